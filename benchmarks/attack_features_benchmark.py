@@ -0,0 +1,57 @@
+"""Positions per second of the attack planes (GridEncoder planes 12-23) generated board by board with python-chess
+and for whole batches with `attack_features`, and of the extra feature planes (mobility, pins, threats).
+
+The positions are those of the games, their piece bitboards are extracted beforehand, so only the attack
+generation is timed. The batch size is the number of positions of one `attack_bitboards` call, e.g. a
+PositionBatchDataset block.
+
+Usage:
+    PYTHONPATH=. python benchmarks/attack_features_benchmark.py -n 1000 --batch-size 1024
+"""
+import argparse
+import time
+import chess
+import numpy as np
+from common import load_games
+from deep_chess_playground.data_encoders.input_encoders.attack_features import attack_bitboards, feature_planes
+from deep_chess_playground.data_encoders.input_encoders.grid_encoding import GridEncoder
+
+
+def positions_per_second(function, items, batch_size, repeats=3):
+    best = float("inf")
+    for _ in range(repeats):
+        start = time.perf_counter()
+        for begin in range(0, len(items), batch_size):
+            function(items[begin:begin + batch_size])
+        best = min(best, time.perf_counter() - start)
+    return len(items) / best
+
+
+def main():
+    argparser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    argparser.add_argument("-i", "--input", help="Converted .csv.gz file, defaults to tests/data/example.pgn.")
+    argparser.add_argument("-n", "--num-games", type=int, default=1000)
+    argparser.add_argument("--batch-size", type=int, default=1024)
+    args = argparser.parse_args()
+
+    encoder, boards = GridEncoder(), []
+    for moves in load_games(args.input, args.num_games):
+        board = chess.Board()
+        for san in moves.split():
+            board.push_san(san)
+            boards.append(board.copy(stack=False))
+    pieces = np.array([encoder.piece_bitboards(board) for board in boards], dtype=np.uint64)
+    assert np.array_equal(attack_bitboards(pieces[:1000]),
+                          np.array([encoder.board_bitboards(board)[12:] for board in boards[:1000]], dtype=np.uint64))
+
+    rows = [("board_bitboards, board by board", positions_per_second(
+                lambda batch: [encoder.board_bitboards(board) for board in batch], boards, args.batch_size)),
+            ("attack_bitboards, batched", positions_per_second(attack_bitboards, pieces, args.batch_size)),
+            ("feature_planes, batched", positions_per_second(feature_planes, pieces, args.batch_size))]
+    print(f"{len(boards)} positions, batches of {args.batch_size}")
+    for name, speed in rows:
+        print(f"{name:32} {speed:12,.0f} positions/sec  ({speed / rows[0][1]:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
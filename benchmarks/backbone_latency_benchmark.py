@@ -0,0 +1,63 @@
+"""Compares CPU latency of the square-token transformer with a ResidualTower of equal parameter count.
+
+Usage:
+    python benchmarks/backbone_latency_benchmark.py --layers 6 --channels 128 --heads 8 --blocks 6
+"""
+import argparse
+import time
+import torch
+from deep_chess_playground.pytorch_modules.cnn.two_d_cnn.backbones import ResidualTower
+from deep_chess_playground.pytorch_modules.transformer.square_transformer import SquareTransformer
+
+
+INPUT_PLANES = 24
+
+
+def count_parameters(module):
+    return sum(parameter.numel() for parameter in module.parameters())
+
+
+def latency_ms(module, batch_size, repeats):
+    x = torch.randn(batch_size, INPUT_PLANES, 8, 8)
+    module.eval()
+    with torch.inference_mode():
+        for _ in range(3):
+            module(x)
+        start = time.perf_counter()
+        for _ in range(repeats):
+            module(x)
+    return (time.perf_counter() - start) / repeats * 1000
+
+
+def residual_tower_with_parameters(num_blocks, num_parameters):
+    """Returns the ResidualTower with num_blocks blocks whose parameter count is closest to num_parameters."""
+    return min((ResidualTower(INPUT_PLANES, num_blocks, channels) for channels in range(8, 513, 8)),
+               key=lambda tower: abs(count_parameters(tower) - num_parameters))
+
+
+def main():
+    argparser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    argparser.add_argument("--layers", type=int, default=6, help="Number of transformer layers.")
+    argparser.add_argument("--channels", type=int, default=128, help="Transformer token dimension.")
+    argparser.add_argument("--heads", type=int, default=8, help="Number of attention heads.")
+    argparser.add_argument("--relative-position-bias", action="store_true", help="Use relative position bias.")
+    argparser.add_argument("--blocks", type=int, default=6, help="Number of residual blocks.")
+    argparser.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 64, 256], help="Batch sizes.")
+    argparser.add_argument("--repeats", type=int, default=20, help="Number of timed forward passes.")
+    argparser.add_argument("--threads", type=int, default=torch.get_num_threads(), help="Number of torch threads.")
+    args = argparser.parse_args()
+    torch.set_num_threads(args.threads)
+
+    transformer = SquareTransformer(INPUT_PLANES, args.layers, args.channels, args.heads,
+                                    relative_position_bias=args.relative_position_bias)
+    tower = residual_tower_with_parameters(args.blocks, count_parameters(transformer))
+    print(f"SquareTransformer: {count_parameters(transformer):,} parameters")
+    print(f"ResidualTower ({args.blocks} blocks, {tower.blocks[-1].conv1[0].out_channels} channels): "
+          f"{count_parameters(tower):,} parameters")
+    for batch_size in args.batch_sizes:
+        print(f"batch {batch_size:4d}: transformer {latency_ms(transformer, batch_size, args.repeats):8.2f} ms, "
+              f"residual tower {latency_ms(tower, batch_size, args.repeats):8.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
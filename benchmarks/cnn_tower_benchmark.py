@@ -0,0 +1,80 @@
+"""Reports parameters, FLOPs per position and CPU latency of the convolutional towers.
+
+Every tower is built from a PyTorchModuleFactory configuration. A JSON file with a list of
+configurations can be given instead of the default ones.
+
+Usage:
+    python benchmarks/cnn_tower_benchmark.py --channels 64 --blocks 6
+    python benchmarks/cnn_tower_benchmark.py -c towers.json
+"""
+import argparse
+import time
+import torch
+from torch.utils.flop_counter import FlopCounterMode
+from deep_chess_playground.pytorch_modules.pytorch_module_factory import PyTorchModuleFactory
+from deep_chess_playground.utils import read_json
+
+
+INPUT_PLANES = 24
+HISTORY_LENGTH = 4
+
+
+def default_configs(num_blocks, channels):
+    common = {"input_planes": INPUT_PLANES, "num_blocks": num_blocks, "channels": channels}
+    return [
+        {"category": "ResidualTower", **common},
+        {"category": "ResidualTower", **common, "squeeze_excitation_ratio": 4},
+        {"category": "ResidualTower", **common, "depthwise_separable": True},
+        {"category": "ResidualTower", **common, "squeeze_excitation_ratio": 4, "depthwise_separable": True},
+        {"category": "ConvolutionalTower", **common},
+        {"category": "LineConvolutionTower", **common},
+        {"category": "LineConvolutionTower", **common, "depthwise_separable": True},
+        {"category": "HistoryConvolutionTower", **common, "input_planes": INPUT_PLANES // HISTORY_LENGTH,
+         "history_length": HISTORY_LENGTH},
+        {"category": "HistoryConvolutionTower", **common, "input_planes": INPUT_PLANES // HISTORY_LENGTH,
+         "history_length": HISTORY_LENGTH, "depthwise_separable": True},
+    ]
+
+
+def describe(config):
+    return ", ".join(f"{key}={value}" for key, value in config.items() if key not in ("input_planes", "channels",
+                                                                                       "num_blocks"))
+
+
+def flops_per_position(module):
+    x = torch.randn(1, INPUT_PLANES, 8, 8)
+    with FlopCounterMode(display=False) as flop_counter, torch.inference_mode():
+        module(x)
+    return flop_counter.get_total_flops()
+
+
+def latency_ms(module, batch_size, repeats):
+    x = torch.randn(batch_size, INPUT_PLANES, 8, 8)
+    with torch.inference_mode():
+        module(x)
+        start = time.perf_counter()
+        for _ in range(repeats):
+            module(x)
+    return (time.perf_counter() - start) / repeats * 1000
+
+
+def main():
+    argparser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    argparser.add_argument("-c", "--conf", help="Path to a JSON file with a list of tower configurations.")
+    argparser.add_argument("--blocks", type=int, default=6, help="Number of blocks of the default towers.")
+    argparser.add_argument("--channels", type=int, default=64, help="Number of channels of the default towers.")
+    argparser.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 256], help="Batch sizes.")
+    argparser.add_argument("--repeats", type=int, default=10, help="Number of timed forward passes.")
+    args = argparser.parse_args()
+
+    configs = read_json(args.conf) if args.conf else default_configs(args.blocks, args.channels)
+    for config in configs:
+        module = PyTorchModuleFactory.build_module(config).eval()
+        latencies = ", ".join(f"batch {batch_size}: {latency_ms(module, batch_size, args.repeats):7.2f} ms"
+                              for batch_size in args.batch_sizes)
+        print(f"{describe(config)}\n    {sum(p.numel() for p in module.parameters()):10,d} parameters, "
+              f"{flops_per_position(module) / 1e6:8.1f} MFLOPs/position, {latencies}")
+
+
+if __name__ == "__main__":
+    main()
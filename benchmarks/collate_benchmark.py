@@ -0,0 +1,80 @@
+"""Compares the per-sample loading path with PositionBatchDataset.
+
+The per-sample path yields a float (24, 8, 8) GridEncoder tensor and a float (8, 8, 73) MoveEncoder8x8x73
+target per position and relies on default_collate; the batch path yields preallocated uint8 planes and int64
+move indices. Reported are the positions per second through a DataLoader, the time spent collating and the
+bytes handed from the workers to the training process per batch.
+
+Usage:
+    python benchmarks/collate_benchmark.py -n 200 --batch-size 1024 --workers 2
+"""
+import argparse
+import os
+import tempfile
+import time
+import chess
+import pandas as pd
+from torch.utils.data import DataLoader, IterableDataset, default_collate
+from common import load_games
+from deep_chess_playground.data_encoders.input_encoders.grid_encoding import GridEncoder
+from deep_chess_playground.data_encoders.output_encoders.move_encoding_8_8_73 import MoveEncoder8x8x73
+from deep_chess_playground.datasets.position_batch_dataset import PositionBatchDataset, batch_loader
+from deep_chess_playground.utils.headers import HEADERS
+
+
+class PerSamplePositionDataset(IterableDataset):
+    def __init__(self, games):
+        self.games = games
+        self.encoder = GridEncoder()
+        self.move_encoder = MoveEncoder8x8x73()
+
+    def __iter__(self):
+        for moves in self.games:
+            board = chess.Board()
+            for san in moves.split():
+                move = board.parse_san(san)
+                yield self.encoder.encode_board(board), self.move_encoder.encode(move.uci())
+                board.push(move)
+
+
+def measure(loader):
+    start, positions, batches, transferred = time.perf_counter(), 0, 0, 0
+    for planes, targets in loader:
+        positions += len(planes)
+        batches += 1
+        transferred += planes.nbytes + targets.nbytes
+    return positions / (time.perf_counter() - start), transferred / max(batches, 1)
+
+
+def main():
+    argparser = argparse.ArgumentParser(description="Per-sample collation vs. batch-native loading.")
+    argparser.add_argument("-i", "--input", help="Converted .csv.gz file.")
+    argparser.add_argument("-n", "--num-games", type=int, default=100, help="Number of games.")
+    argparser.add_argument("--batch-size", type=int, default=1024, help="Positions per batch.")
+    argparser.add_argument("--workers", type=int, default=0, help="DataLoader workers.")
+    args = argparser.parse_args()
+    games = load_games(args.input, args.num_games)
+
+    samples = [sample for sample, _ in zip(PerSamplePositionDataset(games), range(args.batch_size))]
+    start = time.perf_counter()
+    for _ in range(10):
+        default_collate(samples)
+    print(f"default_collate of {len(samples)} samples: {(time.perf_counter() - start) * 100:.1f} ms per batch")
+
+    kwargs = {"num_workers": args.workers, "persistent_workers": False}
+    per_sample_speed, per_sample_bytes = measure(DataLoader(PerSamplePositionDataset(games),
+                                                            batch_size=args.batch_size, **kwargs))
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = os.path.join(tmp_dir, "games.csv.gz")
+        pd.DataFrame([["?"] * (len(HEADERS) - 1) + [moves] for moves in games], columns=HEADERS).to_csv(path,
+                                                                                                         index=False)
+        dataset = PositionBatchDataset([path] * max(args.workers, 1), args.batch_size)
+        batch_speed, batch_bytes = measure(batch_loader(dataset, num_workers=args.workers))
+    print(f"{'path':<12} {'positions/s':>12} {'bytes/batch':>14}")
+    print(f"{'per-sample':<12} {per_sample_speed:>12.0f} {per_sample_bytes:>14.0f}")
+    print(f"{'batch':<12} {batch_speed:>12.0f} {batch_bytes:>14.0f}")
+    print(f"speedup {batch_speed / per_sample_speed:.1f}x, {per_sample_bytes / batch_bytes:.0f}x fewer bytes")
+
+
+if __name__ == "__main__":
+    main()
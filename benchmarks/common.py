@@ -0,0 +1,21 @@
+"""Helpers shared by the benchmark scripts."""
+import io
+import os
+import pandas as pd
+from pypaya_pgn_parser.pgn_parser import PGNParser
+from deep_chess_playground.utils import PROJECT_ROOT
+
+
+def load_games(input_path=None, num_games=1000):
+    """Returns `Moves` strings of num_games games from a converted .csv.gz file.
+
+    Without an input file the games from tests/data/example.pgn are repeated up to num_games."""
+    if input_path:
+        return pd.read_csv(input_path, nrows=num_games)["Moves"].dropna().tolist()
+    with open(os.path.join(PROJECT_ROOT, "tests", "data", "example.pgn")) as f:
+        stream = io.StringIO(f.read())
+    parser, games = PGNParser(), []
+    while result := parser.parse(stream):
+        if result[1]:
+            games.append(result[1])
+    return (games * (num_games // len(games) + 1))[:num_games]
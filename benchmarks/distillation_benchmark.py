@@ -0,0 +1,74 @@
+"""Distills a ResidualTower teacher into a small student through the teacher cache.
+
+Reported are the cache size per position (against the float32 teacher outputs it replaces), the positions per
+second of an epoch read from the cache and of an epoch recomputing the teacher on parsed games, and the
+student's speedup and accuracy retention from `distillation_report`. The teacher is untrained unless a
+state dict is given, so the accuracies are only meaningful with `--teacher-weights`.
+
+Usage:
+    PYTHONPATH=. python benchmarks/distillation_benchmark.py -n 200 --epochs 2
+"""
+import argparse
+import os
+import tempfile
+import time
+import pandas as pd
+import pytorch_lightning as pl
+import torch
+from common import load_games
+from deep_chess_playground.datasets.position_batch_dataset import PositionBatchDataset, batch_loader
+from deep_chess_playground.datasets.teacher_cache import TeacherCacheDataset, build_teacher_cache
+from deep_chess_playground.lightning_modules.distillation_module import DistillationModule, distillation_report
+from deep_chess_playground.pytorch_modules.cnn.two_d_cnn.backbones import ResidualTower
+from deep_chess_playground.pytorch_modules.policy_value_network import PolicyValueNetwork
+from deep_chess_playground.utils.headers import HEADERS
+
+
+def main():
+    argparser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    argparser.add_argument("-i", "--input", help="Converted .csv.gz file, defaults to tests/data/example.pgn.")
+    argparser.add_argument("-n", "--num-games", type=int, default=200)
+    argparser.add_argument("--batch-size", type=int, default=256)
+    argparser.add_argument("--epochs", type=int, default=2)
+    argparser.add_argument("--teacher-weights", help="State dict of a 10x128 PolicyValueNetwork teacher.")
+    args = argparser.parse_args()
+
+    teacher = PolicyValueNetwork(ResidualTower(24, 10, 128), 128)
+    if args.teacher_weights:
+        teacher.load_state_dict(torch.load(args.teacher_weights, weights_only=True))
+    student = PolicyValueNetwork(ResidualTower(24, 2, 32), 32)
+    games = load_games(args.input, args.num_games)
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        csv_path = os.path.join(tmp_dir, "0.csv.gz")
+        pd.DataFrame([["?"] * (len(HEADERS) - 1) + [moves] for moves in games], columns=HEADERS).to_csv(
+            csv_path, index=False)
+        cache_path = os.path.join(tmp_dir, "teacher.cache")
+        positions = PositionBatchDataset([csv_path], args.batch_size)
+
+        start = time.perf_counter()
+        num_positions = build_teacher_cache(teacher, positions, cache_path)
+        teacher_epoch = time.perf_counter() - start
+        print(f"Teacher epoch (parse + encode + forward): {num_positions / teacher_epoch:,.0f} positions/s")
+        cache_bytes = (os.path.getsize(cache_path) - 32) / num_positions
+        print(f"Cache: {cache_bytes:.0f} bytes/position, full float32 outputs: {(4672 + 3) * 4:,} bytes/position")
+
+        dataset = TeacherCacheDataset(cache_path, args.batch_size)
+        start = time.perf_counter()
+        for _ in batch_loader(dataset):
+            pass
+        print(f"Cached epoch (read only): {num_positions / (time.perf_counter() - start):,.0f} positions/s")
+
+        module = DistillationModule(student, torch.optim.Adam(student.parameters(), lr=1e-3))
+        trainer = pl.Trainer(max_epochs=args.epochs, logger=False, enable_checkpointing=False,
+                             enable_progress_bar=False, enable_model_summary=False)
+        start = time.perf_counter()
+        trainer.fit(module, batch_loader(dataset))
+        print(f"Student training: {args.epochs * num_positions / (time.perf_counter() - start):,.0f} positions/s")
+
+        report = distillation_report(teacher, student, positions)
+    for name, value in report.items():
+        print(f"{name}: {value:,.3f}")
+
+
+if __name__ == "__main__":
+    main()
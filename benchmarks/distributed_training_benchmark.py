@@ -0,0 +1,73 @@
+"""Scaling of data-parallel CPU training from 1 to N processes on one machine.
+
+Every process trains on its own converted files with the same number of games and batch size (weak scaling),
+through `training.distributed.fit` with the gloo backend. Reported are the training positions per second of all
+processes together (without the first batch of an epoch), the speedup over one process and the scaling
+efficiency, speedup / processes. With N processes the gradient compressions and the hierarchical all-reduce
+(in groups of N / 2 processes) are compared as well. Each process uses `--threads` threads, so the machine
+needs N * threads cores for a fair comparison.
+
+Usage:
+    PYTHONPATH=. python benchmarks/distributed_training_benchmark.py --processes 4 -n 400
+"""
+import argparse
+import os
+import tempfile
+import pandas as pd
+import torch
+from common import load_games
+from deep_chess_playground.lightning_modules.basic_module import BasicModule
+from deep_chess_playground.pytorch_modules.cnn.two_d_cnn.backbones import ResidualTower
+from deep_chess_playground.training.distributed import fit
+from deep_chess_playground.utils.headers import HEADERS
+
+
+def measure(settings, blocks, channels):
+    torch.manual_seed(0)
+    network = torch.nn.Sequential(ResidualTower(24, blocks, channels), torch.nn.Flatten(),
+                                  torch.nn.Linear(channels * 64, 4672))
+    module = BasicModule(network, torch.optim.SGD(network.parameters(), lr=0.01), torch.nn.CrossEntropyLoss())
+    trainer = fit(module, settings, start_method="spawn", logger=False, enable_checkpointing=False,
+                  enable_progress_bar=False, enable_model_summary=False)
+    return float(trainer.callback_metrics["positions_per_second"])
+
+
+def main():
+    argparser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    argparser.add_argument("-i", "--input", help="Converted .csv.gz file, defaults to tests/data/example.pgn.")
+    argparser.add_argument("-n", "--num-games", type=int, default=400, help="Games per process.")
+    argparser.add_argument("--processes", type=int, default=4)
+    argparser.add_argument("--threads", type=int, default=1, help="Threads per process.")
+    argparser.add_argument("--batch-size", type=int, default=256)
+    argparser.add_argument("--blocks", type=int, default=4)
+    argparser.add_argument("--channels", type=int, default=64)
+    args = argparser.parse_args()
+
+    games = load_games(args.input, args.num_games)
+    rows = []
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for index in range(args.processes):
+            pd.DataFrame([["?"] * (len(HEADERS) - 1) + [moves] for moves in games], columns=HEADERS).to_csv(
+                os.path.join(tmp_dir, f"{index}.csv.gz"), index=False)
+        runs = [(processes, "flat", "none") for processes in range(1, args.processes + 1)]
+        if args.processes > 1:
+            runs += [(args.processes, "flat", "fp16"), (args.processes, "flat", "powersgd")]
+        if args.processes > 2 and args.processes % 2 == 0:
+            runs.append((args.processes, "hierarchical", "none"))
+        for processes, allreduce, compression in runs:
+            settings = {"train_files": [os.path.join(tmp_dir, f"{index}.csv.gz") for index in range(processes)],
+                        "batch_size": args.batch_size, "processes": processes, "threads": args.threads,
+                        "shuffle_buffer": 16 * args.batch_size, "allreduce": allreduce,
+                        "group_size": processes // 2 or 1, "gradient_compression": compression,
+                        "powersgd_start_step": 2}
+            rate = measure(settings, args.blocks, args.channels)
+            rows.append({"processes": processes, "allreduce": allreduce, "compression": compression,
+                         "positions_per_second": rate})
+    results = pd.DataFrame(rows)
+    results["speedup"] = results["positions_per_second"] / results["positions_per_second"].iloc[0]
+    results["efficiency"] = results["speedup"] / results["processes"]
+    print(results.to_string(index=False, float_format="%.2f"))
+
+
+if __name__ == "__main__":
+    main()
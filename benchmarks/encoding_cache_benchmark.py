@@ -0,0 +1,62 @@
+"""Measures PositionBatchDataset with and without the shared EncodingCache over several epochs.
+
+Reported are the positions per second of every epoch and the hit rate of the cache, which tells whether the
+cache pays off for a dataset: a hit replaces the attack generation of `GridEncoder.board_bitboards` by a copy,
+a miss adds the lookup and the insertion.
+
+Usage:
+    PYTHONPATH=. python benchmarks/encoding_cache_benchmark.py -i games.csv.gz -n 5000 --epochs 2 --workers 2
+"""
+import argparse
+import os
+import tempfile
+import time
+import pandas as pd
+from common import load_games
+from deep_chess_playground.data_encoders.input_encoders.encoding_cache import CAPACITY, EncodingCache
+from deep_chess_playground.datasets.position_batch_dataset import PositionBatchDataset, batch_loader
+from deep_chess_playground.utils.headers import HEADERS
+
+
+def run_epochs(dataset, epochs, workers):
+    speeds = []
+    for _ in range(epochs):
+        start, positions = time.perf_counter(), 0
+        for planes, _ in batch_loader(dataset, num_workers=workers):
+            positions += len(planes)
+        speeds.append(positions / (time.perf_counter() - start))
+    return speeds
+
+
+def main():
+    argparser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    argparser.add_argument("-i", "--input", help="Converted .csv.gz file, defaults to tests/data/example.pgn.")
+    argparser.add_argument("-n", "--num-games", type=int, default=1000)
+    argparser.add_argument("--epochs", type=int, default=2)
+    argparser.add_argument("--workers", type=int, default=0)
+    argparser.add_argument("--capacity", type=int, default=CAPACITY)
+    argparser.add_argument("--batch-size", type=int, default=1024)
+    args = argparser.parse_args()
+
+    games = load_games(args.input, args.num_games)
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = os.path.join(tmp_dir, "0.csv.gz")
+        pd.DataFrame([["?"] * (len(HEADERS) - 1) + [moves] for moves in games], columns=HEADERS).to_csv(
+            path, index=False)
+        baseline = run_epochs(PositionBatchDataset([path], args.batch_size), args.epochs, args.workers)
+        cache = EncodingCache(args.capacity)
+        try:
+            cached = run_epochs(PositionBatchDataset([path], args.batch_size, cache=cache), args.epochs,
+                                args.workers)
+            stats = cache.stats()
+        finally:
+            cache.close()
+            cache.unlink()
+    for epoch, (without, with_cache) in enumerate(zip(baseline, cached)):
+        print(f"Epoch {epoch}: {without:,.0f} positions/s without cache, {with_cache:,.0f} with cache")
+    print(f"Hit rate {stats['hit_rate']:.1%} ({stats['hits']:,} hits, {stats['misses']:,} misses, "
+          f"{stats['evictions']:,} evictions, {stats['entries']:,} entries)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+"""Compares a query over converted games answered by GamesIndex with loading the files into pandas.
+
+Without input files, synthetic files are written from the games of tests/data/example.pgn with random
+players and ratings.
+
+Usage:
+    python benchmarks/games_index_benchmark.py --files 8 --games-per-file 50000
+    python benchmarks/games_index_benchmark.py -i 0.csv.gz 1.csv.gz
+"""
+import argparse
+import io
+import os
+import tempfile
+import time
+import numpy as np
+import pandas as pd
+from pypaya_pgn_parser.pgn_parser import PGNParser
+from deep_chess_playground.utils import PROJECT_ROOT
+from deep_chess_playground.utils.games_index import GamesIndex
+from deep_chess_playground.utils.headers import HEADERS
+
+
+def write_synthetic_files(destination_dir, num_files, games_per_file, seed=0):
+    with open(os.path.join(PROJECT_ROOT, "tests", "data", "example.pgn")) as f:
+        stream = io.StringIO(f.read())
+    parser, games = PGNParser(), []
+    while result := parser.parse(stream):
+        games.append(result[0] + [result[1]])
+    rng = np.random.default_rng(seed)
+    paths = []
+    for file_index in range(num_files):
+        df = pd.DataFrame([games[i] for i in rng.integers(len(games), size=games_per_file)], columns=HEADERS)
+        df["White"] = [f"player{i}" for i in rng.integers(10000, size=games_per_file)]
+        df["Black"] = [f"player{i}" for i in rng.integers(10000, size=games_per_file)]
+        df["WhiteElo"] = rng.normal(1700, 350, size=games_per_file).astype(int)
+        df["BlackElo"] = rng.normal(1700, 350, size=games_per_file).astype(int)
+        df["Date"] = [f"{year}.01.01" for year in rng.integers(2018, 2025, size=games_per_file)]
+        paths.append(os.path.join(destination_dir, f"{file_index}.csv.gz"))
+        df.to_csv(paths[-1], index=False, compression="infer")
+    return paths
+
+
+def pandas_query(paths, family, year, min_elo):
+    frames = []
+    for path in paths:
+        df = pd.read_csv(path, dtype=str)
+        elo = pd.concat([pd.to_numeric(df["WhiteElo"], errors="coerce"),
+                         pd.to_numeric(df["BlackElo"], errors="coerce")], axis=1).min(axis=1)
+        frames.append(df[df["Opening"].str.startswith(family) & df["Date"].str.startswith(year) & (elo >= min_elo)])
+    return pd.concat(frames)
+
+
+def main():
+    argparser = argparse.ArgumentParser(description="Indexed queries vs. pandas scans of converted games.")
+    argparser.add_argument("-i", "--input", nargs="+", help="Converted .csv.gz files.")
+    argparser.add_argument("--files", type=int, default=4, help="Number of synthetic files.")
+    argparser.add_argument("--games-per-file", type=int, default=20000, help="Games per synthetic file.")
+    argparser.add_argument("--opening-family", default="Sicilian Defense", help="Queried opening family.")
+    argparser.add_argument("--year", default="2023", help="Queried year.")
+    argparser.add_argument("--min-elo", type=int, default=2200, help="Minimum rating of both players.")
+    args = argparser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        paths = args.input or write_synthetic_files(tmp_dir, args.files, args.games_per_file)
+        start = time.perf_counter()
+        index = GamesIndex.build(paths)
+        build_time = time.perf_counter() - start
+        index_path = os.path.join(tmp_dir, "index.npz")
+        index.save(index_path)
+        print(f"Index of {index.num_games} games built in {build_time:.2f} s, "
+              f"{os.path.getsize(index_path) / 2 ** 20:.1f} MB")
+
+        start = time.perf_counter()
+        expected = pandas_query(paths, args.opening_family, args.year, args.min_elo)
+        pandas_time = time.perf_counter() - start
+        start = time.perf_counter()
+        index = GamesIndex.load(index_path)
+        ids = index.search(opening_family=args.opening_family, year=args.year, min_elo=args.min_elo)
+        search_time = time.perf_counter() - start
+        result = index.read_rows(ids, min_elo=args.min_elo)
+        index_time = time.perf_counter() - start
+        assert len(result) == len(expected)
+        print(f"{len(result)} matching games")
+        print(f"pandas scan:          {pandas_time * 1000:9.1f} ms")
+        print(f"index search (ids):   {search_time * 1000:9.1f} ms")
+        print(f"index search + rows:  {index_time * 1000:9.1f} ms ({pandas_time / index_time:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+"""Compares the header-only scan with plain zstd decompression and with parsing the games with PGNParser.
+
+Usage:
+    PYTHONPATH=. python benchmarks/header_scan_benchmark.py -i lichess_db_standard_rated_2013-01.pgn.zst
+
+Without an input file tests/data/example.pgn is repeated `--repeat` times and compressed.
+"""
+import argparse
+import io
+import os
+import tempfile
+import time
+import zstandard as zstd
+from pypaya_pgn_parser.pgn_parser import PGNParser
+from deep_chess_playground.utils import PROJECT_ROOT
+from deep_chess_playground.utils.header_scan import CHUNK_SIZE, scan_headers
+
+
+def decompress(path):
+    with open(path, "rb") as f:
+        reader = zstd.ZstdDecompressor().stream_reader(f)
+        size = 0
+        while chunk := reader.read(CHUNK_SIZE):
+            size += len(chunk)
+    return size
+
+
+def parse_games(path, max_games, max_bytes=64 * 1024 * 1024):
+    parser, games = PGNParser(), 0
+    with open(path, "rb") as f:
+        # PGNParser needs a seekable stream
+        stream = io.StringIO(zstd.ZstdDecompressor().stream_reader(f).read(max_bytes).decode(errors="ignore"))
+    while games < max_games and parser.parse(stream):
+        games += 1
+    return games
+
+
+def main():
+    argparser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    argparser.add_argument("-i", "--input", help="Path to a .pgn.zst file.")
+    argparser.add_argument("--repeat", type=int, default=400)
+    argparser.add_argument("--parse-games", type=int, default=5000, help="Games parsed with PGNParser.")
+    args = argparser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = args.input
+        if path is None:
+            with open(os.path.join(PROJECT_ROOT, "tests", "data", "example.pgn"), "rb") as f:
+                data = f.read() * args.repeat
+            path = os.path.join(tmp_dir, "example.pgn.zst")
+            with open(path, "wb") as f:
+                f.write(zstd.compress(data, 19))
+
+        start = time.perf_counter()
+        size = decompress(path)
+        seconds = time.perf_counter() - start
+        print(f"decompression: {size / seconds / 1e6:,.0f} MB/s")
+
+        start = time.perf_counter()
+        histograms = scan_headers(path)
+        seconds = time.perf_counter() - start
+        print(f"header scan:   {size / seconds / 1e6:,.0f} MB/s, {histograms.num_games / seconds:,.0f} games/s")
+
+        start = time.perf_counter()
+        games = parse_games(path, args.parse_games)
+        print(f"PGNParser:     {games / (time.perf_counter() - start):,.0f} games/s (including decompression)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+"""Startup time and memory of a network loaded from a Lightning checkpoint vs a model package.
+
+A PolicyValueNetwork on a ResidualTower is saved as a Lightning-style checkpoint with its Adam state, then
+exported as a model package. Each format is loaded by several fresh processes, which report the load time and
+how much their resident memory grew, split into memory private to the process and pages shared with the other
+processes (from /proc/self/smaps_rollup, Linux only).
+
+Usage:
+    PYTHONPATH=. python benchmarks/model_package_benchmark.py --blocks 20 --channels 256 --processes 4
+"""
+import argparse
+import multiprocessing
+import os
+import tempfile
+import time
+import pandas as pd
+import torch
+from deep_chess_playground.engine.checkpoint import STATE_DICT_PREFIX, load_pytorch_module
+from deep_chess_playground.engine.model_package import export_model_package, load_model_package
+from deep_chess_playground.pytorch_modules.pytorch_module_factory import PyTorchModuleFactory
+
+
+def memory_kb():
+    with open("/proc/self/smaps_rollup") as f:
+        values = {line.split(":")[0]: int(line.split()[1]) for line in f if line.split()[-1] == "kB"}
+    return values["Private_Clean"] + values["Private_Dirty"], values["Shared_Clean"] + values["Shared_Dirty"]
+
+
+def load_worker(loader, config, path, start_barrier, end_barrier, results):
+    torch.set_num_threads(1)
+    private_before, shared_before = memory_kb()
+    start_barrier.wait()
+    start = time.perf_counter()
+    model = load_model_package(path) if loader == "package" else load_pytorch_module(config, path)
+    with torch.inference_mode():
+        model(torch.zeros(1, 24, 8, 8))
+    seconds = time.perf_counter() - start
+    # Every process holds its model while the others measure
+    end_barrier.wait()
+    private_after, shared_after = memory_kb()
+    results.put((seconds, (private_after - private_before) / 1024, (shared_after - shared_before) / 1024))
+    end_barrier.wait()
+
+
+def measure(loader, config, path, processes):
+    context = multiprocessing.get_context("spawn")
+    start_barrier, end_barrier, results = context.Barrier(processes), context.Barrier(processes), context.Queue()
+    workers = [context.Process(target=load_worker, args=(loader, config, path, start_barrier, end_barrier, results))
+               for _ in range(processes)]
+    for worker in workers:
+        worker.start()
+    rows = [results.get() for _ in workers]
+    for worker in workers:
+        worker.join()
+    seconds, private, shared = (sum(values) / len(rows) for values in zip(*rows))
+    return {"format": loader, "load_ms": seconds * 1000, "private_mb_per_process": private,
+            "shared_mb_per_process": shared}
+
+
+def main():
+    argparser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    argparser.add_argument("--blocks", type=int, default=20)
+    argparser.add_argument("--channels", type=int, default=256)
+    argparser.add_argument("--processes", type=int, default=4)
+    args = argparser.parse_args()
+
+    network_config = {"category": "PolicyValueNetwork", "channels": args.channels,
+                      "backbone": {"category": "ResidualTower", "input_planes": 24, "num_blocks": args.blocks,
+                                   "channels": args.channels}}
+    config = {"category": "MultiClassClassifier", "pytorch_module": network_config}
+    model = PyTorchModuleFactory.build_module(network_config)
+    optimizer = torch.optim.Adam(model.parameters())
+    model(torch.rand(2, 24, 8, 8))[0].sum().backward()
+    optimizer.step()
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        checkpoint_path = os.path.join(tmp_dir, "model.ckpt")
+        package_path = os.path.join(tmp_dir, "model.pkg.pt")
+        torch.save({"state_dict": {STATE_DICT_PREFIX + name: tensor for name, tensor in model.state_dict().items()},
+                    "optimizer_states": [optimizer.state_dict()]}, checkpoint_path)
+        export_model_package(config, checkpoint_path, package_path)
+        print(f"{sum(parameter.numel() for parameter in model.parameters()) / 1e6:.1f}M parameters, "
+              f"checkpoint {os.path.getsize(checkpoint_path) / 2 ** 20:.0f} MB, "
+              f"package {os.path.getsize(package_path) / 2 ** 20:.0f} MB")
+        rows = [measure(loader, config, path, args.processes)
+                for loader, path in (("checkpoint", checkpoint_path), ("package", package_path))]
+    print(pd.DataFrame(rows).to_string(index=False, float_format="%.1f"))
+
+
+if __name__ == "__main__":
+    main()
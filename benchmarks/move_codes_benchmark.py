@@ -0,0 +1,63 @@
+"""Compares the SAN `Moves` column with 16-bit move code sidecars: bytes per ply on disk, trusted replay in
+plies per second and PositionBatchDataset epochs in positions per second.
+
+Usage:
+    PYTHONPATH=. python benchmarks/move_codes_benchmark.py -n 2000
+
+Without an input file the games from tests/data/example.pgn are used.
+"""
+import argparse
+import os
+import tempfile
+import time
+import pandas as pd
+from common import load_games
+from deep_chess_playground.datasets.position_batch_dataset import PositionBatchDataset
+from deep_chess_playground.utils.headers import HEADERS
+from deep_chess_playground.utils.move_codes import san_to_codes, save_move_codes, sidecar_path
+from deep_chess_playground.utils.trusted_replay import replay, replay_codes
+
+
+def per_second(function, items, count):
+    start = time.perf_counter()
+    for item in items:
+        function(item)
+    return count / (time.perf_counter() - start)
+
+
+def main():
+    argparser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    argparser.add_argument("-i", "--input", help="Path to a converted .csv.gz file.")
+    argparser.add_argument("-n", "--num-games", type=int, default=2000, help="Number of games.")
+    argparser.add_argument("--batch-size", type=int, default=1024)
+    args = argparser.parse_args()
+
+    games = load_games(args.input, args.num_games)
+    codes = [san_to_codes(moves) for moves in games]
+    plies = sum(len(game) for game in codes)
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        san_path = os.path.join(tmp_dir, "san.csv.gz")
+        pd.DataFrame({"Moves": games}).to_csv(san_path, index=False)
+        csv_path = os.path.join(tmp_dir, "0.csv.gz")
+        pd.DataFrame([["?"] * (len(HEADERS) - 1) + [moves] for moves in games], columns=HEADERS).to_csv(
+            csv_path, index=False)
+        save_move_codes(sidecar_path(csv_path), codes)
+        # Without an input file the games are repeated, which flatters both compressed sizes
+        print(f"SAN text: {sum(len(moves) + 1 for moves in games) / plies:.2f} bytes/ply, "
+              f"gzip: {os.path.getsize(san_path) / plies:.2f} bytes/ply, "
+              f"codes: 2 bytes/ply, "
+              f"compressed sidecar: {os.path.getsize(sidecar_path(csv_path)) / plies:.2f} bytes/ply")
+
+        san_replay = per_second(replay, games, plies)
+        code_replay = per_second(replay_codes, codes, plies)
+        print(f"replay (SAN):   {san_replay:,.0f} plies/sec")
+        print(f"replay (codes): {code_replay:,.0f} plies/sec ({code_replay / san_replay:.1f}x)")
+
+        for moves_format in ("san", "codes"):
+            dataset = PositionBatchDataset([csv_path], args.batch_size, moves_format=moves_format)
+            speed = per_second(lambda batch: None, dataset, plies)
+            print(f"dataset epoch ({moves_format}): {speed:,.0f} positions/sec")
+
+
+if __name__ == "__main__":
+    main()
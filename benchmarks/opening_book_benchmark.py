@@ -0,0 +1,78 @@
+"""Measures opening book build throughput and memory-mapped lookup latency.
+
+The build is measured on converted games (tests/data/example.pgn repeated by default). The lookup latency is
+measured on a synthetic book of --records random records written directly in the book format, to show that
+it only grows with log(n).
+
+Usage:
+    python benchmarks/opening_book_benchmark.py --records 50000000
+    python benchmarks/opening_book_benchmark.py -i 0.csv.gz --max-ply 20
+"""
+import argparse
+import os
+import tempfile
+import time
+import numpy as np
+import pandas as pd
+from common import load_games
+from deep_chess_playground.utils.headers import HEADERS
+from deep_chess_playground.utils.opening_book import (HEADER_STRUCT, MAGIC, RECORD_DTYPE, VERSION, OpeningBook,
+                                                      OpeningBookBuilder)
+
+
+def write_synthetic_book(path, num_records, seed=0):
+    rng = np.random.default_rng(seed)
+    with open(path, "wb") as f:
+        f.write(HEADER_STRUCT.pack(MAGIC, VERSION, RECORD_DTYPE.itemsize, 0, 0, num_records))
+        keys = np.sort(rng.integers(0, 2 ** 63, size=num_records, dtype=np.uint64))
+        block_size = 1_000_000
+        for start in range(0, num_records, block_size):
+            records = np.zeros(min(block_size, num_records - start), dtype=RECORD_DTYPE)
+            records["key"] = keys[start:start + len(records)]
+            records["move"] = 12 | 28 << 6
+            records["wins"] = 1
+            records.tofile(f)
+    return keys
+
+
+def main():
+    argparser = argparse.ArgumentParser(description="Opening book build and lookup benchmark.")
+    argparser.add_argument("-i", "--input", help="Converted .csv.gz file.")
+    argparser.add_argument("-n", "--num-games", type=int, default=2000, help="Number of games.")
+    argparser.add_argument("--max-ply", type=int, default=20, help="Plies of each game added to the book.")
+    argparser.add_argument("--records", type=int, default=5_000_000, help="Records of the synthetic book.")
+    argparser.add_argument("--lookups", type=int, default=100_000, help="Number of timed lookups.")
+    args = argparser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        if args.input:
+            csv_path = args.input
+        else:
+            csv_path = os.path.join(tmp_dir, "games.csv.gz")
+            df = pd.DataFrame([["?"] * (len(HEADERS) - 1) + [moves] for moves in load_games(None, args.num_games)],
+                              columns=HEADERS)
+            df["Result"] = "1-0"
+            df.to_csv(csv_path, index=False)
+        start = time.perf_counter()
+        num_records = OpeningBookBuilder(max_ply=args.max_ply).build([csv_path], os.path.join(tmp_dir, "book.bin"))
+        elapsed = time.perf_counter() - start
+        print(f"Built a book of {num_records} moves from {args.num_games} games in {elapsed:.2f} s "
+              f"({args.num_games * args.max_ply / elapsed:.0f} plies/s)")
+
+        book_path = os.path.join(tmp_dir, "synthetic.bin")
+        keys = write_synthetic_book(book_path, args.records)
+        start = time.perf_counter()
+        book = OpeningBook(book_path)
+        open_time = time.perf_counter() - start
+        queries = np.random.default_rng(1).choice(keys, size=args.lookups)
+        start = time.perf_counter()
+        for key in queries.tolist():
+            book.find_all(key)
+        lookup_time = time.perf_counter() - start
+        print(f"Synthetic book of {len(book)} records ({os.path.getsize(book_path) / 2 ** 20:.0f} MB): "
+              f"opened in {open_time * 1e6:.0f} us, {lookup_time / args.lookups * 1e6:.1f} us per lookup")
+        book.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,52 @@
+"""Compares the piece-list input path with the dense GridEncoder path.
+
+Reports storage bytes per position and samples per second of encoding plus batch collation.
+
+Usage:
+    python benchmarks/piece_list_benchmark.py -i data/0.csv.gz -n 200 --batch-size 256
+"""
+import argparse
+import time
+import numpy as np
+import torch
+from common import load_games
+from deep_chess_playground.data_encoders.input_encoders.grid_encoding import GridEncoder
+from deep_chess_playground.data_encoders.input_encoders.piece_list_encoding import PieceListEncoder
+from deep_chess_playground.utils.trusted_replay import replay
+
+
+def samples_per_second(encode_batch, positions, batch_size):
+    start = time.perf_counter()
+    for begin in range(0, len(positions), batch_size):
+        encode_batch(positions[begin:begin + batch_size])
+    return len(positions) / (time.perf_counter() - start)
+
+
+def main():
+    argparser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    argparser.add_argument("-i", "--input", help="Path to a converted .csv.gz file.")
+    argparser.add_argument("-n", "--num-games", type=int, default=100, help="Number of games to replay.")
+    argparser.add_argument("--batch-size", type=int, default=256, help="Number of positions per batch.")
+    args = argparser.parse_args()
+
+    positions = np.concatenate([replay(moves) for moves in load_games(args.input, args.num_games)])
+    grid_encoder, piece_list_encoder = GridEncoder(), PieceListEncoder()
+
+    paths = {
+        "grid (float32 planes, stacked)":
+            lambda batch: torch.stack([grid_encoder.encode_bitboards(bitboards) for bitboards in batch]),
+        "piece list (per sample, stacked)":
+            lambda batch: torch.from_numpy(np.stack([piece_list_encoder.encode_bitboards(bitboards)
+                                                     for bitboards in batch])),
+        "piece list (batch encoded)":
+            lambda batch: torch.from_numpy(piece_list_encoder.encode_batch_bitboards(batch)),
+    }
+    print(f"{len(positions):,} positions")
+    for name, encode_batch in paths.items():
+        bytes_per_position = encode_batch(positions[:1]).element_size() * encode_batch(positions[:1]).numel()
+        print(f"{name:34s} {bytes_per_position:6d} bytes/position, "
+              f"{samples_per_second(encode_batch, positions, args.batch_size):12,.0f} samples/sec")
+
+
+if __name__ == "__main__":
+    main()
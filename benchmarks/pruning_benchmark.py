@@ -0,0 +1,79 @@
+"""Latency/accuracy Pareto table of a channel-pruned ResidualTower policy network.
+
+A PolicyValueNetwork is trained on the played moves for a few epochs with the BatchNorm L1 penalty, then
+pruned to every sparsity target with fine-tuning after each pruning round. The accuracy is the top-1 move
+accuracy on held-out games, the latency that of a batch on the CPU.
+
+Usage:
+    PYTHONPATH=. python benchmarks/pruning_benchmark.py -n 400 --blocks 4 --channels 64
+"""
+import argparse
+import os
+import tempfile
+import pandas as pd
+import torch
+import torch.nn.functional as F
+from common import load_games
+from deep_chess_playground.datasets.position_batch_dataset import PositionBatchDataset
+from deep_chess_playground.pytorch_modules.cnn.channel_pruning import batch_norm_l1_penalty, pareto_table
+from deep_chess_playground.pytorch_modules.cnn.two_d_cnn.backbones import ResidualTower
+from deep_chess_playground.pytorch_modules.policy_value_network import PolicyValueNetwork
+from deep_chess_playground.utils.headers import HEADERS
+
+
+def load_batches(games, batch_size, tmp_dir, name):
+    path = os.path.join(tmp_dir, f"{name}.csv.gz")
+    pd.DataFrame([["?"] * (len(HEADERS) - 1) + [moves] for moves in games], columns=HEADERS).to_csv(path,
+                                                                                                     index=False)
+    return [(planes.float(), targets.clone()) for planes, targets in PositionBatchDataset([path], batch_size)]
+
+
+def train(model, batches, epochs, lr, l1_factor=0.0):
+    optimizer = torch.optim.Adam(model.parameters(), lr=lr)
+    model.train()
+    for _ in range(epochs):
+        for planes, targets in batches:
+            loss = F.cross_entropy(model(planes)[0], targets) + l1_factor * batch_norm_l1_penalty(model)
+            optimizer.zero_grad()
+            loss.backward()
+            optimizer.step()
+
+
+def accuracy(model, batches):
+    model.eval()
+    with torch.inference_mode():
+        correct = sum(int((model(planes)[0].argmax(dim=1) == targets).sum()) for planes, targets in batches)
+    return correct / sum(len(targets) for _, targets in batches)
+
+
+def main():
+    argparser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    argparser.add_argument("-i", "--input", help="Converted .csv.gz file, defaults to tests/data/example.pgn.")
+    argparser.add_argument("-n", "--num-games", type=int, default=400)
+    argparser.add_argument("--blocks", type=int, default=4)
+    argparser.add_argument("--channels", type=int, default=64)
+    argparser.add_argument("--epochs", type=int, default=3)
+    argparser.add_argument("--fine-tune-epochs", type=int, default=1)
+    argparser.add_argument("--rounds", type=int, default=2)
+    argparser.add_argument("--sparsities", type=float, nargs="+", default=[0.0, 0.25, 0.5, 0.75, 0.9])
+    argparser.add_argument("--batch-size", type=int, default=256)
+    args = argparser.parse_args()
+
+    torch.manual_seed(0)
+    games = load_games(args.input, args.num_games)
+    split = len(games) * 9 // 10
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        train_batches = load_batches(games[:split], args.batch_size, tmp_dir, "train")
+        test_batches = load_batches(games[split:], args.batch_size, tmp_dir, "test")
+    model = PolicyValueNetwork(ResidualTower(24, args.blocks, args.channels), args.channels)
+    train(model, train_batches, args.epochs, 1e-3, l1_factor=1e-4)
+    table = pareto_table(model, args.sparsities, evaluate=lambda pruned: accuracy(pruned, test_batches),
+                         example_input=train_batches[0][0],
+                         fine_tune=lambda pruned: train(pruned, train_batches, args.fine_tune_epochs, 1e-4),
+                         rounds=args.rounds)
+    table["flops"] = table["flops"] / 1e6
+    print(table.rename(columns={"flops": "mflops"}).to_string(index=False, float_format="{:.3f}".format))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+"""Time to score a network on a large puzzle suite: encoding the suite, loading it from the cache and evaluating it.
+
+The suite is a Lichess puzzle CSV made of positions of games (the opponent's move and the played reply as the
+solution), with random themes and ratings. Reported are the seconds and positions per second of the first
+load (parsing, encoding and writing the cache), of a load from the cache and of the batched evaluation of a
+PolicyValueNetwork, followed by the accuracy tables.
+
+Usage:
+    PYTHONPATH=. python benchmarks/puzzle_benchmark.py -n 100000 --blocks 6 --channels 64
+"""
+import argparse
+import os
+import tempfile
+import time
+import chess
+import numpy as np
+import pandas as pd
+import torch
+from common import load_games
+from deep_chess_playground.arena.puzzles import accuracy_report, evaluate_suite, load_suite
+from deep_chess_playground.pytorch_modules.cnn.two_d_cnn.backbones import ResidualTower
+from deep_chess_playground.pytorch_modules.policy_value_network import PolicyValueNetwork
+
+
+THEMES = ["fork", "pin", "mateIn2", "endgame", "middlegame", "short", "long", "hangingPiece"]
+
+
+def make_puzzles(games, num_puzzles, seed=0):
+    rng = np.random.default_rng(seed)
+    # FENs and UCI moves of every position of the games
+    lines = []
+    for moves in games:
+        board, line = chess.Board(), []
+        for san in moves.split():
+            move = board.parse_san(san)
+            line.append((board.fen(), move.uci()))
+            board.push(move)
+        if len(line) >= 2:
+            lines.append(line)
+    rows = []
+    for index in range(num_puzzles):
+        line = lines[rng.integers(len(lines))]
+        ply = rng.integers(len(line) - 1)
+        themes = " ".join(rng.choice(THEMES, size=2, replace=False))
+        rows.append([f"{index:06d}", line[ply][0], f"{line[ply][1]} {line[ply + 1][1]}",
+                     int(rng.integers(600, 2800)), themes])
+    return pd.DataFrame(rows, columns=["PuzzleId", "FEN", "Moves", "Rating", "Themes"])
+
+
+def main():
+    argparser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    argparser.add_argument("-i", "--input", help="Converted .csv.gz file, defaults to tests/data/example.pgn.")
+    argparser.add_argument("-n", "--num-puzzles", type=int, default=100_000)
+    argparser.add_argument("--batch-size", type=int, default=256)
+    argparser.add_argument("--blocks", type=int, default=6)
+    argparser.add_argument("--channels", type=int, default=64)
+    args = argparser.parse_args()
+
+    puzzles = make_puzzles(load_games(args.input, 200), args.num_puzzles)
+    model = PolicyValueNetwork(ResidualTower(24, args.blocks, args.channels), args.channels)
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = os.path.join(tmp_dir, "puzzles.csv")
+        puzzles.to_csv(path, index=False)
+        rows = []
+        for stage in ("encode", "cached load", "evaluate"):
+            start = time.perf_counter()
+            if stage == "evaluate":
+                solved = evaluate_suite(model, suite, batch_size=args.batch_size)
+            else:
+                suite = load_suite(path)
+            seconds = time.perf_counter() - start
+            rows.append({"stage": stage, "seconds": seconds, "positions_per_second": len(suite) / seconds})
+    print(pd.DataFrame(rows).to_string(index=False, float_format="%.2f"))
+    print(f"{args.blocks}x{args.channels} network, {torch.get_num_threads()} threads, {len(suite)} positions")
+    report = accuracy_report(suite, solved)
+    print(report["total"].to_string(index=False, float_format="%.3f"))
+    print(report["theme"].to_string(float_format="%.3f"))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,40 @@
+"""Measures how self-play throughput (games/hour) scales with the number of worker processes.
+
+All workers share one inference server process, so the report also shows the mean batch size the server
+gets. A small randomly initialised PolicyValueNetwork is used and games are cut at --max-plies.
+
+Usage:
+    python benchmarks/self_play_benchmark.py --workers 1 2 4 --games 16
+"""
+import argparse
+import tempfile
+from deep_chess_playground.pytorch_modules.cnn.two_d_cnn.backbones import ResidualTower
+from deep_chess_playground.pytorch_modules.policy_value_network import PolicyValueNetwork
+from deep_chess_playground.self_play.self_play_generator import SelfPlayGenerator
+
+
+def main():
+    argparser = argparse.ArgumentParser(description="Self-play games/hour for different numbers of workers.")
+    argparser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4], help="Numbers of workers.")
+    argparser.add_argument("--games", type=int, default=16, help="Games per run.")
+    argparser.add_argument("--simulations", type=int, default=32, help="Search visits per move.")
+    argparser.add_argument("--max-plies", type=int, default=40, help="Maximum game length.")
+    argparser.add_argument("--blocks", type=int, default=4, help="Residual blocks of the network.")
+    argparser.add_argument("--channels", type=int, default=64, help="Channels of the network.")
+    args = argparser.parse_args()
+
+    model = PolicyValueNetwork(ResidualTower(24, args.blocks, args.channels), args.channels)
+    baseline = None
+    print(f"{'workers':>8} {'games/hour':>12} {'positions/s':>12} {'mean batch':>11} {'speedup':>8}")
+    for num_workers in args.workers:
+        with tempfile.TemporaryDirectory() as destination_dir:
+            generator = SelfPlayGenerator(model, destination_dir, num_workers=num_workers,
+                                          num_simulations=args.simulations, max_plies=args.max_plies)
+            stats = generator.generate(args.games)
+        baseline = baseline or stats["games_per_hour"]
+        print(f"{num_workers:>8} {stats['games_per_hour']:>12.0f} {stats['positions'] / stats['seconds']:>12.1f} "
+              f"{stats['mean_batch_size']:>11.1f} {stats['games_per_hour'] / baseline:>7.2f}x")
+
+
+if __name__ == "__main__":
+    main()
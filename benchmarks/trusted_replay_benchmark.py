@@ -0,0 +1,41 @@
+"""Compares python-chess replay with the trusted bitboard replay in plies per second.
+
+Usage:
+    python benchmarks/trusted_replay_benchmark.py -i data/0.csv.gz -n 2000 --verify 200
+
+Without an input file the games from tests/data/example.pgn are used.
+"""
+import argparse
+import random
+import time
+import numpy as np
+from common import load_games
+from deep_chess_playground.utils.trusted_replay import replay, python_chess_replay
+
+
+def plies_per_second(replay_function, games):
+    start = time.perf_counter()
+    plies = sum(len(replay_function(moves)) for moves in games)
+    return plies / (time.perf_counter() - start)
+
+
+def main():
+    argparser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    argparser.add_argument("-i", "--input", help="Path to a converted .csv.gz file.")
+    argparser.add_argument("-n", "--num-games", type=int, default=1000, help="Number of games to replay.")
+    argparser.add_argument("--verify", type=int, default=100, help="Number of games verified against python-chess.")
+    args = argparser.parse_args()
+
+    games = load_games(args.input, args.num_games)
+    for moves in random.sample(games, min(args.verify, len(games))):
+        if not np.array_equal(replay(moves, include_final=True), python_chess_replay(moves, include_final=True)):
+            raise AssertionError(f"Trusted replay differs from python-chess for game: {moves}")
+
+    reference = plies_per_second(python_chess_replay, games)
+    trusted = plies_per_second(replay, games)
+    print(f"python-chess replay: {reference:,.0f} plies/sec")
+    print(f"trusted replay:      {trusted:,.0f} plies/sec ({trusted / reference:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,52 @@
+"""Match between two trained networks, e.g. a new checkpoint against the previous one:
+
+    python -m deep_chess_playground.arena --conf new.json --checkpoint new.ckpt \
+        --reference-conf old.json --reference-checkpoint old.ckpt --openings games/0.csv.gz --games 400
+"""
+import argparse
+import logging
+from deep_chess_playground.arena.arena import NUM_SIMULATIONS, Arena
+from deep_chess_playground.arena.openings import OPENING_PLIES, load_openings
+from deep_chess_playground.arena.statistics import SPRT
+from deep_chess_playground.engine.model_package import load_model
+
+
+def main():
+    argparser = argparse.ArgumentParser(description="Play a match between two trained networks.")
+    argparser.add_argument("--conf", help="Configuration of the tested model, not needed for a model package.")
+    argparser.add_argument("--checkpoint", required=True,
+                           help="Lightning checkpoint or model package of the tested model.")
+    argparser.add_argument("--reference-conf",
+                           help="Configuration of the reference model, not needed for a model package.")
+    argparser.add_argument("--reference-checkpoint", required=True,
+                           help="Lightning checkpoint or model package of the reference model.")
+    argparser.add_argument("--openings", nargs="+", required=True, help="Converted .csv.gz files with openings.")
+    argparser.add_argument("--num-openings", type=int, default=100, help="Number of distinct openings.")
+    argparser.add_argument("--opening-plies", type=int, default=OPENING_PLIES, help="Length of the openings.")
+    argparser.add_argument("--games", type=int, default=1000, help="Maximum number of games.")
+    argparser.add_argument("--num-workers", type=int, help="Number of game-playing processes.")
+    argparser.add_argument("--simulations", type=int, default=NUM_SIMULATIONS, help="Search visits per move.")
+    argparser.add_argument("--elo0", type=float, default=0.0, help="Elo difference of the SPRT null hypothesis.")
+    argparser.add_argument("--elo1", type=float, default=10.0, help="Elo difference of the SPRT alternative.")
+    argparser.add_argument("--alpha", type=float, default=0.05, help="SPRT false positive rate.")
+    argparser.add_argument("--beta", type=float, default=0.05, help="SPRT false negative rate.")
+    argparser.add_argument("--no-sprt", action="store_true", help="Play all games without early stopping.")
+    argparser.add_argument("--device", default="cpu", help="Device of the networks.")
+    args = argparser.parse_args()
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+    models = [load_model(conf, checkpoint, args.device, strict=True)
+              for conf, checkpoint in [(args.conf, args.checkpoint), (args.reference_conf, args.reference_checkpoint)]]
+    openings = load_openings(args.openings, args.num_openings, args.opening_plies)
+    arena = Arena(*models, openings, num_workers=args.num_workers, num_simulations=args.simulations,
+                  device=args.device)
+    sprt = None if args.no_sprt else SPRT(args.elo0, args.elo1, args.alpha, args.beta)
+    result = arena.run(args.games, sprt)
+    logging.info(f"Final result after {result.score.games} games in {result.seconds:.0f} s: {result.score}")
+    if result.decision is not None:
+        accepted = f"Elo >= {args.elo1}" if result.decision == "H1" else f"Elo <= {args.elo0}"
+        logging.info(f"SPRT accepted {result.decision} ({accepted}), LLR {result.llr:.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,162 @@
+import logging
+import multiprocessing
+import os
+import time
+from dataclasses import dataclass
+from typing import List, Optional, Sequence
+import chess
+import torch
+from deep_chess_playground.arena.statistics import SPRT, MatchScore
+from deep_chess_playground.engine.search import Search
+from deep_chess_playground.self_play.inference_server import (BATCH_TIMEOUT, MAX_BATCH_SIZE, InferenceServer,
+                                                              SharedMemoryEvaluator)
+from deep_chess_playground.self_play.self_play_generator import next_result, stop_processes
+
+
+NUM_SIMULATIONS = 100
+LEAVES_PER_BATCH = 8
+MAX_PLIES = 400
+
+
+@dataclass
+class ArenaResult:
+    """Outcome of a match, from the perspective of the first model.
+
+    Attributes:
+        score (MatchScore): Wins, draws and losses with the Elo difference and its error.
+        llr (Optional[float]): Final log-likelihood ratio if the match was run with an SPRT.
+        decision (Optional[str]): "H0" or "H1" if the SPRT stopped the match, None otherwise.
+        seconds (float): Duration of the match.
+    """
+    score: MatchScore
+    llr: Optional[float]
+    decision: Optional[str]
+    seconds: float
+
+
+def play_match_game(white: Search, black: Search, opening: Sequence[str], num_simulations: int = NUM_SIMULATIONS,
+                    max_plies: int = MAX_PLIES) -> str:
+    """Plays a game between two searches from an opening line and returns its result.
+
+    Both searches keep their trees during the game, so each of them reuses the subtree of the opponent's
+    move. Every move is the most visited one after `num_simulations` root visits. Games reaching
+    `max_plies` are adjudicated as draws.
+    """
+    board = chess.Board()
+    for san in opening:
+        board.push_san(san)
+    white.reset()
+    black.reset()
+    while not board.is_game_over(claim_draw=True) and board.ply() < max_plies:
+        search = white if board.turn == chess.WHITE else black
+        search.set_position(board)
+        while search.root.visit_count < num_simulations:
+            search.run_iteration()
+        board.push(search.best_move())
+    outcome = board.outcome(claim_draw=True)
+    return outcome.result() if outcome is not None else "1/2-1/2"
+
+
+def _play_match_games(worker_index, clients, openings, next_game, max_games, results_queue, settings):
+    """Worker process: takes game numbers from `next_game` and puts (game number, first model's score)."""
+    torch.set_num_threads(1)
+    evaluators = [SharedMemoryEvaluator(*client) for client in clients]
+    searches = [Search(evaluator, c_puct=settings["c_puct"], leaves_per_batch=settings["leaves_per_batch"])
+                for evaluator in evaluators]
+    try:
+        while True:
+            with next_game.get_lock():
+                game_number = next_game.value
+                if game_number >= max_games:
+                    break
+                next_game.value += 1
+            # Every opening is played twice in a row with swapped colors
+            opening = openings[(game_number // 2) % len(openings)]
+            first_is_white = game_number % 2 == 0
+            white, black = searches if first_is_white else searches[::-1]
+            result = play_match_game(white, black, opening, settings["num_simulations"], settings["max_plies"])
+            white_score = {"1-0": 1.0, "0-1": 0.0}.get(result, 0.5)
+            results_queue.put((game_number, white_score if first_is_white else 1 - white_score))
+    finally:
+        for evaluator in evaluators:
+            evaluator.close()
+
+
+class Arena:
+    """Plays a match between two networks with games running concurrently in worker processes.
+
+    Each network is served by its own inference server process (see `self_play.inference_server`), so the
+    requests of all workers are batched per network. Every opening is played once with each color. With an
+    SPRT the match stops as soon as one of the hypotheses is accepted, which for a clear regression or
+    improvement usually takes a fraction of `max_games`.
+
+    Args:
+        first_model (torch.nn.Module): Network whose results are reported (e.g. the new checkpoint).
+        second_model (torch.nn.Module): Reference network.
+        openings (List[List[str]]): Opening lines as SAN moves, see `openings.load_openings`.
+        num_workers (int, optional): Number of game-playing processes. Defaults to the number of CPUs - 2.
+        num_simulations (int, optional): Root visits per move. Defaults to NUM_SIMULATIONS.
+        leaves_per_batch (int, optional): Leaves per evaluation request. Defaults to LEAVES_PER_BATCH.
+        c_puct (float, optional): Exploration constant of the searches. Defaults to 1.5.
+        max_plies (int, optional): Games reaching this length are adjudicated as draws. Defaults to MAX_PLIES.
+        max_batch_size (int, optional): Maximum forward pass size of the servers. Defaults to MAX_BATCH_SIZE.
+        batch_timeout (float, optional): Seconds the servers wait for other workers. Defaults to BATCH_TIMEOUT.
+        device (str, optional): Device of the models. Defaults to "cpu".
+
+    Raises:
+        ValueError: If no openings are given.
+    """
+
+    def __init__(self, first_model, second_model, openings: List[List[str]], num_workers: Optional[int] = None,
+                 num_simulations: int = NUM_SIMULATIONS, leaves_per_batch: int = LEAVES_PER_BATCH,
+                 c_puct: float = 1.5, max_plies: int = MAX_PLIES, max_batch_size: int = MAX_BATCH_SIZE,
+                 batch_timeout: float = BATCH_TIMEOUT, device: str = "cpu"):
+        if not openings:
+            raise ValueError("At least one opening is required")
+        self._models = [first_model, second_model]
+        self._openings = openings
+        self._num_workers = num_workers or max(os.cpu_count() - 2, 1)
+        self._settings = {"num_simulations": num_simulations, "leaves_per_batch": leaves_per_batch,
+                          "c_puct": c_puct, "max_plies": max_plies}
+        self._max_batch_size = max_batch_size
+        self._batch_timeout = batch_timeout
+        self._device = device
+
+    def run(self, max_games: int, sprt: Optional[SPRT] = None) -> ArenaResult:
+        """Plays up to `max_games` games (rounded up to an even number, so colors stay balanced)."""
+        max_games += max_games % 2
+        context = multiprocessing.get_context("spawn")
+        servers = [InferenceServer(context, model, self._num_workers, self._settings["leaves_per_batch"],
+                                   self._max_batch_size, self._batch_timeout, self._device)
+                   for model in self._models]
+        next_game = context.Value("i", 0)
+        results_queue = context.Queue()
+        workers = [context.Process(target=_play_match_games, daemon=True,
+                                   args=(index, [server.client(index) for server in servers], self._openings,
+                                         next_game, max_games, results_queue, self._settings))
+                   for index in range(self._num_workers)]
+        score, decision = MatchScore(), None
+        start = time.perf_counter()
+        try:
+            for server in servers:
+                server.start()
+            for worker in workers:
+                worker.start()
+            for _ in range(max_games):
+                _, game_score = next_result(results_queue, workers, servers)
+                score.add(game_score)
+                logging.info(f"Arena after {score.games} games: {score}"
+                             + (f", LLR {sprt.llr(score):.2f}" if sprt is not None else ""))
+                decision = sprt.decision(score) if sprt is not None else None
+                if decision is not None:
+                    break
+        finally:
+            if decision is not None:
+                # The games still running can't change the decision
+                for worker in workers:
+                    worker.terminate()
+            stop_processes(workers)
+            for server in servers:
+                server.stop()
+        return ArenaResult(score, sprt.llr(score) if sprt is not None else None, decision,
+                           time.perf_counter() - start)
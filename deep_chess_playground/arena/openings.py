@@ -0,0 +1,62 @@
+from collections import defaultdict
+from typing import List, Sequence
+import chess
+import numpy as np
+import pandas as pd
+
+
+OPENING_PLIES = 8
+
+
+def load_openings(csv_paths: Sequence[str], num_openings: int, opening_plies: int = OPENING_PLIES, seed: int = 0,
+                  separator: str = ",") -> List[List[str]]:
+    """Samples distinct opening lines from converted .csv.gz files.
+
+    The lines are the first `opening_plies` SAN moves of the games. To keep the sample balanced instead of
+    dominated by the most popular openings, lines are grouped by their ECO code and the groups are visited in
+    a random round-robin order, taking one random line from each. Lines ending in a finished game and lines
+    already taken from another ECO group are skipped.
+
+    Args:
+        csv_paths (Sequence[str]): Files written by PgnZstToCsvGzConverter.
+        num_openings (int): Number of lines to return (fewer if the files don't have enough distinct lines).
+        opening_plies (int, optional): Length of the lines. Defaults to OPENING_PLIES.
+        seed (int, optional): Seed of the sampling. Defaults to 0.
+        separator (str, optional): Separator of the CSV files. Defaults to ','.
+
+    Returns:
+        List[List[str]]: Opening lines as lists of SAN moves.
+    """
+    lines_by_eco = defaultdict(set)
+    for path in csv_paths:
+        df = pd.read_csv(path, usecols=["ECO", "Moves"], sep=separator, dtype=str)
+        for eco, moves in zip(df["ECO"].fillna("?"), df["Moves"].fillna("")):
+            line = moves.split()[:opening_plies]
+            if len(line) == opening_plies:
+                lines_by_eco[eco].add(" ".join(line))
+    rng = np.random.default_rng(seed)
+    groups = [sorted(lines_by_eco[eco]) for eco in sorted(lines_by_eco)]
+    for group in groups:
+        rng.shuffle(group)
+    openings, seen = [], set()
+    while groups and len(openings) < num_openings:
+        rng.shuffle(groups)
+        for group in groups:
+            line = group.pop()
+            if line not in seen and _is_playable(line.split()):
+                seen.add(line)
+                openings.append(line.split())
+            if len(openings) == num_openings:
+                break
+        groups = [group for group in groups if group]
+    return openings
+
+
+def _is_playable(line: List[str]) -> bool:
+    board = chess.Board()
+    try:
+        for san in line:
+            board.push_san(san)
+    except ValueError:
+        return False
+    return not board.is_game_over()
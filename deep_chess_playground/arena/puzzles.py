@@ -0,0 +1,307 @@
+"""Policy accuracy of a network on tactical test suites, by theme and rating.
+
+Two suite formats are read:
+
+    Lichess puzzle CSV (.csv or .csv.zst, https://database.lichess.org/#puzzles): the FEN is the position
+        before the opponent's move, the first of `Moves`. The solver's moves follow, every other move. Themes
+        are taken from `Themes`, the rating from `Rating`.
+    EPD (.epd): positions with `bm` (best moves) and/or `am` (moves to avoid). The theme is the `id` without
+        its number (e.g. "WAC" for "WAC.001"), there are no ratings.
+
+A position is solved at k if one of the k moves with the highest policy logits is accepted: one of the best
+moves, any legal move but the avoided ones if there are only moves to avoid, and any mating move when the
+solution mates (like on Lichess).
+
+The suite is parsed and encoded once into GridEncoder planes and the flat MoveEncoder8x8x73 indices of the legal
+and accepted moves of every position, and cached next to it (`{suite}.suite.npz`). Evaluation then only runs the
+network on large batches of the cached planes and ranks its logits among the legal moves:
+
+    python -m deep_chess_playground.arena.puzzles -c config.json --checkpoint model.ckpt lichess_db_puzzle.csv.zst
+"""
+import argparse
+import logging
+import os
+from typing import Dict, List, Optional, Sequence, Tuple
+import chess
+import numpy as np
+import pandas as pd
+import torch
+from deep_chess_playground.data_encoders.input_encoders.grid_encoding import GridEncoder
+from deep_chess_playground.data_encoders.output_encoders.move_encoding_8_8_73 import POLICY_SIZE, MoveEncoder8x8x73
+from deep_chess_playground.engine.evaluation import split_outputs
+from deep_chess_playground.engine.model_package import load_model
+
+
+BATCH_SIZE = 256
+TOP_K = (1, 3, 5)
+RATING_BUCKET = 200
+MISSING_RATING = -1
+CACHE_SUFFIX = ".suite.npz"
+CACHE_VERSION = 1
+ENCODING_CHUNK_SIZE = 10_000
+
+
+def csr(rows: Sequence[np.ndarray]) -> Tuple[np.ndarray, np.ndarray]:
+    """(offsets, values) of variable-length rows, row i is values[offsets[i]:offsets[i + 1]]."""
+    offsets = np.zeros(len(rows) + 1, dtype=np.int64)
+    np.cumsum([len(row) for row in rows], out=offsets[1:])
+    values = np.concatenate(rows).astype(np.int16) if len(rows) else np.zeros(0, dtype=np.int16)
+    return offsets, values
+
+
+class PuzzleSuite:
+    """Positions of a test suite with everything needed to score a policy on them.
+
+    Attributes:
+        planes (np.ndarray): (N, 24, 8, 8) uint8 GridEncoder planes of the positions.
+        legal_offsets, legal_indices (np.ndarray): Flat MoveEncoder8x8x73 indices of the legal moves of every
+            position (int16, see `csr`).
+        accepted_offsets, accepted_indices (np.ndarray): Indices of the accepted moves of every position.
+        themes (np.ndarray): Space-separated themes of every position.
+        ratings (np.ndarray): int16 ratings, MISSING_RATING if unknown.
+        ids (np.ndarray): Puzzle ids, shared by the positions of a puzzle.
+    """
+
+    def __init__(self, planes: np.ndarray, legal_offsets: np.ndarray, legal_indices: np.ndarray,
+                 accepted_offsets: np.ndarray, accepted_indices: np.ndarray, themes: np.ndarray, ratings: np.ndarray,
+                 ids: np.ndarray):
+        self.planes = planes
+        self.legal_offsets = legal_offsets
+        self.legal_indices = legal_indices
+        self.accepted_offsets = accepted_offsets
+        self.accepted_indices = accepted_indices
+        self.themes = themes
+        self.ratings = ratings
+        self.ids = ids
+
+    def __len__(self) -> int:
+        return len(self.planes)
+
+    @classmethod
+    def encode(cls, positions: Sequence[Tuple[chess.Board, List[chess.Move], str, int, str]]) -> "PuzzleSuite":
+        """Encodes (board, accepted moves, themes, rating, id) positions."""
+        encoder, move_encoder = GridEncoder(), MoveEncoder8x8x73()
+        planes = np.empty((len(positions), 24, 8, 8), dtype=np.uint8)
+        for start in range(0, len(positions), ENCODING_CHUNK_SIZE):
+            chunk = positions[start:start + ENCODING_CHUNK_SIZE]
+            encoder.encode_batch([board for board, *_ in chunk], out=planes[start:start + len(chunk)])
+        legal_offsets, legal_indices = csr([move_encoder.legal_move_indices(board) for board, *_ in positions])
+        accepted_offsets, accepted_indices = csr([np.array([move_encoder.index(move) for move in accepted],
+                                                           dtype=np.int64) for _, accepted, *_ in positions])
+        return cls(planes, legal_offsets, legal_indices, accepted_offsets, accepted_indices,
+                   np.array([themes for *_, themes, _, _ in positions], dtype=str),
+                   np.array([rating for *_, rating, _ in positions], dtype=np.int16),
+                   np.array([puzzle_id for *_, puzzle_id in positions], dtype=str))
+
+    def save(self, path: str, source_stamp: Tuple = ()) -> None:
+        np.savez(path, version=CACHE_VERSION, source_stamp=np.array(source_stamp, dtype=str), planes=self.planes,
+                 legal_offsets=self.legal_offsets, legal_indices=self.legal_indices,
+                 accepted_offsets=self.accepted_offsets, accepted_indices=self.accepted_indices, themes=self.themes,
+                 ratings=self.ratings, ids=self.ids)
+
+    @classmethod
+    def load(cls, path: str, source_stamp: Optional[Tuple] = None) -> Optional["PuzzleSuite"]:
+        """Loads a saved suite, None if it was saved by another version or for another source_stamp."""
+        with np.load(path) as data:
+            if int(data["version"]) != CACHE_VERSION or \
+                    (source_stamp is not None and data["source_stamp"].tolist() != [str(x) for x in source_stamp]):
+                return None
+            return cls(data["planes"], data["legal_offsets"], data["legal_indices"], data["accepted_offsets"],
+                       data["accepted_indices"], data["themes"], data["ratings"], data["ids"])
+
+
+def mating_moves(board: chess.Board) -> List[chess.Move]:
+    mates = []
+    for move in board.legal_moves:
+        board.push(move)
+        if board.is_checkmate():
+            mates.append(move)
+        board.pop()
+    return mates
+
+
+def accepted_moves(board: chess.Board, solution: chess.Move) -> List[chess.Move]:
+    """The solution, or all mating moves if it mates."""
+    if board.gives_check(solution):
+        mates = mating_moves(board)
+        if solution in mates:
+            return mates
+    return [solution]
+
+
+def lichess_positions(path: str, all_moves: bool = False, max_puzzles: Optional[int] = None):
+    """(board, accepted moves, themes, rating, id) of the puzzles of a Lichess puzzle CSV file, for the first
+    solver move or, with all_moves, for every solver move."""
+    puzzles = pd.read_csv(path, usecols=["PuzzleId", "FEN", "Moves", "Rating", "Themes"], dtype=str,
+                          keep_default_na=False, nrows=max_puzzles)
+    positions = []
+    for puzzle_id, fen, moves, rating, themes in zip(puzzles["PuzzleId"], puzzles["FEN"], puzzles["Moves"],
+                                                     puzzles["Rating"], puzzles["Themes"]):
+        try:
+            board, moves = chess.Board(fen), [chess.Move.from_uci(move) for move in moves.split()]
+            rating = int(rating) if rating else MISSING_RATING
+            puzzle_positions = []
+            for ply, move in enumerate(moves):
+                if not board.is_legal(move):
+                    raise ValueError(f"Illegal move {move}")
+                if ply % 2 == 1:
+                    puzzle_positions.append((board.copy(stack=False), accepted_moves(board, move), themes, rating,
+                                             puzzle_id))
+                    if not all_moves:
+                        break
+                board.push(move)
+            positions.extend(puzzle_positions)
+        except ValueError as e:
+            logging.warning(f"Skipping puzzle {puzzle_id}: {e}")
+    return positions
+
+
+def epd_positions(path: str, max_puzzles: Optional[int] = None):
+    """(board, accepted moves, theme, MISSING_RATING, id) of the positions of an EPD file."""
+    positions = []
+    with open(path) as f:
+        for line_number, line in enumerate(f, 1):
+            if max_puzzles is not None and len(positions) >= max_puzzles:
+                break
+            if not line.strip():
+                continue
+            try:
+                board = chess.Board()
+                operations = board.set_epd(line)
+            except ValueError as e:
+                logging.warning(f"Skipping line {line_number}: {e}")
+                continue
+            best, avoid = operations.get("bm", []), operations.get("am", [])
+            if best:
+                accepted = sorted({move for solution in best for move in accepted_moves(board, solution)})
+            else:
+                accepted = [move for move in board.legal_moves if move not in avoid]
+            if not accepted:
+                logging.warning(f"Skipping line {line_number}: no best moves and no moves that aren't avoided")
+                continue
+            puzzle_id = str(operations.get("id", line_number))
+            theme = puzzle_id.rsplit(".", 1)[0] if "." in puzzle_id else ""
+            positions.append((board, accepted, theme, MISSING_RATING, puzzle_id))
+    return positions
+
+
+def load_suite(path: str, all_moves: bool = False, max_puzzles: Optional[int] = None,
+               cache: bool = True) -> PuzzleSuite:
+    """Reads and encodes a suite, or loads it from its cache if it's there and was made from the same file with
+    the same options.
+
+    Args:
+        path (str): Lichess puzzle CSV (.csv, .csv.zst) or EPD (.epd) file.
+        all_moves (bool, optional): Score every solver move of the Lichess puzzles instead of the first one.
+            Defaults to False.
+        max_puzzles (int, optional): Read only the first puzzles. Defaults to all.
+        cache (bool, optional): Use and write `{path}.suite.npz`. Defaults to True.
+    """
+    cache_path = path + CACHE_SUFFIX
+    stat = os.stat(path)
+    stamp = (stat.st_size, stat.st_mtime_ns, all_moves, max_puzzles)
+    if cache and os.path.exists(cache_path):
+        suite = PuzzleSuite.load(cache_path, stamp)
+        if suite is not None:
+            return suite
+    positions = epd_positions(path, max_puzzles) if path.endswith(".epd") else \
+        lichess_positions(path, all_moves, max_puzzles)
+    suite = PuzzleSuite.encode(positions)
+    logging.info(f"Encoded {len(suite)} positions of {path}")
+    if cache:
+        suite.save(cache_path, stamp)
+    return suite
+
+
+def _batch_mask(offsets: np.ndarray, indices: np.ndarray, start: int, end: int) -> torch.Tensor:
+    """(end - start, POLICY_SIZE) bool mask of the CSR rows [start, end), set with one scatter."""
+    counts = np.diff(offsets[start:end + 1])
+    mask = torch.zeros((end - start, POLICY_SIZE), dtype=torch.bool)
+    rows = torch.from_numpy(np.repeat(np.arange(end - start), counts))
+    mask[rows, torch.from_numpy(indices[offsets[start]:offsets[end]].astype(np.int64))] = True
+    return mask
+
+
+@torch.inference_mode()
+def evaluate_suite(model: torch.nn.Module, suite: PuzzleSuite, top_k: Sequence[int] = TOP_K,
+                   batch_size: int = BATCH_SIZE, device: str = "cpu") -> np.ndarray:
+    """Runs the network on the positions of the suite and checks its best legal moves.
+
+    Args:
+        model (torch.nn.Module): Network taking GridEncoder planes, see `evaluation.split_outputs` for its outputs.
+        suite (PuzzleSuite): The positions.
+        top_k (Sequence[int], optional): Numbers of best moves to check. Defaults to TOP_K.
+        batch_size (int, optional): Positions per forward pass. Defaults to BATCH_SIZE.
+        device (str, optional): Device of the network. Defaults to "cpu".
+
+    Returns:
+        np.ndarray: (N, len(top_k)) bool, whether an accepted move is among the top k legal moves.
+    """
+    model.eval()
+    planes = torch.from_numpy(suite.planes)
+    solved = np.zeros((len(suite), len(top_k)), dtype=bool)
+    max_k = max(top_k)
+    for start in range(0, len(suite), batch_size):
+        end = min(start + batch_size, len(suite))
+        policy, _ = split_outputs(model(planes[start:end].to(device).float()))
+        legal = _batch_mask(suite.legal_offsets, suite.legal_indices, start, end)
+        best = policy.cpu().masked_fill(~legal, -torch.inf).topk(min(max_k, POLICY_SIZE), dim=1).indices
+        # Moves beyond the legal ones are illegal, so never accepted
+        hits = _batch_mask(suite.accepted_offsets, suite.accepted_indices, start, end).gather(1, best)
+        for column, k in enumerate(top_k):
+            solved[start:end, column] = hits[:, :k].any(dim=1).numpy()
+    return solved
+
+
+def accuracy_report(suite: PuzzleSuite, solved: np.ndarray, top_k: Sequence[int] = TOP_K,
+                    rating_bucket: int = RATING_BUCKET) -> Dict[str, pd.DataFrame]:
+    """Accuracies of `evaluate_suite` in total, by theme and by rating.
+
+    Returns:
+        Dict[str, pd.DataFrame]: "total", "theme" and "rating" tables with the number of positions and the
+            "top{k}" accuracies. A position counts for each of its themes. Ratings are grouped in buckets of
+            `rating_bucket` points, named by their lowest rating; positions without a rating are left out.
+    """
+    columns = [f"top{k}" for k in top_k]
+    results = pd.DataFrame(solved, columns=columns)
+    results["themes"] = pd.Series(suite.themes).str.split()
+    results["rating"] = suite.ratings
+
+    def summary(groups) -> pd.DataFrame:
+        table = groups[columns].mean()
+        table.insert(0, "positions", groups.size())
+        return table
+
+    total = results[columns].mean().to_frame().T
+    total.insert(0, "positions", len(results))
+    by_theme = summary(results.explode("themes").dropna(subset=["themes"]).groupby("themes"))
+    rated = results[results["rating"] != MISSING_RATING]
+    by_rating = summary(rated.groupby(rated["rating"] // rating_bucket * rating_bucket))
+    return {"total": total, "theme": by_theme.sort_values("positions", ascending=False), "rating": by_rating}
+
+
+def main():
+    argparser = argparse.ArgumentParser(description="Policy accuracy of a network on a test suite.")
+    argparser.add_argument("suite", help="Lichess puzzle CSV (.csv, .csv.zst) or EPD (.epd) file.")
+    argparser.add_argument("-c", "--conf", help="Path to the configuration file, not needed for a model package.")
+    argparser.add_argument("--checkpoint", required=True, help="Path to the Lightning checkpoint or model package.")
+    argparser.add_argument("--all-moves", action="store_true", help="Score every solver move, not only the first.")
+    argparser.add_argument("--max-puzzles", type=int, help="Read only the first puzzles of the suite.")
+    argparser.add_argument("--top-k", type=int, nargs="+", default=list(TOP_K), help="Numbers of best moves.")
+    argparser.add_argument("--batch-size", type=int, default=BATCH_SIZE, help="Positions per forward pass.")
+    argparser.add_argument("--rating-bucket", type=int, default=RATING_BUCKET, help="Width of the rating groups.")
+    argparser.add_argument("--no-cache", action="store_true", help="Don't read or write the encoded suite.")
+    argparser.add_argument("--device", default="cpu", help="Device of the network.")
+    args = argparser.parse_args()
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+    model = load_model(args.conf, args.checkpoint, args.device)
+    suite = load_suite(args.suite, args.all_moves, args.max_puzzles, cache=not args.no_cache)
+    solved = evaluate_suite(model, suite, args.top_k, args.batch_size, args.device)
+    for name, table in accuracy_report(suite, solved, args.top_k, args.rating_bucket).items():
+        print(f"\nBy {name}:" if name != "total" else "Total:")
+        print(table.to_string(float_format="%.3f", index=name != "total"))
+
+
+if __name__ == "__main__":
+    main()
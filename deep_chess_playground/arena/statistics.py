@@ -0,0 +1,122 @@
+import math
+from typing import Optional
+
+
+Z_95 = 1.959963984540054
+REGULARIZATION = 1e-3
+
+
+def expected_score(elo: float) -> float:
+    """Expected score of a player `elo` points stronger than the opponent."""
+    return 1 / (1 + 10 ** (-elo / 400))
+
+
+def elo_difference(score: float) -> float:
+    """Elo difference corresponding to an expected score in (0, 1)."""
+    return -400 * math.log10(1 / score - 1)
+
+
+class MatchScore:
+    """Wins, draws and losses of a player with the derived Elo difference and its 95% confidence interval.
+
+    The variance of the score is estimated from the trinomial distribution of the game results.
+    """
+
+    def __init__(self, wins: int = 0, draws: int = 0, losses: int = 0):
+        self.wins = wins
+        self.draws = draws
+        self.losses = losses
+
+    def add(self, score: float) -> None:
+        """Adds a game scored 1, 0.5 or 0."""
+        if score == 1:
+            self.wins += 1
+        elif score == 0:
+            self.losses += 1
+        else:
+            self.draws += 1
+
+    @property
+    def games(self) -> int:
+        return self.wins + self.draws + self.losses
+
+    @property
+    def score(self) -> float:
+        return (self.wins + self.draws / 2) / self.games if self.games else 0.5
+
+    @property
+    def variance(self) -> float:
+        """Variance of the result of a single game."""
+        if not self.games:
+            return 0.0
+        score = self.score
+        return (self.wins * (1 - score) ** 2 + self.draws * (0.5 - score) ** 2 + self.losses * score ** 2) \
+            / self.games
+
+    @property
+    def elo(self) -> float:
+        return elo_difference(self._clip(self.score))
+
+    @property
+    def elo_error(self) -> float:
+        """Half width of the 95% confidence interval of `elo`."""
+        if not self.games:
+            return math.inf
+        margin = Z_95 * math.sqrt(self.variance / self.games)
+        return (elo_difference(self._clip(self.score + margin)) - elo_difference(self._clip(self.score - margin))) / 2
+
+    @property
+    def likelihood_of_superiority(self) -> float:
+        if self.wins + self.losses == 0:
+            return 0.5
+        return 0.5 * (1 + math.erf((self.wins - self.losses) / math.sqrt(2 * (self.wins + self.losses))))
+
+    def _clip(self, score: float) -> float:
+        # A perfect score has an infinite Elo difference, it is treated as half a game short of perfect
+        epsilon = 1 / (2 * max(self.games, 1))
+        return min(max(score, epsilon), 1 - epsilon)
+
+    def __str__(self) -> str:
+        return (f"+{self.wins} ={self.draws} -{self.losses}, Elo {self.elo:+.1f} +/- {self.elo_error:.1f}, "
+                f"LOS {100 * self.likelihood_of_superiority:.1f}%")
+
+
+class SPRT:
+    """Sequential probability ratio test of H0: Elo difference = elo0 against H1: Elo difference = elo1.
+
+    The log-likelihood ratio uses the normal approximation of the generalized SPRT (the one used by Fishtest
+    for trinomial results), so it only needs the current score and its variance.
+
+    Args:
+        elo0 (float, optional): Elo difference of the null hypothesis. Defaults to 0.
+        elo1 (float, optional): Elo difference of the alternative hypothesis. Defaults to 10.
+        alpha (float, optional): Probability of accepting H1 when H0 is true. Defaults to 0.05.
+        beta (float, optional): Probability of accepting H0 when H1 is true. Defaults to 0.05.
+    """
+
+    def __init__(self, elo0: float = 0.0, elo1: float = 10.0, alpha: float = 0.05, beta: float = 0.05):
+        if elo1 <= elo0:
+            raise ValueError("elo1 must be greater than elo0")
+        self.elo0 = elo0
+        self.elo1 = elo1
+        self.lower_bound = math.log(beta / (1 - alpha))
+        self.upper_bound = math.log((1 - beta) / alpha)
+
+    def llr(self, match_score: MatchScore) -> float:
+        if not match_score.games:
+            return 0.0
+        # Empty result classes are replaced by a tiny count, so a match of only draws still has a variance
+        regularized = MatchScore(*(count or REGULARIZATION for count in (match_score.wins, match_score.draws,
+                                                                          match_score.losses)))
+        score0, score1 = expected_score(self.elo0), expected_score(self.elo1)
+        return regularized.games * (score1 - score0) * (2 * regularized.score - score0 - score1) \
+            / (2 * regularized.variance)
+
+    def decision(self, match_score: MatchScore) -> Optional[str]:
+        """"H0" or "H1" once the log-likelihood ratio leaves the bounds, None while the test continues."""
+        llr = self.llr(match_score)
+        if llr <= self.lower_bound:
+            return "H0"
+        if llr >= self.upper_bound:
+            return "H1"
+        return None
@@ -0,0 +1,199 @@
+"""Attack maps and mobility features of whole batches of positions, computed with array operations.
+
+The positions are (N, 12) uint64 arrays of piece bitboards in the GridEncoder channel order (white pawn, knight,
+bishop, rook, queen, king, then the black ones, square a1 is bit 0), e.g. the first twelve columns of the
+`GridEncoder.board_bitboards` rows. All pieces of the batch are processed together: knights, kings and pawns look
+up precomputed attack tables, sliding pieces precomputed rays cut at the first blocker along each direction, the
+lowest set bit of the occupied ray squares for rays towards higher squares and the highest one otherwise.
+
+`attack_bitboards` returns the squares attacked by each piece type (the planes 12-23 of GridEncoder), and
+`feature_planes` the extra planes of FEATURE_PLANES:
+
+- mobility: on the square of every piece, the number of squares it attacks that aren't occupied by its own side
+- pinned: pieces that can't leave the line between their king and an enemy slider without exposing the king
+- threatened: pieces (not kings) attacked by an enemy piece of lower value (see PIECE_VALUES)
+"""
+from typing import Tuple
+import chess
+import numpy as np
+
+
+# Directions as (file, rank) steps, the first four go towards higher squares
+DIRECTIONS = ((0, 1), (1, 0), (1, 1), (-1, 1), (0, -1), (-1, 0), (1, -1), (-1, -1))
+ORTHOGONAL = (0, 1, 4, 5)
+DIAGONAL = (2, 3, 6, 7)
+NO_SQUARE = 64
+PAWN, KNIGHT, BISHOP, ROOK, QUEEN, KING = range(6)
+PIECE_VALUES = (1, 3, 3, 5, 9)  # pawn to queen
+FEATURE_PLANES = ("white mobility", "black mobility", "white pinned", "black pinned", "white threatened",
+                  "black threatened")
+NUM_FEATURE_PLANES = len(FEATURE_PLANES)
+
+
+def _rays() -> np.ndarray:
+    rays = np.zeros((len(DIRECTIONS), NO_SQUARE + 1), dtype=np.uint64)
+    for direction, (file_step, rank_step) in enumerate(DIRECTIONS):
+        for square in chess.SQUARES:
+            file, rank, ray = chess.square_file(square) + file_step, chess.square_rank(square) + rank_step, 0
+            while 0 <= file < 8 and 0 <= rank < 8:
+                ray |= chess.BB_SQUARES[chess.square(file, rank)]
+                file, rank = file + file_step, rank + rank_step
+            rays[direction, square] = ray
+    return rays
+
+
+# Squares of every direction from every square, empty from NO_SQUARE
+RAYS = _rays()
+KNIGHT_ATTACKS = np.array(chess.BB_KNIGHT_ATTACKS, dtype=np.uint64)
+KING_ATTACKS = np.array(chess.BB_KING_ATTACKS, dtype=np.uint64)
+PAWN_ATTACKS = np.array(chess.BB_PAWN_ATTACKS, dtype=np.uint64)  # indexed by (color, square), black first
+# Attacks of the knights, kings and pawns by (bitboard index, square), none for the sliding pieces
+LEAPER_ATTACKS = np.zeros((12, 64), dtype=np.uint64)
+for _color, _offset in ((chess.WHITE, 0), (chess.BLACK, 6)):
+    LEAPER_ATTACKS[_offset + PAWN] = PAWN_ATTACKS[int(_color)]
+    LEAPER_ATTACKS[_offset + KNIGHT] = KNIGHT_ATTACKS
+    LEAPER_ATTACKS[_offset + KING] = KING_ATTACKS
+ORTHOGONAL_SLIDERS = np.array([piece % 6 in (ROOK, QUEEN) for piece in range(12)])
+DIAGONAL_SLIDERS = np.array([piece % 6 in (BISHOP, QUEEN) for piece in range(12)])
+SQUARE_BITS = np.array(chess.BB_SQUARES + [0], dtype=np.uint64)
+POPCOUNT = np.array([bin(byte).count("1") for byte in range(256)], dtype=np.uint8)
+BYTE_BITS = np.unpackbits(np.arange(256, dtype=np.uint8)[:, None], axis=1, bitorder="little").astype(bool)
+ONE = np.uint64(1)
+
+
+def popcount(bitboards: np.ndarray) -> np.ndarray:
+    """Number of set bits of every bitboard, as uint8."""
+    bitboards = np.ascontiguousarray(bitboards, dtype="<u8")
+    return POPCOUNT[bitboards.view(np.uint8).reshape(*bitboards.shape, 8)].sum(axis=-1, dtype=np.uint8)
+
+
+def _squares(bits: np.ndarray) -> np.ndarray:
+    """Squares of bitboards with a single bit set, NO_SQUARE for empty ones."""
+    # Powers of two are exact in float64, their exponent is the index of the bit
+    return np.where(bits == 0, NO_SQUARE, np.frexp(bits.astype(np.float64))[1] - 1)
+
+
+def first_blockers(direction: int, squares: np.ndarray, occupied: np.ndarray) -> np.ndarray:
+    """Squares of the first occupied squares along the direction from the squares, NO_SQUARE if there are none."""
+    blockers = RAYS[direction, squares] & occupied
+    if direction < 4:
+        return _squares(blockers & (~blockers + ONE))
+    for shift in (1, 2, 4, 8, 16, 32):
+        blockers |= blockers >> np.uint64(shift)
+    return _squares(blockers ^ (blockers >> ONE))
+
+
+def ray_attacks(direction: int, squares: np.ndarray, occupied: np.ndarray) -> np.ndarray:
+    """Squares attacked along the direction from the squares, up to and including the first blocker."""
+    return RAYS[direction, squares] ^ RAYS[direction, first_blockers(direction, squares, occupied)]
+
+
+def _attacks(pieces: np.ndarray, squares: np.ndarray, occupied: np.ndarray) -> np.ndarray:
+    """Squares attacked by pieces of the bitboard indices on the squares, with the occupancies of their positions."""
+    attacks = LEAPER_ATTACKS[pieces, squares]
+    for directions, sliders in ((ORTHOGONAL, ORTHOGONAL_SLIDERS), (DIAGONAL, DIAGONAL_SLIDERS)):
+        selected = np.flatnonzero(sliders[pieces])
+        slider_squares, slider_occupied = squares[selected], occupied[selected]
+        for direction in directions:
+            attacks[selected] |= ray_attacks(direction, slider_squares, slider_occupied)
+    return attacks
+
+
+def piece_attacks(bitboards: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """The attacks of every piece of the batch.
+
+    Args:
+        bitboards (np.ndarray): (N, 12) piece bitboards.
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]: Position, bitboard index, square and attacked squares
+            of every piece, ordered by position and bitboard index.
+    """
+    bitboards = np.ascontiguousarray(bitboards, dtype="<u8")
+    occupied = np.bitwise_or.reduce(bitboards, axis=1)
+    # Only the non-zero bytes are expanded to their set bits, 8 times less to scan than all squares
+    ranks = bitboards.view(np.uint8).reshape(-1)
+    byte_indices = np.flatnonzero(ranks)
+    byte_offsets, bits = np.nonzero(BYTE_BITS[ranks[byte_indices]])
+    byte_indices = byte_indices[byte_offsets]
+    positions, pieces = np.divmod(byte_indices // 8, bitboards.shape[1])
+    squares = byte_indices % 8 * 8 + bits
+    return positions, pieces, squares, _attacks(pieces, squares, occupied[positions])
+
+
+def _combine(shape: Tuple[int, int], positions: np.ndarray, pieces: np.ndarray, attacks: np.ndarray) -> np.ndarray:
+    """ORs the attacks of the pieces of every (position, bitboard index), given in that order."""
+    combined = np.zeros(shape, dtype=np.uint64)
+    if len(attacks):
+        keys = positions * shape[1] + pieces
+        starts = np.flatnonzero(np.r_[True, keys[1:] != keys[:-1]])
+        combined.reshape(-1)[keys[starts]] = np.bitwise_or.reduceat(attacks, starts)
+    return combined
+
+
+def attack_bitboards(bitboards: np.ndarray) -> np.ndarray:
+    """(N, 12) bitboards of the squares attacked by the pieces of every bitboard, equal to the attack bitboards of
+    `GridEncoder.board_bitboards`."""
+    positions, pieces, _, attacks = piece_attacks(bitboards)
+    return _combine(np.shape(bitboards), positions, pieces, attacks)
+
+
+def pinned_bitboards(bitboards: np.ndarray) -> np.ndarray:
+    """(N, 2) bitboards of the pinned white and black pieces."""
+    occupied = np.bitwise_or.reduce(bitboards, axis=1)
+    pinned = np.zeros((len(bitboards), 2), dtype=np.uint64)
+    for color, own in enumerate((bitboards[:, :6], bitboards[:, 6:])):
+        enemy = bitboards[:, 6:] if color == 0 else bitboards[:, :6]
+        own_occupied = np.bitwise_or.reduce(own, axis=1)
+        kings = own[:, KING]
+        king_squares = _squares(kings & (~kings + ONE))
+        for directions, sliders in ((ORTHOGONAL, enemy[:, ROOK] | enemy[:, QUEEN]),
+                                    (DIAGONAL, enemy[:, BISHOP] | enemy[:, QUEEN])):
+            for direction in directions:
+                first = first_blockers(direction, king_squares, occupied)
+                second = first_blockers(direction, first, occupied)
+                pins = ((SQUARE_BITS[first] & own_occupied) != 0) & ((SQUARE_BITS[second] & sliders) != 0)
+                pinned[pins, color] |= SQUARE_BITS[first[pins]]
+    return pinned
+
+
+def threatened_bitboards(bitboards: np.ndarray, attacks: np.ndarray) -> np.ndarray:
+    """(N, 2) bitboards of the white and black pieces attacked by an enemy piece of lower value.
+
+    Args:
+        bitboards (np.ndarray): (N, 12) piece bitboards.
+        attacks (np.ndarray): Their `attack_bitboards`.
+    """
+    threatened = np.zeros((len(bitboards), 2), dtype=np.uint64)
+    for color, offset in enumerate((0, 6)):
+        enemy_attacks = attacks[:, 6 - offset:12 - offset]
+        for piece_type in (KNIGHT, BISHOP, ROOK, QUEEN):
+            lower = np.zeros(len(bitboards), dtype=np.uint64)
+            for attacker_type, value in enumerate(PIECE_VALUES):
+                if value < PIECE_VALUES[piece_type]:
+                    lower |= enemy_attacks[:, attacker_type]
+            threatened[:, color] |= bitboards[:, offset + piece_type] & lower
+    return threatened
+
+
+def feature_planes(bitboards: np.ndarray) -> np.ndarray:
+    """The FEATURE_PLANES of a batch of positions.
+
+    Args:
+        bitboards (np.ndarray): (N, 12) piece bitboards.
+
+    Returns:
+        np.ndarray: (N, NUM_FEATURE_PLANES, 8, 8) uint8 planes with the GridEncoder layout (row = 7 - rank,
+            col = file), mobility counts and 0/1 pinned and threatened pieces.
+    """
+    bitboards = np.asarray(bitboards, dtype=np.uint64)
+    own_occupied = np.stack([np.bitwise_or.reduce(bitboards[:, :6], axis=1),
+                             np.bitwise_or.reduce(bitboards[:, 6:], axis=1)], axis=1)
+    planes = np.zeros((len(bitboards), NUM_FEATURE_PLANES, 64), dtype=np.uint8)
+    positions, pieces, squares, attacked = piece_attacks(bitboards)
+    colors = (pieces >= 6).astype(np.intp)
+    planes[positions, colors, squares] = popcount(attacked & ~own_occupied[positions, colors])
+    attacks = _combine(bitboards.shape, positions, pieces, attacked)
+    masks = np.concatenate([pinned_bitboards(bitboards), threatened_bitboards(bitboards, attacks)], axis=1)
+    planes[:, 2:] = np.unpackbits(masks.astype("<u8").view(np.uint8).reshape(-1, 4, 8), axis=-1, bitorder="little")
+    return np.ascontiguousarray(planes.reshape(-1, NUM_FEATURE_PLANES, 8, 8)[..., ::-1, :])
@@ -0,0 +1,177 @@
+from multiprocessing import shared_memory
+from typing import Dict, Optional
+import chess
+import chess.polyglot
+import numpy as np
+
+
+CAPACITY = 1 << 18
+WAYS = 8
+NUM_BITBOARDS = 24
+MAX_WORKERS = 64
+HITS, MISSES, INSERTIONS, EVICTIONS = range(4)
+# Polyglot piece order: black pawn, white pawn, black knight, ...
+_PIECE_KEYS = np.array(chess.polyglot.POLYGLOT_RANDOM_ARRAY[:768], dtype=np.uint64).reshape(12, 64)
+
+
+def _piece_key(piece_type: int, color: bool, square: int) -> int:
+    return int(_PIECE_KEYS[2 * (piece_type - 1) + int(color), square])
+
+
+def placement_key(board: chess.BaseBoard) -> int:
+    """Polyglot Zobrist hash of the piece placement only.
+
+    The encoded planes depend on nothing else, so unlike `chess.polyglot.zobrist_hash` the side to move,
+    castling rights and en passant square are left out and positions differing only in those share an
+    entry."""
+    key = 0
+    for square, piece in board.piece_map().items():
+        key ^= _piece_key(piece.piece_type, piece.color, square)
+    return key
+
+
+def next_placement_key(key: int, board: chess.Board, move: chess.Move) -> int:
+    """Updates the placement key of the board for the move, before the move is pushed.
+
+    A few XORs instead of hashing the whole board again, for replaying games position by position."""
+    color = board.turn
+    piece_type = board.piece_type_at(move.from_square)
+    if board.is_castling(move):
+        rank = chess.square_rank(move.from_square)
+        rook_from = move.to_square if board.piece_type_at(move.to_square) == chess.ROOK \
+            else chess.square(7 if chess.square_file(move.to_square) > 4 else 0, rank)
+        king_side = chess.square_file(rook_from) > chess.square_file(move.from_square)
+        king_to, rook_to = chess.square(6 if king_side else 2, rank), chess.square(5 if king_side else 3, rank)
+        return (key ^ _piece_key(chess.KING, color, move.from_square) ^ _piece_key(chess.KING, color, king_to)
+                ^ _piece_key(chess.ROOK, color, rook_from) ^ _piece_key(chess.ROOK, color, rook_to))
+    key ^= _piece_key(piece_type, color, move.from_square)
+    key ^= _piece_key(move.promotion or piece_type, color, move.to_square)
+    if board.is_en_passant(move):
+        captured_square = move.to_square + (-8 if color == chess.WHITE else 8)
+        key ^= _piece_key(chess.PAWN, not color, captured_square)
+    else:
+        captured = board.piece_type_at(move.to_square)
+        if captured:
+            key ^= _piece_key(captured, not color, move.to_square)
+    return key
+
+
+class EncodingCache:
+    """Bounded cache of encoded positions in shared memory, keyed by a 64-bit Zobrist hash.
+
+    The table is set-associative: a key maps to one set of `ways` slots, each holding the key and the
+    bit-packed planes (one uint64 bitboard per plane, see `GridEncoder.board_bitboards`). A full set evicts
+    with the clock (second chance) policy: every hit marks its slot as referenced and the set's clock hand
+    skips referenced slots once, clearing their marks, so frequently used positions such as openings stay.
+
+    All processes attached to the same block (e.g. the DataLoader workers, the cache is pickled by name)
+    share the entries without locks: a slot is written with its key cleared and the key is set last, and
+    a reader checks the key again after copying the planes. Hit and miss counters are kept per worker, so
+    they are exact.
+
+    Args:
+        capacity (int, optional): Number of slots, rounded up to a multiple of `ways`. Defaults to CAPACITY.
+        ways (int, optional): Slots per set. Defaults to WAYS.
+        num_bitboards (int, optional): Bitboards per position. Defaults to NUM_BITBOARDS.
+        max_workers (int, optional): Number of counter rows, workers with higher ids share the last one.
+            Defaults to MAX_WORKERS.
+        name (str, optional): Name of an existing block to attach to. A new block is created if None.
+    """
+
+    def __init__(self, capacity: int = CAPACITY, ways: int = WAYS, num_bitboards: int = NUM_BITBOARDS,
+                 max_workers: int = MAX_WORKERS, name: Optional[str] = None):
+        self.num_sets = -(-capacity // ways)
+        self.ways = ways
+        self.num_bitboards = num_bitboards
+        self.max_workers = max_workers
+        slots = self.num_sets * ways
+        sizes = [(max_workers + 1) * 4 * 8, slots * 8, slots * num_bitboards * 8, slots, self.num_sets]
+        create = name is None
+        self._shared_memory = shared_memory.SharedMemory(name=name, create=create, size=sum(sizes))
+        offsets = np.cumsum([0] + sizes)
+        buffer = self._shared_memory.buf
+        self.counters = np.ndarray((max_workers + 1, 4), dtype=np.int64, buffer=buffer, offset=offsets[0])
+        self.keys = np.ndarray((self.num_sets, ways), dtype=np.uint64, buffer=buffer, offset=offsets[1])
+        self.bitboards = np.ndarray((self.num_sets, ways, num_bitboards), dtype=np.uint64, buffer=buffer,
+                                    offset=offsets[2])
+        self.referenced = np.ndarray((self.num_sets, ways), dtype=np.uint8, buffer=buffer, offset=offsets[3])
+        self.hands = np.ndarray((self.num_sets,), dtype=np.uint8, buffer=buffer, offset=offsets[4])
+        if create:
+            self.counters[:] = 0
+            self.keys[:] = 0
+            self.referenced[:] = 0
+            self.hands[:] = 0
+        self._worker_row = 0
+
+    def __getstate__(self):
+        return self.num_sets * self.ways, self.ways, self.num_bitboards, self.max_workers, self.name
+
+    def __setstate__(self, state):
+        capacity, ways, num_bitboards, max_workers, name = state
+        self.__init__(capacity, ways, num_bitboards, max_workers, name)
+
+    @property
+    def name(self) -> str:
+        return self._shared_memory.name
+
+    def set_worker(self, worker_id: int) -> None:
+        """Counts the hits and misses of this process in the row of the worker (row 0 is the main process)."""
+        self._worker_row = min(worker_id + 1, self.max_workers)
+
+    def _slot(self, key: int):
+        # 0 marks an empty slot
+        key = key or 1
+        return key % self.num_sets, np.uint64(key)
+
+    def get(self, key: int, out: np.ndarray) -> bool:
+        """Copies the bitboards of the key into `out` and returns True if the position is cached."""
+        index, key = self._slot(key)
+        keys = self.keys[index]
+        way = int((keys == key).argmax())
+        if keys[way] == key:
+            out[...] = self.bitboards[index, way]
+            # A concurrent writer clears the key before replacing the bitboards
+            if keys[way] == key:
+                self.referenced[index, way] = 1
+                self.counters[self._worker_row, HITS] += 1
+                return True
+        self.counters[self._worker_row, MISSES] += 1
+        return False
+
+    def put(self, key: int, bitboards) -> None:
+        """Adds the bitboards of a position, evicting an entry of its set if the set is full."""
+        index, key = self._slot(key)
+        keys, referenced = self.keys[index], self.referenced[index]
+        if (keys == key).any():
+            return
+        empty = np.flatnonzero(keys == 0)
+        if len(empty):
+            way = empty[0]
+        else:
+            # Clock: from the hand on, the first slot without a second chance, clearing the skipped ones
+            way = int(self.hands[index])
+            while referenced[way]:
+                referenced[way] = 0
+                way = (way + 1) % self.ways
+            self.hands[index] = (way + 1) % self.ways
+            self.counters[self._worker_row, EVICTIONS] += 1
+        keys[way] = 0
+        self.bitboards[index, way] = bitboards
+        referenced[way] = 0
+        keys[way] = key
+        self.counters[self._worker_row, INSERTIONS] += 1
+
+    def stats(self) -> Dict[str, float]:
+        """Hits, misses, insertions and evictions of all processes, the hit rate and the number of entries."""
+        hits, misses, insertions, evictions = (int(value) for value in self.counters.sum(axis=0))
+        return {"hits": hits, "misses": misses, "hit_rate": hits / (hits + misses) if hits + misses else 0.0,
+                "insertions": insertions, "evictions": evictions, "entries": int(np.count_nonzero(self.keys))}
+
+    def reset_stats(self) -> None:
+        self.counters[:] = 0
+
+    def close(self) -> None:
+        self._shared_memory.close()
+
+    def unlink(self) -> None:
+        self._shared_memory.unlink()
@@ -1,34 +1,102 @@
+import numpy as np
 import torch
 import chess
+from deep_chess_playground.data_encoders.input_encoders.attack_features import attack_bitboards
+from deep_chess_playground.data_encoders.input_encoders.encoding_cache import placement_key
+
+
+NUM_PLANES = 24
+NUM_PIECE_PLANES = 12
+# Channel of every piece, white pieces first
+PIECE_TO_INDEX = {
+    'P': 0, 'N': 1, 'B': 2, 'R': 3, 'Q': 4, 'K': 5,
+    'p': 6, 'n': 7, 'b': 8, 'r': 9, 'q': 10, 'k': 11
+}
+# Below this many boards the attacks are generated board by board, the array operations cost more
+MIN_VECTORIZED_BATCH = 16
+
+
+def bitboards_to_planes(bitboards, out=None):
+    """Turns a (N, C) array of bitboards into (N, C, 8, 8) uint8 planes with the GridEncoder layout
+    (row = 7 - rank, col = file)."""
+    bitboards = np.ascontiguousarray(bitboards, dtype="<u8")
+    ranks = bitboards.view(np.uint8).reshape(*bitboards.shape, 8)
+    planes = np.unpackbits(ranks, axis=-1, bitorder="little").reshape(*bitboards.shape, 8, 8)[..., ::-1, :]
+    if out is None:
+        return np.ascontiguousarray(planes)
+    out[...] = planes
+    return out
 
 
 class GridEncoder:
-    def __init__(self):
-        self.piece_to_index = {
-            'P': 0, 'N': 1, 'B': 2, 'R': 3, 'Q': 4, 'K': 5,
-            'p': 6, 'n': 7, 'b': 8, 'r': 9, 'q': 10, 'k': 11
-        }
+    """Encodes positions as 12 piece planes and 12 planes of the squares attacked by each piece type.
+
+    Args:
+        cache (EncodingCache, optional): Cache of encoded positions consulted by `encode` and `encode_board`.
+    """
+    def __init__(self, cache=None):
+        self.piece_to_index = PIECE_TO_INDEX
+        self.cache = cache
 
     def encode(self, fen):
-        board = chess.Board(fen)
-        tensor = torch.zeros(24, 8, 8)
-
-        # Encode piece positions
-        for square in chess.SQUARES:
-            piece = board.piece_at(square)
-            if piece:
-                row, col = divmod(square, 8)
-                tensor[self.piece_to_index[piece.symbol()]][7 - row][col] = 1
-
-        # Encode controlled squares
-        for piece_type in range(1, 7):  # 1=Pawn, 2=Knight, ..., 6=King
-            for color in [chess.WHITE, chess.BLACK]:
-                channel = self.piece_to_index[chess.Piece(piece_type, color).symbol()]
-                for from_square in chess.SQUARES:
-                    piece = board.piece_at(from_square)
-                    if piece and piece.piece_type == piece_type and piece.color == color:
-                        for to_square in board.attacks(from_square):
-                            row, col = divmod(to_square, 8)
-                            tensor[channel + 12][7 - row][col] = 1
-
-        return tensor
+        return self.encode_board(chess.Board(fen))
+
+    def encode_bitboards(self, bitboards):
+        """Encodes twelve piece bitboards in the channel order of the encoder (e.g. rows of
+        `trusted_replay.replay`) without going through a FEN string."""
+        board = chess.BaseBoard.empty()
+        bitboards = [int(bitboard) for bitboard in bitboards]
+        board.pawns, board.knights, board.bishops, board.rooks, board.queens, board.kings = \
+            (white | black for white, black in zip(bitboards[:6], bitboards[6:]))
+        for color, color_bitboards in ((chess.WHITE, bitboards[:6]), (chess.BLACK, bitboards[6:])):
+            for bitboard in color_bitboards:
+                board.occupied_co[color] |= bitboard
+        board.occupied = board.occupied_co[chess.WHITE] | board.occupied_co[chess.BLACK]
+        return self.encode_board(board)
+
+    def encode_board(self, board):
+        bitboards = self.cached_bitboards(board) if self.cache is not None \
+            else np.array(self.board_bitboards(board), dtype=np.uint64)
+        return torch.from_numpy(bitboards_to_planes(bitboards[None])[0]).float()
+
+    def piece_bitboards(self, board):
+        """Returns the 12 piece planes of `encode_board` as bitboards, in the channel order of the encoder."""
+        return [board.pieces_mask(piece_type, color) for color in (chess.WHITE, chess.BLACK)
+                for piece_type in range(1, 7)]
+
+    def board_bitboards(self, board):
+        """Returns the 24 planes of `encode_board` as bitboards: the pieces and the attacked squares of each
+        piece type, in the channel order of the encoder. For many positions `attack_features.attack_bitboards`
+        computes the attacks of the whole batch at once."""
+        pieces = self.piece_bitboards(board)
+        attacks = []
+        for mask in pieces:
+            attacked = 0
+            for square in chess.scan_forward(mask):
+                attacked |= board.attacks_mask(square)
+            attacks.append(attacked)
+        return pieces + attacks
+
+    def cached_bitboards(self, board, key=None):
+        """`board_bitboards` as a uint64 array, from the cache if the position is in it.
+
+        Args:
+            board (chess.BaseBoard): The position.
+            key (int, optional): Its `encoding_cache.placement_key`, computed if not given.
+        """
+        bitboards = np.empty(NUM_PLANES, dtype=np.uint64)
+        key = placement_key(board) if key is None else key
+        if not self.cache.get(key, bitboards):
+            bitboards[:] = self.board_bitboards(board)
+            self.cache.put(key, bitboards)
+        return bitboards
+
+    def encode_batch(self, boards, out=None):
+        """Encodes boards into (N, 24, 8, 8) uint8 planes equal to `encode_board`, optionally into a
+        preallocated array (e.g. a shared-memory batch buffer). The attacked squares of all boards are computed
+        together by `attack_features.attack_bitboards`."""
+        if len(boards) < MIN_VECTORIZED_BATCH:
+            bitboards = np.array([self.board_bitboards(board) for board in boards], dtype=np.uint64)
+            return bitboards_to_planes(bitboards.reshape(-1, NUM_PLANES), out)
+        pieces = np.array([self.piece_bitboards(board) for board in boards], dtype=np.uint64)
+        return bitboards_to_planes(np.concatenate([pieces, attack_bitboards(pieces)], axis=1), out)
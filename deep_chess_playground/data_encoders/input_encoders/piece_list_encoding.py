@@ -0,0 +1,62 @@
+import chess
+import numpy as np
+import torch
+from torch.utils.data import default_collate
+from deep_chess_playground.data_encoders.input_encoders.grid_encoding import PIECE_TO_INDEX
+
+
+MAX_PIECES = 32
+PADDING = -1
+
+
+class PieceListEncoder:
+    """Encodes a position as a padded list of at most 32 (piece, square) tokens.
+
+    The output is an int8 array of shape (2, 32): the first row holds piece indices in the
+    GridEncoder channel order (P, N, B, R, Q, K, p, n, b, r, q, k -> 0..11) and the second row holds
+    python-chess square indices (a1 = 0, h8 = 63). Unused tokens are set to -1.
+    It takes 64 bytes per position instead of the 24x8x8 dense planes.
+    """
+
+    def __init__(self, max_pieces=MAX_PIECES):
+        self.max_pieces = max_pieces
+        self.piece_to_index = PIECE_TO_INDEX
+
+    def encode(self, fen):
+        board = chess.Board(fen)
+        tokens = [(self.piece_to_index[piece.symbol()], square) for square, piece in board.piece_map().items()]
+        if len(tokens) > self.max_pieces:
+            raise ValueError(f"Position has {len(tokens)} pieces, at most {self.max_pieces} are supported.")
+        output = np.full((2, self.max_pieces), PADDING, dtype=np.int8)
+        if tokens:
+            output[:, :len(tokens)] = np.array(sorted(tokens, key=lambda token: token[1])).T
+        return output
+
+    def encode_bitboards(self, bitboards):
+        """Encodes twelve piece bitboards in the channel order of the encoder (e.g. rows of `trusted_replay.replay`)."""
+        return self.encode_batch_bitboards(np.asarray(bitboards, dtype=np.uint64)[None])[0]
+
+    def encode_batch_bitboards(self, bitboards):
+        """Encodes a (N, 12) uint64 array of piece bitboards into a (N, 2, 32) int8 array without any Python loop."""
+        bitboards = np.ascontiguousarray(bitboards, dtype="<u8")
+        num_positions = len(bitboards)
+        bits = np.unpackbits(bitboards.view(np.uint8).reshape(num_positions, 12, 8), axis=-1, bitorder="little")
+        # Squares first, so that the tokens of every position are sorted by square like in `encode`
+        position_indices, squares, pieces = np.nonzero(bits.reshape(num_positions, 12, 64).transpose(0, 2, 1))
+        counts = np.bincount(position_indices, minlength=num_positions)
+        if num_positions and counts.max() > self.max_pieces:
+            raise ValueError(f"Position has {counts.max()} pieces, at most {self.max_pieces} are supported.")
+        token_indices = np.arange(len(position_indices)) - np.repeat(np.cumsum(counts) - counts, counts)
+        output = np.full((num_positions, 2, self.max_pieces), PADDING, dtype=np.int8)
+        output[position_indices, 0, token_indices] = pieces
+        output[position_indices, 1, token_indices] = squares
+        return output
+
+
+def collate_piece_lists(batch):
+    """Collates (piece_list, target) samples into int8 piece lists and stacked targets.
+
+    Piece lists stay int8 all the way to the model, no dense one-hot tensor is ever built.
+    """
+    piece_lists, targets = zip(*batch)
+    return torch.from_numpy(np.stack(piece_lists)), default_collate(targets)
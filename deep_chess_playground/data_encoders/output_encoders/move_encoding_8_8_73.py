@@ -1,50 +1,114 @@
+from typing import Iterable, Union
+import chess
+import numpy as np
 import torch
+from deep_chess_playground.utils.move_codes import encode_move
 from deep_chess_playground.utils.move_utilities import ALL_POSSIBLE_MOVES
 
 
+NUM_PLANES = 73
+POLICY_SIZE = 8 * 8 * NUM_PLANES
+# (file difference, rank difference) of the eight knight moves, clockwise starting from the north
+KNIGHT_MOVE_OFFSETS = [(1, 2), (2, 1), (2, -1), (1, -2), (-1, -2), (-2, -1), (-2, 1), (-1, 2)]
+
+
 class MoveEncoder8x8x73:
     """The class is used to encode moves.
 
     "A move in chess may be described in two parts: selecting the piece to move, and then...".
     Check this paper for more details https://arxiv.org/abs/1712.01815.
+
+    Besides the one-hot 8x8x73 tensors, every move has a flat index into the 4672 logits of the policy,
+    which is the position of its one in the flattened (row, col, plane) tensor.
     """
 
     def __init__(self):
+        self._indices = self._get_move_indices()
+        self._chess_move_indices = {chess.Move.from_uci(move_string): index
+                                    for move_string, index in self._indices.items()}
         self._encodings = self._get_move_encodings()
+        self._code_indices = None
 
     def encode(self, move: str):
         return self._encodings[move]
 
+    def index(self, move: Union[str, chess.Move]) -> int:
+        """Returns the flat index of the move in range [0, 4672)."""
+        if isinstance(move, chess.Move):
+            return self._chess_move_indices[move]
+        return self._indices[move]
+
+    def indices_from_codes(self, codes: np.ndarray) -> np.ndarray:
+        """Flat indices of moves given as 16-bit codes (see `utils.move_codes`), with one table lookup for the
+        whole array. Codes of moves that can't be encoded (e.g. promotions to a king) get -1."""
+        if self._code_indices is None:
+            self._code_indices = np.full(1 << 16, -1, dtype=np.int64)
+            for move, index in self._chess_move_indices.items():
+                self._code_indices[encode_move(move)] = index
+        return self._code_indices[np.asarray(codes, dtype=np.uint16)]
+
+    def legal_move_indices(self, board: chess.Board) -> np.ndarray:
+        """Returns flat indices of all legal moves in the position."""
+        return np.fromiter((self._chess_move_indices[move] for move in board.generate_legal_moves()), dtype=np.int64)
+
+    def legal_move_mask(self, board: Union[chess.Board, str], flat: bool = False) -> torch.Tensor:
+        """Returns a bool mask of legal moves with shape (8, 8, 73), or (4672,) if flat is True."""
+        return self.batch_legal_move_mask([board], flat=flat)[0]
+
+    def batch_legal_move_mask(self, boards: Iterable[Union[chess.Board, str]], flat: bool = False) -> torch.Tensor:
+        """Returns a bool mask of legal moves with shape (N, 8, 8, 73), or (N, 4672) if flat is True.
+
+        Boards can be given as chess.Board objects or FEN strings. The mask is filled with a single
+        scatter over all positions, so it is cheap enough to be built inside DataLoader workers.
+        """
+        batch_indices, move_indices = [], []
+        for batch_index, board in enumerate(boards):
+            if isinstance(board, str):
+                board = chess.Board(board)
+            indices = self.legal_move_indices(board)
+            move_indices.append(indices)
+            batch_indices.append(np.full(len(indices), batch_index, dtype=np.int64))
+        mask = np.zeros((len(move_indices), POLICY_SIZE), dtype=bool)
+        if move_indices:
+            mask[np.concatenate(batch_indices), np.concatenate(move_indices)] = True
+        mask = torch.from_numpy(mask)
+        return mask if flat else mask.view(-1, 8, 8, NUM_PLANES)
+
+    def _get_move_indices(self) -> dict[str, int]:
+        return {move_string: (move.source_square.row * 8 + move.source_square.col) * NUM_PLANES
+                + self._get_plane_number(move)
+                for move_string, move in ALL_POSSIBLE_MOVES.items()}
+
     def _get_move_encodings(self) -> dict[str, torch.Tensor]:
         move_encodings = {}
-        for move_string, move in ALL_POSSIBLE_MOVES.items():
-            current_tensor = torch.zeros((8, 8, 73), dtype=torch.float32)
-            plane_number = self._get_plane_number(move_string)
-            current_tensor[move.source_square.row, move.source_square.col, plane_number] = 1
+        for move_string, index in self._indices.items():
+            current_tensor = torch.zeros((8, 8, NUM_PLANES), dtype=torch.float32)
+            current_tensor.view(-1)[index] = 1
             move_encodings[move_string] = current_tensor
         return move_encodings
 
     def _get_plane_number(self, move):
         if move.promotion is not None and move.promotion != "q":
-            if move.direction == 0:  # N
+            if move.direction in (0, 4):  # N or S
                 return {
                     "r": 64,
                     "b": 67,
                     "n": 70
                 }[move.promotion]
-            elif move.direction == 1:  # NE
+            elif move.direction in (1, 3):  # NE or SE
                 return {
                     "r": 65,
                     "b": 68,
                     "n": 71
                 }[move.promotion]
-            else:  # NW
+            else:  # NW or SW
                 return {
                     "r": 66,
                     "b": 69,
                     "n": 72
                 }[move.promotion]
         elif move.knight_move:
-            return 56 + move.direction
+            return 56 + KNIGHT_MOVE_OFFSETS.index((ord(move.dest_square.file) - ord(move.source_square.file),
+                                                   int(move.dest_square.rank) - int(move.source_square.rank)))
         else:
             return move.direction * 7 + move.square_distance - 1
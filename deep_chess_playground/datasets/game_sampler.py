@@ -0,0 +1,200 @@
+import logging
+import os.path
+from typing import Dict, List, Optional, Sequence, Tuple, Union
+import numpy as np
+import pandas as pd
+from deep_chess_playground.utils.games_index import TIME_CONTROLS, time_control_bucket
+
+
+CHUNK_SIZE = 100_000
+MAX_PLY = 1024
+MISSING_ELO = -1
+
+
+class GameMetadata:
+    """Compact per-game metadata of converted game files, used for sampling without reading the games.
+
+    Built once with a single pass over the files (only the rating and time control columns are parsed, the
+    moves are never read) and saved next to them. Games have global ids in file order like in GamesIndex.
+
+    Attributes:
+        files (List[str]): The files.
+        file_offsets (np.ndarray): Global id of the first game of each file, with the number of games appended.
+        elo (np.ndarray): int16 rating of the weaker player, MISSING_ELO if unknown.
+        time_control (np.ndarray): uint8 index into TIME_CONTROLS.
+    """
+
+    def __init__(self, files: List[str], file_offsets: np.ndarray, elo: np.ndarray, time_control: np.ndarray):
+        self.files = files
+        self.file_offsets = file_offsets
+        self.elo = elo
+        self.time_control = time_control
+
+    @property
+    def num_games(self) -> int:
+        return int(self.file_offsets[-1])
+
+    @classmethod
+    def build(cls, csv_paths: Sequence[str], separator: str = ",") -> "GameMetadata":
+        columns = {"elo": [], "time_control": []}
+        offsets = [0]
+        for path in csv_paths:
+            num_rows = 0
+            for chunk in pd.read_csv(path, usecols=["WhiteElo", "BlackElo", "TimeControl"], sep=separator, dtype=str,
+                                     keep_default_na=False, chunksize=CHUNK_SIZE):
+                elo = pd.concat([pd.to_numeric(chunk["WhiteElo"], errors="coerce"),
+                                 pd.to_numeric(chunk["BlackElo"], errors="coerce")], axis=1).min(axis=1, skipna=False)
+                columns["elo"].append(elo.fillna(MISSING_ELO).to_numpy(dtype=np.int16))
+                columns["time_control"].append(chunk["TimeControl"].map(
+                    lambda value: TIME_CONTROLS.index(time_control_bucket(value))).to_numpy(dtype=np.uint8))
+                num_rows += len(chunk)
+            offsets.append(offsets[-1] + num_rows)
+            logging.info(f"Read metadata of {num_rows} games of {path}")
+        arrays = {name: np.concatenate(values) if values else np.zeros(0) for name, values in columns.items()}
+        return cls([os.path.abspath(path) for path in csv_paths], np.array(offsets, dtype=np.int64),
+                   arrays["elo"].astype(np.int16), arrays["time_control"].astype(np.uint8))
+
+    def save(self, path: str) -> None:
+        np.savez(path, files=np.array(self.files), file_offsets=self.file_offsets, elo=self.elo,
+                 time_control=self.time_control)
+
+    @classmethod
+    def load(cls, path: str) -> "GameMetadata":
+        with np.load(path) as data:
+            return cls(data["files"].tolist(), data["file_offsets"], data["elo"], data["time_control"])
+
+
+def step_function(thresholds: Optional[Dict[float, float]], values: np.ndarray) -> np.ndarray:
+    """Weights of the values from {threshold: weight}: a value gets the weight of the largest threshold not
+    above it (1 below the smallest threshold or without thresholds)."""
+    if not thresholds:
+        return np.ones(len(values))
+    bounds = np.array(sorted(thresholds), dtype=np.float64)
+    weights = np.array([1.0] + [thresholds[bound] for bound in sorted(thresholds)])
+    return weights[np.searchsorted(bounds, values, side="right")]
+
+
+class SamplingWeights:
+    """Weights of games by rating and time control and of positions by ply.
+
+    Args:
+        elo (Dict[int, float], optional): {rating: weight} step function of the weaker player's rating,
+            e.g. {0: 0.1, 1800: 0.5, 2200: 1.0}. Games without ratings count as rating 0.
+        time_control (Dict[str, float], optional): Weight of each of TIME_CONTROLS, 1 if not given.
+        ply (Dict[int, float], optional): {ply: weight} step function of the probability to keep a position,
+            e.g. {0: 0.2, 10: 1.0} to train less on the opening. Scaled so that the largest weight keeps
+            every position.
+    """
+
+    def __init__(self, elo: Optional[Dict[int, float]] = None, time_control: Optional[Dict[str, float]] = None,
+                 ply: Optional[Dict[int, float]] = None):
+        unknown = set(time_control or {}) - set(TIME_CONTROLS)
+        if unknown:
+            raise ValueError(f"Unknown time controls {sorted(unknown)}, expected some of {TIME_CONTROLS}")
+        self.elo = elo
+        self.time_control = time_control
+        self.ply = ply
+
+    def game_weights(self, metadata: GameMetadata) -> np.ndarray:
+        time_control_weights = np.array([(self.time_control or {}).get(name, 1.0) for name in TIME_CONTROLS])
+        return step_function(self.elo, np.maximum(metadata.elo, 0)) * time_control_weights[metadata.time_control]
+
+    def ply_weights(self, max_ply: int = MAX_PLY) -> np.ndarray:
+        weights = step_function(self.ply, np.arange(max_ply))
+        return weights / weights.max() if weights.max() > 0 else weights
+
+
+class CurriculumSchedule:
+    """Sampling weights changing over epochs.
+
+    The weights are given at some epochs and interpolated linearly in between; before the first and after
+    the last epoch they stay constant.
+
+    Args:
+        milestones (Sequence[Tuple[int, SamplingWeights]]): (epoch, weights) pairs.
+    """
+
+    def __init__(self, milestones: Sequence[Tuple[int, SamplingWeights]]):
+        if not milestones:
+            raise ValueError("A curriculum needs at least one milestone")
+        self.milestones = sorted(milestones, key=lambda milestone: milestone[0])
+
+    def _interpolate(self, epoch: int, values: List[np.ndarray]) -> np.ndarray:
+        epochs = [milestone_epoch for milestone_epoch, _ in self.milestones]
+        position = int(np.searchsorted(epochs, epoch, side="right"))
+        if position == 0:
+            return values[0]
+        if position == len(epochs):
+            return values[-1]
+        fraction = (epoch - epochs[position - 1]) / (epochs[position] - epochs[position - 1])
+        return (1 - fraction) * values[position - 1] + fraction * values[position]
+
+    def game_weights(self, metadata: GameMetadata, epoch: int) -> np.ndarray:
+        # Normalized first, so that the interpolation mixes the two distributions
+        distributions = []
+        for _, weights in self.milestones:
+            game_weights = weights.game_weights(metadata)
+            distributions.append(game_weights / max(game_weights.sum(), 1e-12))
+        return self._interpolate(epoch, distributions)
+
+    def ply_weights(self, epoch: int, max_ply: int = MAX_PLY) -> np.ndarray:
+        return self._interpolate(epoch, [weights.ply_weights(max_ply) for _, weights in self.milestones])
+
+
+class GameSampler:
+    """Chooses the games (with repetitions) and the position keep probabilities of every epoch.
+
+    With `stratified=True` the games are grouped by (Elo bucket, time control) and each group gets a share of
+    the samples proportional to its weight regardless of its size, so e.g. equal weights give as many
+    2400-rated classical games as 1500-rated bullet games. Otherwise every game is sampled with its own
+    weight. Only the metadata arrays are used; the dataset then reads just the chosen games.
+
+    Args:
+        metadata (GameMetadata): Metadata of the game files.
+        weights (Union[SamplingWeights, CurriculumSchedule]): Weights or a schedule of weights.
+        num_games (int, optional): Games per epoch. Defaults to the number of games in the files.
+        stratified (bool, optional): Sample strata instead of games. Defaults to False.
+        elo_bucket_size (int, optional): Width of the Elo strata. Defaults to 200.
+        replacement (bool, optional): Sample with replacement. Defaults to True.
+        seed (int, optional): Seed, combined with the epoch. Defaults to 0.
+    """
+
+    def __init__(self, metadata: GameMetadata, weights: Union[SamplingWeights, CurriculumSchedule],
+                 num_games: Optional[int] = None, stratified: bool = False, elo_bucket_size: int = 200,
+                 replacement: bool = True, seed: int = 0):
+        self.metadata = metadata
+        self.schedule = weights if isinstance(weights, CurriculumSchedule) else CurriculumSchedule([(0, weights)])
+        self.num_games = metadata.num_games if num_games is None else num_games
+        self.stratified = stratified
+        self.replacement = replacement
+        self.seed = seed
+        self.epoch = 0
+        strata = (np.maximum(metadata.elo, 0) // elo_bucket_size).astype(np.int64) * len(TIME_CONTROLS) \
+            + metadata.time_control
+        _, self._strata, self._strata_sizes = np.unique(strata, return_inverse=True, return_counts=True)
+
+    def set_epoch(self, epoch: int) -> None:
+        self.epoch = epoch
+
+    def probabilities(self) -> np.ndarray:
+        """Probability of every game to be sampled in the current epoch."""
+        weights = self.schedule.game_weights(self.metadata, self.epoch)
+        if self.stratified:
+            weights = weights / self._strata_sizes[self._strata]
+        total = weights.sum()
+        if total <= 0:
+            raise ValueError("All games have zero weight")
+        return weights / total
+
+    def game_counts(self) -> np.ndarray:
+        """Number of times every game is used in the current epoch."""
+        rng = np.random.default_rng([self.seed, self.epoch])
+        probabilities = self.probabilities()
+        if self.replacement:
+            return rng.multinomial(self.num_games, probabilities).astype(np.int32)
+        chosen = rng.choice(len(probabilities), size=min(self.num_games, np.count_nonzero(probabilities)),
+                            replace=False, p=probabilities)
+        return np.bincount(chosen, minlength=len(probabilities)).astype(np.int32)
+
+    def ply_keep_probabilities(self) -> np.ndarray:
+        return self.schedule.ply_weights(self.epoch)
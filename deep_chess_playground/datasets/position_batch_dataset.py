@@ -0,0 +1,318 @@
+import heapq
+import logging
+import math
+from itertools import compress
+from typing import Iterable, Iterator, List, Optional, Sequence, Tuple, Union
+import chess
+import numpy as np
+import pandas as pd
+import torch
+from torch.utils.data import DataLoader, IterableDataset, get_worker_info
+from deep_chess_playground.data_encoders.input_encoders.attack_features import attack_bitboards
+from deep_chess_playground.data_encoders.input_encoders.encoding_cache import (EncodingCache, next_placement_key,
+                                                                               placement_key)
+from deep_chess_playground.data_encoders.input_encoders.grid_encoding import NUM_PIECE_PLANES, NUM_PLANES, \
+    GridEncoder, bitboards_to_planes
+from deep_chess_playground.data_encoders.output_encoders.move_encoding_8_8_73 import MoveEncoder8x8x73
+from deep_chess_playground.datasets.game_sampler import GameSampler
+from deep_chess_playground.utils.move_codes import decode_move_codes, load_move_codes, sidecar_path
+from deep_chess_playground.utils.pgn_annotations import annotations_path, eval_targets, load_annotations
+
+
+CHUNK_SIZE = 10_000
+REPEAT_SPACING = 64
+
+
+def game_partition(files: Sequence, worker_id: int, num_workers: int) -> Tuple[List, int, int]:
+    """Files read by a DataLoader worker and the (stride, offset) of the games it keeps from them.
+
+    With at least as many files as workers every worker reads its own files. Otherwise all workers read all
+    files and take every `num_workers`-th game.
+    """
+    if len(files) >= num_workers:
+        return list(files[worker_id::num_workers]), 1, 0
+    return list(files), num_workers, worker_id
+
+
+def spread_repeats(games: Iterable, counts: Iterable[int], spacing: int = REPEAT_SPACING) -> Iterator:
+    """Yields every game `count` times, the repeats of a game `spacing` games apart instead of in a row, so that
+    a game sampled many times doesn't fill whole batches. Repeats still pending after the last game are yielded
+    at the end, in the order they are due."""
+    pending = []  # heap of (due, order, game)
+    emitted = order = 0
+    for game, count in zip(games, counts):
+        while pending and pending[0][0] <= emitted:
+            yield heapq.heappop(pending)[2]
+            emitted += 1
+        yield game
+        emitted += 1
+        for repeat in range(1, count):
+            heapq.heappush(pending, (emitted + repeat * spacing, order, game))
+            order += 1
+    while pending:
+        yield heapq.heappop(pending)[2]
+
+
+class PositionBatchDataset(IterableDataset):
+    """Streams the positions of converted games as whole batches of (planes, move or eval targets).
+
+    Every item is already a batch: a (batch_size, 24, 8, 8) uint8 tensor of GridEncoder planes and a
+    (batch_size,) int64 tensor of MoveEncoder8x8x73 flat indices of the played moves. Instead of building
+    thousands of float (24, 8, 8) and (8, 8, 73) tensors and stacking them in `default_collate`, a worker
+    writes the positions straight into one buffer per batch. In DataLoader workers the buffers are allocated
+    in shared memory, so handing a batch to the main process only sends a handle, and they are 4x smaller
+    than float planes. The planes become floats on the consumer side (see `to_float_batch` and
+    `BasicModule.on_after_batch_transfer`), after a pinned-memory transfer to the GPU if there is one.
+
+    With target_type "eval" the targets are the engine evaluations of the positions instead, a (batch_size, 1)
+    float32 tensor for a Regressor from the `{n}.annotations.npz` sidecars written by the converter with
+    `annotations=True` (see `utils.pgn_annotations.eval_targets`). An eval comment follows its move, so the
+    positions are those after the moves, and positions without an eval are skipped.
+
+    For distributed training every replica (process) gets its own files, split further between its DataLoader
+    workers (see `game_partition`), so nothing is read twice and no process needs the list of all games. With a
+    shuffle buffer the files of every replica are read in a different order each epoch and the positions are
+    shuffled in blocks of `shuffle_buffer` positions, both seeded by (seed, epoch, partition): the order is
+    reproducible and changes with `set_epoch`, without a global shuffle of the data.
+
+    Use it with `batch_loader` or a DataLoader with batch_size=None.
+
+    Args:
+        csv_paths (Sequence[str]): Files written by PgnZstToCsvGzConverter.
+        batch_size (int): Number of positions per batch.
+        drop_last (bool, optional): Drop the last incomplete batch of each worker. Defaults to False.
+        separator (str, optional): Separator of the CSV files. Defaults to ','.
+        sampler (GameSampler, optional): Chooses the games of each epoch and the probability to keep the
+            positions of each ply. The repeats of a game sampled several times are spread out (see
+            `spread_repeats`). All games and positions are used once if None.
+        cache (EncodingCache, optional): Shared cache of encoded positions. Worth it when `cache.stats()`
+            shows a high hit rate, e.g. for many games from few openings or several epochs.
+        moves_format (str, optional): "san" reads the `Moves` column, "codes" the `{n}.moves.npz` sidecars of
+            the files (converted with moves_format "codes" or "both"), which skips SAN parsing. Defaults to "san".
+        target_type (str, optional): "move" for the played moves or "eval" for the evaluations. Defaults to
+            "move".
+        num_replicas (int, optional): Number of processes reading the files, e.g. the world size of distributed
+            training. Defaults to 1.
+        rank (int, optional): Index of this process among the replicas. Defaults to 0.
+        shuffle_buffer (int, optional): Number of positions shuffled together, rounded up to a multiple of
+            batch_size. No shuffling if 0. Defaults to 0.
+        seed (int, optional): Seed of the shuffling. Defaults to 0.
+    """
+
+    def __init__(self, csv_paths: Sequence[str], batch_size: int, drop_last: bool = False, separator: str = ",",
+                 sampler: Optional[GameSampler] = None, cache: Optional[EncodingCache] = None,
+                 moves_format: str = "san", target_type: str = "move", num_replicas: int = 1, rank: int = 0,
+                 shuffle_buffer: int = 0, seed: int = 0):
+        super().__init__()
+        if moves_format not in ("san", "codes"):
+            raise ValueError(f"Invalid moves format {moves_format}, expected 'san' or 'codes'")
+        if target_type not in ("move", "eval"):
+            raise ValueError(f"Invalid target type {target_type}, expected 'move' or 'eval'")
+        if sampler is not None and len(sampler.metadata.files) != len(csv_paths):
+            raise ValueError("The sampler metadata must describe the same files as the dataset")
+        if not 0 <= rank < num_replicas:
+            raise ValueError(f"Invalid rank {rank} of {num_replicas} replicas")
+        self.csv_paths = list(csv_paths)
+        self.sampler = sampler
+        self.cache = cache
+        self.moves_format = moves_format
+        self.target_type = target_type
+        self.batch_size = batch_size
+        self.drop_last = drop_last
+        self.separator = separator
+        self.num_replicas = num_replicas
+        self.rank = rank
+        self.shuffle_buffer = math.ceil(shuffle_buffer / batch_size) * batch_size
+        self.seed = seed
+        self.epoch = 0
+        self._encoder = GridEncoder(cache)
+        self._move_encoder = MoveEncoder8x8x73()
+        self._start_key = placement_key(chess.Board())
+
+    def set_epoch(self, epoch: int) -> None:
+        """Sets the epoch of the shuffling and the sampler. Call it before creating the DataLoader iterator of the
+        epoch."""
+        self.epoch = epoch
+        if self.sampler is not None:
+            self.sampler.set_epoch(epoch)
+
+    def _games(self) -> Iterator[Tuple[Union[str, np.ndarray], Optional[np.ndarray]]]:
+        """(moves, evals) of the games of this worker, evals is None for move targets."""
+        counts = self.sampler.game_counts() if self.sampler is not None else None
+        file_indices, stride, offset = self._partition()
+        if self.shuffle_buffer:
+            # The same permutation for all partitions, which stride over the games of the same files
+            file_indices = np.random.default_rng([self.seed, self.epoch]).permutation(file_indices).tolist()
+        game_index = 0
+        for file_index in file_indices:
+            path = self.csv_paths[file_index]
+            file_counts = None
+            if counts is not None:
+                start = self.sampler.metadata.file_offsets[file_index]
+                file_counts = counts[start:self.sampler.metadata.file_offsets[file_index + 1]]
+                if not file_counts.any():
+                    continue
+            if self.moves_format == "codes":
+                codes, offsets = load_move_codes(sidecar_path(path))
+                games = (codes[begin:end] for begin, end in zip(offsets[:-1].tolist(), offsets[1:].tolist()))
+                if file_counts is not None:
+                    games = compress(games, file_counts)
+            else:
+                # Lines of games that were not sampled are skipped by the parser without splitting them
+                wanted = set((np.flatnonzero(file_counts) + 1).tolist()) if file_counts is not None else None
+                chunks = pd.read_csv(path, usecols=["Moves"], sep=self.separator, dtype=str, chunksize=CHUNK_SIZE,
+                                     skiprows=(lambda line: line != 0 and line not in wanted) if wanted else None)
+                games = (moves for chunk in chunks for moves in chunk["Moves"].fillna(""))
+            if self.target_type == "eval":
+                annotations, eval_offsets = load_annotations(annotations_path(path))
+                values = eval_targets(annotations.eval_cp, annotations.eval_mate)
+                evals = (values[begin:end] for begin, end in zip(eval_offsets[:-1].tolist(), eval_offsets[1:].tolist()))
+                games = zip(games, compress(evals, file_counts) if file_counts is not None else evals)
+            else:
+                games = ((moves, None) for moves in games)
+            if file_counts is not None:
+                games = spread_repeats(games, file_counts[file_counts > 0].tolist())
+            for game in games:
+                if game_index % stride == offset:
+                    yield game
+                game_index += 1
+
+    def _worker(self) -> Tuple[int, int]:
+        worker_info = get_worker_info()
+        return (worker_info.id, worker_info.num_workers) if worker_info else (0, 1)
+
+    def _partition(self) -> Tuple[List[int], int, int]:
+        """Indices of the files read by this worker of this replica and the (stride, offset) of the games it keeps.
+
+        The files are split between the replicas first, so that every replica reads its own files if there are
+        enough, and then between the workers of the replica. Replicas sharing all files count the games in the
+        same order, so their workers share the files as well.
+        """
+        worker_id, num_workers = self._worker()
+        file_indices, stride, offset = game_partition(list(range(len(self.csv_paths))), self.rank,
+                                                      self.num_replicas)
+        if stride > 1:
+            return file_indices, stride * num_workers, offset + stride * worker_id
+        return game_partition(file_indices, worker_id, num_workers)
+
+    def _game_moves(self, board: chess.Board, moves: Union[str, np.ndarray]) -> Iterator[Tuple[chess.Move, int]]:
+        """The moves of a game with their targets. SAN moves are parsed on the board, so the caller must push
+        every move before taking the next one; move codes are decoded and looked up for the whole game."""
+        if isinstance(moves, str):
+            for san in moves.split():
+                move = board.parse_san(san)
+                yield move, self._move_encoder.index(move)
+            return
+        from_squares, to_squares, promotions = (array.tolist() for array in decode_move_codes(moves))
+        targets = self._move_encoder.indices_from_codes(moves).tolist()
+        for from_square, to_square, promotion, target in zip(from_squares, to_squares, promotions, targets):
+            if target < 0:
+                raise ValueError(f"Invalid move code {from_square | to_square << 6 | promotion << 12}")
+            yield chess.Move(from_square, to_square, promotion or None), target
+
+    def _positions(self, board: chess.Board, moves: Union[str, np.ndarray],
+                   evals: Optional[np.ndarray]) -> Iterator[Tuple[int, Union[int, float], int]]:
+        """Replays a game on the board and yields the (ply, target, placement key) of every position to encode
+        while the board holds it."""
+        key = self._start_key
+        evals = evals.tolist() if evals is not None else None
+        for ply, (move, target) in enumerate(self._game_moves(board, moves)):
+            if evals is None:
+                yield ply, target, key
+            if self.cache is not None:
+                key = next_placement_key(key, board, move)
+            board.push(move)
+            if evals is not None and ply < len(evals) and not math.isnan(evals[ply]):
+                yield ply + 1, evals[ply], key
+
+    def _new_targets(self, size: int, shared: bool) -> torch.Tensor:
+        targets = torch.empty(size, dtype=torch.int64) if self.target_type == "move" \
+            else torch.empty((size, 1), dtype=torch.float32)
+        # Batches are written in place by a worker and passed to the main process without a copy
+        return targets.share_memory_() if shared and get_worker_info() is not None else targets
+
+    def _new_planes(self, size: int) -> torch.Tensor:
+        planes = torch.empty((size, NUM_PLANES, 8, 8), dtype=torch.uint8)
+        return planes.share_memory_() if get_worker_info() is not None else planes
+
+    def _position_blocks(self, size: int) -> Iterator[Tuple[np.ndarray, torch.Tensor, int]]:
+        """Encodes the positions of the games of this worker into blocks of `size` positions and yields the
+        (bitboards, targets, number of positions) of every block, the last one may be incomplete. Without a
+        shuffle buffer the blocks are the batches and their targets are yielded as they are."""
+        worker_id, num_workers = self._worker()
+        bitboards = np.zeros((size, NUM_PLANES), dtype=np.uint64)
+        targets = self._new_targets(size, shared=not self.shuffle_buffer)
+        count = 0
+        keep_probabilities, rng = None, None
+        if self.sampler is not None:
+            keep_probabilities = self.sampler.ply_keep_probabilities()
+            rng = np.random.default_rng([self.sampler.seed, self.sampler.epoch,
+                                         self.rank * num_workers + worker_id])
+        if self.cache is not None and get_worker_info() is not None:
+            self.cache.set_worker(worker_id)
+        for moves, evals in self._games():
+            board = chess.Board()
+            try:
+                for ply, target, key in self._positions(board, moves, evals):
+                    if keep_probabilities is None \
+                            or rng.random() < keep_probabilities[min(ply, len(keep_probabilities) - 1)]:
+                        if self.cache is not None:
+                            bitboards[count] = self._encoder.cached_bitboards(board, key)
+                        else:
+                            bitboards[count, :NUM_PIECE_PLANES] = self._encoder.piece_bitboards(board)
+                        targets[count] = target
+                        count += 1
+                        if count == size:
+                            yield self._with_attacks(bitboards, count), targets, count
+                            bitboards = np.zeros((size, NUM_PLANES), dtype=np.uint64)
+                            targets = self._new_targets(size, shared=not self.shuffle_buffer)
+                            count = 0
+            except ValueError as e:
+                logging.warning(f"Skipping the rest of an invalid game: {e}")
+        if count:
+            yield self._with_attacks(bitboards, count), targets, count
+
+    def _with_attacks(self, bitboards: np.ndarray, count: int) -> np.ndarray:
+        """Adds the attack bitboards of the first `count` positions of a block, computed for the whole block at once
+        (cached positions already have them)."""
+        if self.cache is None:
+            bitboards[:count, NUM_PIECE_PLANES:] = attack_bitboards(bitboards[:count, :NUM_PIECE_PLANES])
+        return bitboards
+
+    def __iter__(self) -> Iterator[Tuple[torch.Tensor, torch.Tensor]]:
+        if not self.shuffle_buffer:
+            for bitboards, targets, size in self._position_blocks(self.batch_size):
+                if size < self.batch_size and self.drop_last:
+                    return
+                planes = self._new_planes(size)
+                bitboards_to_planes(bitboards[:size], out=planes.numpy())
+                yield planes, targets[:size]
+            return
+        worker_id, num_workers = self._worker()
+        rng = np.random.default_rng([self.seed, self.epoch, self.rank * num_workers + worker_id])
+        for bitboards, targets, size in self._position_blocks(self.shuffle_buffer):
+            order = rng.permutation(size)
+            for start in range(0, size, self.batch_size):
+                indices = order[start:start + self.batch_size]
+                if len(indices) < self.batch_size and self.drop_last:
+                    return
+                planes, batch_targets = self._new_planes(len(indices)), self._new_targets(len(indices), shared=True)
+                bitboards_to_planes(bitboards[indices], out=planes.numpy())
+                batch_targets.copy_(targets[torch.from_numpy(indices)])
+                yield planes, batch_targets
+
+
+def batch_loader(dataset: PositionBatchDataset, num_workers: int = 0, pin_memory: bool = False,
+                 prefetch_factor: int = 2) -> DataLoader:
+    """DataLoader passing the batches of the dataset through unchanged (no collation).
+
+    Workers are started for every epoch, so they see the epoch set with `PositionBatchDataset.set_epoch`."""
+    return DataLoader(dataset, batch_size=None, num_workers=num_workers, pin_memory=pin_memory,
+                      prefetch_factor=prefetch_factor if num_workers else None)
+
+
+def to_float_batch(batch, device="cpu", non_blocking: bool = True):
+    """Moves a (uint8 planes, targets) batch to the device and converts the planes to float32 there."""
+    planes, targets = batch
+    return (planes.to(device, non_blocking=non_blocking).float(),
+            targets.to(device, non_blocking=non_blocking))
@@ -0,0 +1,148 @@
+"""Teacher outputs cached once for knowledge distillation.
+
+Cache file format (all integers little-endian):
+
+    header (32 bytes):  magic b"DCPTEACH", version u32, record size u32, top k u32, reserved u32,
+                        number of records u64
+    records:            planes u8[192], move u16, policy indices u16[k], policy probabilities f16[k],
+                        wdl f16[3]
+
+The planes are the 24 GridEncoder planes of the position packed to bits, the move is the MoveEncoder8x8x73
+flat index of the played move. The policy keeps the teacher's k most probable moves; the probabilities are
+those of the full softmax, so they sum up to at most 1. The wdl is the softmax of the teacher's value.
+"""
+import logging
+import mmap
+import struct
+from typing import Iterable, Iterator, Tuple
+import numpy as np
+import torch
+from torch.utils.data import IterableDataset, get_worker_info
+from deep_chess_playground.data_encoders.input_encoders.grid_encoding import NUM_PLANES
+
+
+MAGIC = b"DCPTEACH"
+VERSION = 1
+HEADER_STRUCT = struct.Struct("<8sIIIIQ")
+PACKED_PLANES_SIZE = NUM_PLANES * 64 // 8
+TOP_K = 16
+
+
+def record_dtype(top_k: int) -> np.dtype:
+    return np.dtype([("planes", "u1", (PACKED_PLANES_SIZE,)), ("move", "<u2"), ("policy_indices", "<u2", (top_k,)),
+                     ("policy_probabilities", "<f2", (top_k,)), ("wdl", "<f2", (3,))])
+
+
+def build_teacher_cache(teacher: torch.nn.Module, batches: Iterable[Tuple[torch.Tensor, torch.Tensor]], path: str,
+                        top_k: int = TOP_K, device: str = "cpu") -> int:
+    """Runs the teacher once over the batches and writes its outputs with the positions to a cache file.
+
+    Args:
+        teacher (torch.nn.Module): Network returning (N, 4672) policy and (N, 3) [W, D, L] value logits, e.g. a
+            PolicyValueNetwork.
+        batches (Iterable[Tuple[torch.Tensor, torch.Tensor]]): (uint8 planes, played move indices) batches,
+            e.g. from PositionBatchDataset.
+        path (str): Path of the cache file.
+        top_k (int, optional): Number of policy entries kept per position. Defaults to TOP_K.
+        device (str, optional): Device of the teacher. Defaults to "cpu".
+
+    Returns:
+        int: Number of cached positions.
+
+    Raises:
+        ValueError: If the teacher doesn't return a [W, D, L] value.
+    """
+    dtype = record_dtype(top_k)
+    teacher = teacher.to(device).eval()
+    num_records = 0
+    with open(path, "wb") as f:
+        f.write(HEADER_STRUCT.pack(MAGIC, VERSION, dtype.itemsize, top_k, 0, 0))
+        with torch.inference_mode():
+            for planes, moves in batches:
+                outputs = teacher(planes.to(device).float())
+                if not isinstance(outputs, (tuple, list)) or outputs[1].shape[1:] != (3,):
+                    raise ValueError("The teacher must return policy logits and [W, D, L] value logits")
+                policy = torch.softmax(outputs[0].flatten(1).float(), dim=1)
+                probabilities, indices = policy.topk(top_k, dim=1)
+                records = np.zeros(len(planes), dtype=dtype)
+                records["planes"] = np.packbits(planes.numpy().reshape(len(planes), -1).astype(bool), axis=1)
+                records["move"] = moves.numpy()
+                records["policy_indices"] = indices.cpu().numpy()
+                records["policy_probabilities"] = probabilities.cpu().numpy()
+                records["wdl"] = torch.softmax(outputs[1].float(), dim=1).cpu().numpy()
+                records.tofile(f)
+                num_records += len(records)
+        f.seek(0)
+        f.write(HEADER_STRUCT.pack(MAGIC, VERSION, dtype.itemsize, top_k, 0, num_records))
+    logging.info(f"Cached teacher outputs of {num_records} positions in {path}")
+    return num_records
+
+
+class TeacherCacheDataset(IterableDataset):
+    """Streams batches of positions with the cached teacher outputs, see the module docstring for the file.
+
+    Every item is a batch like those of PositionBatchDataset: (N, 24, 8, 8) uint8 planes and a tuple of
+    targets (played moves (N,) int64, teacher policy indices (N, k) int64, teacher policy probabilities
+    (N, k) float32, teacher wdl (N, 3) float32). The file is memory-mapped, so an epoch reads only the
+    records and never runs the teacher. Use it with `batch_loader`.
+
+    Args:
+        path (str): Path of the cache file.
+        batch_size (int): Number of positions per batch.
+        shuffle (bool, optional): Visit the records in a new random order every epoch. Defaults to True.
+        drop_last (bool, optional): Drop the last incomplete batch of each worker. Defaults to False.
+        seed (int, optional): Seed of the shuffling, combined with the epoch. Defaults to 0.
+
+    Raises:
+        ValueError: If the file is not a teacher cache of a supported version.
+    """
+
+    def __init__(self, path: str, batch_size: int, shuffle: bool = True, drop_last: bool = False, seed: int = 0):
+        super().__init__()
+        with open(path, "rb") as f:
+            header = HEADER_STRUCT.unpack(f.read(HEADER_STRUCT.size))
+        magic, version, record_size, self.top_k, _, self.num_records = header
+        if magic != MAGIC or version != VERSION or record_size != record_dtype(self.top_k).itemsize:
+            raise ValueError(f"Not a teacher cache of version {VERSION}: {path}")
+        self.path = path
+        self.batch_size = batch_size
+        self.shuffle = shuffle
+        self.drop_last = drop_last
+        self.seed = seed
+        self.epoch = 0
+
+    def __len__(self) -> int:
+        """Number of batches in a single process."""
+        full, rest = divmod(self.num_records, self.batch_size)
+        return full + (1 if rest and not self.drop_last else 0)
+
+    def set_epoch(self, epoch: int) -> None:
+        self.epoch = epoch
+
+    def records(self) -> np.ndarray:
+        """All records, memory-mapped."""
+        # Opened in every worker, an mmap can't be pickled
+        with open(self.path, "rb") as f:
+            buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        return np.frombuffer(buffer, dtype=record_dtype(self.top_k), count=self.num_records,
+                             offset=HEADER_STRUCT.size)
+
+    def __iter__(self) -> Iterator[Tuple[torch.Tensor, Tuple[torch.Tensor, ...]]]:
+        worker_info = get_worker_info()
+        worker_id, num_workers = (worker_info.id, worker_info.num_workers) if worker_info else (0, 1)
+        records = self.records()
+        order = np.random.default_rng([self.seed, self.epoch]).permutation(self.num_records) if self.shuffle \
+            else np.arange(self.num_records)
+        order = order[worker_id::num_workers]
+        for start in range(0, len(order), self.batch_size):
+            indices = order[start:start + self.batch_size]
+            if len(indices) < self.batch_size and self.drop_last:
+                break
+            # Sorted reads touch the pages of the file in order
+            batch = records[np.sort(indices)]
+            planes = np.unpackbits(batch["planes"], axis=1).reshape(len(batch), NUM_PLANES, 8, 8)
+            yield (torch.from_numpy(planes),
+                   (torch.from_numpy(batch["move"].astype(np.int64)),
+                    torch.from_numpy(batch["policy_indices"].astype(np.int64)),
+                    torch.from_numpy(batch["policy_probabilities"].astype(np.float32)),
+                    torch.from_numpy(batch["wdl"].astype(np.float32))))
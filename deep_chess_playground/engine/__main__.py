@@ -0,0 +1,34 @@
+"""UCI entry point, e.g. for a chess GUI or a tournament manager:
+
+    python -m deep_chess_playground.engine -c config.json --checkpoint model.ckpt
+
+or, starting faster, with a model package exported by `engine.model_package`:
+
+    python -m deep_chess_playground.engine --checkpoint model.pkg.pt
+"""
+import argparse
+import logging
+from deep_chess_playground.engine.batcher import InferenceBatcher, MAX_BATCH_SIZE
+from deep_chess_playground.engine.model_package import load_model
+from deep_chess_playground.engine.uci import UciEngine
+
+
+def main():
+    argparser = argparse.ArgumentParser(description="UCI chess engine with a trained network.")
+    argparser.add_argument("-c", "--conf", help="Path to the configuration file, not needed for a model package.")
+    argparser.add_argument("--checkpoint", required=True, help="Path to the Lightning checkpoint or model package.")
+    argparser.add_argument("--device", default="cpu", help="Device of the network.")
+    argparser.add_argument("--max-batch-size", type=int, default=MAX_BATCH_SIZE, help="Maximum inference batch size.")
+    argparser.add_argument("--log-file", help="Path to a log file (stdout is reserved for the UCI protocol).")
+    args = argparser.parse_args()
+    if args.log_file:
+        logging.basicConfig(filename=args.log_file, level=logging.INFO,
+                            format='%(asctime)s - %(levelname)s - %(message)s')
+
+    model = load_model(args.conf, args.checkpoint, args.device)
+    batcher = InferenceBatcher(model, max_batch_size=args.max_batch_size, device=args.device)
+    UciEngine(batcher.evaluate, on_quit=batcher.close).run()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+import logging
+import threading
+from concurrent.futures import Future
+from queue import Queue, Empty
+from typing import List, Sequence
+import chess
+import torch
+from deep_chess_playground.data_encoders.input_encoders.grid_encoding import GridEncoder
+from deep_chess_playground.data_encoders.output_encoders.move_encoding_8_8_73 import MoveEncoder8x8x73
+from deep_chess_playground.engine.evaluation import Evaluation, evaluations_from_outputs
+
+
+MAX_BATCH_SIZE = 256
+BATCH_TIMEOUT = 0.001
+
+
+class InferenceBatcher:
+    """Evaluates positions with a network on a background thread, in batches.
+
+    Callers submit positions from any thread and get futures back. The worker thread waits for the first
+    request, collects more requests until the batch is full or BATCH_TIMEOUT passes, and runs a single
+    forward pass for all of them, so several searches (or a search with virtual loss) share one batch.
+
+    Args:
+        model (torch.nn.Module): Network taking GridEncoder planes, see `evaluation.split_outputs` for its outputs.
+        max_batch_size (int, optional): Maximum number of positions per forward pass. Defaults to MAX_BATCH_SIZE.
+        batch_timeout (float, optional): Seconds to wait for more requests. Defaults to BATCH_TIMEOUT.
+        device (str, optional): Device of the model. Defaults to "cpu".
+
+    Attributes:
+        positions_evaluated (int): Number of positions evaluated so far.
+        batches_evaluated (int): Number of forward passes so far.
+    """
+
+    def __init__(self, model, max_batch_size: int = MAX_BATCH_SIZE, batch_timeout: float = BATCH_TIMEOUT,
+                 device: str = "cpu"):
+        self._model = model.to(device).eval()
+        self._device = device
+        self._max_batch_size = max_batch_size
+        self._batch_timeout = batch_timeout
+        self._encoder = GridEncoder()
+        self._move_encoder = MoveEncoder8x8x73()
+        self._requests: Queue = Queue()
+        self._closed = False
+        self.positions_evaluated = 0
+        self.batches_evaluated = 0
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def submit(self, board: chess.Board) -> Future:
+        """Queues the position and returns a future of its Evaluation."""
+        if self._closed:
+            raise RuntimeError("InferenceBatcher is closed")
+        future: Future = Future()
+        self._requests.put((board, future))
+        return future
+
+    def evaluate(self, boards: Sequence[chess.Board]) -> List[Evaluation]:
+        """Evaluates the positions and waits for the results."""
+        futures = [self.submit(board) for board in boards]
+        return [future.result() for future in futures]
+
+    def close(self) -> None:
+        """Stops the worker thread after the queued requests are evaluated."""
+        self._closed = True
+        self._requests.put(None)
+        self._thread.join()
+
+    def _next_batch(self) -> list:
+        batch = [self._requests.get()]
+        while batch[-1] is not None and len(batch) < self._max_batch_size:
+            try:
+                batch.append(self._requests.get(timeout=self._batch_timeout))
+            except Empty:
+                break
+        return batch
+
+    def _run(self) -> None:
+        running = True
+        while running:
+            batch = self._next_batch()
+            if batch[-1] is None:
+                running = False
+                batch.pop()
+            if not batch:
+                continue
+            boards, futures = zip(*batch)
+            try:
+                x = torch.from_numpy(self._encoder.encode_batch(boards)).to(self._device).float()
+                with torch.inference_mode():
+                    outputs = self._model(x)
+                for future, evaluation in zip(futures, evaluations_from_outputs(outputs, boards,
+                                                                                 self._move_encoder)):
+                    future.set_result(evaluation)
+                self.positions_evaluated += len(boards)
+                self.batches_evaluated += 1
+            except Exception as e:
+                logging.error(f"Error during batched inference: {e}")
+                for future in futures:
+                    future.set_exception(e)
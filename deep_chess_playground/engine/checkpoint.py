@@ -0,0 +1,49 @@
+import copy
+import torch
+from deep_chess_playground.pytorch_modules.pytorch_module_factory import PyTorchModuleFactory
+
+
+STATE_DICT_PREFIX = "pytorch_module."
+
+
+def load_pytorch_module(config, checkpoint_path, device="cpu"):
+    """Loads the network of a trained BasicModule for inference.
+
+    The network is built from the "pytorch_module" part of the LightningModuleFactory configuration and
+    gets the weights of the Lightning checkpoint. The optimizer and metrics are not built.
+
+    Args:
+        config (dict): LightningModuleFactory configuration the checkpoint was trained with.
+        checkpoint_path (str): Path to the .ckpt file saved by Lightning.
+        device (str, optional): Device to load the weights to. Defaults to "cpu".
+
+    Returns:
+        torch.nn.Module: The network in eval mode.
+    """
+    module = PyTorchModuleFactory.build_module(config["pytorch_module"])
+    state_dict = torch.load(checkpoint_path, map_location=device, weights_only=False)["state_dict"]
+    module.load_state_dict({key[len(STATE_DICT_PREFIX):]: value for key, value in state_dict.items()
+                            if key.startswith(STATE_DICT_PREFIX)})
+    return module.to(device).eval()
+
+
+def load_lightning_module(config, checkpoint_path, device="cpu"):
+    """Builds the complete Lightning module with LightningModuleFactory and returns its trained network.
+
+    Unlike `load_pytorch_module` the whole module is built, so the checkpoint must match the configuration
+    exactly (strict loading).
+
+    Args:
+        config (dict): LightningModuleFactory configuration the checkpoint was trained with.
+        checkpoint_path (str): Path to the .ckpt file saved by Lightning.
+        device (str, optional): Device to load the weights to. Defaults to "cpu".
+
+    Returns:
+        torch.nn.Module: The `pytorch_module` of the Lightning module in eval mode.
+    """
+    # Imported here, so that inference with `load_pytorch_module` doesn't need the training dependencies
+    from deep_chess_playground.lightning_modules.lightning_module_factory import LightningModuleFactory
+    module = LightningModuleFactory.build_module(copy.deepcopy(config))
+    state_dict = torch.load(checkpoint_path, map_location=device, weights_only=False)["state_dict"]
+    module.load_state_dict(state_dict)
+    return module.pytorch_module.to(device).eval()
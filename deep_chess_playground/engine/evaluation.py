@@ -0,0 +1,69 @@
+from typing import List, NamedTuple, Sequence
+import chess
+import numpy as np
+import torch
+from deep_chess_playground.data_encoders.output_encoders.move_encoding_8_8_73 import MoveEncoder8x8x73, NUM_PLANES
+
+
+class Evaluation(NamedTuple):
+    """Network evaluation of a position.
+
+    Attributes:
+        moves (List[chess.Move]): Legal moves of the position.
+        priors (np.ndarray): Policy probabilities of the legal moves (they sum up to 1).
+        value (float): Expected score in [-1, 1] from the perspective of the side to move.
+    """
+    moves: List[chess.Move]
+    priors: np.ndarray
+    value: float
+
+
+def _is_distribution(tensor: torch.Tensor, dim: int) -> bool:
+    """Whether the tensor holds probabilities summing up to 1 along the dimension, e.g. the output of nn.Softmax."""
+    return bool((tensor >= 0).all()) and torch.allclose(tensor.sum(dim=dim), torch.ones(()), atol=1e-3)
+
+
+def split_outputs(outputs):
+    """Splits model outputs into (N, 4672) policy logits and (N,) values from the perspective of white.
+
+    Supported outputs are a policy tensor alone (the value is then 0) or a (policy, value) pair, e.g. from
+    PolicyValueNetwork. The policy can be (N, 4672), (N, 8, 8, 73) or (N, 73, 8, 8) like the output of a
+    1x1 convolution. The value can be [W, D, L] logits of shape (N, 3) or a single score in [-1, 1].
+
+    Probabilities are recognized and used as they are: a policy that sums up to 1 over all moves or over the
+    73 planes of every square (AlphaZeroMoveClassificationHead) is returned as log-probabilities, and a
+    [W, D, L] distribution (ValueWDLHead) isn't put through softmax again. Log-probabilities, e.g. of the
+    masked head, are valid logits.
+    """
+    policy, value = outputs if isinstance(outputs, (tuple, list)) else (outputs, None)
+    if policy.dim() == 4 and policy.shape[1] == NUM_PLANES:
+        policy = policy.permute(0, 2, 3, 1)
+    policy = policy.flatten(1).float()
+    if policy.shape[1] == 64 * NUM_PLANES and \
+            (_is_distribution(policy, 1) or _is_distribution(policy.reshape(-1, 64, NUM_PLANES), 2)):
+        policy = policy.clamp_min(1e-12).log()
+    if value is None:
+        value = policy.new_zeros(len(policy))
+    elif value.dim() == 2 and value.shape[1] == 3:
+        value = value.float()
+        wdl = value if _is_distribution(value, 1) else torch.softmax(value, dim=1)
+        value = wdl[:, 0] - wdl[:, 2]
+    else:
+        value = value.float().flatten().clamp(-1, 1)
+    return policy, value
+
+
+def evaluations_from_outputs(outputs, boards: Sequence[chess.Board], move_encoder: MoveEncoder8x8x73) \
+        -> List[Evaluation]:
+    """Turns batched model outputs into one Evaluation per board, restricting the policy to legal moves."""
+    policy, value = split_outputs(outputs)
+    policy, value = policy.cpu().numpy(), value.cpu().numpy()
+    evaluations = []
+    for index, board in enumerate(boards):
+        moves = list(board.generate_legal_moves())
+        logits = policy[index, [move_encoder.index(move) for move in moves]]
+        priors = np.exp(logits - logits.max()) if moves else logits
+        priors /= max(priors.sum(), 1e-12)
+        position_value = float(value[index]) if board.turn == chess.WHITE else -float(value[index])
+        evaluations.append(Evaluation(moves, priors, position_value))
+    return evaluations
@@ -0,0 +1,132 @@
+"""Inference-only model packages: the network configuration and weights in one memory-mappable file.
+
+A Lightning checkpoint also holds the optimizer state, and loading it unpickles everything into private memory
+before the network is built by LightningModuleFactory. A package holds only what inference needs:
+
+    format_version (int):  PACKAGE_VERSION
+    config (dict):         the PyTorchModuleFactory configuration of the network ("pytorch_module")
+    state_dict (dict):     the weights and persistent buffers
+    buffers (dict):        the non-persistent buffers (e.g. precomputed index tables), which a state dict leaves out
+
+It is written with `torch.save`, which stores every tensor uncompressed and aligned, and loaded with
+`torch.load(mmap=True)`: the tensors are views of the mapped file, assigned to the network without copying. The
+network is built on the meta device, so its parameters aren't initialized only to be overwritten. Pages are read
+on first use and, as long as nobody writes to the weights, engine, self-play or evaluation processes loading the
+same package share them through the page cache.
+
+    python -m deep_chess_playground.engine.model_package -c config.json --checkpoint model.ckpt -o model.pkg.pt
+"""
+import argparse
+import logging
+from typing import Dict
+import torch
+from deep_chess_playground.engine.checkpoint import load_lightning_module, load_pytorch_module
+from deep_chess_playground.pytorch_modules.pytorch_module_factory import PyTorchModuleFactory
+from deep_chess_playground.utils import read_json
+
+
+PACKAGE_VERSION = 1
+PACKAGE_SUFFIX = ".pkg.pt"
+
+
+def is_model_package(path: str) -> bool:
+    return path.endswith(PACKAGE_SUFFIX)
+
+
+def non_persistent_buffers(module: torch.nn.Module) -> Dict[str, torch.Tensor]:
+    state_dict = module.state_dict(keep_vars=True)
+    return {name: buffer for name, buffer in module.named_buffers() if name not in state_dict}
+
+
+def save_model_package(module: torch.nn.Module, config: dict, package_path: str) -> None:
+    """Saves a network with its PyTorchModuleFactory configuration as a package.
+
+    Args:
+        module (torch.nn.Module): The network.
+        config (dict): The configuration the network is built from, the "pytorch_module" part of a
+            LightningModuleFactory configuration.
+        package_path (str): Path of the package, ending with PACKAGE_SUFFIX by convention.
+    """
+    state_dict = {name: tensor.detach().cpu().contiguous() for name, tensor in module.state_dict().items()}
+    buffers = {name: buffer.cpu().contiguous() for name, buffer in non_persistent_buffers(module).items()}
+    package = {"format_version": PACKAGE_VERSION, "config": config, "state_dict": state_dict, "buffers": buffers}
+    torch.save(package, package_path)
+
+
+def export_model_package(config: dict, checkpoint_path: str, package_path: str) -> None:
+    """Saves the network of a Lightning checkpoint as a package, without the optimizer state and metrics.
+
+    Args:
+        config (dict): LightningModuleFactory configuration the checkpoint was trained with.
+        checkpoint_path (str): Path to the .ckpt file saved by Lightning.
+        package_path (str): Path of the package.
+    """
+    save_model_package(load_pytorch_module(config, checkpoint_path), config["pytorch_module"], package_path)
+
+
+def _build_without_initialization(config: dict) -> torch.nn.Module:
+    try:
+        with torch.device("meta"):
+            return PyTorchModuleFactory.build_module(config)
+    except (NotImplementedError, RuntimeError):
+        # Networks computing tables with operations the meta device doesn't support are built as usual
+        return PyTorchModuleFactory.build_module(config)
+
+
+def load_model_package(package_path: str, device: str = "cpu", mmap: bool = True) -> torch.nn.Module:
+    """Loads the network of a package for inference.
+
+    Args:
+        package_path (str): Path of the package.
+        device (str, optional): Device of the network, other devices than "cpu" get a copy of the mapped
+            weights. Defaults to "cpu".
+        mmap (bool, optional): Map the weights instead of reading them. Defaults to True.
+
+    Returns:
+        torch.nn.Module: The network in eval mode, without gradients.
+
+    Raises:
+        ValueError: If the file isn't a package of a known version or leaves tensors of the network unset.
+        RuntimeError: If the weights don't match the network built from the configuration.
+    """
+    package = torch.load(package_path, map_location="cpu", mmap=mmap, weights_only=True)
+    if not isinstance(package, dict) or package.get("format_version") != PACKAGE_VERSION:
+        raise ValueError(f"{package_path} is not a model package of version {PACKAGE_VERSION}")
+    module = _build_without_initialization(package["config"])
+    module.load_state_dict(package["state_dict"], assign=True)
+    for name, buffer in package["buffers"].items():
+        owner, _, buffer_name = name.rpartition(".")
+        module.get_submodule(owner).register_buffer(buffer_name, buffer, persistent=False)
+    uninitialized = [name for name, tensor in [*module.named_parameters(), *module.named_buffers()] if tensor.is_meta]
+    if uninitialized:
+        raise ValueError(f"{package_path} has no values for {uninitialized}")
+    return module.requires_grad_(False).to(device).eval()
+
+
+def load_model(config_path, checkpoint_path: str, device: str = "cpu", strict: bool = False) -> torch.nn.Module:
+    """Loads a network for inference from a package, or from a Lightning checkpoint with its configuration
+    file, as given on the command line. With `strict` a checkpoint is loaded with `load_lightning_module`, so it
+    must match the whole Lightning module of the configuration."""
+    if is_model_package(checkpoint_path):
+        return load_model_package(checkpoint_path, device)
+    if config_path is None:
+        raise ValueError(f"A configuration is needed to load the Lightning checkpoint {checkpoint_path}")
+    load = load_lightning_module if strict else load_pytorch_module
+    return load(read_json(config_path), checkpoint_path, device)
+
+
+def main():
+    argparser = argparse.ArgumentParser(description="Export the network of a Lightning checkpoint as a package.")
+    argparser.add_argument("-c", "--conf", required=True, help="Path to the configuration file.")
+    argparser.add_argument("--checkpoint", required=True, help="Path to the Lightning checkpoint.")
+    argparser.add_argument("-o", "--output", required=True, help=f"Path of the package (*{PACKAGE_SUFFIX}).")
+    args = argparser.parse_args()
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    if not is_model_package(args.output):
+        logging.warning(f"{args.output} doesn't end with {PACKAGE_SUFFIX}, it won't be recognized as a package")
+    export_model_package(read_json(args.conf), args.checkpoint, args.output)
+    logging.info(f"Saved {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,154 @@
+import math
+from typing import Callable, Dict, List, Optional
+import chess
+
+
+C_PUCT = 1.5
+LEAVES_PER_BATCH = 16
+VIRTUAL_LOSS = 1.0
+
+
+class Node:
+    """A node of the search tree, reached by a move of the player to move in the parent node.
+
+    `value_sum` is accumulated from the perspective of that player, so the parent picks the child with
+    the highest `q`."""
+    __slots__ = ("prior", "visit_count", "value_sum", "children")
+
+    def __init__(self, prior: float):
+        self.prior = prior
+        self.visit_count = 0
+        self.value_sum = 0.0
+        self.children: Optional[Dict[chess.Move, "Node"]] = None
+
+    @property
+    def expanded(self) -> bool:
+        return self.children is not None
+
+    @property
+    def q(self) -> float:
+        return self.value_sum / self.visit_count if self.visit_count else 0.0
+
+
+def terminal_value(board: chess.Board) -> Optional[float]:
+    """Value of a finished game from the perspective of the side to move, or None if the game is not over."""
+    outcome = board.outcome(claim_draw=False)
+    if outcome is None:
+        return None
+    return 0.0 if outcome.winner is None else (1.0 if outcome.winner == board.turn else -1.0)
+
+
+class Search:
+    """PUCT Monte Carlo tree search guided by a policy/value network.
+
+    Leaves are collected in groups of `leaves_per_batch` using virtual loss and evaluated with one call of
+    `evaluate` (e.g. `InferenceBatcher.evaluate`), so the network always sees batches. The tree is kept
+    between searches: `set_position` reuses the subtree when the new position follows from the previous one.
+
+    Args:
+        evaluate (Callable): Takes a list of boards and returns a list of `evaluation.Evaluation`.
+        c_puct (float, optional): Exploration constant. Defaults to C_PUCT.
+        leaves_per_batch (int, optional): Number of leaves evaluated together. Defaults to LEAVES_PER_BATCH.
+    """
+
+    def __init__(self, evaluate: Callable, c_puct: float = C_PUCT, leaves_per_batch: int = LEAVES_PER_BATCH):
+        self._evaluate = evaluate
+        self.c_puct = c_puct
+        self.leaves_per_batch = leaves_per_batch
+        self.board = chess.Board()
+        self.root = Node(1.0)
+
+    def set_position(self, board: chess.Board) -> bool:
+        """Sets the root position. Returns True if an already searched part of the previous tree was reused."""
+        old_moves, new_moves = self.board.move_stack, board.move_stack
+        node: Optional[Node] = self.root
+        if board.root() == self.board.root() and new_moves[:len(old_moves)] == old_moves:
+            for move in new_moves[len(old_moves):]:
+                node = node.children.get(move) if node.expanded else None
+                if node is None:
+                    break
+        else:
+            node = None
+        self.board = board.copy()
+        self.root = node if node is not None else Node(1.0)
+        return node is not None and node.visit_count > 0
+
+    def reset(self) -> None:
+        """Drops the search tree."""
+        self.board = chess.Board()
+        self.root = Node(1.0)
+
+    def run_iteration(self) -> int:
+        """Selects up to `leaves_per_batch` leaves, evaluates them and backs up the values.
+
+        Returns:
+            int: Number of positions sent to the network.
+        """
+        paths, boards = [], []
+        for _ in range(self.leaves_per_batch):
+            path, board = self._select()
+            value = terminal_value(board)
+            if value is not None:
+                self._backup(path, value)
+            elif path[-1] in (leaf_path[-1] for leaf_path in paths):
+                self._revert_virtual_loss(path)
+                break
+            else:
+                paths.append(path)
+                boards.append(board)
+        if boards:
+            for path, evaluation in zip(paths, self._evaluate(boards)):
+                path[-1].children = {move: Node(float(prior))
+                                     for move, prior in zip(evaluation.moves, evaluation.priors)}
+                self._backup(path, evaluation.value)
+        return len(boards)
+
+    def best_move(self) -> Optional[chess.Move]:
+        """The most visited move of the root, or the move with the highest prior before any visit."""
+        if not self.root.expanded or not self.root.children:
+            return None
+        return max(self.root.children.items(), key=lambda item: (item[1].visit_count, item[1].prior))[0]
+
+    def principal_variation(self, max_length: int = 32) -> List[chess.Move]:
+        moves, node = [], self.root
+        while node.expanded and node.children and len(moves) < max_length:
+            move, node = max(node.children.items(), key=lambda item: (item[1].visit_count, item[1].prior))
+            if node.visit_count == 0:
+                break
+            moves.append(move)
+        return moves
+
+    def root_value(self) -> float:
+        """Average value of the root from the perspective of the side to move."""
+        best = self.best_move()
+        return self.root.children[best].q if best is not None else 0.0
+
+    def _select(self):
+        node, board, path = self.root, self.board.copy(stack=False), [self.root]
+        self._apply_virtual_loss(node)
+        while node.expanded and node.children:
+            sqrt_visits = math.sqrt(max(node.visit_count, 1))
+            move, node = max(node.children.items(),
+                             key=lambda item: item[1].q + self.c_puct * item[1].prior * sqrt_visits
+                             / (1 + item[1].visit_count))
+            board.push(move)
+            path.append(node)
+            self._apply_virtual_loss(node)
+        return path, board
+
+    @staticmethod
+    def _apply_virtual_loss(node: Node) -> None:
+        node.visit_count += 1
+        node.value_sum -= VIRTUAL_LOSS
+
+    def _revert_virtual_loss(self, path: List[Node]) -> None:
+        for node in path:
+            node.visit_count -= 1
+            node.value_sum += VIRTUAL_LOSS
+
+    @staticmethod
+    def _backup(path: List[Node], value: float) -> None:
+        """Backs up a value given from the perspective of the side to move in the leaf."""
+        for node in reversed(path):
+            value = -value
+            node.value_sum += value + VIRTUAL_LOSS
@@ -0,0 +1,269 @@
+import logging
+import math
+import sys
+import threading
+import time
+from dataclasses import dataclass
+from typing import Callable, List, Optional, TextIO
+import chess
+from deep_chess_playground.engine.search import Search
+
+
+ENGINE_NAME = "deep-chess-playground"
+ENGINE_AUTHOR = "PypayaTech"
+INFO_INTERVAL = 0.5
+MOVE_OVERHEAD = 0.05
+DEFAULT_MOVES_TO_GO = 30
+DEFAULT_NODES = 800  # for a `go` without any limit
+
+
+@dataclass
+class SearchLimits:
+    """Limits of a search given with the `go` command (times in milliseconds)."""
+    wtime: Optional[int] = None
+    btime: Optional[int] = None
+    winc: int = 0
+    binc: int = 0
+    movestogo: Optional[int] = None
+    movetime: Optional[int] = None
+    nodes: Optional[int] = None
+    depth: Optional[int] = None
+    mate: Optional[int] = None
+    infinite: bool = False
+    ponder: bool = False
+
+    @classmethod
+    def from_tokens(cls, tokens: List[str]) -> "SearchLimits":
+        limits = cls()
+        index = 0
+        while index < len(tokens):
+            token = tokens[index]
+            if token in ("infinite", "ponder"):
+                setattr(limits, token, True)
+            elif token in ("wtime", "btime", "winc", "binc", "movestogo", "movetime", "nodes", "depth", "mate") \
+                    and index + 1 < len(tokens):
+                setattr(limits, token, int(tokens[index + 1]))
+                index += 1
+            index += 1
+        return limits
+
+    def time_budget(self, turn: bool) -> Optional[float]:
+        """Seconds to spend on the move, or None if the search is only limited by nodes, depth or `stop`."""
+        if self.movetime is not None:
+            return max(self.movetime / 1000 - MOVE_OVERHEAD, 0.01)
+        time_left = self.wtime if turn == chess.WHITE else self.btime
+        if time_left is None:
+            return None
+        increment = self.winc if turn == chess.WHITE else self.binc
+        budget = time_left / (self.movestogo or DEFAULT_MOVES_TO_GO) + 0.75 * increment
+        return max(min(budget, time_left / 2) / 1000 - MOVE_OVERHEAD, 0.01)
+
+    def max_depth(self) -> Optional[int]:
+        """Length of the principal variation that ends the search, a mate in N moves takes 2N - 1 plies."""
+        depths = [depth for depth in (self.depth, None if self.mate is None else 2 * self.mate - 1)
+                  if depth is not None]
+        return max(min(depths), 1) if depths else None
+
+    def node_limit(self, turn: bool) -> Optional[int]:
+        """The `nodes` limit, DEFAULT_NODES if the search has no limit at all so that it still ends."""
+        if self.nodes is None and not self.infinite and self.max_depth() is None and self.time_budget(turn) is None:
+            return DEFAULT_NODES
+        return self.nodes
+
+
+def value_to_centipawns(value: float) -> int:
+    """Maps an expected score in [-1, 1] to centipawns (the mapping used by Leela Chess Zero)."""
+    value = min(max(value, -0.999), 0.999)
+    return int(round(111.714640912 * math.tan(1.5620688421 * value)))
+
+
+class UciEngine:
+    """UCI protocol front-end for a network-guided search.
+
+    Commands are handled on the caller's thread and the search runs on a background thread, so `stop`,
+    `isready` and `ponderhit` are answered immediately while the network evaluation keeps running on the
+    inference batcher. The batcher and the search tree are kept between `position` commands, so a position
+    that continues the previous game starts from the already searched subtree.
+
+    Args:
+        evaluate (Callable): Evaluates a list of boards, e.g. `InferenceBatcher.evaluate`.
+        output (TextIO, optional): Stream for the engine's messages. Defaults to sys.stdout.
+        on_quit (Callable, optional): Called on `quit`, e.g. `InferenceBatcher.close`.
+    """
+
+    def __init__(self, evaluate: Callable, output: TextIO = sys.stdout, on_quit: Optional[Callable] = None):
+        self._search = Search(evaluate)
+        self._output = output
+        self._on_quit = on_quit
+        self._output_lock = threading.Lock()
+        self._board = chess.Board()
+        self._search_thread: Optional[threading.Thread] = None
+        self._stop_event = threading.Event()
+        self._ponder_hit_event = threading.Event()
+        self._deadline: Optional[float] = None
+        self._ponder = False
+
+    def run(self, input_stream: TextIO = sys.stdin) -> None:
+        """Reads commands until `quit` or the end of the input."""
+        for line in input_stream:
+            if not self.handle(line):
+                return
+        self.handle("quit")
+
+    def handle(self, line: str) -> bool:
+        """Handles a single command. Returns False after `quit`."""
+        tokens = line.split()
+        if not tokens:
+            return True
+        command, arguments = tokens[0], tokens[1:]
+        if command == "uci":
+            self._send(f"id name {ENGINE_NAME}")
+            self._send(f"id author {ENGINE_AUTHOR}")
+            self._send("option name Ponder type check default false")
+            self._send(f"option name CPuct type string default {self._search.c_puct}")
+            self._send(f"option name LeavesPerBatch type spin default {self._search.leaves_per_batch} min 1 max 1024")
+            self._send("uciok")
+        elif command == "isready":
+            self._send("readyok")
+        elif command == "setoption":
+            self._set_option(arguments)
+        elif command == "ucinewgame":
+            self._stop_search()
+            self._search.reset()
+        elif command == "position":
+            self._stop_search()
+            self._set_position(arguments)
+        elif command == "go":
+            self._stop_search()
+            self._start_search(SearchLimits.from_tokens(arguments))
+        elif command == "stop":
+            self._stop_event.set()
+            self._ponder_hit_event.set()
+        elif command == "ponderhit":
+            self._ponder_hit_event.set()
+        elif command == "quit":
+            self._stop_search()
+            if self._on_quit is not None:
+                self._on_quit()
+            return False
+        else:
+            logging.warning(f"Unknown UCI command: {line.strip()}")
+        return True
+
+    def wait(self) -> None:
+        """Waits until the current search finishes on its own (e.g. because of its time or node limit)."""
+        if self._search_thread is not None:
+            self._search_thread.join()
+
+    def _send(self, message: str) -> None:
+        with self._output_lock:
+            self._output.write(message + "\n")
+            self._output.flush()
+
+    def _set_option(self, arguments: List[str]) -> None:
+        if "name" not in arguments:
+            return
+        value_index = arguments.index("value") if "value" in arguments else len(arguments)
+        name = " ".join(arguments[arguments.index("name") + 1:value_index]).lower()
+        value = " ".join(arguments[value_index + 1:])
+        if name == "cpuct":
+            self._search.c_puct = float(value)
+        elif name == "leavesperbatch":
+            self._search.leaves_per_batch = int(value)
+
+    def _set_position(self, arguments: List[str]) -> None:
+        moves_index = arguments.index("moves") if "moves" in arguments else len(arguments)
+        if arguments and arguments[0] == "fen":
+            board = chess.Board(" ".join(arguments[1:moves_index]))
+        else:
+            board = chess.Board()
+        for move in arguments[moves_index + 1:]:
+            board.push_uci(move)
+        self._board = board
+
+    def _start_search(self, limits: SearchLimits) -> None:
+        self._stop_event.clear()
+        self._ponder_hit_event.clear()
+        self._search_thread = threading.Thread(target=self._search_worker, args=(limits,), daemon=True)
+        self._search_thread.start()
+
+    def _stop_search(self) -> None:
+        if self._search_thread is not None:
+            self._stop_event.set()
+            self._ponder_hit_event.set()
+            self._search_thread.join()
+            self._search_thread = None
+
+    def _search_worker(self, limits: SearchLimits) -> None:
+        if self._board.is_game_over():
+            # There is nothing to search, and the tree wouldn't grow to reach a node limit
+            self._send("bestmove 0000")
+            return
+        start = time.perf_counter()
+        reused = self._search.set_position(self._board)
+        if reused:
+            self._send(f"info string reused {self._search.root.visit_count} nodes of the previous search")
+        budget = limits.time_budget(self._board.turn)
+        node_limit, max_depth = limits.node_limit(self._board.turn), limits.max_depth()
+        waiting_for_ponder_hit = limits.ponder
+        deadline = start + budget if budget is not None and not waiting_for_ponder_hit else None
+        nodes, first_move_reported, last_info = 0, False, start
+
+        while not self._stop_event.is_set():
+            if waiting_for_ponder_hit and self._ponder_hit_event.is_set():
+                # The opponent played the expected move, the clock of the engine starts now
+                waiting_for_ponder_hit = False
+                deadline = time.perf_counter() + budget if budget is not None else None
+            evaluated = self._search.run_iteration()
+            nodes += evaluated
+            now = time.perf_counter()
+            if not first_move_reported and self._search.best_move() is not None:
+                first_move_reported = True
+                self._send(f"info string time to first move {int((now - start) * 1000)} ms")
+                self._send_info(nodes, now - start)
+            elif now - last_info >= INFO_INTERVAL:
+                last_info = now
+                self._send_info(nodes, now - start)
+            if limits.infinite or waiting_for_ponder_hit:
+                if evaluated == 0:
+                    time.sleep(0.001)
+                continue
+            forced = self._search.root.expanded and len(self._search.root.children) <= 1
+            if forced or (deadline is not None and now >= deadline) \
+                    or (node_limit is not None and nodes >= node_limit) \
+                    or (max_depth is not None and self._depth_reached(max_depth)):
+                break
+
+        self._send_info(nodes, time.perf_counter() - start)
+        self._send_best_move()
+
+    def _depth_reached(self, max_depth: int) -> bool:
+        """Whether the principal variation is `max_depth` plies long or ends the game, so it can't get longer."""
+        pv = self._search.principal_variation(max_length=max_depth)
+        if len(pv) >= max_depth:
+            return True
+        if not pv:
+            return False
+        board = self._board.copy(stack=False)
+        for move in pv:
+            board.push(move)
+        return board.is_game_over()
+
+    def _send_info(self, nodes: int, elapsed: float) -> None:
+        pv = self._search.principal_variation()
+        if not pv:
+            return
+        self._send(f"info depth {len(pv)} nodes {nodes} nps {int(nodes / max(elapsed, 1e-6))} "
+                   f"time {int(elapsed * 1000)} score cp {value_to_centipawns(self._search.root_value())} "
+                   f"pv {' '.join(move.uci() for move in pv)}")
+
+    def _send_best_move(self) -> None:
+        best_move = self._search.best_move()
+        if best_move is None:
+            self._send("bestmove 0000")
+            return
+        pv = self._search.principal_variation(max_length=2)
+        if len(pv) == 2 and pv[0] == best_move:
+            self._send(f"bestmove {best_move.uci()} ponder {pv[1].uci()}")
+        else:
+            self._send(f"bestmove {best_move.uci()}")
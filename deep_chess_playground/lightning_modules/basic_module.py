@@ -1,4 +1,5 @@
 import pytorch_lightning as pl
+import torch
 
 
 class BasicModule(pl.LightningModule):
@@ -12,6 +13,13 @@ class BasicModule(pl.LightningModule):
     def forward(self, x):
         return self.pytorch_module(x)
 
+    def on_after_batch_transfer(self, batch, dataloader_idx):
+        x, y = batch
+        if x.dtype == torch.uint8:
+            # Encoded planes are loaded and transferred as bytes, see PositionBatchDataset
+            x = x.float()
+        return x, y
+
     def training_step(self, batch, batch_idx):
         x, y = batch
         y_hat = self(x)
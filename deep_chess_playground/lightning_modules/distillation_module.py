@@ -0,0 +1,125 @@
+import time
+from typing import Dict, Iterable, Tuple
+import torch
+import torch.nn as nn
+import torch.nn.functional as F
+from deep_chess_playground.lightning_modules.basic_module import BasicModule
+
+
+class DistillationLoss(nn.Module):
+    """Loss of a student against cached teacher outputs, see `datasets.teacher_cache`.
+
+    The policy term is the cross entropy between the teacher's top-k distribution (renormalized and softened
+    with the temperature) and the student's policy at the same temperature, scaled by temperature ** 2 so
+    its gradients keep their size. The value term is the cross entropy between the teacher's and the
+    student's [W, D, L] distributions. The played move can be mixed in as a hard label.
+
+    Args:
+        temperature (float, optional): Softening of both policies. Defaults to 1.
+        value_weight (float, optional): Weight of the value term. Defaults to 1.
+        hard_label_weight (float, optional): Weight of the cross entropy with the played move. Defaults to 0.
+    """
+
+    def __init__(self, temperature: float = 1.0, value_weight: float = 1.0, hard_label_weight: float = 0.0):
+        super().__init__()
+        self.temperature = temperature
+        self.value_weight = value_weight
+        self.hard_label_weight = hard_label_weight
+
+    def forward(self, outputs, targets):
+        policy, value = outputs
+        moves, teacher_indices, teacher_probabilities, teacher_wdl = targets
+        policy = policy.flatten(1)
+        teacher_policy = teacher_probabilities.clamp_min(1e-12) ** (1 / self.temperature)
+        teacher_policy = teacher_policy / teacher_policy.sum(dim=1, keepdim=True)
+        student_log_policy = F.log_softmax(policy / self.temperature, dim=1).gather(1, teacher_indices)
+        loss = -(teacher_policy * student_log_policy).sum(dim=1).mean() * self.temperature ** 2
+        loss = loss - self.value_weight * (teacher_wdl * F.log_softmax(value, dim=1)).sum(dim=1).mean()
+        if self.hard_label_weight:
+            loss = loss + self.hard_label_weight * F.cross_entropy(policy, moves)
+        return loss
+
+
+def teacher_agreement(outputs, targets) -> torch.Tensor:
+    """Fraction of positions where the student's most probable move is the teacher's."""
+    return (outputs[0].flatten(1).argmax(dim=1) == targets[1][:, 0]).float().mean()
+
+
+def move_accuracy(outputs, targets) -> torch.Tensor:
+    """Fraction of positions where the student's most probable move is the played move."""
+    return (outputs[0].flatten(1).argmax(dim=1) == targets[0]).float().mean()
+
+
+class DistillationModule(BasicModule):
+    """Trains a small student network to reproduce the policy and value of a large teacher.
+
+    The teacher is not part of the module: its outputs are computed once with
+    `datasets.teacher_cache.build_teacher_cache` and the module is trained on a TeacherCacheDataset.
+    The student must return (policy, [W, D, L] value) logits like PolicyValueNetwork.
+
+    Args:
+        pytorch_module (nn.Module): The student.
+        optimizer: Optimizer of the student's parameters.
+        temperature (float, optional): See DistillationLoss. Defaults to 1.
+        value_weight (float, optional): See DistillationLoss. Defaults to 1.
+        hard_label_weight (float, optional): See DistillationLoss. Defaults to 0.
+        metrics (dict, optional): Metrics called with (outputs, targets). Teacher agreement and move accuracy
+            are always logged.
+    """
+
+    def __init__(self, pytorch_module, optimizer, temperature=1.0, value_weight=1.0, hard_label_weight=0.0,
+                 metrics=None):
+        metrics = dict(metrics or {})
+        metrics.setdefault("teacher_agreement", teacher_agreement)
+        metrics.setdefault("move_accuracy", move_accuracy)
+        loss_fn = DistillationLoss(temperature, value_weight, hard_label_weight)
+        super().__init__(pytorch_module, optimizer, loss_fn, metrics)
+
+
+def _positions_per_second(model: nn.Module, planes: torch.Tensor, repeats: int) -> float:
+    with torch.inference_mode():
+        model(planes)
+        start = time.perf_counter()
+        for _ in range(repeats):
+            model(planes)
+        return repeats * len(planes) / (time.perf_counter() - start)
+
+
+def distillation_report(teacher: nn.Module, student: nn.Module,
+                        batches: Iterable[Tuple[torch.Tensor, torch.Tensor]], device: str = "cpu",
+                        timing_repeats: int = 10) -> Dict[str, float]:
+    """Compares the student with its teacher on held-out (uint8 planes, played move) batches.
+
+    Returns:
+        Dict[str, float]: Move accuracy of both networks, the student's accuracy retention (its accuracy
+        divided by the teacher's), the teacher agreement of the student, the inference speed of both networks
+        in positions per second on the first batch and the speedup of the student.
+    """
+    teacher, student = teacher.to(device).eval(), student.to(device).eval()
+    correct = {"teacher": 0, "student": 0}
+    agreeing, total, first_planes = 0, 0, None
+    with torch.inference_mode():
+        for planes, moves in batches:
+            planes, moves = planes.to(device).float(), moves.to(device)
+            first_planes = planes if first_planes is None else first_planes
+            teacher_moves = teacher(planes)[0].flatten(1).argmax(dim=1)
+            student_moves = student(planes)[0].flatten(1).argmax(dim=1)
+            correct["teacher"] += int((teacher_moves == moves).sum())
+            correct["student"] += int((student_moves == moves).sum())
+            agreeing += int((teacher_moves == student_moves).sum())
+            total += len(moves)
+    if not total:
+        raise ValueError("No positions to evaluate")
+    teacher_speed = _positions_per_second(teacher, first_planes, timing_repeats)
+    student_speed = _positions_per_second(student, first_planes, timing_repeats)
+    teacher_accuracy, student_accuracy = correct["teacher"] / total, correct["student"] / total
+    return {
+        "positions": total,
+        "teacher_accuracy": teacher_accuracy,
+        "student_accuracy": student_accuracy,
+        "accuracy_retention": student_accuracy / teacher_accuracy if teacher_accuracy else float("nan"),
+        "teacher_agreement": agreeing / total,
+        "teacher_positions_per_second": teacher_speed,
+        "student_positions_per_second": student_speed,
+        "speedup": student_speed / teacher_speed,
+    }
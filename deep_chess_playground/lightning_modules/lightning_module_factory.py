@@ -1,5 +1,6 @@
 from deep_chess_playground.lightning_modules.basic_module import BasicModule
 from deep_chess_playground.lightning_modules.binary_classifier import BinaryClassifier
+from deep_chess_playground.lightning_modules.distillation_module import DistillationModule
 from deep_chess_playground.lightning_modules.multiclass_classifier import MultiClassClassifier
 from deep_chess_playground.lightning_modules.regressor import Regressor
 from deep_chess_playground.pytorch_modules.pytorch_module_factory import PyTorchModuleFactory
@@ -12,7 +13,7 @@ _object_generator = ConfigurableObjectGenerator()
 class LightningModuleFactory:
     @staticmethod
     def build_module(config):
-        module_category = config.pop("category").lower()
+        module_category = config.pop("category")
         if module_category == "Basic":
             module = LightningModuleFactory.build_basic_module(config)
         elif module_category == "BinaryClassifier":
@@ -21,6 +22,8 @@ class LightningModuleFactory:
             module = LightningModuleFactory.build_multiclass_classifier(config)
         elif module_category == "Regressor":
             module = LightningModuleFactory.build_regressor(config)
+        elif module_category == "Distillation":
+            module = LightningModuleFactory.build_distillation_module(config)
         else:
             raise ValueError("Invalid configuration - no valid lightning module category found.")
         return module
@@ -55,3 +58,13 @@ class LightningModuleFactory:
                          optimizer=_object_generator.create(config["optimizer"]),
                          metrics={name: _object_generator.create(metric_config)
                                   for name, metric_config in config["metrics"]})
+
+    @staticmethod
+    def build_distillation_module(config):
+        return DistillationModule(pytorch_module=PyTorchModuleFactory.build_module(config["pytorch_module"]),
+                                  optimizer=_object_generator.create(config["optimizer"]),
+                                  temperature=config.get("temperature", 1.0),
+                                  value_weight=config.get("value_weight", 1.0),
+                                  hard_label_weight=config.get("hard_label_weight", 0.0),
+                                  metrics={name: _object_generator.create(metric_config)
+                                           for name, metric_config in config.get("metrics", [])})
@@ -0,0 +1,228 @@
+"""Structured channel pruning of the convolutional towers guided by BatchNorm scales (network slimming,
+https://arxiv.org/abs/1708.06519).
+
+A prunable group is a set of channels produced by one convolution, normalized by one BatchNorm and consumed
+by the next convolution:
+
+- the inner channels of every residual block (conv1 -> BatchNorm -> ReLU -> conv2); the channels of the
+  residual stream are shared by all blocks and the heads, so they are kept,
+- the output channels of every ConvolutionalBlock of a ConvolutionalTower except the last one.
+
+The importance of a channel is the absolute value of its BatchNorm weight (gamma). Pruning removes the
+least important channels over all groups at once and copies the remaining weights into smaller layers, so
+the result is a regular dense network with fewer FLOPs rather than a masked one.
+"""
+import copy
+import time
+from typing import Callable, List, NamedTuple, Optional, Sequence
+import pandas as pd
+import torch
+import torch.nn as nn
+from torch.utils.flop_counter import FlopCounterMode
+from deep_chess_playground.pytorch_modules.cnn.efficient_blocks import (DepthwiseSeparableConvolution,
+                                                                        EfficientResidualBlock, SqueezeExcitation)
+from deep_chess_playground.pytorch_modules.cnn.two_d_cnn.backbones import ConvolutionalTower
+
+
+class PrunableGroup(NamedTuple):
+    """Channels of `batch_norm`, produced by `producer` and consumed by `consumer`."""
+    producer: nn.Module
+    batch_norm: nn.modules.batchnorm._BatchNorm
+    consumer: nn.Module
+    squeeze_excitation: Optional[nn.Module] = None
+
+
+def prunable_groups(model: nn.Module) -> List[PrunableGroup]:
+    """Groups of channels of all residual blocks and convolutional towers in the model."""
+    groups = []
+    for module in model.modules():
+        if isinstance(module, EfficientResidualBlock):
+            groups.append(PrunableGroup(module.conv1[0], module.conv1[1], module.conv2[0]))
+        elif isinstance(module, ConvolutionalTower):
+            for block, next_block in zip(module.blocks[:-1], module.blocks[1:]):
+                groups.append(PrunableGroup(block.conv, block.batch_norm, next_block.conv,
+                                            block.squeeze_excitation))
+    return groups
+
+
+def batch_norm_l1_penalty(model: nn.Module) -> torch.Tensor:
+    """Sum of the absolute BatchNorm weights of the prunable groups.
+
+    Adding it with a small factor (around 1e-4) to the training loss drives unimportant channels towards zero
+    before pruning."""
+    return sum((group.batch_norm.weight.abs().sum() for group in prunable_groups(model)), torch.tensor(0.0))
+
+
+def _keep_conv_outputs(conv: nn.Module, keep: torch.Tensor) -> nn.Module:
+    if isinstance(conv, DepthwiseSeparableConvolution):
+        conv.pointwise = _keep_conv_outputs(conv.pointwise, keep)
+        return conv
+    pruned = type(conv)(conv.in_channels, len(keep), conv.kernel_size, stride=conv.stride, padding=conv.padding,
+                        dilation=conv.dilation, groups=conv.groups, bias=conv.bias is not None)
+    pruned.weight.data = conv.weight.data[keep].clone()
+    if conv.bias is not None:
+        pruned.bias.data = conv.bias.data[keep].clone()
+    return pruned
+
+
+def _keep_conv_inputs(conv: nn.Module, keep: torch.Tensor) -> nn.Module:
+    if isinstance(conv, DepthwiseSeparableConvolution):
+        depthwise = conv.depthwise
+        # A depthwise convolution has one filter per input channel
+        conv.depthwise = type(depthwise)(len(keep), len(keep), depthwise.kernel_size, stride=depthwise.stride,
+                                         padding=depthwise.padding, dilation=depthwise.dilation,
+                                         groups=len(keep), bias=depthwise.bias is not None)
+        conv.depthwise.weight.data = depthwise.weight.data[keep].clone()
+        if depthwise.bias is not None:
+            conv.depthwise.bias.data = depthwise.bias.data[keep].clone()
+            removed = torch.ones(depthwise.out_channels, dtype=torch.bool)
+            removed[keep] = False
+            if conv.pointwise.bias is not None:
+                # The bias of a removed depthwise filter reaches the pointwise convolution even for zero inputs
+                conv.pointwise.bias.data += conv.pointwise.weight.data[:, removed].flatten(1) \
+                    @ depthwise.bias.data[removed]
+        conv.pointwise = _keep_conv_inputs(conv.pointwise, keep)
+        return conv
+    pruned = type(conv)(len(keep), conv.out_channels, conv.kernel_size, stride=conv.stride, padding=conv.padding,
+                        dilation=conv.dilation, groups=conv.groups, bias=conv.bias is not None)
+    pruned.weight.data = conv.weight.data[:, keep].clone()
+    if conv.bias is not None:
+        pruned.bias.data = conv.bias.data.clone()
+    return pruned
+
+
+def _keep_batch_norm(batch_norm: nn.modules.batchnorm._BatchNorm, keep: torch.Tensor) -> nn.Module:
+    pruned = type(batch_norm)(len(keep), eps=batch_norm.eps, momentum=batch_norm.momentum,
+                              affine=batch_norm.affine, track_running_stats=batch_norm.track_running_stats)
+    for name in ("weight", "bias", "running_mean", "running_var"):
+        if getattr(batch_norm, name) is not None:
+            getattr(pruned, name).data = getattr(batch_norm, name).data[keep].clone()
+    pruned.train(batch_norm.training)
+    return pruned
+
+
+def _keep_squeeze_excitation(squeeze_excitation: nn.Module, keep: torch.Tensor) -> nn.Module:
+    if not isinstance(squeeze_excitation, SqueezeExcitation):
+        return squeeze_excitation
+    first, last = squeeze_excitation.gate[0], squeeze_excitation.gate[2]
+    pruned_first, pruned_last = nn.Linear(len(keep), first.out_features), nn.Linear(last.in_features, len(keep))
+    pruned_first.weight.data, pruned_first.bias.data = first.weight.data[:, keep].clone(), first.bias.data.clone()
+    pruned_last.weight.data, pruned_last.bias.data = last.weight.data[keep].clone(), last.bias.data[keep].clone()
+    squeeze_excitation.gate[0], squeeze_excitation.gate[2] = pruned_first, pruned_last
+    return squeeze_excitation
+
+
+def _replace(model: nn.Module, old: nn.Module, new: nn.Module) -> None:
+    for parent in model.modules():
+        for name, child in parent.named_children():
+            if child is old:
+                setattr(parent, name, new)
+
+
+def prune_channels(model: nn.Module, sparsity: float, min_channels: int = 1) -> nn.Module:
+    """Returns a copy of the model without the `sparsity` fraction of the prunable channels.
+
+    The channels with the smallest absolute BatchNorm weights over all groups are removed (one global
+    ranking, so layers with many unimportant channels lose more), but every group keeps at least
+    `min_channels`, so slightly fewer channels can be removed. The model should be fine-tuned afterwards.
+
+    Args:
+        model (nn.Module): Model containing ResidualTowers, residual blocks or ConvolutionalTowers.
+        sparsity (float): Fraction of the prunable channels to remove, in [0, 1).
+        min_channels (int, optional): Minimum number of channels left in every group. Defaults to 1.
+
+    Raises:
+        ValueError: If the sparsity is out of range or the model has nothing to prune.
+    """
+    if not 0 <= sparsity < 1:
+        raise ValueError(f"The sparsity must be in [0, 1), got {sparsity}")
+    model = copy.deepcopy(model)
+    groups = prunable_groups(model)
+    if not groups:
+        raise ValueError("The model has no prunable channels")
+    importances = [group.batch_norm.weight.detach().abs() for group in groups]
+    # Ranked rather than thresholded, so ties (e.g. untrained weights of 1) still remove the requested number
+    removed = torch.zeros(sum(len(importance) for importance in importances), dtype=torch.bool)
+    removed[torch.cat(importances).argsort(stable=True)[:round(sparsity * len(removed))]] = True
+    keeps = []
+    for importance, group_removed in zip(importances, removed.split([len(importance) for importance in importances])):
+        keep = torch.nonzero(~group_removed).flatten()
+        if len(keep) < min(min_channels, len(importance)):
+            keep = importance.topk(min(min_channels, len(importance))).indices.sort().values
+        keeps.append(keep)
+    for index, keep in enumerate(keeps):
+        if len(keep) == len(importances[index]):
+            continue
+        # Looked up again, the consumer of a group can be the producer of the next one and was replaced
+        group = prunable_groups(model)[index]
+        _replace(model, group.producer, _keep_conv_outputs(group.producer, keep))
+        _replace(model, group.batch_norm, _keep_batch_norm(group.batch_norm, keep))
+        _replace(model, group.consumer, _keep_conv_inputs(group.consumer, keep))
+        if group.squeeze_excitation is not None:
+            _keep_squeeze_excitation(group.squeeze_excitation, keep)
+    return model
+
+
+def count_channels(model: nn.Module) -> int:
+    return sum(group.batch_norm.num_features for group in prunable_groups(model))
+
+
+def flops_per_position(model: nn.Module, example_input: torch.Tensor) -> int:
+    with FlopCounterMode(display=False) as flop_counter, torch.inference_mode():
+        model(example_input[:1])
+    return flop_counter.get_total_flops()
+
+
+def latency_ms(model: nn.Module, example_input: torch.Tensor, repeats: int = 20) -> float:
+    """Mean CPU time of a forward pass of the example batch in milliseconds."""
+    with torch.inference_mode():
+        model(example_input)
+        start = time.perf_counter()
+        for _ in range(repeats):
+            model(example_input)
+    return (time.perf_counter() - start) / repeats * 1000
+
+
+def pareto_table(model: nn.Module, sparsities: Sequence[float], evaluate: Callable[[nn.Module], float],
+                 example_input: torch.Tensor, fine_tune: Optional[Callable[[nn.Module], None]] = None,
+                 rounds: int = 1, min_channels: int = 1, repeats: int = 20) -> pd.DataFrame:
+    """Prunes the model to every sparsity target and measures the size, speed and accuracy of the results.
+
+    Every target is reached in `rounds` steps of equal sparsity from the unpruned model, with a call to
+    `fine_tune` after every step (iterative pruning loses less accuracy than one large step).
+
+    Args:
+        model (nn.Module): The trained model.
+        sparsities (Sequence[float]): Sparsity targets, 0 measures the unpruned model.
+        evaluate (Callable[[nn.Module], float]): Returns the accuracy of a model (higher is better).
+        example_input (torch.Tensor): Batch used to measure the latency.
+        fine_tune (Callable[[nn.Module], None], optional): Trains a pruned model in place.
+        rounds (int, optional): Pruning and fine-tuning steps per target. Defaults to 1.
+        min_channels (int, optional): See `prune_channels`. Defaults to 1.
+        repeats (int, optional): Forward passes timed per model. Defaults to 20.
+
+    Returns:
+        pd.DataFrame: One row per target with the sparsity, channels, parameters, FLOPs per position, latency,
+        accuracy and whether the model is on the latency/accuracy Pareto front.
+    """
+    rows = []
+    for sparsity in sparsities:
+        # prune_channels copies the model, the unpruned one is copied here so that eval() leaves it as it was
+        pruned = model if sparsity > 0 else copy.deepcopy(model)
+        for step in range(1, rounds + 1 if sparsity > 0 else 1):
+            # The fraction removed from the current model to reach step / rounds of the target
+            remaining = count_channels(pruned) / count_channels(model)
+            step_sparsity = 1 - (1 - sparsity * step / rounds) / remaining
+            pruned = prune_channels(pruned, max(step_sparsity, 0.0), min_channels)
+            if fine_tune is not None:
+                fine_tune(pruned)
+        pruned.eval()
+        rows.append({"sparsity": sparsity, "channels": count_channels(pruned),
+                     "parameters": sum(parameter.numel() for parameter in pruned.parameters()),
+                     "flops": flops_per_position(pruned, example_input),
+                     "latency_ms": latency_ms(pruned, example_input, repeats), "accuracy": evaluate(pruned)})
+    table = pd.DataFrame(rows)
+    table["pareto"] = [not ((table["latency_ms"] <= row.latency_ms) & (table["accuracy"] >= row.accuracy)
+                            & ((table["latency_ms"] < row.latency_ms) | (table["accuracy"] > row.accuracy))).any()
+                       for row in table.itertuples()]
+    return table
@@ -0,0 +1,73 @@
+import torch.nn as nn
+
+
+CONVOLUTIONS = {1: nn.Conv1d, 2: nn.Conv2d, 3: nn.Conv3d}
+BATCH_NORMS = {1: nn.BatchNorm1d, 2: nn.BatchNorm2d, 3: nn.BatchNorm3d}
+
+
+class SqueezeExcitation(nn.Module):
+    """Squeeze-and-excitation for inputs with any number of spatial dimensions (https://arxiv.org/abs/1709.01507).
+
+    Channels are rescaled by a gate computed from their global average, which lets the network
+    use global information at the cost of two small dense layers."""
+    def __init__(self, channels, ratio=4):
+        super().__init__()
+        self.gate = nn.Sequential(
+            nn.Linear(channels, max(channels // ratio, 1)),
+            nn.ReLU(),
+            nn.Linear(max(channels // ratio, 1), channels),
+            nn.Sigmoid())
+
+    def forward(self, x):
+        squeezed = x.mean(dim=tuple(range(2, x.dim())))
+        return x * self.gate(squeezed).view(*squeezed.shape, *([1] * (x.dim() - 2)))
+
+
+class DepthwiseSeparableConvolution(nn.Module):
+    """Depthwise convolution followed by a 1x1 pointwise convolution.
+
+    It needs roughly 1 / out_channels + 1 / kernel_volume of the FLOPs of a regular convolution."""
+    def __init__(self, dims, in_channels, out_channels, kernel_size=3, padding="same"):
+        super().__init__()
+        self.depthwise = CONVOLUTIONS[dims](in_channels, in_channels, kernel_size=kernel_size, padding=padding,
+                                            groups=in_channels)
+        self.pointwise = CONVOLUTIONS[dims](in_channels, out_channels, kernel_size=1)
+
+    def forward(self, x):
+        return self.pointwise(self.depthwise(x))
+
+
+def make_convolution(dims, in_channels, out_channels, kernel_size=3, padding="same", depthwise_separable=False):
+    """Returns a 1D, 2D or 3D convolution, optionally depthwise separable."""
+    if depthwise_separable:
+        return DepthwiseSeparableConvolution(dims, in_channels, out_channels, kernel_size, padding)
+    return CONVOLUTIONS[dims](in_channels, out_channels, kernel_size=kernel_size, padding=padding)
+
+
+class EfficientResidualBlock(nn.Module):
+    """Residual block for 1D, 2D or 3D inputs with optional squeeze-and-excitation and
+    depthwise separable convolutions."""
+    def __init__(self, dims, in_channels=256, out_channels=256, kernel_size=3, padding="same",
+                 squeeze_excitation_ratio=None, depthwise_separable=False):
+        super().__init__()
+        self.conv1 = nn.Sequential(
+            make_convolution(dims, in_channels, out_channels, kernel_size, padding, depthwise_separable),
+            BATCH_NORMS[dims](out_channels),
+            nn.ReLU())
+        self.conv2 = nn.Sequential(
+            make_convolution(dims, out_channels, out_channels, kernel_size, padding, depthwise_separable),
+            BATCH_NORMS[dims](out_channels))
+        self.squeeze_excitation = (SqueezeExcitation(out_channels, squeeze_excitation_ratio)
+                                   if squeeze_excitation_ratio else nn.Identity())
+        self.projection = (CONVOLUTIONS[dims](in_channels, out_channels, kernel_size=1)
+                           if in_channels != out_channels else nn.Identity())
+        self.relu = nn.ReLU()
+
+    def forward(self, x):
+        residual = self.projection(x)
+        out = self.conv1(x)
+        out = self.conv2(out)
+        out = self.squeeze_excitation(out)
+        out += residual
+        out = self.relu(out)
+        return out
@@ -0,0 +1,65 @@
+import torch
+import torch.nn as nn
+from deep_chess_playground.pytorch_modules.cnn.efficient_blocks import EfficientResidualBlock
+
+
+PADDING_SQUARE = 64
+
+
+def get_board_lines():
+    """Returns a (46, 8) tensor with the square indices (row * 8 + col) of every rank, file, diagonal and
+    anti-diagonal of the board. Lines shorter than 8 squares are padded with PADDING_SQUARE."""
+    lines = [[row * 8 + col for col in range(8)] for row in range(8)]
+    lines += [[row * 8 + col for row in range(8)] for col in range(8)]
+    for offset in range(-7, 8):
+        lines.append([row * 8 + row + offset for row in range(8) if 0 <= row + offset < 8])
+        lines.append([row * 8 + 7 - row - offset for row in range(8) if 0 <= row + offset < 8])
+    return torch.tensor([line + [PADDING_SQUARE] * (8 - len(line)) for line in lines])
+
+
+class LineConvolutionBlock(nn.Module):
+    """Runs a 1D residual block along every rank, file and diagonal of the board.
+
+    The squares of each line are gathered into a sequence of length 8, all 46 sequences are convolved
+    with shared weights and the results are averaged back onto the squares. Sliding pieces act along these
+    lines, so a single block connects squares that are up to 7 squares apart."""
+    def __init__(self, channels, kernel_size=3, squeeze_excitation_ratio=None, depthwise_separable=False):
+        super().__init__()
+        self.block = EfficientResidualBlock(1, channels, channels, kernel_size,
+                                            squeeze_excitation_ratio=squeeze_excitation_ratio,
+                                            depthwise_separable=depthwise_separable)
+        lines = get_board_lines()
+        self.register_buffer("lines", lines, persistent=False)
+        self.register_buffer("lines_per_square", torch.bincount(lines.flatten(), minlength=65)[:64].float(),
+                             persistent=False)
+
+    def forward(self, x):
+        batch_size, channels = x.shape[:2]
+        squares = torch.cat([x.flatten(2), x.new_zeros(batch_size, channels, 1)], dim=2)
+        num_lines = len(self.lines)
+        sequences = squares[:, :, self.lines.flatten()].view(batch_size, channels, num_lines, 8)
+        sequences = sequences.permute(0, 2, 1, 3).reshape(batch_size * num_lines, channels, 8)
+        sequences = self.block(sequences).view(batch_size, num_lines, channels, 8).permute(0, 2, 1, 3)
+        squares = squares.new_zeros(batch_size, channels, 65)
+        squares.index_add_(2, self.lines.flatten(), sequences.reshape(batch_size, channels, -1))
+        return (squares[:, :, :64] / self.lines_per_square).view_as(x)
+
+
+class LineConvolutionTower(nn.Module):
+    """1D convolutional backbone over ranks, files and diagonals with the (N, C, 8, 8) layout of the 2D towers."""
+    def __init__(self, input_planes, num_blocks, channels, kernel_size=3, squeeze_excitation_ratio=None,
+                 depthwise_separable=False):
+        super().__init__()
+        self.input_projection = nn.Sequential(
+            nn.Conv2d(input_planes, channels, kernel_size=(1, 1)),
+            nn.BatchNorm2d(channels),
+            nn.ReLU())
+        self.blocks = nn.ModuleList([
+            LineConvolutionBlock(channels, kernel_size, squeeze_excitation_ratio, depthwise_separable)
+            for _ in range(num_blocks)])
+
+    def forward(self, x):
+        x = self.input_projection(x)
+        for block in self.blocks:
+            x = block(x)
+        return x
@@ -0,0 +1,34 @@
+import torch.nn as nn
+from deep_chess_playground.pytorch_modules.cnn.efficient_blocks import EfficientResidualBlock
+
+
+class HistoryConvolutionTower(nn.Module):
+    """3D convolutional backbone which treats the position history as depth.
+
+    The input is either (N, C, T, 8, 8) or the AlphaZero-style stacked planes (N, T * C, 8, 8) with the
+    planes of the T positions one after another. After the 3D residual blocks the history dimension is
+    collapsed by a (T, 1, 1) convolution, so the output has the (N, channels, 8, 8) layout of the 2D towers
+    and the same heads can be used."""
+    def __init__(self, input_planes, history_length, num_blocks, channels, kernel_size=3,
+                 squeeze_excitation_ratio=None, depthwise_separable=False):
+        super().__init__()
+        self.input_planes = input_planes
+        self.history_length = history_length
+        self.blocks = nn.ModuleList()
+        self.blocks.append(EfficientResidualBlock(3, input_planes, channels, kernel_size,
+                                                  squeeze_excitation_ratio=squeeze_excitation_ratio))
+        for _ in range(num_blocks - 1):
+            self.blocks.append(EfficientResidualBlock(3, channels, channels, kernel_size,
+                                                      squeeze_excitation_ratio=squeeze_excitation_ratio,
+                                                      depthwise_separable=depthwise_separable))
+        self.history_reduction = nn.Sequential(
+            nn.Conv3d(channels, channels, kernel_size=(history_length, 1, 1)),
+            nn.BatchNorm3d(channels),
+            nn.ReLU())
+
+    def forward(self, x):
+        if x.dim() == 4:
+            x = x.view(x.shape[0], self.history_length, self.input_planes, 8, 8).transpose(1, 2)
+        for block in self.blocks:
+            x = block(x)
+        return self.history_reduction(x).squeeze(2)
@@ -2,13 +2,15 @@ import torch.nn as nn
 from deep_chess_playground.pytorch_modules.cnn.two_d_cnn.simple_modules import ConvolutionalBlock, ResidualBlock
 
 
-class ConvolutionalTower:
-    def __init__(self, input_planes, num_blocks, channels):
-        super().__init__(channels, channels)
+class ConvolutionalTower(nn.Module):
+    def __init__(self, input_planes, num_blocks, channels, squeeze_excitation_ratio=None, depthwise_separable=False):
+        super().__init__()
         self.blocks = nn.ModuleList()
-        self.blocks.append(ConvolutionalBlock(input_planes, channels))
+        self.blocks.append(ConvolutionalBlock(input_planes, channels,
+                                              squeeze_excitation_ratio=squeeze_excitation_ratio))
         for _ in range(num_blocks - 1):
-            self.blocks.append(ConvolutionalBlock(channels, channels))
+            self.blocks.append(ConvolutionalBlock(channels, channels, squeeze_excitation_ratio=squeeze_excitation_ratio,
+                                                  depthwise_separable=depthwise_separable))
 
     def forward(self, x):
         for block in self.blocks:
@@ -16,13 +18,15 @@ class ConvolutionalTower:
         return x
 
 
-class ResidualTower:
-    def __init__(self, input_planes, num_blocks, channels):
-        super().__init__(channels, channels)
+class ResidualTower(nn.Module):
+    def __init__(self, input_planes, num_blocks, channels, squeeze_excitation_ratio=None, depthwise_separable=False):
+        super().__init__()
         self.blocks = nn.ModuleList()
-        self.blocks.append(ResidualBlock(input_planes, channels))
+        self.blocks.append(ResidualBlock(input_planes, channels,
+                                         squeeze_excitation_ratio=squeeze_excitation_ratio))
         for _ in range(num_blocks - 1):
-            self.blocks.append(ResidualBlock(channels, channels))
+            self.blocks.append(ResidualBlock(channels, channels, squeeze_excitation_ratio=squeeze_excitation_ratio,
+                                             depthwise_separable=depthwise_separable))
 
     def forward(self, x):
         for block in self.blocks:
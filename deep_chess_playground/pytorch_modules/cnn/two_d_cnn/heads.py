@@ -1,5 +1,6 @@
 import torch.nn as nn
 import pytorch_lightning as pl
+from deep_chess_playground.pytorch_modules.losses import masked_log_softmax
 
 
 class AlphaZeroMoveClassificationHead(pl.LightningModule):
@@ -7,16 +8,22 @@ class AlphaZeroMoveClassificationHead(pl.LightningModule):
 
     It has the same format as AlphaZero architecture.
     "A move in chess may be described in two parts: selecting the piece to move, and then...".
-    Check this paper for more details https://arxiv.org/abs/1712.01815."""
+    Check this paper for more details https://arxiv.org/abs/1712.01815.
+
+    If a legal move mask of shape (N, 8, 8, 73) or (N, 4672) is given (see `MoveEncoder8x8x73.batch_legal_move_mask`),
+    the output is the masked log-softmax over all 4672 moves with shape (N, 4672) instead."""
     def __init__(self, input_planes):
         super().__init__()
         self.conv = nn.Conv2d(input_planes, 73, kernel_size=(1, 1), padding="valid")
         self.relu = nn.ReLU()
         self.softmax = nn.Softmax(dim=1)
 
-    def forward(self, x):
+    def forward(self, x, legal_mask=None):
         x = self.conv(x)
         x = self.relu(x)
+        if legal_mask is not None:
+            # (N, 73, 8, 8) -> (N, 8, 8, 73) to match the layout of MoveEncoder8x8x73
+            return masked_log_softmax(x.permute(0, 2, 3, 1), legal_mask)
         x = self.softmax(x)
         return x
 
@@ -1,45 +1,28 @@
 import torch.nn as nn
+from deep_chess_playground.pytorch_modules.cnn.efficient_blocks import EfficientResidualBlock, SqueezeExcitation, \
+    make_convolution
 
 
 class ConvolutionalBlock(nn.Module):
-    def __init__(self, in_channels=256, out_channels=256, kernel_size=(3, 3), padding="same"):
+    def __init__(self, in_channels=256, out_channels=256, kernel_size=(3, 3), padding="same",
+                 squeeze_excitation_ratio=None, depthwise_separable=False):
         super().__init__()
-        self.conv = nn.Conv2d(in_channels=in_channels,
-                              out_channels=out_channels,
-                              kernel_size=kernel_size,
-                              padding=padding)
+        self.conv = make_convolution(2, in_channels, out_channels, kernel_size, padding, depthwise_separable)
         self.relu = nn.ReLU()
         self.batch_norm = nn.BatchNorm2d(num_features=out_channels)
+        self.squeeze_excitation = (SqueezeExcitation(out_channels, squeeze_excitation_ratio)
+                                   if squeeze_excitation_ratio else nn.Identity())
 
     def forward(self, x):
         x = self.conv(x)
         x = self.relu(x)
         x = self.batch_norm(x)
+        x = self.squeeze_excitation(x)
         return x
 
 
-class ResidualBlock(nn.Module):
-    def __init__(self, in_channels=256, out_channels=256, kernel_size=(3, 3), padding="same"):
-        super().__init__()
-        self.conv1 = nn.Sequential(
-            nn.Conv2d(in_channels=in_channels,
-                      out_channels=out_channels,
-                      kernel_size=kernel_size,
-                      padding=padding),
-            nn.BatchNorm2d(in_channels),
-            nn.ReLU())
-        self.conv2 = nn.Sequential(
-            nn.Conv2d(in_channels=out_channels,
-                      out_channels=out_channels,
-                      kernel_size=kernel_size,
-                      padding=padding),
-            nn.BatchNorm2d(in_channels))
-        self.relu = nn.ReLU()
-
-    def forward(self, x):
-        residual = x
-        out = self.conv1(x)
-        out = self.conv2(out)
-        out += residual
-        out = self.relu(out)
-        return out
+class ResidualBlock(EfficientResidualBlock):
+    def __init__(self, in_channels=256, out_channels=256, kernel_size=(3, 3), padding="same",
+                 squeeze_excitation_ratio=None, depthwise_separable=False):
+        super().__init__(2, in_channels, out_channels, kernel_size, padding, squeeze_excitation_ratio,
+                         depthwise_separable)
@@ -0,0 +1,32 @@
+import torch
+import torch.nn as nn
+
+
+NUM_PIECE_SQUARE_FEATURES = 12 * 64
+
+
+class PieceSetModel(nn.Module):
+    """Fully connected model over a set of (piece, square) tokens, e.g. from PieceListEncoder.
+
+    Every token is mapped to one of the 768 piece-square features and the first layer is an
+    `nn.EmbeddingBag` summing the embeddings of the pieces on the board, which is equivalent to a dense
+    layer applied to the 768 one-hot inputs without ever building them. Padding tokens (-1) are ignored.
+
+    Args:
+        hidden_sizes (list): Sizes of the hidden layers, the first one is the size of the embedding.
+        output_size (int): Size of the output, e.g. 3 for [W, D, L] or 4672 for the 8x8x73 policy.
+    """
+    def __init__(self, hidden_sizes, output_size):
+        super().__init__()
+        self.embedding = nn.EmbeddingBag(NUM_PIECE_SQUARE_FEATURES + 1, hidden_sizes[0], mode="sum",
+                                         padding_idx=NUM_PIECE_SQUARE_FEATURES)
+        layers = []
+        for in_features, out_features in zip(hidden_sizes[:-1], hidden_sizes[1:]):
+            layers += [nn.ReLU(), nn.Linear(in_features, out_features)]
+        layers += [nn.ReLU(), nn.Linear(hidden_sizes[-1], output_size)]
+        self.layers = nn.Sequential(*layers)
+
+    def forward(self, x):
+        pieces, squares = x[:, 0].long(), x[:, 1].long()
+        features = torch.where(pieces >= 0, pieces * 64 + squares, NUM_PIECE_SQUARE_FEATURES)
+        return self.layers(self.embedding(features))
@@ -0,0 +1,35 @@
+import torch
+import torch.nn as nn
+import torch.nn.functional as F
+
+
+def masked_log_softmax(logits, legal_mask):
+    """Log-softmax over the flattened logits which gives (almost) no probability to illegal moves.
+
+    Args:
+        logits (torch.Tensor): Policy logits of shape (N, 4672) or (N, 8, 8, 73).
+        legal_mask (torch.Tensor): Bool mask of the same number of elements per sample, True for legal moves.
+
+    Returns:
+        torch.Tensor: Log-probabilities of shape (N, 4672). Illegal moves get a very large negative value
+        instead of -inf, so positions without legal moves do not produce NaNs.
+    """
+    logits = logits.flatten(1)
+    legal_mask = legal_mask.flatten(1)
+    logits = logits.masked_fill(~legal_mask, torch.finfo(logits.dtype).min)
+    return F.log_softmax(logits, dim=1)
+
+
+class MaskedPolicyCrossEntropyLoss(nn.Module):
+    """Cross entropy over the 4672 policy logits restricted to legal moves.
+
+    The target can be a flat move index of shape (N,) or the one-hot (N, 8, 8, 73) tensor of
+    `MoveEncoder8x8x73`. Without a mask it is the plain cross entropy over the flattened logits.
+    """
+
+    def forward(self, logits, target, legal_mask=None):
+        if target.dim() > 1:
+            target = target.flatten(1).argmax(dim=1)
+        if legal_mask is None:
+            return F.cross_entropy(logits.flatten(1), target)
+        return F.nll_loss(masked_log_softmax(logits, legal_mask), target)
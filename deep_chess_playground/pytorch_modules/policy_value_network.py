@@ -0,0 +1,31 @@
+import torch.nn as nn
+
+
+class PolicyValueNetwork(nn.Module):
+    """A backbone with AlphaZero-style policy and [W, D, L] value outputs.
+
+    Both outputs are logits, so they can be trained with (masked) cross entropy and read by the engine:
+    the policy has shape (N, 4672) in the flattened (row, col, plane) layout of MoveEncoder8x8x73 and the
+    value has shape (N, 3) with white wins, draws and white losses.
+
+    Args:
+        backbone (nn.Module): Module returning (N, channels, 8, 8) features, e.g. a ResidualTower.
+        channels (int): Number of output channels of the backbone.
+        value_channels (int, optional): Number of channels of the value head convolution. Defaults to 32.
+    """
+    def __init__(self, backbone, channels, value_channels=32):
+        super().__init__()
+        self.backbone = backbone
+        self.policy_head = nn.Conv2d(channels, 73, kernel_size=(1, 1))
+        self.value_head = nn.Sequential(
+            nn.Conv2d(channels, value_channels, kernel_size=(1, 1)),
+            nn.ReLU(),
+            nn.AdaptiveAvgPool2d((1, 1)),
+            nn.Flatten(),
+            nn.Linear(value_channels, 3))
+
+    def forward(self, x):
+        features = self.backbone(x)
+        policy = self.policy_head(features).permute(0, 2, 3, 1).flatten(1)
+        value = self.value_head(features)
+        return policy, value
@@ -0,0 +1,43 @@
+import torch.nn as nn
+from deep_chess_playground.pytorch_modules.cnn.one_d_cnn.backbones import LineConvolutionTower
+from deep_chess_playground.pytorch_modules.cnn.three_d_cnn.backbones import HistoryConvolutionTower
+from deep_chess_playground.pytorch_modules.cnn.two_d_cnn.backbones import ConvolutionalTower, ResidualTower
+from deep_chess_playground.pytorch_modules.cnn.two_d_cnn.heads import AlphaZeroMoveClassificationHead, ValueWDLHead
+from deep_chess_playground.pytorch_modules.fcn.piece_centric.piece_set_model import PieceSetModel
+from deep_chess_playground.pytorch_modules.policy_value_network import PolicyValueNetwork
+from deep_chess_playground.pytorch_modules.transformer.square_transformer import SquareTransformer
+
+
+MODULE_CLASSES = {
+    "ConvolutionalTower": ConvolutionalTower,
+    "ResidualTower": ResidualTower,
+    "LineConvolutionTower": LineConvolutionTower,
+    "HistoryConvolutionTower": HistoryConvolutionTower,
+    "SquareTransformer": SquareTransformer,
+    "PieceSetModel": PieceSetModel,
+    "AlphaZeroMoveClassificationHead": AlphaZeroMoveClassificationHead,
+    "ValueWDLHead": ValueWDLHead,
+}
+
+
+class PyTorchModuleFactory:
+    """Builds PyTorch modules from configuration dictionaries.
+
+    A configuration holds the module category and its constructor arguments, e.g.
+    {"category": "ResidualTower", "input_planes": 24, "num_blocks": 6, "channels": 128}.
+    The "Sequential" category chains the modules given in "modules", e.g. a backbone and a head, and the
+    "PolicyValueNetwork" category puts policy and value outputs on top of the module given in "backbone".
+    """
+    @staticmethod
+    def build_module(config):
+        config = dict(config)
+        module_category = config.pop("category")
+        if module_category == "Sequential":
+            return nn.Sequential(*[PyTorchModuleFactory.build_module(module_config)
+                                   for module_config in config["modules"]])
+        elif module_category == "PolicyValueNetwork":
+            return PolicyValueNetwork(backbone=PyTorchModuleFactory.build_module(config.pop("backbone")), **config)
+        elif module_category in MODULE_CLASSES:
+            return MODULE_CLASSES[module_category](**config)
+        else:
+            raise ValueError("Invalid configuration - no valid pytorch module category found.")
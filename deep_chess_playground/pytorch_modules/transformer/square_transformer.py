@@ -0,0 +1,102 @@
+import torch
+import torch.nn as nn
+import torch.nn.functional as F
+
+
+NUM_SQUARES = 64
+
+
+class SquareTokenEmbedding(nn.Module):
+    """Turns (N, C, 8, 8) planes (e.g. from GridEncoder) into 64 square tokens of shape (N, 64, channels).
+
+    Token i corresponds to row i // 8 and column i % 8 of the planes, i.e. to `Square.index`."""
+    def __init__(self, input_planes, channels, learned_square_embedding=True):
+        super().__init__()
+        self.projection = nn.Linear(input_planes, channels)
+        self.square_embedding = nn.Parameter(torch.zeros(NUM_SQUARES, channels)) if learned_square_embedding else None
+        if self.square_embedding is not None:
+            nn.init.normal_(self.square_embedding, std=0.02)
+
+    def forward(self, x):
+        x = self.projection(x.flatten(2).transpose(1, 2))
+        if self.square_embedding is not None:
+            x = x + self.square_embedding
+        return x
+
+
+class RelativePositionBias(nn.Module):
+    """Learned per-head attention bias indexed by the (row, column) offset between two squares."""
+    def __init__(self, num_heads):
+        super().__init__()
+        self.bias = nn.Parameter(torch.zeros(num_heads, 15 * 15))
+        rows, cols = torch.arange(NUM_SQUARES) // 8, torch.arange(NUM_SQUARES) % 8
+        offsets = (rows[:, None] - rows[None, :] + 7) * 15 + (cols[:, None] - cols[None, :] + 7)
+        self.register_buffer("offsets", offsets, persistent=False)
+
+    def forward(self):
+        return self.bias[:, self.offsets]
+
+
+class SquareAttention(nn.Module):
+    def __init__(self, channels, num_heads, dropout=0.0, relative_position_bias=False):
+        super().__init__()
+        if channels % num_heads != 0:
+            raise ValueError(f"Number of channels ({channels}) must be divisible by number of heads ({num_heads}).")
+        self.num_heads = num_heads
+        self.dropout = dropout
+        self.qkv = nn.Linear(channels, 3 * channels)
+        self.out = nn.Linear(channels, channels)
+        self.position_bias = RelativePositionBias(num_heads) if relative_position_bias else None
+
+    def forward(self, x):
+        batch_size, num_tokens, channels = x.shape
+        qkv = self.qkv(x).view(batch_size, num_tokens, 3, self.num_heads, channels // self.num_heads)
+        q, k, v = qkv.permute(2, 0, 3, 1, 4)
+        attn_mask = self.position_bias().to(x.dtype) if self.position_bias is not None else None
+        x = F.scaled_dot_product_attention(q, k, v, attn_mask=attn_mask,
+                                           dropout_p=self.dropout if self.training else 0.0)
+        return self.out(x.transpose(1, 2).reshape(batch_size, num_tokens, channels))
+
+
+class SquareTransformerLayer(nn.Module):
+    """Pre-norm transformer encoder layer."""
+    def __init__(self, channels, num_heads, mlp_ratio=4, dropout=0.0, relative_position_bias=False):
+        super().__init__()
+        self.norm1 = nn.LayerNorm(channels)
+        self.attention = SquareAttention(channels, num_heads, dropout, relative_position_bias)
+        self.norm2 = nn.LayerNorm(channels)
+        self.mlp = nn.Sequential(
+            nn.Linear(channels, mlp_ratio * channels),
+            nn.GELU(),
+            nn.Linear(mlp_ratio * channels, channels),
+            nn.Dropout(dropout))
+
+    def forward(self, x):
+        x = x + self.attention(self.norm1(x))
+        x = x + self.mlp(self.norm2(x))
+        return x
+
+
+class SquareTransformer(nn.Module):
+    """Transformer backbone over 64 square tokens.
+
+    Input and output have the (N, C, 8, 8) layout of the convolutional towers, so the same heads
+    (e.g. AlphaZeroMoveClassificationHead(channels)) can be put on top of it.
+    Attention uses the fused `scaled_dot_product_attention` kernels. Squares are identified either by
+    a learned absolute embedding, by a learned relative (row, column) offset bias in every layer, or both.
+    """
+    def __init__(self, input_planes, num_layers, channels, num_heads=8, mlp_ratio=4, dropout=0.0,
+                 learned_square_embedding=True, relative_position_bias=False):
+        super().__init__()
+        self.embedding = SquareTokenEmbedding(input_planes, channels, learned_square_embedding)
+        self.layers = nn.ModuleList([
+            SquareTransformerLayer(channels, num_heads, mlp_ratio, dropout, relative_position_bias)
+            for _ in range(num_layers)])
+        self.norm = nn.LayerNorm(channels)
+
+    def forward(self, x):
+        x = self.embedding(x)
+        for layer in self.layers:
+            x = layer(x)
+        x = self.norm(x)
+        return x.transpose(1, 2).reshape(x.shape[0], -1, 8, 8)
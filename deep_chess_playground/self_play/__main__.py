@@ -0,0 +1,35 @@
+"""Self-play data generation with a trained network:
+
+    python -m deep_chess_playground.self_play -c config.json --checkpoint model.ckpt -o games/ --num-games 1000
+"""
+import argparse
+import logging
+from deep_chess_playground.engine.model_package import load_model
+from deep_chess_playground.self_play.self_play_generator import (GAMES_PER_FILE, NUM_SIMULATIONS, OUTPUT_FORMATS,
+                                                                 SelfPlayGenerator)
+
+
+def main():
+    argparser = argparse.ArgumentParser(description="Generate self-play games with a trained network.")
+    argparser.add_argument("-c", "--conf", help="Path to the configuration file, not needed for a model package.")
+    argparser.add_argument("--checkpoint", required=True, help="Path to the Lightning checkpoint or model package.")
+    argparser.add_argument("-o", "--output-dir", required=True, help="Directory for the generated files.")
+    argparser.add_argument("--num-games", type=int, required=True, help="Number of games to play.")
+    argparser.add_argument("--num-workers", type=int, help="Number of game-playing processes.")
+    argparser.add_argument("--format", choices=OUTPUT_FORMATS, default="csv", help="Output format.")
+    argparser.add_argument("--games-per-file", type=int, default=GAMES_PER_FILE, help="Games per output file.")
+    argparser.add_argument("--simulations", type=int, default=NUM_SIMULATIONS, help="Search visits per move.")
+    argparser.add_argument("--device", default="cpu", help="Device of the network.")
+    args = argparser.parse_args()
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+    model = load_model(args.conf, args.checkpoint, args.device)
+    generator = SelfPlayGenerator(model, args.output_dir, num_workers=args.num_workers, output_format=args.format,
+                                  games_per_file=args.games_per_file, num_simulations=args.simulations,
+                                  device=args.device)
+    stats = generator.generate(args.num_games)
+    logging.info(f"{stats['games_per_hour']:.0f} games/hour, mean batch size {stats['mean_batch_size']:.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,171 @@
+import logging
+from typing import List, Sequence
+import chess
+import numpy as np
+import torch
+from deep_chess_playground.data_encoders.input_encoders.grid_encoding import GridEncoder
+from deep_chess_playground.data_encoders.output_encoders.move_encoding_8_8_73 import MoveEncoder8x8x73
+from deep_chess_playground.engine.evaluation import Evaluation, evaluations_from_outputs, split_outputs
+from deep_chess_playground.self_play.ring_buffer import InferenceRingBuffer
+
+
+MAX_BATCH_SIZE = 512
+BATCH_TIMEOUT = 0.002
+POLL_TIMEOUT = 0.1
+
+
+class SharedMemoryEvaluator:
+    """Worker side of the inference server, a drop-in `evaluate` for `engine.search.Search`.
+
+    The boards are encoded in the worker process, written to the worker's ring buffer as uint8 planes and
+    the server is woken up through `work_semaphore`. The worker then sleeps on its own `response_semaphore`
+    until the server has written the outputs back into the same slots.
+
+    Args:
+        ring_name (str): Name of the worker's InferenceRingBuffer.
+        capacity (int): Capacity of the ring buffer.
+        work_semaphore: Semaphore shared by all workers, released once per submitted batch.
+        response_semaphore: Semaphore of this worker, released by the server once per answered batch.
+    """
+
+    def __init__(self, ring_name: str, capacity: int, work_semaphore, response_semaphore):
+        self._ring = InferenceRingBuffer(capacity, name=ring_name)
+        self._work_semaphore = work_semaphore
+        self._response_semaphore = response_semaphore
+        self._encoder = GridEncoder()
+        self._move_encoder = MoveEncoder8x8x73()
+
+    def __call__(self, boards: Sequence[chess.Board]) -> List[Evaluation]:
+        planes = self._encoder.encode_batch(boards)
+        start = self._ring.put_requests(planes)
+        self._work_semaphore.release()
+        self._response_semaphore.acquire()
+        while not self._ring.responses_ready(start, len(boards)):
+            self._response_semaphore.acquire()
+        policy, value = self._ring.get_responses(start, len(boards))
+        return evaluations_from_outputs((torch.from_numpy(policy), torch.from_numpy(value)), boards,
+                                        self._move_encoder)
+
+    def close(self) -> None:
+        self._ring.close()
+
+
+def run_inference_server(model, ring_names: List[str], capacity: int, work_semaphore, response_semaphores,
+                         stop_event, max_batch_size: int = MAX_BATCH_SIZE, batch_timeout: float = BATCH_TIMEOUT,
+                         device: str = "cpu", num_threads: int = 0, stats=None) -> None:
+    """Serves the requests of all workers with batched forward passes until `stop_event` is set.
+
+    After the first batch is announced the server waits up to `batch_timeout` for the other workers, then
+    gathers the pending requests of every ring buffer into one batch, so N workers that each search with
+    virtual loss give batches of roughly N * leaves_per_batch positions.
+
+    Args:
+        model (torch.nn.Module): Network taking GridEncoder planes, see `engine.evaluation.split_outputs`.
+        ring_names (List[str]): Names of the workers' ring buffers.
+        capacity (int): Capacity of the ring buffers.
+        work_semaphore: Semaphore released by the workers for each submitted batch.
+        response_semaphores (list): Semaphore of each worker.
+        stop_event: Event that stops the server.
+        max_batch_size (int, optional): Maximum number of positions per forward pass. Defaults to MAX_BATCH_SIZE.
+        batch_timeout (float, optional): Seconds to wait for other workers. Defaults to BATCH_TIMEOUT.
+        device (str, optional): Device of the model. Defaults to "cpu".
+        num_threads (int, optional): Number of torch threads, 0 keeps the torch default. Defaults to 0.
+        stats (multiprocessing.Array, optional): Shared int64 [positions, batches] counters.
+    """
+    if num_threads:
+        torch.set_num_threads(num_threads)
+    model = model.to(device).eval()
+    rings = [InferenceRingBuffer(capacity, name=name) for name in ring_names]
+    try:
+        while not stop_event.is_set():
+            if not work_semaphore.acquire(timeout=POLL_TIMEOUT):
+                continue
+            for _ in range(len(rings) - 1):
+                if not work_semaphore.acquire(timeout=batch_timeout):
+                    break
+            pending = [(index, *ring.pending_requests()) for index, ring in enumerate(rings)]
+            pending = [(index, start, count) for index, start, count in pending if count > 0]
+            if not pending:
+                continue
+            planes = np.concatenate([rings[index].planes[rings[index].slots(start, count)]
+                                     for index, start, count in pending])
+            policies, values = [], []
+            with torch.inference_mode():
+                for offset in range(0, len(planes), max_batch_size):
+                    x = torch.from_numpy(planes[offset:offset + max_batch_size]).to(device).float()
+                    policy, value = split_outputs(model(x))
+                    policies.append(policy.cpu().numpy())
+                    values.append(value.cpu().numpy())
+            policy, value = np.concatenate(policies), np.concatenate(values)
+            offset = 0
+            for index, start, count in pending:
+                rings[index].put_responses(start, policy[offset:offset + count], value[offset:offset + count])
+                response_semaphores[index].release()
+                offset += count
+            if stats is not None:
+                stats[0] += len(planes)
+                stats[1] += 1
+    except Exception as e:
+        logging.error(f"Error in the inference server: {e}")
+        raise
+    finally:
+        for ring in rings:
+            ring.close()
+
+
+class InferenceServer:
+    """Owns the ring buffers, semaphores and process of `run_inference_server` for a fixed set of workers.
+
+    Args:
+        context: Multiprocessing context used to create the process and the semaphores.
+        model (torch.nn.Module): Network served to the workers.
+        num_workers (int): Number of workers (one ring buffer each).
+        capacity (int): Slots per ring buffer, at least the largest batch a worker submits at once.
+        max_batch_size (int, optional): Maximum number of positions per forward pass. Defaults to MAX_BATCH_SIZE.
+        batch_timeout (float, optional): Seconds to wait for other workers. Defaults to BATCH_TIMEOUT.
+        device (str, optional): Device of the model. Defaults to "cpu".
+        num_threads (int, optional): Number of torch threads, 0 keeps the torch default. Defaults to 0.
+    """
+
+    def __init__(self, context, model, num_workers: int, capacity: int, max_batch_size: int = MAX_BATCH_SIZE,
+                 batch_timeout: float = BATCH_TIMEOUT, device: str = "cpu", num_threads: int = 0):
+        self._capacity = capacity
+        self._rings = [InferenceRingBuffer(capacity) for _ in range(num_workers)]
+        self._work_semaphore = context.Semaphore(0)
+        self._response_semaphores = [context.Semaphore(0) for _ in self._rings]
+        self._stop_event = context.Event()
+        self._stats = context.Array("q", 2, lock=False)
+        self._process = context.Process(target=run_inference_server, daemon=True,
+                                        args=(model, [ring.name for ring in self._rings], capacity,
+                                              self._work_semaphore, self._response_semaphores, self._stop_event,
+                                              max_batch_size, batch_timeout, device, num_threads, self._stats))
+
+    def start(self) -> None:
+        self._process.start()
+
+    def client(self, worker_index: int) -> tuple:
+        """Picklable arguments of the SharedMemoryEvaluator of a worker."""
+        return (self._rings[worker_index].name, self._capacity, self._work_semaphore,
+                self._response_semaphores[worker_index])
+
+    def is_alive(self) -> bool:
+        return self._process.is_alive()
+
+    @property
+    def positions_evaluated(self) -> int:
+        return int(self._stats[0])
+
+    @property
+    def batches_evaluated(self) -> int:
+        return int(self._stats[1])
+
+    def stop(self, timeout: float = POLL_TIMEOUT * 10) -> None:
+        """Stops the process and releases the shared memory."""
+        self._stop_event.set()
+        if self._process.is_alive():
+            self._process.join(timeout=timeout)
+        if self._process.is_alive():
+            self._process.terminate()
+        for ring in self._rings:
+            ring.close()
+            ring.unlink()
@@ -0,0 +1,87 @@
+from multiprocessing import shared_memory
+from typing import Optional
+import numpy as np
+from deep_chess_playground.data_encoders.output_encoders.move_encoding_8_8_73 import POLICY_SIZE
+
+
+PLANES_SHAPE = (24, 8, 8)
+WRITE, READ, DONE = 0, 1, 2
+
+
+class InferenceRingBuffer:
+    """Single-producer single-consumer ring of inference requests and responses in shared memory.
+
+    A game-playing worker writes uint8 input planes into the next free slots and advances the write counter,
+    the inference server reads every slot between the read and the write counter, writes the policy logits
+    and values into the same slots and advances the done counter. Nothing is pickled: both processes map
+    the same block and only exchange the counters.
+
+    Args:
+        capacity (int): Number of slots.
+        name (str, optional): Name of an existing block to attach to. A new block is created if None.
+
+    Attributes:
+        planes (np.ndarray): uint8 requests of shape (capacity, 24, 8, 8).
+        policy (np.ndarray): float32 policy logits of shape (capacity, 4672).
+        value (np.ndarray): float32 values from the perspective of white of shape (capacity,).
+        counters (np.ndarray): int64 write, read and done counters (they only grow, slot = counter % capacity).
+    """
+
+    def __init__(self, capacity: int, name: Optional[str] = None):
+        self.capacity = capacity
+        sizes = [3 * 8, capacity * int(np.prod(PLANES_SHAPE)), capacity * POLICY_SIZE * 4, capacity * 4]
+        create = name is None
+        self._shared_memory = shared_memory.SharedMemory(name=name, create=create, size=sum(sizes))
+        offsets = np.cumsum([0] + sizes)
+        buffer = self._shared_memory.buf
+        self.counters = np.ndarray((3,), dtype=np.int64, buffer=buffer, offset=offsets[0])
+        self.planes = np.ndarray((capacity, *PLANES_SHAPE), dtype=np.uint8, buffer=buffer, offset=offsets[1])
+        self.policy = np.ndarray((capacity, POLICY_SIZE), dtype=np.float32, buffer=buffer, offset=offsets[2])
+        self.value = np.ndarray((capacity,), dtype=np.float32, buffer=buffer, offset=offsets[3])
+        if create:
+            self.counters[:] = 0
+
+    @property
+    def name(self) -> str:
+        return self._shared_memory.name
+
+    def slots(self, start: int, count: int) -> np.ndarray:
+        """Slot indices of `count` requests starting at counter value `start`."""
+        return (start + np.arange(count)) % self.capacity
+
+    def put_requests(self, planes: np.ndarray) -> int:
+        """Writes requests (producer side) and returns the counter value of the first one.
+
+        The caller must not have more than `capacity` requests waiting for a response."""
+        start = int(self.counters[WRITE])
+        if start + len(planes) - int(self.counters[DONE]) > self.capacity:
+            raise RuntimeError("Inference ring buffer overflow")
+        self.planes[self.slots(start, len(planes))] = planes
+        self.counters[WRITE] = start + len(planes)
+        return start
+
+    def pending_requests(self):
+        """Returns (start, count) of the requests the consumer has not read yet."""
+        start = int(self.counters[READ])
+        return start, int(self.counters[WRITE]) - start
+
+    def put_responses(self, start: int, policy: np.ndarray, value: np.ndarray) -> None:
+        """Writes responses for the requests starting at `start` (consumer side)."""
+        slots = self.slots(start, len(policy))
+        self.policy[slots] = policy
+        self.value[slots] = value
+        self.counters[READ] = self.counters[DONE] = start + len(policy)
+
+    def responses_ready(self, start: int, count: int) -> bool:
+        return int(self.counters[DONE]) >= start + count
+
+    def get_responses(self, start: int, count: int):
+        """Returns copies of the (policy, value) responses of `count` requests starting at `start`."""
+        slots = self.slots(start, count)
+        return self.policy[slots], self.value[slots]
+
+    def close(self) -> None:
+        self._shared_memory.close()
+
+    def unlink(self) -> None:
+        self._shared_memory.unlink()
@@ -0,0 +1,289 @@
+import logging
+import multiprocessing
+import os.path
+import time
+from datetime import datetime, timezone
+from queue import Empty
+from typing import List, Optional
+import chess
+import numpy as np
+import pandas as pd
+import torch
+from deep_chess_playground.data_encoders.input_encoders.grid_encoding import GridEncoder
+from deep_chess_playground.data_encoders.output_encoders.move_encoding_8_8_73 import MoveEncoder8x8x73
+from deep_chess_playground.engine.search import Search
+from deep_chess_playground.self_play.inference_server import (BATCH_TIMEOUT, MAX_BATCH_SIZE, InferenceServer,
+                                                              SharedMemoryEvaluator)
+from deep_chess_playground.utils.headers import HEADERS
+
+
+NUM_SIMULATIONS = 100
+LEAVES_PER_BATCH = 8
+TEMPERATURE_PLIES = 30
+MAX_PLIES = 400
+DIRICHLET_ALPHA = 0.3
+EXPLORATION_FRACTION = 0.25
+GAMES_PER_FILE = 1000
+QUEUE_TIMEOUT = 1
+OUTPUT_FORMATS = ("csv", "shards")
+
+
+class SelfPlayGame:
+    """A finished self-play game.
+
+    Attributes:
+        board (chess.Board): Final position with the move stack of the game.
+        result (str): "1-0", "0-1" or "1/2-1/2".
+        termination (str): "Normal" or "Adjudication" (the game reached the ply limit and is scored as a draw).
+        policy_indices (List[np.ndarray]): MoveEncoder8x8x73 flat indices of the searched moves of each position.
+        policy_probabilities (List[np.ndarray]): Visit distribution over these moves.
+    """
+
+    def __init__(self, board: chess.Board, result: str, termination: str, policy_indices: List[np.ndarray],
+                 policy_probabilities: List[np.ndarray]):
+        self.board = board
+        self.result = result
+        self.termination = termination
+        self.policy_indices = policy_indices
+        self.policy_probabilities = policy_probabilities
+
+    def row(self, player: str = "self-play") -> List[str]:
+        """The game as a row of the HEADERS schema, with the moves in SAN like the converted PGN files."""
+        now = datetime.now(timezone.utc)
+        san = chess.Board().variation_san(self.board.move_stack)
+        # variation_san numbers the moves, the converted files only keep the SAN tokens
+        moves = " ".join(token for token in san.split() if not token[0].isdigit() or token[-1] != ".")
+        values = {"Event": "Self-play", "Site": "deep-chess-playground", "Date": now.strftime("%Y.%m.%d"),
+                  "Round": "-", "White": player, "Black": player, "Result": self.result,
+                  "UTCDate": now.strftime("%Y.%m.%d"), "UTCTime": now.strftime("%H:%M:%S"),
+                  "WhiteElo": "?", "BlackElo": "?", "WhiteRatingDiff": "", "BlackRatingDiff": "", "ECO": "?",
+                  "Opening": "?", "TimeControl": "-", "Termination": self.termination, "Moves": moves}
+        return [values[header] for header in HEADERS]
+
+    def values(self) -> np.ndarray:
+        """Game result from the perspective of the side to move in each position (1, 0 or -1)."""
+        score = {"1-0": 1, "0-1": -1}.get(self.result, 0)
+        return np.array([score if ply % 2 == 0 else -score for ply in range(len(self.board.move_stack))],
+                        dtype=np.int8)
+
+
+def add_exploration_noise(search: Search, rng: np.random.Generator, alpha: float = DIRICHLET_ALPHA,
+                          fraction: float = EXPLORATION_FRACTION) -> None:
+    """Mixes Dirichlet noise into the priors of the (expanded) root, as in AlphaZero self-play."""
+    children = list(search.root.children.values())
+    if not children or fraction == 0:
+        return
+    for child, noise in zip(children, rng.dirichlet([alpha] * len(children))):
+        child.prior = (1 - fraction) * child.prior + fraction * noise
+
+
+def play_game(search: Search, move_encoder: MoveEncoder8x8x73, rng: np.random.Generator,
+              num_simulations: int = NUM_SIMULATIONS, temperature_plies: int = TEMPERATURE_PLIES,
+              max_plies: int = MAX_PLIES, dirichlet_alpha: float = DIRICHLET_ALPHA,
+              exploration_fraction: float = EXPLORATION_FRACTION) -> SelfPlayGame:
+    """Plays one game of the network against itself.
+
+    Each move is searched until the root has `num_simulations` visits, reusing the subtree of the previous
+    move. The move is sampled in proportion to the visit counts during the first `temperature_plies` plies
+    and is the most visited one afterwards.
+    """
+    board = chess.Board()
+    search.reset()
+    policy_indices, policy_probabilities = [], []
+    while not board.is_game_over(claim_draw=True) and board.ply() < max_plies:
+        search.set_position(board)
+        if not search.root.expanded:
+            search.run_iteration()
+        add_exploration_noise(search, rng, dirichlet_alpha, exploration_fraction)
+        while search.root.visit_count < num_simulations:
+            search.run_iteration()
+        moves = list(search.root.children)
+        visits = np.array([search.root.children[move].visit_count for move in moves], dtype=np.float64)
+        probabilities = visits / visits.sum()
+        if board.ply() < temperature_plies:
+            move = moves[rng.choice(len(moves), p=probabilities)]
+        else:
+            move = moves[int(np.argmax(visits))]
+        policy_indices.append(np.array([move_encoder.index(move) for move in moves], dtype=np.int16))
+        policy_probabilities.append(probabilities.astype(np.float16))
+        board.push(move)
+    outcome = board.outcome(claim_draw=True)
+    if outcome is None:
+        return SelfPlayGame(board, "1/2-1/2", "Adjudication", policy_indices, policy_probabilities)
+    return SelfPlayGame(board, outcome.result(), "Normal", policy_indices, policy_probabilities)
+
+
+def next_result(results_queue, workers, servers):
+    """Waits for the next result of the workers, failing if a worker or an inference server died."""
+    while True:
+        try:
+            return results_queue.get(timeout=QUEUE_TIMEOUT)
+        except Empty:
+            if not all(server.is_alive() for server in servers) \
+                    or any(worker.exitcode not in (None, 0) for worker in workers):
+                raise RuntimeError("A worker or inference server process stopped unexpectedly")
+
+
+def stop_processes(processes, timeout: float = QUEUE_TIMEOUT) -> None:
+    for process in processes:
+        if process.is_alive():
+            process.join(timeout=timeout)
+        if process.is_alive():
+            process.terminate()
+
+
+def _play_games(worker_index, client, games_left, games_queue, settings, seed):
+    """Worker process: plays games until `games_left` reaches 0 and puts them into `games_queue`."""
+    torch.set_num_threads(1)
+    evaluator = SharedMemoryEvaluator(*client)
+    search = Search(evaluator, c_puct=settings["c_puct"], leaves_per_batch=settings["leaves_per_batch"])
+    move_encoder, encoder = MoveEncoder8x8x73(), GridEncoder()
+    rng = np.random.default_rng([seed, worker_index])
+    try:
+        while True:
+            with games_left.get_lock():
+                if games_left.value <= 0:
+                    break
+                games_left.value -= 1
+            game = play_game(search, move_encoder, rng, settings["num_simulations"], settings["temperature_plies"],
+                             settings["max_plies"], settings["dirichlet_alpha"], settings["exploration_fraction"])
+            planes = None
+            if settings["output_format"] == "shards":
+                board, boards = chess.Board(), []
+                for move in game.board.move_stack:
+                    boards.append(encoder.encode_board(board).numpy().astype(np.uint8))
+                    board.push(move)
+                planes = np.stack(boards) if boards else np.zeros((0, 24, 8, 8), dtype=np.uint8)
+            games_queue.put((game, planes))
+    finally:
+        evaluator.close()
+
+
+class SelfPlayGenerator:
+    """Generates self-play games with a pool of worker processes and one shared inference server process.
+
+    Every worker runs its own PUCT search (`engine.search.Search`) and plays whole games. Instead of owning a
+    copy of the network, the workers write the leaves they want evaluated into their own shared-memory ring
+    buffer (`InferenceRingBuffer`) and the inference server process answers the requests of all workers
+    with one batched forward pass. Games are written in the HEADERS schema like the converted PGN files
+    ("csv", `<n>.csv.gz`) or as training shards ("shards", `<n>.npz` with uint8 GridEncoder planes, sparse
+    visit distributions and game results from the side to move).
+
+    Args:
+        model (torch.nn.Module): Network taking GridEncoder planes, see `engine.evaluation.split_outputs`.
+        destination_dir (str): Directory for the output files.
+        num_workers (int, optional): Number of game-playing processes. Defaults to the number of CPUs - 1.
+        output_format (str, optional): "csv" or "shards". Defaults to "csv".
+        games_per_file (int, optional): Maximum number of games per output file. Defaults to GAMES_PER_FILE.
+        num_simulations (int, optional): Root visits per move. Defaults to NUM_SIMULATIONS.
+        leaves_per_batch (int, optional): Leaves per evaluation request of a worker. Defaults to LEAVES_PER_BATCH.
+        c_puct (float, optional): Exploration constant of the search. Defaults to 1.5.
+        temperature_plies (int, optional): Number of plies with moves sampled from the visit counts.
+            Defaults to TEMPERATURE_PLIES.
+        max_plies (int, optional): Games reaching this length are adjudicated as draws. Defaults to MAX_PLIES.
+        dirichlet_alpha (float, optional): Root noise concentration. Defaults to DIRICHLET_ALPHA.
+        exploration_fraction (float, optional): Weight of the root noise. Defaults to EXPLORATION_FRACTION.
+        max_batch_size (int, optional): Maximum forward pass size of the server. Defaults to MAX_BATCH_SIZE.
+        batch_timeout (float, optional): Seconds the server waits for other workers. Defaults to BATCH_TIMEOUT.
+        device (str, optional): Device of the model. Defaults to "cpu".
+        server_threads (int, optional): Torch threads of the server, 0 keeps the torch default. Defaults to 0.
+        seed (int, optional): Seed of the move sampling and the root noise. Defaults to 0.
+        player (str, optional): Name written to the White and Black headers. Defaults to "self-play".
+
+    Raises:
+        FileNotFoundError: If the destination directory doesn't exist.
+        ValueError: If the output format is not supported.
+    """
+
+    def __init__(self, model, destination_dir: str, num_workers: Optional[int] = None, output_format: str = "csv",
+                 games_per_file: int = GAMES_PER_FILE, num_simulations: int = NUM_SIMULATIONS,
+                 leaves_per_batch: int = LEAVES_PER_BATCH, c_puct: float = 1.5,
+                 temperature_plies: int = TEMPERATURE_PLIES, max_plies: int = MAX_PLIES,
+                 dirichlet_alpha: float = DIRICHLET_ALPHA, exploration_fraction: float = EXPLORATION_FRACTION,
+                 max_batch_size: int = MAX_BATCH_SIZE, batch_timeout: float = BATCH_TIMEOUT, device: str = "cpu",
+                 server_threads: int = 0, seed: int = 0, player: str = "self-play"):
+        if not os.path.isdir(destination_dir):
+            raise FileNotFoundError(f"Destination directory not found: {destination_dir}")
+        if output_format not in OUTPUT_FORMATS:
+            raise ValueError(f"Unsupported output format: {output_format}, expected one of {OUTPUT_FORMATS}")
+        self._model = model
+        self._destination_dir = destination_dir
+        self._num_workers = num_workers or max(os.cpu_count() - 1, 1)
+        self._output_format = output_format
+        self._games_per_file = games_per_file
+        self._settings = {"num_simulations": num_simulations, "leaves_per_batch": leaves_per_batch,
+                          "c_puct": c_puct, "temperature_plies": temperature_plies, "max_plies": max_plies,
+                          "dirichlet_alpha": dirichlet_alpha, "exploration_fraction": exploration_fraction,
+                          "output_format": output_format}
+        self._max_batch_size = max_batch_size
+        self._batch_timeout = batch_timeout
+        self._device = device
+        self._server_threads = server_threads
+        self._seed = seed
+        self._player = player
+        self._file_counter = 0
+
+    def generate(self, num_games: int) -> dict:
+        """Plays `num_games` games and writes them to the destination directory.
+
+        Returns:
+            dict: Number of games and positions, elapsed seconds, games per hour, number of forward passes
+                and their mean batch size.
+        """
+        context = multiprocessing.get_context("spawn")
+        # Every worker has at most one request batch in flight
+        server = InferenceServer(context, self._model, self._num_workers, self._settings["leaves_per_batch"],
+                                 self._max_batch_size, self._batch_timeout, self._device, self._server_threads)
+        games_left = context.Value("i", num_games)
+        games_queue = context.Queue()
+        workers = [context.Process(target=_play_games, daemon=True,
+                                   args=(index, server.client(index), games_left, games_queue, self._settings,
+                                         self._seed))
+                   for index in range(self._num_workers)]
+        start = time.perf_counter()
+        games, positions = [], 0
+        try:
+            server.start()
+            for worker in workers:
+                worker.start()
+            for _ in range(num_games):
+                game = next_result(games_queue, workers, [server])
+                games.append(game)
+                positions += len(game[0].board.move_stack)
+                if len(games) >= self._games_per_file:
+                    self._save_games(games)
+                    games = []
+            self._save_games(games)
+            for worker in workers:
+                worker.join()
+        finally:
+            stop_processes(workers)
+            server.stop()
+        elapsed = time.perf_counter() - start
+        logging.info(f"Played {num_games} self-play games in {elapsed:.1f} s")
+        return {"games": num_games, "positions": positions, "seconds": elapsed,
+                "games_per_hour": num_games * 3600 / elapsed, "batches": server.batches_evaluated,
+                "mean_batch_size": server.positions_evaluated / max(server.batches_evaluated, 1)}
+
+    def _save_games(self, games) -> None:
+        if not games:
+            return
+        if self._output_format == "csv":
+            filepath = os.path.join(self._destination_dir, f"{self._file_counter}.csv.gz")
+            df = pd.DataFrame([game.row(self._player) for game, _ in games], columns=HEADERS)
+            df.to_csv(filepath, index=False, compression="infer")
+        else:
+            filepath = os.path.join(self._destination_dir, f"{self._file_counter}.npz")
+            indices = [indices for game, _ in games for indices in game.policy_indices]
+            probabilities = [probabilities for game, _ in games for probabilities in game.policy_probabilities]
+            offsets = np.zeros(len(indices) + 1, dtype=np.int64)
+            np.cumsum([len(index) for index in indices], out=offsets[1:])
+            np.savez_compressed(filepath,
+                                planes=np.concatenate([planes for _, planes in games]),
+                                policy_offsets=offsets,
+                                policy_indices=np.concatenate(indices) if indices else np.zeros(0, np.int16),
+                                policy_probabilities=np.concatenate(probabilities) if probabilities
+                                else np.zeros(0, np.float16),
+                                values=np.concatenate([game.values() for game, _ in games]))
+        self._file_counter += 1
+        logging.info(f"Saved {len(games)} self-play games to {filepath}")
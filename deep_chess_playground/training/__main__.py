@@ -0,0 +1,39 @@
+"""Data-parallel training on CPU processes, configured by a LightningModuleFactory configuration file with a
+"training" section (see `training.distributed`):
+
+    python -m deep_chess_playground.training -c config.json --processes 4
+
+On several nodes the same command runs on every node, with MASTER_ADDR and MASTER_PORT of the first node and
+NODE_RANK set:
+
+    MASTER_ADDR=node0 MASTER_PORT=29500 NODE_RANK=1 python -m deep_chess_playground.training -c config.json \\
+        --processes 16 --num-nodes 4
+"""
+import argparse
+import logging
+from deep_chess_playground.training.distributed import train
+from deep_chess_playground.utils import read_json
+
+
+def main():
+    argparser = argparse.ArgumentParser(description="Train a network on CPU processes with gloo.")
+    argparser.add_argument("-c", "--conf", required=True, help="Path to the configuration file.")
+    argparser.add_argument("--processes", type=int, help="Training processes on every node, overrides the "
+                                                         "configuration.")
+    argparser.add_argument("--num-nodes", type=int, help="Number of nodes, overrides the configuration.")
+    args = argparser.parse_args()
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+    config = read_json(args.conf)
+    config.setdefault("training", {})
+    if args.processes:
+        config["training"]["processes"] = args.processes
+    if args.num_nodes:
+        config["training"]["num_nodes"] = args.num_nodes
+    trainer = train(config)
+    if trainer.is_global_zero:
+        logging.info(f"Finished training: {trainer.callback_metrics}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,323 @@
+"""Data-parallel training on CPU processes, communicating with gloo.
+
+Every process trains a replica of the network on its own share of the converted game files and the gradients
+are averaged after each backward pass (PyTorch DistributedDataParallel through Lightning's DDPStrategy). The
+settings are the "training" section of the LightningModuleFactory configuration file:
+
+    train_files (list or str):       converter output files, or a glob pattern matching them
+    val_files (list or str):         validation files, optional
+    batch_size (int):                positions per batch of every process (default 1024)
+    epochs (int):                    number of epochs (default 1)
+    num_workers (int):               DataLoader workers of every process (default 0)
+    shuffle_buffer (int):            positions shuffled together, see PositionBatchDataset (default 65536)
+    seed (int):                      seed of the shuffling (default 0)
+    moves_format, target_type (str): as in PositionBatchDataset (default "san", "move")
+    processes (int):                 training processes on every node (default 1)
+    num_nodes (int):                 number of nodes (default 1)
+    threads (int):                   PyTorch threads of every process (default: CPU count / processes)
+    gradient_compression (str):      "none", "fp16" or "bf16" (gradients sent as 16-bit floats), or "powersgd"
+                                     (low-rank approximations of the gradients, see `powersgd_rank`)
+    powersgd_rank (int):             rank of the PowerSGD approximations (default 1)
+    powersgd_start_step (int):       steps with uncompressed gradients before PowerSGD starts (default 1000)
+    allreduce (str):                 "flat" (one all-reduce over all processes) or "hierarchical" (see
+                                     `hierarchical_allreduce_hook`)
+    group_size (int):                processes per group of the hierarchical all-reduce (default: processes)
+    default_root_dir (str):          directory of the logs and checkpoints
+
+Every rank gets disjoint files and reshuffles them each epoch with a seed, so no process reads the list of all
+games or shuffles it (see PositionBatchDataset).
+"""
+import copy
+import glob
+import os
+import time
+from typing import Iterator, List, Optional, Tuple, Union
+import pytorch_lightning as pl
+import torch
+import torch.distributed as dist
+from pytorch_lightning.strategies import DDPStrategy
+from torch.distributed.algorithms.ddp_comm_hooks import default_hooks, powerSGD_hook
+from deep_chess_playground.datasets.position_batch_dataset import PositionBatchDataset, batch_loader
+
+
+TRAINING_DEFAULTS = {"train_files": None, "val_files": None, "batch_size": 1024, "epochs": 1, "num_workers": 0,
+                     "shuffle_buffer": 65536, "seed": 0, "moves_format": "san", "target_type": "move",
+                     "processes": 1, "num_nodes": 1, "threads": None, "gradient_compression": "none",
+                     "powersgd_rank": 1, "powersgd_start_step": 1000, "allreduce": "flat", "group_size": None,
+                     "default_root_dir": None}
+GRADIENT_COMPRESSIONS = ("none", "fp16", "bf16", "powersgd")
+ALLREDUCE_ALGORITHMS = ("flat", "hierarchical")
+HALF_PRECISION_DTYPES = {"fp16": torch.float16, "bf16": torch.bfloat16}
+
+
+def expand_files(files: Union[str, List[str]]) -> List[str]:
+    """The files of a list, or the files matching a glob pattern in sorted order."""
+    paths = sorted(glob.glob(files)) if isinstance(files, str) else list(files)
+    if not paths:
+        raise ValueError(f"No files found for {files}")
+    return paths
+
+
+class EvenBatches:
+    """Iterates over the batches of a replica's loader and stops all processes together, when the first one has
+    no batch left.
+
+    The replicas read different files, which rarely hold the same number of positions, but every process must
+    take part in the same number of gradient all-reduces, or the others wait forever. Before each batch the
+    processes agree with a one-element all-reduce whether all of them still have one. The batches only some
+    replicas have at the end of an epoch are left out.
+
+    Args:
+        loader: Loader of the batches of this replica.
+        dataset (PositionBatchDataset): Dataset of the loader, gets the epoch with `set_epoch`.
+    """
+
+    def __init__(self, loader, dataset: PositionBatchDataset):
+        self.loader = loader
+        self.dataset = dataset
+
+    def set_epoch(self, epoch: int) -> None:
+        self.dataset.set_epoch(epoch)
+
+    @staticmethod
+    def _all_have_batch(has_batch: bool) -> bool:
+        flag = torch.tensor([int(has_batch)])
+        dist.all_reduce(flag, op=dist.ReduceOp.MIN)
+        return bool(flag.item())
+
+    def __iter__(self) -> Iterator:
+        distributed = dist.is_available() and dist.is_initialized()
+        for batch in self.loader:
+            if distributed and not self._all_have_batch(True):
+                return
+            yield batch
+        if distributed:
+            self._all_have_batch(False)
+
+
+class HierarchicalAllReduceState:
+    """State of `hierarchical_allreduce_hook`: the process groups of the two levels.
+
+    The groups are created on the first call of the hook, when the default process group exists. All processes
+    call it for the same gradient bucket first, so they create the groups in the same order as required.
+
+    Args:
+        group_size (int): Processes per group, e.g. the processes of a node. Ranks are numbered node by node.
+        dtype (torch.dtype, optional): Type the gradients are sent as, e.g. torch.float16. Defaults to the type of
+            the gradients.
+    """
+
+    def __init__(self, group_size: int, dtype: Optional[torch.dtype] = None):
+        self.group_size = group_size
+        self.dtype = dtype
+        self._groups = None
+
+    def groups(self) -> Tuple[dist.ProcessGroup, Optional[dist.ProcessGroup], int]:
+        """(group of this process, group of the leaders or None for the other processes, rank of the leader)."""
+        if self._groups is None:
+            world_size, rank = dist.get_world_size(), dist.get_rank()
+            if world_size % self.group_size:
+                raise ValueError(f"The world size {world_size} isn't a multiple of the group size {self.group_size}")
+            groups = [dist.new_group(list(range(start, start + self.group_size)))
+                      for start in range(0, world_size, self.group_size)]
+            leaders = dist.new_group(list(range(0, world_size, self.group_size)))
+            leader = rank - rank % self.group_size
+            self._groups = groups[rank // self.group_size], leaders if rank == leader else None, leader
+        return self._groups
+
+
+def hierarchical_allreduce_hook(state: HierarchicalAllReduceState,
+                                bucket: dist.GradBucket) -> torch.futures.Future[torch.Tensor]:
+    """DDP communication hook averaging the gradients in two levels.
+
+    The gradients of every group are summed on its first process (the leader), the leaders all-reduce the sums
+    and send the result back to their group. Between nodes only one all-reduce per node is sent instead of one
+    per process, the rest of the traffic stays within the nodes. The collectives run one after the other before
+    the future is returned.
+    """
+    group, leaders, leader = state.groups()
+    gradients = bucket.buffer()
+    gradients.div_(dist.get_world_size())
+    buffer = gradients.to(state.dtype) if state.dtype is not None else gradients
+    dist.reduce(buffer, dst=leader, group=group)
+    if leaders is not None:
+        dist.all_reduce(buffer, group=leaders)
+    dist.broadcast(buffer, src=leader, group=group)
+    if buffer is not gradients:
+        gradients.copy_(buffer)
+    future = torch.futures.Future()
+    future.set_result(gradients)
+    return future
+
+
+def sequential_powersgd_hook(state: powerSGD_hook.PowerSGDState,
+                             bucket: dist.GradBucket) -> torch.futures.Future[torch.Tensor]:
+    """PowerSGD hook finishing the communication of a bucket before the next bucket starts.
+
+    PowerSGD starts some all-reduces from the callbacks of the previous ones. gloo needs the collectives in the
+    same order in all processes, which buckets compressed at the same time don't guarantee.
+    """
+    future = powerSGD_hook.powerSGD_hook(state, bucket)
+    future.wait()
+    return future
+
+
+def communication_hook(settings: dict):
+    """(state, hook) of DDP's gradient communication for the (validated) training settings, (None, None) for DDP's
+    own all-reduce."""
+    compression = settings["gradient_compression"]
+    if settings["allreduce"] == "hierarchical":
+        return (HierarchicalAllReduceState(settings["group_size"] or settings["processes"],
+                                           HALF_PRECISION_DTYPES.get(compression)), hierarchical_allreduce_hook)
+    if compression == "fp16":
+        return None, default_hooks.fp16_compress_hook
+    if compression == "bf16":
+        return None, default_hooks.bf16_compress_hook
+    if compression == "powersgd":
+        state = powerSGD_hook.PowerSGDState(None, matrix_approximation_rank=settings["powersgd_rank"],
+                                            start_powerSGD_iter=settings["powersgd_start_step"])
+        return state, sequential_powersgd_hook
+    return None, None
+
+
+class GlooDDPStrategy(DDPStrategy):
+    """DDPStrategy with the gloo backend that limits the threads of every process and also registers a
+    communication hook on CPUs (Lightning only does it for CUDA devices, but gloo supports hooks as well).
+
+    The hook is chosen with `communication_hook` in every process once the process group exists, since the
+    state of some hooks can't be pickled before.
+
+    Args:
+        threads (int, optional): PyTorch threads of every process. Defaults to PyTorch's choice.
+        settings (dict, optional): Training settings choosing the communication hook. DDP's own all-reduce if
+            None.
+        **kwargs: Other arguments of DDPStrategy.
+    """
+
+    def __init__(self, threads: Optional[int] = None, settings: Optional[dict] = None, **kwargs):
+        super().__init__(process_group_backend="gloo", **kwargs)
+        self.threads = threads
+        self.settings = settings
+
+    def setup_environment(self) -> None:
+        super().setup_environment()
+        if self.threads:
+            torch.set_num_threads(self.threads)
+
+    def _register_ddp_hooks(self) -> None:
+        state, hook = communication_hook(self.settings) if self.settings is not None else (None, None)
+        if hook is not None:
+            self.model.register_comm_hook(state, hook)
+
+
+class ShardedPositionDataModule(pl.LightningDataModule):
+    """Batches of PositionBatchDataset for every process of distributed training, from its own files.
+
+    Args:
+        settings (dict): The training settings, see TRAINING_DEFAULTS.
+    """
+
+    def __init__(self, settings: dict):
+        super().__init__()
+        self.settings = settings
+
+    def _loader(self, files, shuffle: bool) -> EvenBatches:
+        settings = self.settings
+        dataset = PositionBatchDataset(expand_files(files), settings["batch_size"], drop_last=shuffle,
+                                       moves_format=settings["moves_format"], target_type=settings["target_type"],
+                                       num_replicas=self.trainer.world_size, rank=self.trainer.global_rank,
+                                       shuffle_buffer=settings["shuffle_buffer"] if shuffle else 0,
+                                       seed=settings["seed"])
+        return EvenBatches(batch_loader(dataset, num_workers=settings["num_workers"]), dataset)
+
+    def train_dataloader(self) -> EvenBatches:
+        return self._loader(self.settings["train_files"], shuffle=True)
+
+    def val_dataloader(self):
+        return self._loader(self.settings["val_files"], shuffle=False) if self.settings["val_files"] else []
+
+
+class SetEpoch(pl.Callback):
+    """Passes the epoch to the training data at the start of every epoch, for its per-epoch shuffling."""
+
+    def on_train_epoch_start(self, trainer, pl_module):
+        trainer.train_dataloader.set_epoch(trainer.current_epoch)
+
+
+class PositionThroughput(pl.Callback):
+    """Logs `positions_per_second`, the training positions of all processes per second of every epoch. The first
+    batch, which waits for the DataLoader workers to start, isn't counted."""
+
+    def __init__(self):
+        self._start, self._positions = None, 0
+
+    def on_train_epoch_start(self, trainer, pl_module):
+        self._start, self._positions = None, 0
+
+    def on_train_batch_end(self, trainer, pl_module, outputs, batch, batch_idx):
+        if self._start is None:
+            self._start = time.perf_counter()
+        else:
+            self._positions += len(batch[1])
+
+    def on_train_epoch_end(self, trainer, pl_module):
+        if self._positions:
+            pl_module.log("positions_per_second", self._positions / (time.perf_counter() - self._start),
+                          sync_dist=True, reduce_fx="sum")
+
+
+def training_settings(settings: dict) -> dict:
+    """The settings completed with the defaults."""
+    unknown = set(settings) - set(TRAINING_DEFAULTS)
+    if unknown:
+        raise ValueError(f"Unknown training settings {sorted(unknown)}")
+    settings = {**TRAINING_DEFAULTS, **settings}
+    if settings["train_files"] is None:
+        raise ValueError("The training settings need train_files")
+    if settings["gradient_compression"] not in GRADIENT_COMPRESSIONS:
+        raise ValueError(f"Invalid gradient compression {settings['gradient_compression']}, expected one of "
+                         f"{GRADIENT_COMPRESSIONS}")
+    if settings["allreduce"] not in ALLREDUCE_ALGORITHMS:
+        raise ValueError(f"Invalid all-reduce {settings['allreduce']}, expected one of {ALLREDUCE_ALGORITHMS}")
+    if settings["allreduce"] == "hierarchical" and settings["gradient_compression"] == "powersgd":
+        raise ValueError("PowerSGD can't be combined with the hierarchical all-reduce")
+    if settings["threads"] is None:
+        settings["threads"] = max(1, (os.cpu_count() or 1) // settings["processes"])
+    return settings
+
+
+def fit(module: pl.LightningModule, settings: dict, start_method: str = "popen", **trainer_kwargs) -> pl.Trainer:
+    """Trains a Lightning module with the training settings in `processes` processes on every node.
+
+    With the default start method Lightning starts the other processes by running the command of this one
+    again; "spawn" runs them from a pickled copy of the module instead (e.g. from a notebook or a script that
+    shouldn't run twice), and returns the trained weights to this process. On several nodes every node runs the
+    same command with the MASTER_ADDR, MASTER_PORT and NODE_RANK environment variables set.
+
+    Args:
+        module (pl.LightningModule): The module to train.
+        settings (dict): Training settings, see TRAINING_DEFAULTS.
+        start_method (str, optional): "popen", "spawn", "fork" or "forkserver". Defaults to "popen".
+        **trainer_kwargs: Other arguments of the Trainer.
+
+    Returns:
+        pl.Trainer: The trainer, with the metrics of the last epoch in `callback_metrics`.
+    """
+    settings = training_settings(settings)
+    strategy = GlooDDPStrategy(threads=settings["threads"], settings=settings, start_method=start_method)
+    trainer = pl.Trainer(accelerator="cpu", devices=settings["processes"], num_nodes=settings["num_nodes"],
+                         strategy=strategy, max_epochs=settings["epochs"], use_distributed_sampler=False,
+                         callbacks=[SetEpoch(), PositionThroughput()], default_root_dir=settings["default_root_dir"],
+                         **trainer_kwargs)
+    trainer.fit(module, datamodule=ShardedPositionDataModule(settings))
+    return trainer
+
+
+def train(config: dict, start_method: str = "popen", **trainer_kwargs) -> pl.Trainer:
+    """Builds the module of a LightningModuleFactory configuration and trains it with its "training" settings,
+    see `fit`."""
+    # Imported here, so that the data and communication parts don't need the factory's dependencies
+    from deep_chess_playground.lightning_modules.lightning_module_factory import LightningModuleFactory
+    config = copy.deepcopy(config)
+    settings = config.pop("training")
+    return fit(LightningModuleFactory.build_module(config), settings, start_method, **trainer_kwargs)
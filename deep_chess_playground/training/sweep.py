@@ -0,0 +1,273 @@
+"""Hyperparameter sweeps over LightningModuleFactory configurations, with early stopping of weak trials.
+
+A sweep file holds a base configuration (with its "training" section, see `training.distributed`) and the
+search space, as dotted paths into the configuration:
+
+    {"base": "experiment.json",
+     "search_space": {"optimizer.lr": {"loguniform": [1e-4, 1e-2]},
+                      "pytorch_module.backbone.num_blocks": [4, 8],
+                      "training.batch_size": {"choice": [512, 1024]}},
+     "num_samples": 4, "max_epochs": 27, "min_epochs": 1, "reduction_factor": 3,
+     "processes": 4, "threads_per_trial": 2, "seed": 0, "output_dir": "sweeps/lr"}
+
+A list (or {"grid": [...]}) is a grid dimension: every combination of the grid values is tried `num_samples`
+times, each time with new values drawn from the distributions ({"choice": [...]}, {"uniform": [low, high]},
+{"loguniform": [low, high]}, {"randint": [low, high]}). "base" is a configuration or the path of one.
+
+Trials run concurrently in a pool of `processes` processes, each limited to `threads_per_trial` threads, so
+several CPU trials share a machine without oversubscribing its cores. Weak trials are stopped with asynchronous
+successive halving (ASHA): at the rungs min_epochs * reduction_factor ** k epochs a trial reports its
+`val_loss` and goes on only if it is among the best 1 / reduction_factor of the trials that reached the rung
+before it. The best trials train for max_epochs, most others stop after a few epochs, so the same budget covers
+more configurations. The results are written to `{output_dir}/results.csv`, the configuration of every trial to
+`{output_dir}/trial_{n}/config.json`:
+
+    python -m deep_chess_playground.training.sweep -c sweep.json
+"""
+import argparse
+import copy
+import itertools
+import json
+import logging
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Callable, Dict, List, Sequence
+import numpy as np
+import pandas as pd
+import pytorch_lightning as pl
+import torch
+from deep_chess_playground.training.distributed import ShardedPositionDataModule, SetEpoch, training_settings
+from deep_chess_playground.utils import read_json
+
+
+SWEEP_DEFAULTS = {"num_samples": 1, "max_epochs": 27, "min_epochs": 1, "reduction_factor": 3, "processes": 1,
+                  "threads_per_trial": None, "seed": 0, "output_dir": "sweep"}
+DISTRIBUTIONS = ("grid", "choice", "uniform", "loguniform", "randint")
+METRIC = "val_loss"
+
+
+def set_path(config: dict, path: str, value: Any) -> None:
+    """Sets the value at a dotted path, e.g. "pytorch_module.backbone.channels". Integer parts index lists.
+
+    Raises:
+        KeyError: If a part of the path before the last one doesn't exist.
+    """
+    *parents, last = path.split(".")
+    node = config
+    for part in parents:
+        node = node[int(part)] if isinstance(node, list) else node[part]
+    if isinstance(node, list):
+        node[int(last)] = value
+    else:
+        node[last] = value
+
+
+def _distribution(spec) -> tuple:
+    """(name, values) of a search space entry, lists are grid dimensions."""
+    if isinstance(spec, list):
+        return "grid", spec
+    if not isinstance(spec, dict) or len(spec) != 1 or next(iter(spec)) not in DISTRIBUTIONS:
+        raise ValueError(f"Invalid search space entry {spec}, expected a list or one of {DISTRIBUTIONS}")
+    return next(iter(spec.items()))
+
+
+def _sample(name: str, values: list, rng: np.random.Generator):
+    if name == "choice":
+        return values[rng.integers(len(values))]
+    if name == "uniform":
+        return float(rng.uniform(*values))
+    if name == "loguniform":
+        return float(np.exp(rng.uniform(np.log(values[0]), np.log(values[1]))))
+    return int(rng.integers(values[0], values[1] + 1))
+
+
+def expand_search_space(search_space: Dict[str, Any], num_samples: int = 1, seed: int = 0) -> List[Dict[str, Any]]:
+    """The parameters of every trial: all combinations of the grid values, each `num_samples` times with values
+    drawn from the distributions.
+
+    Returns:
+        List[Dict[str, Any]]: {dotted path: value} of every trial.
+    """
+    rng = np.random.default_rng(seed)
+    entries = {path: _distribution(spec) for path, spec in search_space.items()}
+    grid = {path: values for path, (name, values) in entries.items() if name == "grid"}
+    trials = []
+    for combination in itertools.product(*grid.values()):
+        for _ in range(num_samples):
+            parameters = dict(zip(grid, combination))
+            for path, (name, values) in entries.items():
+                if name != "grid":
+                    parameters[path] = _sample(name, values, rng)
+            trials.append({path: parameters[path] for path in search_space})
+    return trials
+
+
+def rung_epochs(min_epochs: int, max_epochs: int, reduction_factor: int) -> List[int]:
+    """Epochs at which ASHA compares the trials: min_epochs * reduction_factor ** k below max_epochs."""
+    rungs, epochs = [], min_epochs
+    while epochs < max_epochs:
+        rungs.append(epochs)
+        epochs *= reduction_factor
+    return rungs
+
+
+def keeps_going(recorded: Sequence[float], loss: float, reduction_factor: int) -> bool:
+    """ASHA's decision at a rung: continue if the loss is among the best 1 / reduction_factor of the losses
+    recorded at the rung before, or if nothing was recorded yet."""
+    return len(recorded) == 0 or loss <= np.percentile(recorded, 100 / reduction_factor)
+
+
+class SuccessiveHalving(pl.Callback):
+    """Reports `val_loss` at the rungs to the shared records of all trials and stops the trial when ASHA says so.
+
+    Args:
+        rungs (Sequence[int]): Epochs of the rungs.
+        records: Dict from rung epoch to the recorded losses, shared by the trials (e.g. a Manager dict).
+        lock: Lock of the records.
+        reduction_factor (int): Keep the best 1 / reduction_factor of the trials at every rung.
+
+    Attributes:
+        losses (List[float]): `val_loss` after every epoch.
+    """
+
+    def __init__(self, rungs: Sequence[int], records, lock, reduction_factor: int):
+        self.rungs = set(rungs)
+        self.records = records
+        self.lock = lock
+        self.reduction_factor = reduction_factor
+        self.losses = []
+
+    def on_validation_end(self, trainer, pl_module):
+        if trainer.sanity_checking:
+            return
+        loss = float(trainer.callback_metrics[METRIC])
+        self.losses.append(loss)
+        epochs = trainer.current_epoch + 1
+        if epochs not in self.rungs:
+            return
+        with self.lock:
+            recorded = self.records.get(epochs, [])
+            self.records[epochs] = recorded + [loss]
+        if not keeps_going(recorded, loss, self.reduction_factor):
+            trainer.should_stop = True
+
+
+def build_lightning_module(config: dict) -> pl.LightningModule:
+    # Imported here, so that the search space can be expanded without the factory's dependencies
+    from deep_chess_playground.lightning_modules.lightning_module_factory import LightningModuleFactory
+    return LightningModuleFactory.build_module(copy.deepcopy(config))
+
+
+def run_trial(trial: int, config: dict, sweep: dict, records, lock,
+              build_module: Callable[[dict], pl.LightningModule] = build_lightning_module) -> Dict[str, Any]:
+    """Trains the module of one configuration in this process, stopped early by SuccessiveHalving.
+
+    Returns:
+        Dict[str, Any]: The trial number, its epochs and last `val_loss`, and the `val_loss` of every epoch.
+    """
+    config = copy.deepcopy(config)
+    settings = training_settings(config.pop("training"))
+    trial_dir = os.path.join(sweep["output_dir"], f"trial_{trial}")
+    halving = SuccessiveHalving(rung_epochs(sweep["min_epochs"], sweep["max_epochs"], sweep["reduction_factor"]),
+                                records, lock, sweep["reduction_factor"])
+    trainer = pl.Trainer(accelerator="cpu", devices=1, max_epochs=sweep["max_epochs"],
+                         callbacks=[SetEpoch(), halving], default_root_dir=trial_dir, enable_progress_bar=False,
+                         enable_model_summary=False)
+    trainer.fit(build_module(config), datamodule=ShardedPositionDataModule(settings))
+    return {"trial": trial, "epochs": len(halving.losses), METRIC: halving.losses[-1] if halving.losses else np.nan,
+            "losses": halving.losses}
+
+
+def _limit_threads(threads: int) -> None:
+    torch.set_num_threads(threads)
+
+
+def _run_trials(configs: List[dict], trials: List[Dict[str, Any]], sweep: dict,
+                build_module: Callable[[dict], pl.LightningModule]) -> List[Dict[str, Any]]:
+    context = multiprocessing.get_context("spawn")
+    with context.Manager() as manager, \
+            ProcessPoolExecutor(sweep["processes"], mp_context=context, initializer=_limit_threads,
+                                initargs=(sweep["threads_per_trial"],)) as pool:
+        records, lock = manager.dict(), manager.Lock()
+        futures = [pool.submit(run_trial, trial, config, sweep, records, lock, build_module)
+                   for trial, config in enumerate(configs)]
+        rows = []
+        for future, parameters in zip(futures, trials):
+            result = future.result()
+            logging.info(f"Trial {result['trial']}: {result['epochs']} epochs, {METRIC} {result[METRIC]:.4f}")
+            rows.append({**result, **parameters})
+    return rows
+
+
+def sweep_settings(sweep: dict) -> dict:
+    """The sweep settings completed with the defaults, with the base configuration read if it's a path."""
+    unknown = set(sweep) - set(SWEEP_DEFAULTS) - {"base", "search_space"}
+    if unknown:
+        raise ValueError(f"Unknown sweep settings {sorted(unknown)}")
+    sweep = {**SWEEP_DEFAULTS, **sweep}
+    if isinstance(sweep["base"], str):
+        sweep["base"] = read_json(sweep["base"])
+    settings = training_settings(sweep["base"].get("training", {}))
+    if not settings["val_files"]:
+        raise ValueError(f"The trials are compared by {METRIC}, the training settings need val_files")
+    if settings["processes"] != 1 or settings["num_nodes"] != 1:
+        raise ValueError("Every trial runs in a single process, the training settings can't have more processes")
+    if sweep["threads_per_trial"] is None:
+        sweep["threads_per_trial"] = max(1, (os.cpu_count() or 1) // sweep["processes"])
+    return sweep
+
+
+def run_sweep(sweep: dict, build_module: Callable[[dict], pl.LightningModule] = build_lightning_module) \
+        -> pd.DataFrame:
+    """Runs the trials of a sweep (see the module documentation) and saves their results.
+
+    Args:
+        sweep (dict): The sweep settings.
+        build_module (Callable, optional): Builds the Lightning module of a configuration (without its "training"
+            section) in the trial processes. Must be picklable. Defaults to LightningModuleFactory.
+
+    Returns:
+        pd.DataFrame: A row per trial with its parameters, epochs and last `val_loss`, sorted by `val_loss`.
+    """
+    sweep = sweep_settings(sweep)
+    trials = expand_search_space(sweep["search_space"], sweep["num_samples"], sweep["seed"])
+    configs = []
+    for trial, parameters in enumerate(trials):
+        config = copy.deepcopy(sweep["base"])
+        for path, value in parameters.items():
+            set_path(config, path, value)
+        os.makedirs(os.path.join(sweep["output_dir"], f"trial_{trial}"), exist_ok=True)
+        with open(os.path.join(sweep["output_dir"], f"trial_{trial}", "config.json"), "w") as f:
+            json.dump(config, f, indent=2)
+        configs.append(config)
+    logging.info(f"Running {len(configs)} trials in {sweep['processes']} processes with "
+                 f"{sweep['threads_per_trial']} threads each")
+
+    # Set while the pool starts its processes, so that they don't start more threads when importing PyTorch, and
+    # restored afterwards
+    threads = os.environ.get("OMP_NUM_THREADS")
+    os.environ["OMP_NUM_THREADS"] = str(sweep["threads_per_trial"])
+    try:
+        rows = _run_trials(configs, trials, sweep, build_module)
+    finally:
+        if threads is None:
+            del os.environ["OMP_NUM_THREADS"]
+        else:
+            os.environ["OMP_NUM_THREADS"] = threads
+    results = pd.DataFrame(rows).sort_values(METRIC)
+    results.to_csv(os.path.join(sweep["output_dir"], "results.csv"), index=False)
+    return results
+
+
+def main():
+    argparser = argparse.ArgumentParser(description="Run a hyperparameter sweep with early stopping.")
+    argparser.add_argument("-c", "--conf", required=True, help="Path to the sweep file.")
+    args = argparser.parse_args()
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    results = run_sweep(read_json(args.conf))
+    print(results.drop(columns="losses").to_string(index=False))
+
+
+if __name__ == "__main__":
+    main()
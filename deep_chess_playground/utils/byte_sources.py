@@ -0,0 +1,171 @@
+"""Compressed input of the converter: local files, stdin or pipes, and HTTP(S) URLs read with Range requests.
+
+A source is opened at a byte offset, so an interrupted conversion can continue from a checkpoint: files
+seek, URLs request the bytes from the offset on, and streams that can't seek (stdin, pipes) discard the
+bytes before it, which means they have to be fed from the start again.
+"""
+import http.client
+import io
+import logging
+import os.path
+import re
+import sys
+import time
+import urllib.request
+from typing import BinaryIO, Optional, Tuple, Union
+
+
+STDIN = "-"
+HTTP_TIMEOUT = 30.0
+HTTP_RETRIES = 5
+RETRY_DELAY = 1.0
+DISCARD_BLOCK_SIZE = 1024 * 1024
+
+Source = Union[str, BinaryIO]
+
+
+def is_url(source: Source) -> bool:
+    return isinstance(source, str) and source.startswith(("http://", "https://"))
+
+
+def is_local_file(source: Source) -> bool:
+    return isinstance(source, str) and source != STDIN and not is_url(source)
+
+
+def source_name(source: Source) -> str:
+    if isinstance(source, str):
+        return "stdin" if source == STDIN else source
+    return getattr(source, "name", type(source).__name__)
+
+
+class HttpRangeReader(io.RawIOBase):
+    """Binary stream of a URL from a byte offset on.
+
+    The bytes are requested with a `Range: bytes={offset}-` header. If the connection fails or ends early the
+    stream reconnects from the current offset, up to `retries` times in a row, so a dropped download goes on
+    where it stopped instead of starting over. A server ignoring ranges gets the bytes before the offset
+    discarded.
+
+    Args:
+        url (str): The http(s) URL.
+        offset (int, optional): Offset of the first byte. Defaults to 0.
+        timeout (float, optional): Socket timeout in seconds. Defaults to HTTP_TIMEOUT.
+        retries (int, optional): Reconnections without progress before giving up. Defaults to HTTP_RETRIES.
+        retry_delay (float, optional): Seconds before the first reconnection, doubled for every next one.
+            Defaults to RETRY_DELAY.
+
+    Attributes:
+        size (Optional[int]): Total size of the resource, None if the server doesn't tell.
+        reconnections (int): Number of times the stream reconnected.
+
+    Raises:
+        OSError: If the URL can't be read after the retries.
+    """
+
+    def __init__(self, url: str, offset: int = 0, timeout: float = HTTP_TIMEOUT, retries: int = HTTP_RETRIES,
+                 retry_delay: float = RETRY_DELAY):
+        super().__init__()
+        self.url = url
+        self.name = url
+        self._offset = offset
+        self._timeout = timeout
+        self._retries = retries
+        self._retry_delay = retry_delay
+        self._response = None
+        self.size: Optional[int] = None
+        self.reconnections = 0
+        self._connect()
+
+    def _connect(self) -> None:
+        request = urllib.request.Request(self.url, headers={"Range": f"bytes={self._offset}-"})
+        response = urllib.request.urlopen(request, timeout=self._timeout)
+        if response.status == 206:
+            match = re.match(r"bytes (\d+)-\d+/(\d+|\*)", response.headers.get("Content-Range", ""))
+            if match is None or int(match.group(1)) != self._offset:
+                response.close()
+                raise OSError(f"Unexpected Content-Range {response.headers.get('Content-Range')} of {self.url}")
+            self.size = int(match.group(2)) if match.group(2) != "*" else None
+        else:
+            length = response.headers.get("Content-Length")
+            self.size = int(length) if length is not None else None
+            remaining = self._offset
+            while remaining:
+                skipped = len(response.read(min(remaining, DISCARD_BLOCK_SIZE)))
+                if not skipped:
+                    response.close()
+                    raise OSError(f"{self.url} ended before the offset {self._offset}")
+                remaining -= skipped
+        self._response = response
+
+    def readable(self) -> bool:
+        return True
+
+    def tell(self) -> int:
+        return self._offset
+
+    def readinto(self, buffer) -> int:
+        failures = 0
+        while True:
+            try:
+                if self._response is None:
+                    self._connect()
+                size = self._response.readinto(buffer)
+                if size or self.size is None or self._offset >= self.size:
+                    self._offset += size
+                    return size
+                error = OSError(f"Connection closed at byte {self._offset} of {self.size}")
+            except (OSError, http.client.HTTPException) as e:
+                error = e
+            failures += 1
+            if failures > self._retries:
+                raise OSError(f"Reading {self.url} failed at byte {self._offset}: {error}")
+            logging.warning(f"Reading {self.url} failed at byte {self._offset} ({error}), reconnecting")
+            if self._response is not None:
+                self._response.close()
+                self._response = None
+            time.sleep(self._retry_delay * 2 ** (failures - 1))
+            self.reconnections += 1
+
+    def close(self) -> None:
+        if self._response is not None:
+            self._response.close()
+            self._response = None
+        super().close()
+
+
+def _discard(stream: BinaryIO, num_bytes: int) -> None:
+    while num_bytes:
+        discarded = len(stream.read(min(num_bytes, DISCARD_BLOCK_SIZE)))
+        if not discarded:
+            raise ValueError(f"The input ended {num_bytes} bytes before the offset")
+        num_bytes -= discarded
+
+
+def open_source(source: Source, offset: int = 0) -> Tuple[BinaryIO, Optional[int]]:
+    """Opens a source at the byte offset.
+
+    Args:
+        source (Source): A file path, STDIN ("-"), an http(s) URL or a readable binary stream.
+        offset (int, optional): Offset of the first byte to read. Defaults to 0.
+
+    Returns:
+        Tuple[BinaryIO, Optional[int]]: The stream and the total size of the source, None if unknown. Only
+        streams opened from paths and URLs should be closed by the caller.
+    """
+    if is_url(source):
+        stream = HttpRangeReader(source, offset)
+        return stream, stream.size
+    if source == STDIN:
+        stream = sys.stdin.buffer
+    elif isinstance(source, str):
+        stream = open(source, "rb")
+        stream.seek(offset)
+        return stream, os.path.getsize(source)
+    else:
+        stream = source
+    if offset:
+        if stream.seekable():
+            stream.seek(offset)
+        else:
+            _discard(stream, offset)
+    return stream, None
@@ -0,0 +1,171 @@
+import json
+import os
+import threading
+import time
+from queue import Queue
+from typing import Callable, Dict, Optional, Sequence
+
+
+METRICS_INTERVAL = 10.0
+PROMETHEUS_PREFIX = "pgn_conversion"
+# Metrics that only grow, exported as Prometheus counters (the rest are gauges)
+COUNTERS = ("compressed_bytes_read", "decompressed_bytes", "games_parsed", "games_written", "files_written",
+            "download_stall_seconds", "read_stall_seconds", "parse_wait_seconds", "parse_stall_seconds",
+            "write_wait_seconds")
+
+
+class ConversionStats:
+    """Progress and throughput counters of a PgnZstToCsvGzConverter run.
+
+    Every counter is updated by a single converter thread, so they are plain attributes read without locks.
+    The stall times measure where the pipeline waits:
+
+    - download_stall_seconds: the downloader blocked on a full compressed queue (decompression is the
+      bottleneck),
+    - read_stall_seconds: the decompressor blocked on a full chunks queue (parsing is the bottleneck),
+    - parse_wait_seconds: the parser waited for chunks (reading or decompression is the bottleneck),
+    - parse_stall_seconds: the parser blocked on a full games queue (writing is the bottleneck),
+    - write_wait_seconds: the writer waited for games.
+
+    Args:
+        compressed_bytes_total (int): Size of the .pgn.zst input, used for the progress and the ETA, 0 if unknown
+            (e.g. stdin).
+        queues (Dict[str, Queue], optional): Queues whose occupancy is reported, by stage name.
+
+    Attributes:
+        start_offset (int): Compressed offset the run started reading at, non-zero when a conversion is
+            resumed. The bytes before it count towards the progress but not towards the read rate of the ETA.
+    """
+
+    def __init__(self, compressed_bytes_total: int, queues: Optional[Dict[str, Queue]] = None):
+        self.compressed_bytes_total = compressed_bytes_total
+        self.queues = queues or {}
+        self.start_time = time.perf_counter()
+        self.start_offset = 0
+        self.compressed_bytes_read = 0
+        self.decompressed_bytes = 0
+        self.games_parsed = 0
+        self.games_written = 0
+        self.files_written = 0
+        self.download_stall_seconds = 0.0
+        self.read_stall_seconds = 0.0
+        self.parse_wait_seconds = 0.0
+        self.parse_stall_seconds = 0.0
+        self.write_wait_seconds = 0.0
+
+    def snapshot(self) -> Dict[str, float]:
+        """Current values of the counters with the derived rates, progress and ETA."""
+        elapsed = max(time.perf_counter() - self.start_time, 1e-9)
+        progress = self.compressed_bytes_read / self.compressed_bytes_total if self.compressed_bytes_total else 0.0
+        bytes_read = self.compressed_bytes_read - self.start_offset
+        metrics = {
+            "timestamp": time.time(),
+            "elapsed_seconds": elapsed,
+            "compressed_bytes_read": self.compressed_bytes_read,
+            "compressed_bytes_total": self.compressed_bytes_total,
+            "progress": progress,
+            "decompressed_bytes": self.decompressed_bytes,
+            "decompressed_mb_per_second": self.decompressed_bytes / 1e6 / elapsed,
+            "games_parsed": self.games_parsed,
+            "games_parsed_per_second": self.games_parsed / elapsed,
+            "games_written": self.games_written,
+            "games_written_per_second": self.games_written / elapsed,
+            "files_written": self.files_written,
+            "download_stall_seconds": self.download_stall_seconds,
+            "read_stall_seconds": self.read_stall_seconds,
+            "parse_wait_seconds": self.parse_wait_seconds,
+            "parse_stall_seconds": self.parse_stall_seconds,
+            "write_wait_seconds": self.write_wait_seconds,
+            # Extrapolated from the average compressed read rate of this run, unknown before anything was read
+            "eta_seconds": ((self.compressed_bytes_total - self.compressed_bytes_read) / (bytes_read / elapsed)
+                            if self.compressed_bytes_total and bytes_read > 0 else float("nan")),
+        }
+        for name, queue in self.queues.items():
+            metrics[f"{name}_queue_size"] = queue.qsize()
+            metrics[f"{name}_queue_occupancy"] = queue.qsize() / queue.maxsize if queue.maxsize > 0 else 0.0
+        return metrics
+
+
+class MetricsReporter:
+    """Background thread passing snapshots of the stats to callbacks every `interval` seconds.
+
+    A last snapshot is always reported when the reporter is stopped, so short runs get one too.
+
+    Args:
+        stats (ConversionStats): The stats.
+        callbacks (Sequence[Callable[[Dict[str, float]], None]]): Called with every snapshot.
+        interval (float, optional): Seconds between snapshots. Defaults to METRICS_INTERVAL.
+    """
+
+    def __init__(self, stats: ConversionStats, callbacks: Sequence[Callable[[Dict[str, float]], None]],
+                 interval: float = METRICS_INTERVAL):
+        self._stats = stats
+        self._callbacks = list(callbacks)
+        self._interval = interval
+        self._stop_event = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def start(self) -> None:
+        if self._callbacks:
+            self._thread.start()
+
+    def _report(self) -> None:
+        snapshot = self._stats.snapshot()
+        for callback in self._callbacks:
+            callback(snapshot)
+
+    def _run(self) -> None:
+        while not self._stop_event.wait(self._interval):
+            self._report()
+
+    def stop(self) -> None:
+        if not self._callbacks:
+            return
+        self._stop_event.set()
+        if self._thread.is_alive():
+            self._thread.join()
+        self._report()
+
+
+class JsonLinesExporter:
+    """Metrics callback appending every snapshot to a file as one JSON object per line."""
+
+    def __init__(self, path: str):
+        self.path = path
+
+    def __call__(self, metrics: Dict[str, float]) -> None:
+        with open(self.path, "a") as f:
+            # NaN is not valid JSON
+            f.write(json.dumps({name: None if value != value else value for name, value in metrics.items()})
+                    + "\n")
+
+
+class PrometheusExporter:
+    """Metrics callback writing the latest snapshot in the Prometheus text format.
+
+    Meant for the textfile collector of the node exporter: the file is replaced atomically, so the collector
+    never reads a partial file.
+
+    Args:
+        path (str): Path of the .prom file.
+        prefix (str, optional): Prefix of the metric names. Defaults to PROMETHEUS_PREFIX.
+        labels (Dict[str, str], optional): Labels added to every metric, e.g. {"file": "lichess_2024-01"}.
+    """
+
+    def __init__(self, path: str, prefix: str = PROMETHEUS_PREFIX, labels: Optional[Dict[str, str]] = None):
+        self.path = path
+        self.prefix = prefix
+        self.labels = labels or {}
+
+    def __call__(self, metrics: Dict[str, float]) -> None:
+        labels = ",".join(f'{name}="{value}"' for name, value in self.labels.items())
+        labels = f"{{{labels}}}" if labels else ""
+        lines = []
+        for name, value in metrics.items():
+            metric = f"{self.prefix}_{name}" + ("_total" if name in COUNTERS else "")
+            lines.append(f"# TYPE {metric} {'counter' if name in COUNTERS else 'gauge'}")
+            lines.append(f"{metric}{labels} {value}")
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w") as f:
+            f.write("\n".join(lines) + "\n")
+        os.replace(tmp_path, self.path)
@@ -0,0 +1,223 @@
+import logging
+import os.path
+from functools import reduce
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple, Union
+import numpy as np
+import pandas as pd
+from deep_chess_playground.utils.headers import HEADERS
+
+
+ELO_BUCKET_SIZE = 100
+CHUNK_SIZE = 100_000
+KEY_SEPARATOR = "\t"
+# Lichess speed categories by the estimated game duration in seconds (base + 40 * increment)
+TIME_CONTROL_BUCKETS = [(29, "UltraBullet"), (179, "Bullet"), (479, "Blitz"), (1499, "Rapid")]
+# All categories returned by time_control_bucket
+TIME_CONTROLS = [name for _, name in TIME_CONTROL_BUCKETS] + ["Classical", "Correspondence"]
+INDEXED_COLUMNS = ["Date", "White", "Black", "WhiteElo", "BlackElo", "ECO", "Opening", "TimeControl"]
+
+
+def time_control_bucket(time_control: str) -> str:
+    """Speed category of a PGN TimeControl value, e.g. "300+3" -> "Blitz" and "-" -> "Correspondence"."""
+    try:
+        base, increment = time_control.split("+")
+        duration = int(base) + 40 * int(increment)
+    except (AttributeError, ValueError):
+        return "Correspondence"
+    for limit, name in TIME_CONTROL_BUCKETS:
+        if duration <= limit:
+            return name
+    return "Classical"
+
+
+def opening_family(opening: str) -> str:
+    """Opening name without the variation, e.g. "Sicilian Defense: Najdorf Variation" -> "Sicilian Defense"."""
+    return opening.split(":")[0].strip()
+
+
+class GamesIndex:
+    """Inverted index over the .csv.gz files written by PgnZstToCsvGzConverter.
+
+    Every game gets a global id (the games of the first file come first, in file order). For each indexed
+    value there is a posting list, a sorted uint32 array of the ids of the games having that value:
+
+    - "ECO", "Opening" and "OpeningFamily" (the opening name without the variation),
+    - "Player" (the game is listed under both players),
+    - "TimeControl" (speed category, see `time_control_bucket`),
+    - "Elo" (rating of the weaker player rounded down to a multiple of `elo_bucket_size`),
+    - "Year" (of the Date header).
+
+    A query intersects the posting lists, smallest first, and only the files containing matches are read.
+
+    Args:
+        files (List[str]): Indexed files.
+        file_offsets (np.ndarray): Global id of the first game of each file, with the total number of games
+            appended.
+        postings (Dict[Tuple[str, str], np.ndarray]): Posting list of each (field, value) key.
+        elo_bucket_size (int, optional): Width of the Elo buckets. Defaults to ELO_BUCKET_SIZE.
+        separator (str, optional): Separator of the CSV files. Defaults to ','.
+    """
+
+    def __init__(self, files: List[str], file_offsets: np.ndarray, postings: Dict[Tuple[str, str], np.ndarray],
+                 elo_bucket_size: int = ELO_BUCKET_SIZE, separator: str = ","):
+        self.files = files
+        self.file_offsets = file_offsets
+        self.postings = postings
+        self.elo_bucket_size = elo_bucket_size
+        self.separator = separator
+
+    @property
+    def num_games(self) -> int:
+        return int(self.file_offsets[-1])
+
+    @classmethod
+    def build(cls, csv_paths: Sequence[str], elo_bucket_size: int = ELO_BUCKET_SIZE,
+              separator: str = ",") -> "GamesIndex":
+        """Indexes the files. Only the header columns are parsed, the moves are skipped."""
+        files, offsets, postings = [], [0], {}
+        for path in csv_paths:
+            if not os.path.isfile(path):
+                raise FileNotFoundError(f"File not found: {path}")
+            num_rows = 0
+            for chunk in pd.read_csv(path, usecols=INDEXED_COLUMNS, sep=separator, dtype=str,
+                                     keep_default_na=False, chunksize=CHUNK_SIZE):
+                first_id = offsets[-1] + num_rows
+                for key, rows in cls._chunk_keys(chunk, elo_bucket_size):
+                    postings.setdefault(key, []).append(rows.astype(np.uint32) + first_id)
+                num_rows += len(chunk)
+            files.append(os.path.abspath(path))
+            offsets.append(offsets[-1] + num_rows)
+            logging.info(f"Indexed {num_rows} games of {path}")
+        postings = {key: np.concatenate(lists) for key, lists in postings.items()}
+        return cls(files, np.array(offsets, dtype=np.int64), postings, elo_bucket_size, separator)
+
+    @staticmethod
+    def _chunk_keys(chunk: pd.DataFrame, elo_bucket_size: int) -> Iterable[Tuple[Tuple[str, str], np.ndarray]]:
+        elo = pd.concat([pd.to_numeric(chunk["WhiteElo"], errors="coerce"),
+                         pd.to_numeric(chunk["BlackElo"], errors="coerce")], axis=1).min(axis=1, skipna=False)
+        values = {
+            "ECO": chunk["ECO"],
+            "Opening": chunk["Opening"],
+            "OpeningFamily": chunk["Opening"].map(opening_family),
+            "TimeControl": chunk["TimeControl"].map(time_control_bucket),
+            "Elo": (elo // elo_bucket_size * elo_bucket_size).astype("Int64").astype(str),
+            "Year": chunk["Date"].str[:4],
+        }
+        for field, column in values.items():
+            for value, rows in column.groupby(column.to_numpy(), sort=False).indices.items():
+                if value not in ("", "?", "<NA>"):
+                    yield (field, value), rows
+        # A game is listed once under each player, sorted positions keep the posting lists sorted
+        players = pd.concat([chunk["White"], chunk["Black"]])
+        rows = np.concatenate([np.arange(len(chunk)), np.arange(len(chunk))])
+        for value, positions in players.groupby(players.to_numpy(), sort=False).indices.items():
+            if value not in ("", "?"):
+                yield ("Player", value), np.unique(rows[positions])
+
+    def posting_list(self, field: str, values: Union[str, Iterable[str]]) -> np.ndarray:
+        """Sorted ids of the games having any of the values in the field."""
+        values = [values] if isinstance(values, str) else list(values)
+        if not values:
+            return np.zeros(0, dtype=np.uint32)
+        lists = [self.postings.get((field, str(value)), np.zeros(0, dtype=np.uint32)) for value in values]
+        return lists[0] if len(lists) == 1 else np.unique(np.concatenate(lists))
+
+    def search(self, eco=None, opening=None, opening_family=None, player=None, time_control=None, year=None,
+               min_elo: Optional[int] = None, max_elo: Optional[int] = None) -> np.ndarray:
+        """Ids of the games matching all given criteria. Each criterion is a value or a list of values.
+
+        The Elo range is matched at bucket granularity on the rating of the weaker player, so the ids can include
+        a few games outside of it. `read_rows` applies the exact range.
+        """
+        lists = [self.posting_list(field, values) for field, values in
+                 [("ECO", eco), ("Opening", opening), ("OpeningFamily", opening_family), ("Player", player),
+                  ("TimeControl", time_control), ("Year", year)] if values is not None]
+        if min_elo is not None or max_elo is not None:
+            lists.append(self.posting_list("Elo", self._elo_buckets(min_elo, max_elo)))
+        if not lists:
+            return np.arange(self.num_games, dtype=np.uint32)
+        lists.sort(key=len)
+        return reduce(lambda ids, other: np.intersect1d(ids, other, assume_unique=True), lists)
+
+    def _elo_buckets(self, min_elo: Optional[int], max_elo: Optional[int]) -> List[str]:
+        buckets = [int(value) for field, value in self.postings if field == "Elo"]
+        low = min_elo // self.elo_bucket_size * self.elo_bucket_size if min_elo is not None else -np.inf
+        high = max_elo if max_elo is not None else np.inf
+        return [str(bucket) for bucket in buckets if low <= bucket <= high]
+
+    def locations(self, ids: np.ndarray) -> List[Tuple[str, int]]:
+        """(file, row) of each game id."""
+        file_indices = np.searchsorted(self.file_offsets, ids, side="right") - 1
+        return [(self.files[file_index], int(game_id - self.file_offsets[file_index]))
+                for file_index, game_id in zip(file_indices, ids)]
+
+    def read_rows(self, ids: np.ndarray, columns: Optional[List[str]] = None, min_elo: Optional[int] = None,
+                  max_elo: Optional[int] = None) -> pd.DataFrame:
+        """Reads the rows of the games, opening only the files that contain some of them.
+
+        Args:
+            ids (np.ndarray): Game ids, e.g. from `search`.
+            columns (List[str], optional): Columns to read. Defaults to all HEADERS.
+            min_elo (int, optional): Minimum rating of both players.
+            max_elo (int, optional): Maximum rating of both players.
+
+        Returns:
+            pd.DataFrame: The rows with the "File" and "Row" of each game.
+        """
+        columns = list(columns or HEADERS)
+        read_columns = list(dict.fromkeys(columns + (["WhiteElo", "BlackElo"]
+                                                     if min_elo is not None or max_elo is not None else [])))
+        ids = np.unique(np.asarray(ids, dtype=np.int64))
+        frames = []
+        for file_index, path in enumerate(self.files):
+            start, end = self.file_offsets[file_index], self.file_offsets[file_index + 1]
+            rows = ids[(ids >= start) & (ids < end)] - start
+            if not len(rows):
+                continue
+            wanted = set((rows + 1).tolist())
+            # Lines of other games are skipped by the parser without splitting them into fields
+            frame = pd.read_csv(path, usecols=read_columns, sep=self.separator, dtype=str,
+                                skiprows=lambda line: line != 0 and line not in wanted)
+            frame["File"], frame["Row"] = path, rows
+            frames.append(frame)
+        if not frames:
+            return pd.DataFrame(columns=columns + ["File", "Row"])
+        df = pd.concat(frames, ignore_index=True)
+        if min_elo is not None or max_elo is not None:
+            elo = pd.concat([pd.to_numeric(df["WhiteElo"], errors="coerce"),
+                             pd.to_numeric(df["BlackElo"], errors="coerce")], axis=1)
+            keep = pd.Series(True, index=df.index)
+            if min_elo is not None:
+                keep &= elo.min(axis=1) >= min_elo
+            if max_elo is not None:
+                keep &= elo.max(axis=1) <= max_elo
+            df = df[keep].reset_index(drop=True)
+        return df[columns + ["File", "Row"]]
+
+    def query(self, columns: Optional[List[str]] = None, **criteria) -> pd.DataFrame:
+        """Searches the games (see `search` for the criteria) and loads the matching rows."""
+        ids = self.search(**criteria)
+        return self.read_rows(ids, columns, criteria.get("min_elo"), criteria.get("max_elo"))
+
+    def save(self, path: str) -> None:
+        """Saves the index to a .npz file: one concatenated array of all posting lists and the key table."""
+        keys = sorted(self.postings)
+        lengths = [len(self.postings[key]) for key in keys]
+        np.savez(path,
+                 keys=np.array([KEY_SEPARATOR.join(key) for key in keys]),
+                 offsets=np.concatenate([[0], np.cumsum(lengths)]).astype(np.int64),
+                 postings=np.concatenate([self.postings[key] for key in keys]) if keys
+                 else np.zeros(0, dtype=np.uint32),
+                 files=np.array(self.files),
+                 file_offsets=self.file_offsets,
+                 settings=np.array([self.elo_bucket_size]),
+                 separator=np.array(self.separator))
+
+    @classmethod
+    def load(cls, path: str) -> "GamesIndex":
+        with np.load(path) as data:
+            offsets, postings = data["offsets"], data["postings"]
+            index = {tuple(key.split(KEY_SEPARATOR, 1)): postings[offsets[position]:offsets[position + 1]]
+                     for position, key in enumerate(data["keys"])}
+            return cls(data["files"].tolist(), data["file_offsets"], index, int(data["settings"][0]),
+                       str(data["separator"]))
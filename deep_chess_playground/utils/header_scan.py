@@ -0,0 +1,163 @@
+"""Header statistics of .pgn.zst files without parsing the games.
+
+The scan works on the decompressed bytes. One regex pass per chunk finds the tag lines it counts (a tag line
+starts a line with `[`, so the movetext is skipped without being tokenized), `collections.Counter` counts
+the distinct (tag, value) pairs in C and the games are counted as `[Event ` lines. Only the distinct values
+are then mapped to bins of fixed-size histograms, so both the time per game and the memory use stay small.
+"""
+import re
+from collections import Counter
+from typing import Dict, List
+import numpy as np
+import pandas as pd
+import zstandard as zstd
+from deep_chess_playground.utils.byte_sources import STDIN, Source, open_source
+from deep_chess_playground.utils.games_index import ELO_BUCKET_SIZE, TIME_CONTROLS, time_control_bucket
+
+
+CHUNK_SIZE = 1024 * 1024
+FIRST_YEAR = 1800
+LAST_YEAR = 2099
+MAX_ELO = 4000
+RESULTS = ["1-0", "0-1", "1/2-1/2", "*"]
+TERMINATIONS = ["Normal", "Time forfeit", "Abandoned", "Rules infraction", "Unterminated"]
+GAME_START = b'\n[Event "'
+# Histogram of every counted tag
+HISTOGRAM_TAGS = {b"Date": "months", b"WhiteElo": "elo", b"BlackElo": "elo", b"TimeControl": "time_controls",
+                  b"Termination": "terminations", b"Result": "results"}
+TAG_REGEX = re.compile(rb'\n\[(' + b"|".join(HISTOGRAM_TAGS) + rb') "([^"]*)"')
+
+
+class HeaderHistograms:
+    """Counts of the games of a PGN stream by month, player rating, time control, termination and result.
+
+    Every histogram has a last bin for games with a missing or unexpected value:
+
+    - months: one bin per month from FIRST_YEAR to LAST_YEAR, from the Date tag,
+    - elo: the WhiteElo and BlackElo of every game (two counts per game) in `elo_bucket_size` bins up to
+      MAX_ELO,
+    - time_controls: the speed categories of TIME_CONTROLS (see `time_control_bucket`),
+    - terminations: the lichess TERMINATIONS,
+    - results: the RESULTS.
+
+    Args:
+        elo_bucket_size (int, optional): Width of the rating bins. Defaults to ELO_BUCKET_SIZE.
+    """
+
+    def __init__(self, elo_bucket_size: int = ELO_BUCKET_SIZE):
+        self.elo_bucket_size = elo_bucket_size
+        self.num_games = 0
+        self.months = np.zeros((LAST_YEAR - FIRST_YEAR + 1) * 12 + 1, dtype=np.int64)
+        self.elo = np.zeros(-(-MAX_ELO // elo_bucket_size) + 1, dtype=np.int64)
+        self.time_controls = np.zeros(len(TIME_CONTROLS) + 1, dtype=np.int64)
+        self.terminations = np.zeros(len(TERMINATIONS) + 1, dtype=np.int64)
+        self.results = np.zeros(len(RESULTS) + 1, dtype=np.int64)
+        self._value_bins = {
+            "months": self._month_bin, "elo": self._elo_bin, "time_controls": self._time_control_bin,
+            "terminations": lambda value: self._label_bin(TERMINATIONS, value),
+            "results": lambda value: self._label_bin(RESULTS, value)}
+        # Bin of every raw value seen so far, tags have few distinct values
+        self._bins = {name: {} for name in self._value_bins}
+
+    def _month_bin(self, date: bytes) -> int:
+        if len(date) < 7 or not (date[:4].isdigit() and date[5:7].isdigit()):
+            return len(self.months) - 1
+        year, month = int(date[:4]), int(date[5:7])
+        if not (FIRST_YEAR <= year <= LAST_YEAR and 1 <= month <= 12):
+            return len(self.months) - 1
+        return (year - FIRST_YEAR) * 12 + month - 1
+
+    def _elo_bin(self, elo: bytes) -> int:
+        if not elo.isdigit() or int(elo) >= MAX_ELO:
+            return len(self.elo) - 1
+        return int(elo) // self.elo_bucket_size
+
+    @staticmethod
+    def _time_control_bin(time_control: bytes) -> int:
+        return TIME_CONTROLS.index(time_control_bucket(time_control.decode(errors="replace")))
+
+    @staticmethod
+    def _label_bin(labels: List[str], value: bytes) -> int:
+        value = value.decode(errors="replace")
+        return labels.index(value) if value in labels else len(labels)
+
+    def add_tag_counts(self, num_games: int, counts: Dict[tuple, int]) -> None:
+        """Adds games given by their number and the counts of their (tag, value) pairs, raw bytes of the
+        HISTOGRAM_TAGS. Games without a tag are counted in the last bin of its histogram."""
+        indices = {name: [] for name in self._bins}
+        weights = {name: [] for name in self._bins}
+        for (tag, value), count in counts.items():
+            name = HISTOGRAM_TAGS[tag]
+            index = self._bins[name].get(value)
+            if index is None:
+                index = self._bins[name][value] = self._value_bins[name](value)
+            indices[name].append(index)
+            weights[name].append(count)
+        for name in self._bins:
+            histogram = getattr(self, name)
+            histogram += np.bincount(indices[name], weights[name], minlength=len(histogram)).astype(np.int64)
+            expected = num_games * (2 if name == "elo" else 1)
+            histogram[-1] += expected - sum(weights[name])
+        self.num_games += num_games
+
+    def scan(self, data: bytes, final: bool = False) -> bytes:
+        """Counts the games and tags in the complete lines of the data and returns the rest, to be passed again
+        at the start of the next chunk. The data of a stream must start with a newline (see `scan_headers`) and
+        the last call must set `final`."""
+        # Tag lines end before the last newline, the rest may continue in the next chunk
+        end = len(data) if final else max(data.rfind(b"\n"), 0)
+        self.add_tag_counts(data.count(GAME_START, 0, end), Counter(TAG_REGEX.findall(data, 0, end)))
+        return data[end:]
+
+    def summary(self) -> Dict[str, Dict[str, int]]:
+        """The non-zero counts of every histogram by label, "?" for missing or unexpected values."""
+        month_labels = [f"{FIRST_YEAR + index // 12}-{index % 12 + 1:02d}" for index in range(len(self.months) - 1)]
+        elo_labels = [str(index * self.elo_bucket_size) for index in range(len(self.elo) - 1)]
+        summary = {"games": {"total": self.num_games}}
+        for name, histogram, labels in (("months", self.months, month_labels), ("elo", self.elo, elo_labels),
+                                        ("time_controls", self.time_controls, TIME_CONTROLS),
+                                        ("terminations", self.terminations, TERMINATIONS),
+                                        ("results", self.results, RESULTS)):
+            summary[name] = {label: int(count) for label, count in zip(labels + ["?"], histogram) if count}
+        return summary
+
+    def to_frame(self, name: str) -> pd.DataFrame:
+        """The non-zero bins of a histogram ("months", "elo", ...) as a DataFrame of labels and counts."""
+        return pd.DataFrame(list(self.summary()[name].items()), columns=[name, "games"])
+
+
+def scan_headers(pgn_zst_path: Source, chunk_size: int = CHUNK_SIZE, elo_bucket_size: int = ELO_BUCKET_SIZE,
+                 stats=None) -> HeaderHistograms:
+    """Scans the headers of all games of a .pgn.zst file.
+
+    Args:
+        pgn_zst_path (Source): Path or http(s) URL of the .pgn.zst file, "-" for stdin or a binary stream.
+        chunk_size (int, optional): Decompressed bytes per read. Defaults to CHUNK_SIZE.
+        elo_bucket_size (int, optional): Width of the rating bins. Defaults to ELO_BUCKET_SIZE.
+        stats (ConversionStats, optional): Updated with the bytes read and games scanned.
+    """
+    histograms = HeaderHistograms(elo_bucket_size)
+    f, size = open_source(pgn_zst_path)
+    if stats is not None:
+        stats.compressed_bytes_total = size or 0
+    try:
+        reader = zstd.ZstdDecompressor().stream_reader(f, read_across_frames=True)
+        rest = b"\n"
+        while chunk := reader.read(chunk_size):
+            data = rest + chunk
+            if b"\r" in data:
+                data = data.replace(b"\r\n", b"\n")
+            rest = histograms.scan(data)
+            if stats is not None:
+                # The position of streams of unknown size may not be known either
+                if size is not None:
+                    stats.compressed_bytes_read = f.tell()
+                stats.decompressed_bytes += len(chunk)
+                stats.games_parsed = histograms.num_games
+        histograms.scan(rest, final=True)
+    finally:
+        if isinstance(pgn_zst_path, str) and pgn_zst_path != STDIN:
+            f.close()
+    if stats is not None:
+        stats.games_parsed = histograms.num_games
+    return histograms
@@ -0,0 +1,62 @@
+"""Moves as 16-bit codes, a compact alternative to the SAN text of the `Moves` column.
+
+A move is encoded as `from_square | to_square << 6 | promotion_piece_type << 12` (python-chess squares and
+piece types, 0 without promotion, castling as the king's two-square move), so every code fits a uint16.
+
+The converter can save the moves of the games of a `{n}.csv.gz` file to a compressed `{n}.moves.npz` sidecar
+with two arrays: `codes`, the uint16 codes of all games concatenated, and `offsets`, the int64 position of the
+first code of every game with the total number of codes appended (game i is codes[offsets[i]:offsets[i + 1]]).
+Readers decode them in bulk with NumPy (`decode_move_codes`, `MoveEncoder8x8x73.indices_from_codes`) and
+replay them without parsing SAN.
+"""
+from typing import Iterable, Tuple
+import chess
+import numpy as np
+from deep_chess_playground.utils.trusted_replay import TrustedBoard
+
+
+SIDECAR_SUFFIX = ".moves.npz"
+
+
+def encode_move(move: chess.Move) -> int:
+    return move.from_square | move.to_square << 6 | (move.promotion or 0) << 12
+
+
+def decode_move(code: int) -> chess.Move:
+    return chess.Move(code & 0x3F, (code >> 6) & 0x3F, (code >> 12) or None)
+
+
+def decode_move_codes(codes: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Splits codes into (from squares, to squares, promotion piece types) arrays without a Python loop."""
+    codes = np.asarray(codes, dtype=np.uint16)
+    return codes & 0x3F, (codes >> 6) & 0x3F, codes >> 12
+
+
+def san_to_codes(moves: str) -> np.ndarray:
+    """Codes of a space-separated SAN move list, resolved with a TrustedBoard (no legality checks).
+
+    Raises:
+        ValueError: If a move can't be resolved.
+    """
+    board = TrustedBoard()
+    return np.array([encode_move(board.push_san(san)) for san in moves.split()], dtype=np.uint16)
+
+
+def sidecar_path(csv_path: str) -> str:
+    """Path of the move codes sidecar of a converted .csv.gz file."""
+    return (csv_path[:-len(".csv.gz")] if csv_path.endswith(".csv.gz") else csv_path) + SIDECAR_SUFFIX
+
+
+def save_move_codes(path: str, games: Iterable[np.ndarray]) -> None:
+    """Saves the code arrays of games to a sidecar file."""
+    games = list(games)
+    offsets = np.zeros(len(games) + 1, dtype=np.int64)
+    np.cumsum([len(codes) for codes in games], out=offsets[1:])
+    codes = np.concatenate(games).astype(np.uint16) if games else np.zeros(0, dtype=np.uint16)
+    np.savez_compressed(path, codes=codes, offsets=offsets)
+
+
+def load_move_codes(path: str) -> Tuple[np.ndarray, np.ndarray]:
+    """Returns the (codes, offsets) arrays of a sidecar file."""
+    with np.load(path) as data:
+        return data["codes"], data["offsets"]
@@ -16,7 +16,7 @@ class Move:
         self._direction = self._chess_move_to_direction()
         self._square_distance = max(abs(self._file_diff), abs(self._rank_diff))
         self._knight_move = (True if self._square_distance == 2
-                             and (self._file_diff == 1 or self._rank_diff == 1)
+                             and (abs(self._file_diff) == 1 or abs(self._rank_diff) == 1)
                              else False)
 
     @property
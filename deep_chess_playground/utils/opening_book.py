@@ -0,0 +1,252 @@
+"""Opening book built from converted games.
+
+Book file format (all integers little-endian):
+
+    header (32 bytes):  magic b"DCPBOOK\\0", version u32, record size u32, max ply u32, reserved u32,
+                        number of records u64
+    records (24 bytes): key u64, move u16, flags u16, wins u32, draws u32, losses u32
+
+The key is the Polyglot Zobrist hash of the position. The move is a 16-bit code of `utils.move_codes`
+and bit 0 of the flags marks castling. Wins, draws and losses are counted from the perspective of
+the player making the move. Records are sorted by key and then by move, so all moves of a position are
+adjacent and can be found by binary search.
+"""
+import logging
+import mmap
+import os
+import struct
+import tempfile
+from typing import Iterator, List, NamedTuple, Optional, Sequence, Union
+import chess
+import chess.polyglot
+import numpy as np
+import pandas as pd
+from deep_chess_playground.utils.move_codes import decode_move, encode_move
+
+
+MAGIC = b"DCPBOOK\0"
+VERSION = 1
+HEADER_STRUCT = struct.Struct("<8sIIIIQ")
+RECORD_DTYPE = np.dtype([("key", "<u8"), ("move", "<u2"), ("flags", "<u2"), ("wins", "<u4"), ("draws", "<u4"),
+                         ("losses", "<u4")])
+KEY_STRUCT = struct.Struct("<Q")
+CASTLING_FLAG = 1
+MAX_PLY = 20
+RUN_SIZE = 10_000_000
+MERGE_BLOCK_SIZE = 1_000_000
+CHUNK_SIZE = 10_000
+POLYGLOT_ENTRY_STRUCT = struct.Struct(">QHHI")
+
+
+class BookEntry(NamedTuple):
+    """A move of a book position with its results from the perspective of the player making it."""
+    move: chess.Move
+    wins: int
+    draws: int
+    losses: int
+
+    @property
+    def count(self) -> int:
+        return self.wins + self.draws + self.losses
+
+    @property
+    def score(self) -> float:
+        return (self.wins + self.draws / 2) / self.count
+
+
+class OpeningBookBuilder:
+    """Builds an opening book from the .csv.gz files written by PgnZstToCsvGzConverter.
+
+    Games are streamed in chunks and replayed up to `max_ply`. Every (key, move, result) is appended to a
+    fixed-size buffer; a full buffer is sorted, aggregated and written to a temporary run file, so memory use
+    doesn't depend on the amount of data. The runs are then merged block by block into the book file.
+
+    Args:
+        max_ply (int, optional): Number of plies of each game added to the book. Defaults to MAX_PLY.
+        min_count (int, optional): Moves played fewer times are left out. Defaults to 1.
+        run_size (int, optional): Number of records sorted in memory at once. Defaults to RUN_SIZE.
+        separator (str, optional): Separator of the CSV files. Defaults to ','.
+    """
+
+    def __init__(self, max_ply: int = MAX_PLY, min_count: int = 1, run_size: int = RUN_SIZE, separator: str = ","):
+        self._max_ply = max_ply
+        self._min_count = min_count
+        self._run_size = run_size
+        self._separator = separator
+
+    def build(self, csv_paths: Sequence[str], book_path: str) -> int:
+        """Builds the book and returns the number of records written."""
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            runs, buffer, size = [], np.zeros(self._run_size, dtype=RECORD_DTYPE), 0
+            for key, move, flags, score in self._positions(csv_paths):
+                buffer[size] = (key, move, flags, score == 2, score == 1, score == 0)
+                size += 1
+                if size == self._run_size:
+                    runs.append(self._write_run(buffer[:size], tmp_dir, len(runs)))
+                    size = 0
+            if size:
+                runs.append(self._write_run(buffer[:size], tmp_dir, len(runs)))
+            del buffer
+            return self._merge_runs(runs, book_path)
+
+    def _positions(self, csv_paths: Sequence[str]) -> Iterator[tuple]:
+        """Yields (key, move, flags, score points of the mover: 2, 1 or 0) of the first plies of the games."""
+        for path in csv_paths:
+            for chunk in pd.read_csv(path, usecols=["Result", "Moves"], sep=self._separator, dtype=str,
+                                     chunksize=CHUNK_SIZE):
+                for result, moves in zip(chunk["Result"], chunk["Moves"].fillna("")):
+                    if result not in ("1-0", "0-1", "1/2-1/2"):
+                        continue
+                    white_points = {"1-0": 2, "0-1": 0}.get(result, 1)
+                    board = chess.Board()
+                    try:
+                        for san in moves.split()[:self._max_ply]:
+                            move = board.parse_san(san)
+                            points = white_points if board.turn == chess.WHITE else 2 - white_points
+                            yield (chess.polyglot.zobrist_hash(board), encode_move(move),
+                                   CASTLING_FLAG if board.is_castling(move) else 0, points)
+                            board.push(move)
+                    except ValueError as e:
+                        logging.warning(f"Skipping the rest of an invalid game in {path}: {e}")
+
+    @staticmethod
+    def _aggregate(records: np.ndarray) -> np.ndarray:
+        """Sorts records by (key, move) and sums the results of equal moves."""
+        records = records[np.lexsort((records["move"], records["key"]))]
+        starts = np.flatnonzero(np.concatenate([[True], (records["key"][1:] != records["key"][:-1])
+                                                | (records["move"][1:] != records["move"][:-1])]))
+        aggregated = records[starts].copy()
+        for field in ("wins", "draws", "losses"):
+            aggregated[field] = np.add.reduceat(records[field], starts)
+        return aggregated
+
+    def _write_run(self, records: np.ndarray, tmp_dir: str, run_index: int) -> str:
+        path = os.path.join(tmp_dir, f"{run_index}.run")
+        self._aggregate(records).tofile(path)
+        logging.info(f"Wrote sorted run {path} with {len(records)} positions")
+        return path
+
+    def _merge_runs(self, runs: List[str], book_path: str) -> int:
+        """Merges the sorted runs in blocks: each step takes the records of all runs up to the smallest last
+        key of their next blocks, so the moves of a position are never split between two steps."""
+        sources = [np.memmap(path, dtype=RECORD_DTYPE, mode="r") for path in runs if os.path.getsize(path)]
+        positions = [0] * len(sources)
+        num_records = 0
+        with open(book_path, "wb") as f:
+            f.write(HEADER_STRUCT.pack(MAGIC, VERSION, RECORD_DTYPE.itemsize, self._max_ply, 0, 0))
+            while any(position < len(source) for position, source in zip(positions, sources)):
+                active = [index for index, source in enumerate(sources) if positions[index] < len(source)]
+                boundary = min(int(sources[index]["key"][min(positions[index] + MERGE_BLOCK_SIZE,
+                                                             len(sources[index])) - 1]) for index in active)
+                blocks = []
+                for index in active:
+                    source, start = sources[index], positions[index]
+                    keys = np.asarray(source["key"][start:start + MERGE_BLOCK_SIZE])
+                    end = start + int(np.searchsorted(keys, np.uint64(boundary), side="right"))
+                    # The other moves of the boundary position can follow the block
+                    while end < len(source) and int(source["key"][end]) == boundary:
+                        end += 1
+                    blocks.append(np.asarray(source[start:end]))
+                    positions[index] = end
+                merged = self._aggregate(np.concatenate(blocks))
+                merged = merged[merged["wins"] + merged["draws"] + merged["losses"] >= self._min_count]
+                merged.tofile(f)
+                num_records += len(merged)
+            f.seek(0)
+            f.write(HEADER_STRUCT.pack(MAGIC, VERSION, RECORD_DTYPE.itemsize, self._max_ply, 0, num_records))
+        del sources
+        logging.info(f"Saved opening book {book_path} with {num_records} moves")
+        return num_records
+
+
+class OpeningBook:
+    """Reader of a book file, see the module docstring for the format.
+
+    The file is memory-mapped and searched in place: a lookup is a binary search over the records touching
+    O(log n) pages, so there is no load step and the operating system shares the pages between processes.
+
+    Args:
+        path (str): Path to the book file.
+
+    Raises:
+        ValueError: If the file is not a book of a supported version.
+    """
+
+    def __init__(self, path: str):
+        with open(path, "rb") as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, record_size, self.max_ply, _, self._num_records = HEADER_STRUCT.unpack_from(self._mmap)
+        if magic != MAGIC or version != VERSION or record_size != RECORD_DTYPE.itemsize:
+            raise ValueError(f"Not an opening book of version {VERSION}: {path}")
+        if hasattr(mmap, "MADV_RANDOM"):
+            self._mmap.madvise(mmap.MADV_RANDOM)
+
+    def __len__(self) -> int:
+        return self._num_records
+
+    def _key_at(self, index: int) -> int:
+        return KEY_STRUCT.unpack_from(self._mmap, HEADER_STRUCT.size + index * RECORD_DTYPE.itemsize)[0]
+
+    def _records(self, start: int = 0, count: Optional[int] = None) -> np.ndarray:
+        count = self._num_records - start if count is None else count
+        return np.frombuffer(self._mmap, dtype=RECORD_DTYPE, count=count,
+                             offset=HEADER_STRUCT.size + start * RECORD_DTYPE.itemsize)
+
+    def find_all(self, position: Union[chess.Board, int]) -> List[BookEntry]:
+        """Moves of the position (a board or its Polyglot key), the most played first."""
+        key = chess.polyglot.zobrist_hash(position) if isinstance(position, chess.Board) else position
+        low, high = 0, self._num_records
+        while low < high:
+            middle = (low + high) // 2
+            if self._key_at(middle) < key:
+                low = middle + 1
+            else:
+                high = middle
+        end = low
+        while end < self._num_records and self._key_at(end) == key:
+            end += 1
+        if end == low:
+            return []
+        entries = [BookEntry(decode_move(int(record["move"])), int(record["wins"]), int(record["draws"]),
+                             int(record["losses"])) for record in self._records(low, end - low)]
+        return sorted(entries, key=lambda entry: entry.count, reverse=True)
+
+    def weighted_choice(self, board: chess.Board, rng: Optional[np.random.Generator] = None) \
+            -> Optional[chess.Move]:
+        """A book move sampled in proportion to how often it was played, or None outside of the book."""
+        entries = self.find_all(board)
+        if not entries:
+            return None
+        counts = np.array([entry.count for entry in entries], dtype=np.float64)
+        return entries[(rng or np.random.default_rng()).choice(len(entries), p=counts / counts.sum())].move
+
+    def export_polyglot(self, path: str) -> None:
+        """Writes the book in the Polyglot format read by most chess GUIs and python-chess.
+
+        The weight of a move is 2 * wins + draws, scaled down within a position if it doesn't fit 16 bits.
+        """
+        records = self._records()
+        starts = np.flatnonzero(np.concatenate([[True], records["key"][1:] != records["key"][:-1]])) \
+            if len(records) else np.zeros(0, dtype=np.int64)
+        points = 2 * records["wins"].astype(np.int64) + records["draws"]
+        maximum = np.maximum.reduceat(points, starts) if len(records) else points
+        scale = np.repeat(np.maximum(maximum / 0xFFFF, 1.0), np.diff(np.append(starts, len(records))))
+        weights = np.maximum(points / scale, 1).astype(np.int64)
+        with open(path, "wb") as f:
+            for record, weight in zip(records, weights):
+                f.write(POLYGLOT_ENTRY_STRUCT.pack(int(record["key"]), self._polyglot_move(record), int(weight), 0))
+
+    @staticmethod
+    def _polyglot_move(record) -> int:
+        move = decode_move(int(record["move"]))
+        to_square = move.to_square
+        if record["flags"] & CASTLING_FLAG:
+            # Polyglot encodes castling as the king capturing its own rook
+            to_square = chess.square(7 if chess.square_file(to_square) > 4 else 0, chess.square_rank(to_square))
+        promotion = move.promotion - 1 if move.promotion else 0
+        return (chess.square_file(to_square) | chess.square_rank(to_square) << 3
+                | chess.square_file(move.from_square) << 6 | chess.square_rank(move.from_square) << 9
+                | promotion << 12)
+
+    def close(self) -> None:
+        self._mmap.close()
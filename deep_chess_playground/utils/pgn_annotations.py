@@ -0,0 +1,127 @@
+"""Per-ply engine evaluations and clock times from the `[%eval ...]` and `[%clk ...]` comments of lichess games.
+
+The converter can parse the comments while parsing the games and save them to a compressed
+`{n}.annotations.npz` sidecar of every `{n}.csv.gz` file, with one value per ply (the comment after the move)
+of all games concatenated:
+
+    eval_cp (int16):   evaluation in centipawns from white's point of view, MISSING_EVAL without an eval or for
+                       a mate score
+    eval_mate (int16): moves to mate, positive if white mates and negative if black mates, 0 if not a mate score
+    clock (float32):   seconds left on the clock of the player who made the move, NaN without a clock
+    offsets (int64):   position of the first ply of every game with the total number of plies appended
+
+so the values of game i are at [offsets[i]:offsets[i + 1]], aligned with its moves.
+"""
+import re
+from typing import Iterable, List, NamedTuple, Optional, Tuple
+import numpy as np
+from pypaya_pgn_parser.movetext_parser import MovetextParser, ParseResult, PlayerColor
+from pypaya_pgn_parser.pgn_parser import PGNParser
+
+
+SIDECAR_SUFFIX = ".annotations.npz"
+MISSING_EVAL = -32768
+MATE_EVAL = 20.0
+EVAL_REGEX = re.compile(r"\[%eval\s+(#)?([+-]?\d+(?:\.\d+)?)")
+CLOCK_REGEX = re.compile(r"\[%clk\s+(\d+):(\d+):(\d+(?:\.\d+)?)\s*\]")
+
+
+class Annotations(NamedTuple):
+    """Per-ply arrays of one game or of all games of a file, see the module docstring."""
+    eval_cp: np.ndarray
+    eval_mate: np.ndarray
+    clock: np.ndarray
+
+
+def parse_comment(comment: str) -> Tuple[int, int, float]:
+    """Returns the (centipawns, moves to mate, clock seconds) of a comment, see the module docstring for the
+    values of missing annotations."""
+    eval_cp, eval_mate, clock = MISSING_EVAL, 0, float("nan")
+    match = EVAL_REGEX.search(comment)
+    if match:
+        if match.group(1):
+            eval_mate = int(float(match.group(2)))
+        else:
+            eval_cp = int(np.clip(round(float(match.group(2)) * 100), MISSING_EVAL + 1, 32767))
+    match = CLOCK_REGEX.search(comment)
+    if match:
+        hours, minutes, seconds = match.groups()
+        clock = int(hours) * 3600 + int(minutes) * 60 + float(seconds)
+    return eval_cp, eval_mate, clock
+
+
+def ply_annotations(result: ParseResult) -> Annotations:
+    """Annotations of every ply of a game parsed by MovetextParser."""
+    num_plies = len(result.moves)
+    annotations = Annotations(np.full(num_plies, MISSING_EVAL, dtype=np.int16), np.zeros(num_plies, dtype=np.int16),
+                              np.full(num_plies, np.nan, dtype=np.float32))
+    for move_number, color, comment in result.comments:
+        if "[%" not in comment:
+            continue
+        ply = 2 * (move_number - 1) + (color == PlayerColor.BLACK)
+        if 0 <= ply < num_plies:
+            annotations.eval_cp[ply], annotations.eval_mate[ply], annotations.clock[ply] = parse_comment(comment)
+    return annotations
+
+
+class _RecordingMovetextParser(MovetextParser):
+    """Keeps the result of the last parsed movetext, PGNParser only returns its moves."""
+
+    def __init__(self):
+        super().__init__()
+        self.last_result: Optional[ParseResult] = None
+
+    def parse(self, movetext: str) -> ParseResult:
+        self.last_result = super().parse(movetext)
+        return self.last_result
+
+
+class AnnotatedPGNParser(PGNParser):
+    """PGNParser which also extracts the annotations of every parsed game.
+
+    Attributes:
+        annotations (Annotations): Annotations of the game returned by the last `parse` call.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.movetext_parser = _RecordingMovetextParser()
+        self.annotations = ply_annotations(ParseResult([], []))
+
+    def parse(self, stream) -> Optional[Tuple[List[str], str]]:
+        self.movetext_parser.last_result = None
+        result = super().parse(stream)
+        last_result = self.movetext_parser.last_result
+        self.annotations = ply_annotations(last_result if last_result is not None else ParseResult([], []))
+        return result
+
+
+def annotations_path(csv_path: str) -> str:
+    """Path of the annotations sidecar of a converted .csv.gz file."""
+    return (csv_path[:-len(".csv.gz")] if csv_path.endswith(".csv.gz") else csv_path) + SIDECAR_SUFFIX
+
+
+def save_annotations(path: str, games: Iterable[Annotations]) -> None:
+    """Saves the annotations of games to a sidecar file."""
+    games = list(games)
+    offsets = np.zeros(len(games) + 1, dtype=np.int64)
+    np.cumsum([len(game.eval_cp) for game in games], out=offsets[1:])
+    arrays = {name: np.concatenate([getattr(game, name) for game in games]).astype(dtype) if games
+              else np.zeros(0, dtype=dtype)
+              for name, dtype in (("eval_cp", np.int16), ("eval_mate", np.int16), ("clock", np.float32))}
+    np.savez_compressed(path, offsets=offsets, **arrays)
+
+
+def load_annotations(path: str) -> Tuple[Annotations, np.ndarray]:
+    """Returns the annotations of all games of a sidecar file and the offsets of the games."""
+    with np.load(path) as data:
+        return Annotations(data["eval_cp"], data["eval_mate"], data["clock"]), data["offsets"]
+
+
+def eval_targets(eval_cp: np.ndarray, eval_mate: np.ndarray) -> np.ndarray:
+    """Evaluations as float32 pawns from white's point of view, clipped to ±MATE_EVAL, with mates at ±MATE_EVAL
+    and NaN where there is no evaluation."""
+    pawns = np.clip(np.asarray(eval_cp, dtype=np.float32) / 100, -MATE_EVAL, MATE_EVAL)
+    pawns[np.asarray(eval_cp) == MISSING_EVAL] = np.nan
+    eval_mate = np.asarray(eval_mate)
+    return np.where(eval_mate != 0, np.sign(eval_mate) * MATE_EVAL, pawns).astype(np.float32)
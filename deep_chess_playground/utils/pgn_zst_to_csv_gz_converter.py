@@ -1,28 +1,47 @@
+import argparse
+import codecs
 import io
+import json
 import os.path
 import logging
-from collections import deque
-from typing import List, Optional
-from queue import Queue, Empty
+import time
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+from queue import Queue, Empty, Full
 import zstandard as zstd
+import numpy as np
 import pandas as pd
 import threading
 from pypaya_pgn_parser.pgn_parser import PGNParser
+from deep_chess_playground.utils.byte_sources import STDIN, Source, is_local_file, open_source, source_name
+from deep_chess_playground.utils.conversion_telemetry import (METRICS_INTERVAL, ConversionStats,
+                                                              JsonLinesExporter, MetricsReporter,
+                                                              PrometheusExporter)
+from deep_chess_playground.utils.games_index import ELO_BUCKET_SIZE
+from deep_chess_playground.utils.header_scan import GAME_START, HeaderHistograms, scan_headers
 from deep_chess_playground.utils.headers import HEADERS
+from deep_chess_playground.utils.move_codes import san_to_codes, save_move_codes, sidecar_path
+from deep_chess_playground.utils.pgn_annotations import AnnotatedPGNParser, annotations_path, save_annotations
 
 
 # Constants
 CHUNK_SIZE = 1024 * 1024
+READ_SIZE = 1024 * 1024
+COMPRESSED_QUEUE_SIZE = 64
 CHUNKS_QUEUE_SIZE = 1024
 GAMES_QUEUE_SIZE = 1024 * 1024
 QUEUE_TIMEOUT = 1
 LOG_INTERVAL = 100
 ENCODING = 'utf-8'
+MOVES_FORMATS = ("san", "codes", "both")
+# Decompressed bytes kept to find the game starts crossing into the next data
+TAIL_SIZE = len(GAME_START) - 1
+GAME_START_TEXT = GAME_START.decode()
 
-
-# Set up logging
-logging.basicConfig(filename='pgn_zst_to_csv_gz_converter.log', level=logging.INFO,
-                    format='%(asctime)s - %(levelname)s - %(message)s')
+# The zstd frame a chunk of decompressed data starts in: the compressed offset of the frame, the number of game
+# starts before it and the last TAIL_SIZE decompressed bytes before it
+Frame = Tuple[int, int, bytes]
+# The first game of a stream has no newline before its [Event tag
+FIRST_FRAME: Frame = (0, 0, b"\n")
 
 
 class PgnZstToCsvGzConverter:
@@ -31,26 +50,59 @@ class PgnZstToCsvGzConverter:
     This class reads a Zstandard-compressed PGN (Portable Game Notation) file,
     parses the chess games within, and writes them to CSV (Comma-Separated Values)
     files compressed with gzip. It uses a multi-threaded approach for efficient
-    processing of large files.
+    processing of large files: downloading, decompression, parsing and writing run in
+    their own threads connected by bounded queues, so they overlap.
+
+    The input can also be stdin, a pipe or any readable binary stream, or an http(s) URL read with Range
+    requests that reconnect where a dropped connection stopped (see `utils.byte_sources`), so a dump can be
+    converted while it is downloaded.
+
+    With a `checkpoint_path`, the progress is saved to that JSON file after every written .csv.gz file: the
+    files written, the games they cover and the compressed offset of the zstd frame the next game starts in.
+    Converting again with the same checkpoint resumes from there: the input is opened at that offset (files
+    seek, URLs request the range, other streams discard the bytes before it) and the games of the frame which
+    were already written are skipped without being parsed. Skipping counts the `[Event "` tags, so every game
+    has to start with one, as lichess games do. An input compressed as a single frame is decompressed from the
+    start again, one compressed in independent frames (e.g. with `zstd -T0`) resumes close to the interruption.
+    The checkpoint also records the input and the settings of the written files, resuming with other ones raises
+    a ValueError instead of mixing their outputs.
 
     Args:
-        pgn_zst_path (str): Path to the input .pgn.zst file.
+        pgn_zst_path (Source): Path to the input .pgn.zst file, an http(s) URL, "-" for stdin or a readable
+            binary stream.
         destination_dir (str): Directory where the output .csv.gz files will be saved.
         num_games_per_file (int): Maximum number of games to include in each output file.
-        chunk_size (int, optional): Size of each chunk read from the input file. Defaults to CHUNK_SIZE.
+        chunk_size (int, optional): Maximum size of the decompressed chunks passed to the parser.
+            Defaults to CHUNK_SIZE.
         separator (str, optional): Separator to use in the CSV files. Defaults to ','.
+        metrics_callbacks (Sequence[Callable[[Dict[str, float]], None]], optional): Called from a background
+            thread with a snapshot of the stats every `metrics_interval` seconds and once at the end, e.g.
+            a JsonLinesExporter or PrometheusExporter. Defaults to none.
+        metrics_interval (float, optional): Seconds between snapshots. Defaults to METRICS_INTERVAL.
+        moves_format (str, optional): "san" keeps the moves as SAN text in the `Moves` column, "codes" saves
+            them as 16-bit codes to a `{n}.moves.npz` sidecar of every `{n}.csv.gz` file instead (see
+            `utils.move_codes`) and "both" does both. Defaults to "san".
+        annotations (bool, optional): Also parse the `[%eval]` and `[%clk]` comments of the moves into per-ply
+            arrays saved to a `{n}.annotations.npz` sidecar of every file (see `utils.pgn_annotations`).
+            Defaults to False.
+        checkpoint_path (str, optional): JSON file the progress is saved to, and resumed from if it exists.
+            Defaults to None, no checkpoints.
 
     Attributes:
-        _pgn_zst_path (str): Path to the input .pgn.zst file.
+        stats (ConversionStats): Bytes, games, queue occupancy and stall times of the current run.
+        _pgn_zst_path (Source): The input .pgn.zst file, URL or stream.
         _destination_dir (str): Directory where output .csv.gz files are saved.
         _num_games_per_file (int): Maximum number of games per .csv.gz file.
-        _chunk_size (int): Size of a single read from the source file.
+        _chunk_size (int): Maximum size of a decompressed chunk.
         _separator (str): Separator used in .csv files.
-        _chunks_queue (Queue): Queue for storing file chunks.
-        _games_queue (Queue): Queue for storing parsed games.
-        _end_of_data (bool): Flag indicating end of input data.
+        _compressed_queue (Queue): Queue for storing compressed blocks.
+        _chunks_queue (Queue): Queue for storing decompressed chunks with their frames.
+        _games_queue (Queue): Queue for storing parsed games with the progress after them.
+        _failed (threading.Event): Set when a thread fails, which stops the others.
+        _errors (List[Exception]): Errors of the failed threads.
         _csv_file_counter (int): Counter for generated CSV files.
-        _parser (PGNParser): Parser object for PGN data.
+        _checkpoint (Dict[str, Any]): Progress the current conversion resumes from, empty if none.
+        _parser (PGNParser): Parser object for PGN data, an AnnotatedPGNParser with `annotations`.
 
     Raises:
         FileNotFoundError: If the input file or destination directory doesn't exist.
@@ -65,47 +117,80 @@ class PgnZstToCsvGzConverter:
 
     def __init__(
             self,
-            pgn_zst_path: str,
+            pgn_zst_path: Source,
             destination_dir: str,
             num_games_per_file: int,
             chunk_size: int = CHUNK_SIZE,
-            separator: str = ','
+            separator: str = ',',
+            metrics_callbacks: Sequence[Callable[[Dict[str, float]], None]] = (),
+            metrics_interval: float = METRICS_INTERVAL,
+            moves_format: str = "san",
+            annotations: bool = False,
+            checkpoint_path: Optional[str] = None
     ):
         self._validate_inputs(pgn_zst_path, destination_dir)
+        if moves_format not in MOVES_FORMATS:
+            raise ValueError(f"Invalid moves format {moves_format}, expected one of {MOVES_FORMATS}")
 
         self._pgn_zst_path = pgn_zst_path
         self._destination_dir = destination_dir
         self._num_games_per_file = num_games_per_file
         self._chunk_size = chunk_size
         self._separator = separator
+        self._compressed_queue: Queue = Queue(maxsize=COMPRESSED_QUEUE_SIZE)
         self._chunks_queue: Queue = Queue(maxsize=CHUNKS_QUEUE_SIZE)
         self._games_queue: Queue = Queue(maxsize=GAMES_QUEUE_SIZE)
-        self._end_of_data = False
+        self._failed = threading.Event()
+        self._errors: List[Exception] = []
         self._csv_file_counter = 0
-        self._parser = PGNParser()
+        self._checkpoint_path = checkpoint_path
+        self._checkpoint: Dict[str, Any] = {}
+        self._parser = AnnotatedPGNParser() if annotations else PGNParser()
+        self._metrics_callbacks = list(metrics_callbacks)
+        self._metrics_interval = metrics_interval
+        self._moves_format = moves_format
+        self._annotations = annotations
+        self.stats = self._new_stats()
 
-        logging.info(f"Initialized PgnZstToCsvGzConverter with file: {pgn_zst_path}")
+        logging.info(f"Initialized PgnZstToCsvGzConverter with file: {source_name(pgn_zst_path)}")
 
     @staticmethod
-    def _validate_inputs(pgn_zst_path: str, destination_dir: str) -> None:
+    def _validate_inputs(pgn_zst_path: Source, destination_dir: str) -> None:
         """Validate input file and destination directory."""
-        if not os.path.exists(pgn_zst_path):
+        if is_local_file(pgn_zst_path) and not os.path.exists(pgn_zst_path):
             raise FileNotFoundError(f"Input file not found: {pgn_zst_path}")
         if not os.path.exists(destination_dir):
             raise FileNotFoundError(f"Destination directory not found: {destination_dir}")
         if not os.access(destination_dir, os.W_OK):
             raise PermissionError(f"No write permission for destination directory: {destination_dir}")
-        if os.path.getsize(pgn_zst_path) == 0:
+        if is_local_file(pgn_zst_path) and os.path.getsize(pgn_zst_path) == 0:
             raise ValueError(f"Input file is empty: {pgn_zst_path}")
 
+    def _new_stats(self) -> ConversionStats:
+        # The size of other sources is known once they are opened, if at all
+        size = os.path.getsize(self._pgn_zst_path) if is_local_file(self._pgn_zst_path) else 0
+        return ConversionStats(size, {"compressed": self._compressed_queue, "chunks": self._chunks_queue,
+                                      "games": self._games_queue})
+
     def convert(self) -> None:
-        """Starts reading and writing threads."""
+        """Starts downloading, decompressing, parsing and writing threads."""
         logging.info("Starting conversion process")
+        self._checkpoint = self._load_checkpoint()
+        if self._checkpoint.get("complete"):
+            logging.info(f"Conversion already completed according to {self._checkpoint_path}")
+            return
+        self._csv_file_counter = self._checkpoint.get("files_written", 0)
+        self._failed.clear()
+        self._errors = []
+        self.stats = self._new_stats()
+        reporter = MetricsReporter(self.stats, self._metrics_callbacks, self._metrics_interval)
+        reporter.start()
         try:
             threads = [
-                threading.Thread(target=self._read_zst),
-                threading.Thread(target=self._write_csv_gz),
-                threading.Thread(target=self._write_games)
+                threading.Thread(target=self._run_stage, args=(self._download,)),
+                threading.Thread(target=self._run_stage, args=(self._read_zst,)),
+                threading.Thread(target=self._run_stage, args=(self._write_csv_gz,)),
+                threading.Thread(target=self._run_stage, args=(self._write_games,))
             ]
 
             for thread in threads:
@@ -114,118 +199,334 @@ class PgnZstToCsvGzConverter:
             for thread in threads:
                 thread.join()
 
+            if self._errors:
+                raise self._errors[0]
             logging.info("Conversion process completed")
         except Exception as e:
             logging.error(f"Error during conversion process: {e}")
             raise RuntimeError(f"Conversion process failed: {e}")
-
-    def _read_zst(self) -> None:
-        """Reads data from the .pgn.zst file and adds it to the chunks queue."""
-        logging.info(f"Starting to read {self._pgn_zst_path}")
+        finally:
+            reporter.stop()
+
+    def scan_headers(self, elo_bucket_size: int = ELO_BUCKET_SIZE) -> HeaderHistograms:
+        """Counts the games of the input file by month, rating, time control, termination and result from their
+        headers only, without parsing the moves or writing anything (see `utils.header_scan`).
+
+        The metrics callbacks get the progress like during a conversion, with the scanned games as parsed."""
+        logging.info(f"Scanning the headers of {source_name(self._pgn_zst_path)}")
+        self.stats = self._new_stats()
+        reporter = MetricsReporter(self.stats, self._metrics_callbacks, self._metrics_interval)
+        reporter.start()
+        try:
+            histograms = scan_headers(self._pgn_zst_path, self._chunk_size, elo_bucket_size, self.stats)
+        finally:
+            reporter.stop()
+        logging.info(f"Scanned the headers of {histograms.num_games} games")
+        return histograms
+
+    def _load_checkpoint(self) -> Dict[str, Any]:
+        """The progress saved by an interrupted conversion, empty if there is none."""
+        if self._checkpoint_path is None or not os.path.exists(self._checkpoint_path):
+            return {}
+        with open(self._checkpoint_path) as f:
+            checkpoint = json.load(f)
+        for name, value in self._checkpoint_settings().items():
+            # Streams have no name to compare, e.g. stdin
+            if name == "source" and (value is None or checkpoint.get(name) is None):
+                continue
+            if checkpoint.get(name) != value:
+                raise ValueError(f"The checkpoint {self._checkpoint_path} was written with {name} "
+                                 f"{checkpoint.get(name)!r}, not {value!r}")
+        logging.info(f"Resuming after {checkpoint['files_written']} files and {checkpoint['games_consumed']} "
+                     f"games from byte {checkpoint['frame_offset']}")
+        return checkpoint
+
+    def _checkpoint_settings(self) -> Dict[str, Any]:
+        """The input (None if it has no name) and the settings of the written files, a checkpoint is only valid
+        for the same ones."""
+        source = self._pgn_zst_path
+        if is_local_file(source):
+            source = os.path.abspath(source)
+        elif not isinstance(source, str) or source == STDIN:
+            source = None
+        return {"source": source, "num_games_per_file": self._num_games_per_file,
+                "moves_format": self._moves_format, "annotations": self._annotations}
+
+    def _save_checkpoint(self, games_consumed: int, frame: Frame, complete: bool = False) -> None:
+        """Replaces the checkpoint with the progress after the last written file, atomically."""
+        if self._checkpoint_path is None:
+            return
+        frame_offset, frame_games, frame_tail = frame
+        checkpoint = {**self._checkpoint_settings(), "files_written": self._csv_file_counter,
+                      "games_consumed": games_consumed, "frame_offset": frame_offset, "frame_games": frame_games,
+                      "frame_tail": frame_tail.hex(), "complete": complete}
+        temporary_path = f"{self._checkpoint_path}.tmp"
+        with open(temporary_path, "w") as f:
+            json.dump(checkpoint, f)
+        os.replace(temporary_path, self._checkpoint_path)
+
+    def _start_frame(self) -> Frame:
+        if not self._checkpoint:
+            return FIRST_FRAME
+        return (self._checkpoint["frame_offset"], self._checkpoint["frame_games"],
+                bytes.fromhex(self._checkpoint["frame_tail"]))
+
+    def _run_stage(self, stage: Callable[[], None]) -> None:
+        """Runs a thread of the pipeline, an error stops the other threads."""
+        try:
+            stage()
+        except Exception as e:
+            logging.error(f"Error in {stage.__name__}: {e}")
+            self._errors.append(e)
+            self._failed.set()
+
+    def _put(self, queue: Queue, item) -> bool:
+        """Puts the item to the queue, gives up if the queue stays full after another thread failed (the data
+        already read is still passed on if the failure was upstream)."""
+        while True:
+            try:
+                queue.put(item, timeout=QUEUE_TIMEOUT)
+                return True
+            except Full:
+                if self._failed.is_set():
+                    return False
+
+    def _get(self, queue: Queue):
+        """Gets the next item of the queue, None at the end of the data or if another thread failed."""
+        while True:
+            try:
+                return queue.get(timeout=QUEUE_TIMEOUT)
+            except Empty:
+                if self._failed.is_set():
+                    return None
+
+    def _download(self) -> None:
+        """Reads the compressed input and adds it to the compressed queue."""
+        offset = self._start_frame()[0]
+        logging.info(f"Starting to read {source_name(self._pgn_zst_path)} from byte {offset}")
+        stream, size = open_source(self._pgn_zst_path, offset)
+        self.stats.compressed_bytes_total = size or 0
+        self.stats.start_offset = self.stats.compressed_bytes_read = offset
         try:
-            with open(self._pgn_zst_path, 'rb') as f:
-                reader = zstd.ZstdDecompressor().stream_reader(f)
-                chunks_read, total_bytes_read = 0, 0
+            while block := stream.read(READ_SIZE):
+                self.stats.compressed_bytes_read += len(block)
+                start = time.perf_counter()
+                if not self._put(self._compressed_queue, block):
+                    return
+                self.stats.download_stall_seconds += time.perf_counter() - start
+            self._put(self._compressed_queue, None)  # Sentinel value
+        finally:
+            # Streams passed by the caller stay open
+            if isinstance(self._pgn_zst_path, str) and self._pgn_zst_path != STDIN:
+                stream.close()
+        logging.info(f"Finished reading {source_name(self._pgn_zst_path)}, "
+                     f"{self.stats.compressed_bytes_read - offset} bytes")
 
-                while chunk := reader.read(self._chunk_size):
-                    self._chunks_queue.put(chunk)
+    def _read_zst(self) -> None:
+        """Decompresses the input frame by frame and adds the data to the chunks queue.
+
+        The game starts are counted so that every chunk knows its frame, and when resuming the data before the
+        first game which wasn't written is dropped."""
+        logging.info("Starting to decompress")
+        decompressor = zstd.ZstdDecompressor()
+        decompressobj = decompressor.decompressobj()
+        frame = self._start_frame()
+        compressed_position, games, tail = frame
+        # Game starts to skip when resuming, None once the data is passed on
+        skip = self._checkpoint.get("games_consumed") if self._checkpoint else None
+        in_frame, chunks_read, total_bytes_read = False, 0, 0
+
+        while (block := self._get(self._compressed_queue)) is not None:
+            compressed_position += len(block)
+            while block:
+                in_frame = True
+                data = decompressobj.decompress(block)
+                self.stats.decompressed_bytes += len(data)
+                total_bytes_read += len(data)
+                # No game start fits in the tail, so all in the joined data are new
+                joined = tail + data
+                tail = joined[-TAIL_SIZE:]
+                if skip is None:
+                    games += joined.count(GAME_START)
+                else:
+                    games, data = self._skip_games(joined, games, skip)
+                    if data is not None:
+                        skip = None
+                for start in range(0, len(data or b""), self._chunk_size):
+                    start_time = time.perf_counter()
+                    if not self._put(self._chunks_queue, (data[start:start + self._chunk_size], frame)):
+                        return
+                    self.stats.read_stall_seconds += time.perf_counter() - start_time
                     chunks_read += 1
-                    total_bytes_read += len(chunk)
-
                     if chunks_read % LOG_INTERVAL == 0:
                         logging.debug(f"Read {chunks_read} chunks, total bytes: {total_bytes_read}")
+                if not decompressobj.eof:
+                    break
+                # The rest of the block belongs to the next frame
+                block = decompressobj.unused_data
+                frame = (compressed_position - len(block), games, tail)
+                decompressobj = decompressor.decompressobj()
+                in_frame = False
+
+        if self._failed.is_set():
+            return
+        if in_frame:
+            logging.warning("The input ends in the middle of a zstd frame")
+        self._put(self._chunks_queue, None)  # Sentinel value
+        logging.info(f"Finished decompressing. Total chunks: {chunks_read}, total bytes: {total_bytes_read}")
 
-                self._chunks_queue.put(None)  # Sentinel value
-                logging.info(
-                    f"Finished reading {self._pgn_zst_path}. Total chunks: {chunks_read}, total bytes: {total_bytes_read}")
-        except Exception as e:
-            logging.error(f"Error reading input file: {e}")
-            self._chunks_queue.put(None)
-            raise
+    @staticmethod
+    def _skip_games(data: bytes, games: int, skip: int) -> Tuple[int, Optional[bytes]]:
+        """Counts the game starts of the data up to the first game after the `skip` first ones and returns the
+        number of game starts with the data from that game on, None if the data ends before it."""
+        position = data.find(GAME_START)
+        while position >= 0:
+            games += 1
+            if games > skip:
+                return games + data.count(GAME_START, position + 1), data[position + 1:]
+            position = data.find(GAME_START, position + 1)
+        return games, None
 
     def _write_csv_gz(self) -> None:
-        """Takes the data from the queue and writes it to the .csv.gz file."""
+        """Takes the data from the queue, parses the games and adds them to the games queue.
+
+        The text is split at the game starts and only complete games are parsed, the last game of a chunk waits
+        for the next chunk."""
         logging.info("Starting to parse games")
-        two_last_positions = deque([0], maxlen=2)
-        remaining_part = ""
+        decoder = codecs.getincrementaldecoder(ENCODING)()
+        # The frame the remaining part starts in, the games parsed from it start in or after that frame
+        remaining_part, frame = "", self._start_frame()
+        games_consumed = self._checkpoint.get("games_consumed", 0)
         games_parsed, chunk_count = 0, 0
 
-        while data := self._get_next_chunk():
+        while (item := self._get_next_chunk()) is not None:
+            data, chunk_frame = item
             chunk_count += 1
-            string = self._process_chunk(remaining_part, data)
-            stream = io.StringIO(string)
-            current_games = self._parse_games(stream, two_last_positions)
-
-            self._add_games_to_queue(current_games)
-            games_parsed += len(current_games)
-
-            if games_parsed % LOG_INTERVAL == 0:
+            if not remaining_part:
+                frame = chunk_frame
+            string = self._process_chunk(remaining_part, decoder.decode(data))
+            # A \r\n may continue in the next chunk
+            string, carriage_return = (string[:-1], "\r") if string.endswith("\r") else (string, "")
+            rest = string.rfind(GAME_START_TEXT) + 1
+            if rest > 0:
+                current_games = self._parse_games(string[:rest])
+                games_consumed = self._add_games_to_queue(current_games, games_consumed, frame)
+                games_parsed += sum(game is not None for game, _ in current_games)
+                self.stats.games_parsed = games_parsed
+                if rest >= len(remaining_part):
+                    frame = chunk_frame
+
+            if chunk_count % LOG_INTERVAL == 0:
                 logging.info(f"Parsed {games_parsed} games")
 
-            remaining_part = string[two_last_positions[0]:]
+            remaining_part = string[rest:] + carriage_return
 
-        self._end_of_data = True
+        if self._failed.is_set():
+            return
+        string = self._process_chunk(remaining_part, decoder.decode(b"", final=True))
+        current_games = self._parse_games(string)
+        self._add_games_to_queue(current_games, games_consumed, frame)
+        games_parsed += sum(game is not None for game, _ in current_games)
+        self.stats.games_parsed = games_parsed
+        self._put(self._games_queue, None)  # Sentinel value
         logging.info(f"Finished parsing games. Total games parsed: {games_parsed}")
         logging.debug(f"Total chunks processed: {chunk_count}")
 
-    def _get_next_chunk(self) -> Optional[bytes]:
-        """Get the next chunk from the queue."""
+    def _get_next_chunk(self) -> Optional[Tuple[bytes, Frame]]:
+        """Get the next chunk with its frame from the queue."""
+        start = time.perf_counter()
         try:
-            return self._chunks_queue.get(timeout=QUEUE_TIMEOUT)
-        except Empty:
-            return None
+            return self._get(self._chunks_queue)
+        finally:
+            self.stats.parse_wait_seconds += time.perf_counter() - start
 
     @staticmethod
-    def _process_chunk(remaining_part: str, data: bytes) -> str:
+    def _process_chunk(remaining_part: str, string: str) -> str:
         """Process the chunk data."""
-        return remaining_part + data.decode(ENCODING).replace('\r\n', '\n').replace('\r', '\n')
-
-    def _parse_games(self, stream: io.StringIO, two_last_positions: deque) -> List[List[str]]:
-        """Parse games from the given stream."""
+        return remaining_part + string.replace('\r\n', '\n').replace('\r', '\n')
+
+    def _parse_games(self, string: str) -> List[Tuple[Optional[List[str]], bool]]:
+        """Parses the games of the string, one game per game start so that the games stay aligned with the game
+        starts counted when resuming. Returns every game, None if it's empty, with whether it has a game start:
+        text before the first game start (only at the start of a stream) is parsed as well, without one."""
+        starts = [0]
+        while (start := string.find(GAME_START_TEXT, starts[-1])) >= 0:
+            starts.append(start + 1)
+        starts.append(len(string))
         current_games = []
-        while result := self._parser.parse(stream):
-            game_info, mainline_moves = result
-            if game_info and mainline_moves:
-                current_games.append(game_info + [mainline_moves])
-            else:
-                logging.warning(f"Empty game detected. Game info: {game_info}, Moves: {mainline_moves}")
-            two_last_positions.append(stream.tell())
+        for start, end in zip(starts, starts[1:]):
+            stream = io.StringIO(string[start:end])
+            has_start = string.startswith(GAME_START_TEXT[1:], start)
+            if not has_start and not string[start:end].strip():
+                continue
+            while result := self._parser.parse(stream):
+                game_info, mainline_moves = result
+                if game_info and mainline_moves:
+                    # The annotations ride along at the end of the row and are split off before saving
+                    current_games.append((game_info + [mainline_moves]
+                                          + ([self._parser.annotations] if self._annotations else []), has_start))
+                else:
+                    logging.warning(f"Empty game detected. Game info: {game_info}, Moves: {mainline_moves}")
+                    current_games.append((None, has_start))
+                if has_start:
+                    break
         return current_games
 
-    def _add_games_to_queue(self, games: List[List[str]]) -> None:
-        """Add parsed games to the games queue."""
-        for game in games[:-1]:
-            self._games_queue.put(game)
-        if games:
-            self._games_queue.put(games[-1])
+    def _add_games_to_queue(self, games: List[Tuple[Optional[List[str]], bool]], games_consumed: int,
+                            frame: Frame) -> int:
+        """Add parsed games to the games queue, each with the number of game starts consumed up to it and a
+        frame the next game starts in or after, and returns the number of game starts consumed."""
+        start = time.perf_counter()
+        for game, has_start in games:
+            games_consumed += has_start
+            if game is not None and not self._put(self._games_queue, (game, games_consumed, frame)):
+                break
+        self.stats.parse_stall_seconds += time.perf_counter() - start
+        return games_consumed
 
     def _write_games(self) -> None:
         """Reads the games from the games queue and saves them to a disk."""
         logging.info("Starting to write games to CSV")
         games, games_written = [], 0
-
-        while not self._end_of_data or not self._games_queue.empty():
-            game = self._get_next_game()
-            if game:
-                games.append(game)
-                if len(games) == self._num_games_per_file:
-                    self._save_games_on_disk(games)
-                    games_written += len(games)
-                    games = []
-                    logging.debug(f"Written {games_written} games so far")
-
+        games_consumed, frame = self._checkpoint.get("games_consumed", 0), self._start_frame()
+
+        while (item := self._get_next_game()) is not None:
+            game, games_consumed, frame = item
+            games.append(game)
+            if len(games) == self._num_games_per_file:
+                self._save_games_on_disk(games)
+                self._save_checkpoint(games_consumed, frame)
+                games_written += len(games)
+                games = []
+                logging.debug(f"Written {games_written} games so far")
+
+        if self._failed.is_set():
+            # Converted again when resuming
+            logging.warning(f"Conversion failed, {len(games)} games of an incomplete file are not saved")
+            return
         if games:
             self._save_games_on_disk(games)
             games_written += len(games)
+        self._save_checkpoint(games_consumed, frame, complete=True)
 
         logging.info(f"Finished writing games to CSV. Total games written: {games_written}")
 
-    def _get_next_game(self) -> Optional[List[str]]:
-        """Get the next game from the queue."""
+    def _get_next_game(self) -> Optional[Tuple[List[str], int, Frame]]:
+        """Get the next game with the progress after it from the queue."""
+        start = time.perf_counter()
         try:
-            return self._games_queue.get(timeout=QUEUE_TIMEOUT)
-        except Empty:
-            return None
+            return self._get(self._games_queue)
+        finally:
+            self.stats.write_wait_seconds += time.perf_counter() - start
+
+    @staticmethod
+    def _move_codes(moves: str) -> np.ndarray:
+        try:
+            return san_to_codes(moves)
+        except ValueError as e:
+            # Saved without moves, so that the sidecar stays aligned with the rows
+            logging.warning(f"Invalid moves, saving the game without moves: {e}")
+            return np.zeros(0, dtype=np.uint16)
 
     def _save_games_on_disk(self, games: List[List[str]]) -> None:
         """Creates dataframe from the list of lists of strings and saves it to the .csv file."""
@@ -236,10 +537,69 @@ class PgnZstToCsvGzConverter:
         filepath = os.path.join(self._destination_dir, f"{self._csv_file_counter}.csv.gz")
         logging.info(f"Saving games to file {filepath}")
         try:
+            if self._annotations:
+                save_annotations(annotations_path(filepath), [game[-1] for game in games])
+                games = [game[:-1] for game in games]
             df = pd.DataFrame(games, columns=HEADERS)
+            if self._moves_format != "san":
+                save_move_codes(sidecar_path(filepath), [self._move_codes(moves) for moves in df["Moves"]])
+            if self._moves_format == "codes":
+                df = df.drop(columns="Moves")
             df.to_csv(filepath, index=False, compression="infer", sep=self._separator)
             self._csv_file_counter += 1
+            self.stats.games_written += len(games)
+            self.stats.files_written += 1
             logging.info(f"Games saved to file {filepath}")
         except Exception as e:
             logging.error(f"Error saving games to file: {e}")
             raise
+
+
+def main():
+    argparser = argparse.ArgumentParser(description="Convert a .pgn.zst file to .csv.gz files.")
+    argparser.add_argument("pgn_zst_path", help="Path or http(s) URL of the .pgn.zst file, - for stdin.")
+    argparser.add_argument("-o", "--output-dir", help="Directory for the .csv.gz files.")
+    argparser.add_argument("--games-per-file", type=int, help="Games per output file.")
+    argparser.add_argument("--scan", action="store_true",
+                           help="Only count the games by month, rating, time control, termination and result from "
+                                "their headers and print the histograms as JSON instead of converting.")
+    argparser.add_argument("--moves-format", choices=MOVES_FORMATS, default="san",
+                           help="Save the moves as SAN text, 16-bit codes in sidecar files or both.")
+    argparser.add_argument("--annotations", action="store_true",
+                           help="Save the [%%eval] and [%%clk] comments as per-ply arrays in sidecar files.")
+    argparser.add_argument("--checkpoint",
+                           help="Save the progress to this JSON file after every output file and resume from it "
+                                "if it exists.")
+    argparser.add_argument("--log-file", help="Log to this file instead of stderr.")
+    argparser.add_argument("--metrics-jsonl", help="Append metrics snapshots to this JSON lines file.")
+    argparser.add_argument("--metrics-prom", help="Write the latest metrics to this Prometheus text file.")
+    argparser.add_argument("--metrics-interval", type=float, default=METRICS_INTERVAL,
+                           help="Seconds between metrics snapshots.")
+    args = argparser.parse_args()
+    if not args.scan and (args.output_dir is None or args.games_per_file is None):
+        argparser.error("-o/--output-dir and --games-per-file are required unless --scan is given")
+    logging.basicConfig(filename=args.log_file, level=logging.INFO,
+                        format='%(asctime)s - %(levelname)s - %(message)s')
+
+    def log_progress(metrics):
+        logging.info(f"{metrics['progress']:.1%} of the input, {metrics['decompressed_mb_per_second']:.1f} MB/s, "
+                     f"{metrics['games_parsed_per_second']:.0f} games/s, ETA {metrics['eta_seconds']:.0f} s")
+
+    callbacks = [log_progress]
+    if args.metrics_jsonl:
+        callbacks.append(JsonLinesExporter(args.metrics_jsonl))
+    if args.metrics_prom:
+        callbacks.append(PrometheusExporter(args.metrics_prom))
+    # Nothing is written by a scan
+    converter = PgnZstToCsvGzConverter(args.pgn_zst_path, args.output_dir or ".", args.games_per_file or 1,
+                                       metrics_callbacks=callbacks, metrics_interval=args.metrics_interval,
+                                       moves_format=args.moves_format, annotations=args.annotations,
+                                       checkpoint_path=args.checkpoint)
+    if args.scan:
+        print(json.dumps(converter.scan_headers().summary(), indent=2))
+    else:
+        converter.convert()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,275 @@
+from typing import List, Optional
+import chess
+import numpy as np
+
+
+# Bitboard order follows the GridEncoder channel order (white pieces first, then black ones)
+PIECE_SYMBOLS = "PNBRQKpnbrqk"
+NUM_BITBOARDS = len(PIECE_SYMBOLS)
+SAN_PIECE_TYPES = {"N": chess.KNIGHT, "B": chess.BISHOP, "R": chess.ROOK, "Q": chess.QUEEN, "K": chess.KING}
+SAN_SUFFIX_CHARACTERS = "+#!?"
+BACK_RANKS = [chess.BB_RANK_8, chess.BB_RANK_1]  # indexed by color
+
+
+def bitboard_index(piece_type: int, color: bool) -> int:
+    """Index of the (piece_type, color) bitboard in PIECE_SYMBOLS order."""
+    return piece_type - 1 if color == chess.WHITE else piece_type + 5
+
+
+class TrustedBoard:
+    """A minimal bitboard position which applies moves without legality checks.
+
+    python-chess validates full legality on every `push_san`, which dominates the cost of replaying
+    games that are already known to be legal (e.g. games from the lichess.org database).
+    This board only resolves the information that SAN actually leaves implicit (the source square,
+    en passant and castling) using precomputed attack tables, so a corrupted move list is not detected.
+    Only games starting from the standard starting position are supported (no Chess960).
+
+    Attributes:
+        bitboards (List[int]): Twelve piece bitboards in PIECE_SYMBOLS order (square a1 is bit 0).
+        occupied_co (List[int]): Occupancy of black and white pieces, indexed by chess.BLACK/chess.WHITE.
+        turn (bool): Side to move.
+        castling_rights (int): Bitboard of rooks that still have castling rights.
+        ep_square (Optional[int]): Square behind a pawn that has just made a two-step move.
+    """
+
+    def __init__(self):
+        self.bitboards: List[int] = [
+            chess.BB_RANK_2, chess.BB_B1 | chess.BB_G1, chess.BB_C1 | chess.BB_F1,
+            chess.BB_A1 | chess.BB_H1, chess.BB_D1, chess.BB_E1,
+            chess.BB_RANK_7, chess.BB_B8 | chess.BB_G8, chess.BB_C8 | chess.BB_F8,
+            chess.BB_A8 | chess.BB_H8, chess.BB_D8, chess.BB_E8
+        ]
+        self.occupied_co: List[int] = [chess.BB_RANK_7 | chess.BB_RANK_8, chess.BB_RANK_1 | chess.BB_RANK_2]
+        self.turn = chess.WHITE
+        self.castling_rights = chess.BB_CORNERS
+        self.ep_square: Optional[int] = None
+
+    @classmethod
+    def from_board(cls, board: chess.Board) -> "TrustedBoard":
+        """Creates a trusted board from the position of a python-chess board."""
+        trusted_board = cls()
+        trusted_board.bitboards = [int(board.pieces_mask(chess.PIECE_SYMBOLS.index(symbol.lower()),
+                                                         symbol.isupper()))
+                                   for symbol in PIECE_SYMBOLS]
+        trusted_board.occupied_co = [board.occupied_co[chess.BLACK], board.occupied_co[chess.WHITE]]
+        trusted_board.turn = board.turn
+        trusted_board.castling_rights = board.castling_rights
+        trusted_board.ep_square = board.ep_square
+        return trusted_board
+
+    def to_board(self) -> chess.Board:
+        """Creates a python-chess board with the same position (move counters are not tracked)."""
+        board = chess.Board.empty()
+        for index, bitboard in enumerate(self.bitboards):
+            piece = chess.Piece.from_symbol(PIECE_SYMBOLS[index])
+            for square in chess.scan_forward(bitboard):
+                board.set_piece_at(square, piece)
+        board.turn = self.turn
+        board.castling_rights = self.castling_rights
+        board.ep_square = self.ep_square
+        return board
+
+    @property
+    def occupied(self) -> int:
+        """Bitboard of all occupied squares."""
+        return self.occupied_co[chess.WHITE] | self.occupied_co[chess.BLACK]
+
+    def to_array(self) -> np.ndarray:
+        """The twelve piece bitboards as a uint64 array."""
+        return np.array(self.bitboards, dtype=np.uint64)
+
+    def push_san(self, san: str) -> chess.Move:
+        """Applies a move given in standard algebraic notation, e.g. Nbd2, exd6, e8=Q+ or O-O-O, and returns
+        it (castling as the king's two-square move)."""
+        san = san.rstrip(SAN_SUFFIX_CHARACTERS)
+        if san in ("O-O", "0-0", "O-O-O", "0-0-0"):
+            return self._castle(kingside=len(san) == 3)
+
+        promotion = None
+        if "=" in san:
+            san, promotion_symbol = san.split("=")
+            promotion = SAN_PIECE_TYPES[promotion_symbol]
+        elif san[-1] in SAN_PIECE_TYPES and san[0].islower():
+            san, promotion = san[:-1], SAN_PIECE_TYPES[san[-1]]
+
+        to_square = chess.parse_square(san[-2:])
+        if san[0] in SAN_PIECE_TYPES:
+            piece_type = SAN_PIECE_TYPES[san[0]]
+            from_square = self._find_source_square(piece_type, to_square, san[1:-2].replace("x", ""))
+        else:
+            piece_type = chess.PAWN
+            from_square = self._find_pawn_source_square(san, to_square)
+        self._make_move(from_square, to_square, piece_type, promotion)
+        return chess.Move(from_square, to_square, promotion)
+
+    def push_uci(self, uci: str) -> None:
+        """Applies a move given in UCI notation, e.g. g1f3, e7e8q or e1g1 (castling)."""
+        promotion = chess.PIECE_SYMBOLS.index(uci[4]) if len(uci) > 4 else None
+        self.push_squares(chess.parse_square(uci[0:2]), chess.parse_square(uci[2:4]), promotion)
+
+    def push_squares(self, from_square: int, to_square: int, promotion: Optional[int] = None) -> None:
+        """Applies a move given by its squares, e.g. decoded from a move code (castling as e1g1)."""
+        piece_type = self._piece_type_at(from_square)
+        if piece_type == chess.KING and abs(to_square - from_square) == 2:
+            self._castle(kingside=to_square > from_square)
+        else:
+            self._make_move(from_square, to_square, piece_type, promotion)
+
+    def _piece_type_at(self, square: int) -> int:
+        mask = chess.BB_SQUARES[square]
+        offset = 0 if self.turn == chess.WHITE else 6
+        for piece_type in chess.PIECE_TYPES:
+            if self.bitboards[offset + piece_type - 1] & mask:
+                return piece_type
+        raise ValueError(f"No piece of the side to move on {chess.square_name(square)}")
+
+    def _find_pawn_source_square(self, san: str, to_square: int) -> int:
+        step = 8 if self.turn == chess.WHITE else -8
+        if "x" in san:
+            return chess.square(chess.FILE_NAMES.index(san[0]), chess.square_rank(to_square - step))
+        pawns = self.bitboards[bitboard_index(chess.PAWN, self.turn)]
+        if pawns & chess.BB_SQUARES[to_square - step]:
+            return to_square - step
+        return to_square - 2 * step
+
+    def _find_source_square(self, piece_type: int, to_square: int, disambiguation: str) -> int:
+        candidates = self._attacks(piece_type, to_square) & self.bitboards[bitboard_index(piece_type, self.turn)]
+        for character in disambiguation:
+            if character.isdigit():
+                candidates &= chess.BB_RANKS[int(character) - 1]
+            else:
+                candidates &= chess.BB_FILES[chess.FILE_NAMES.index(character)]
+        if candidates & (candidates - 1):
+            # SAN only disambiguates between legal moves, so drop the candidates that are pinned
+            candidates = sum(chess.BB_SQUARES[square] for square in chess.scan_forward(candidates)
+                             if not self._is_pinned(square, to_square))
+        if not candidates:
+            raise ValueError(f"No {chess.piece_name(piece_type)} can reach {chess.square_name(to_square)}")
+        return chess.msb(candidates)
+
+    def _attacks(self, piece_type: int, square: int) -> int:
+        occupied = self.occupied
+        if piece_type == chess.KNIGHT:
+            return chess.BB_KNIGHT_ATTACKS[square]
+        if piece_type == chess.KING:
+            return chess.BB_KING_ATTACKS[square]
+        attacks = 0
+        if piece_type in (chess.BISHOP, chess.QUEEN):
+            attacks |= chess.BB_DIAG_ATTACKS[square][chess.BB_DIAG_MASKS[square] & occupied]
+        if piece_type in (chess.ROOK, chess.QUEEN):
+            attacks |= (chess.BB_RANK_ATTACKS[square][chess.BB_RANK_MASKS[square] & occupied]
+                        | chess.BB_FILE_ATTACKS[square][chess.BB_FILE_MASKS[square] & occupied])
+        return attacks
+
+    def _is_pinned(self, from_square: int, to_square: int) -> bool:
+        """Whether moving the piece from from_square to to_square would expose the own king."""
+        king_square = chess.lsb(self.bitboards[bitboard_index(chess.KING, self.turn)])
+        if not chess.BB_RAYS[king_square][from_square]:
+            return False
+        occupied = (self.occupied & ~chess.BB_SQUARES[from_square]) | chess.BB_SQUARES[to_square]
+        not_captured = ~chess.BB_SQUARES[to_square]
+        queens = self.bitboards[bitboard_index(chess.QUEEN, not self.turn)]
+        diagonal_sliders = (self.bitboards[bitboard_index(chess.BISHOP, not self.turn)] | queens) & not_captured
+        straight_sliders = (self.bitboards[bitboard_index(chess.ROOK, not self.turn)] | queens) & not_captured
+        diagonal_attacks = chess.BB_DIAG_ATTACKS[king_square][chess.BB_DIAG_MASKS[king_square] & occupied]
+        straight_attacks = (chess.BB_RANK_ATTACKS[king_square][chess.BB_RANK_MASKS[king_square] & occupied]
+                            | chess.BB_FILE_ATTACKS[king_square][chess.BB_FILE_MASKS[king_square] & occupied])
+        return bool(diagonal_attacks & diagonal_sliders or straight_attacks & straight_sliders)
+
+    def _remove_captured_piece(self, square: int) -> None:
+        mask = chess.BB_SQUARES[square]
+        if not self.occupied_co[not self.turn] & mask:
+            return
+        self.occupied_co[not self.turn] &= ~mask
+        offset = 6 if self.turn == chess.WHITE else 0
+        for index in range(offset, offset + 6):
+            if self.bitboards[index] & mask:
+                self.bitboards[index] &= ~mask
+                break
+        self.castling_rights &= ~mask
+
+    def _make_move(self, from_square: int, to_square: int, piece_type: int, promotion: Optional[int]) -> None:
+        from_mask, to_mask = chess.BB_SQUARES[from_square], chess.BB_SQUARES[to_square]
+        ep_square = self.ep_square
+        self.ep_square = None
+
+        if piece_type == chess.PAWN:
+            if to_square == ep_square and not self.occupied & to_mask:
+                self._remove_captured_piece(to_square + (-8 if self.turn == chess.WHITE else 8))
+            elif abs(to_square - from_square) == 16:
+                self.ep_square = (from_square + to_square) // 2
+        elif piece_type == chess.KING:
+            self.castling_rights &= ~BACK_RANKS[self.turn]
+        self.castling_rights &= ~from_mask
+
+        self._remove_captured_piece(to_square)
+        self.bitboards[bitboard_index(piece_type, self.turn)] &= ~from_mask
+        self.bitboards[bitboard_index(promotion or piece_type, self.turn)] |= to_mask
+        self.occupied_co[self.turn] = (self.occupied_co[self.turn] & ~from_mask) | to_mask
+        self.turn = not self.turn
+
+    def _castle(self, kingside: bool) -> chess.Move:
+        rank = 0 if self.turn == chess.WHITE else 7
+        king_from, king_to = chess.square(4, rank), chess.square(6 if kingside else 2, rank)
+        rook_from, rook_to = chess.square(7 if kingside else 0, rank), chess.square(5 if kingside else 3, rank)
+        king_mask = chess.BB_SQUARES[king_from] | chess.BB_SQUARES[king_to]
+        rook_mask = chess.BB_SQUARES[rook_from] | chess.BB_SQUARES[rook_to]
+        self.bitboards[bitboard_index(chess.KING, self.turn)] ^= king_mask
+        self.bitboards[bitboard_index(chess.ROOK, self.turn)] ^= rook_mask
+        self.occupied_co[self.turn] ^= king_mask | rook_mask
+        self.castling_rights &= ~BACK_RANKS[self.turn]
+        self.ep_square = None
+        self.turn = not self.turn
+        return chess.Move(king_from, king_to)
+
+
+def replay(moves: str, notation: str = "san", include_final: bool = False) -> np.ndarray:
+    """Replays a space-separated move list (e.g. the `Moves` column of the converter output).
+
+    Args:
+        moves (str): Moves separated by single spaces, e.g. "e4 e5 Nf3".
+        notation (str, optional): "san" or "uci". Defaults to "san".
+        include_final (bool, optional): Whether to append the position after the last move. Defaults to False.
+
+    Returns:
+        np.ndarray: uint64 array of shape (num_positions, 12) with the piece bitboards of the position
+        before every move. White is to move in even rows and black in odd rows.
+    """
+    board = TrustedBoard()
+    push = board.push_san if notation == "san" else board.push_uci
+    positions = []
+    for move in moves.split():
+        positions.append(list(board.bitboards))
+        push(move)
+    if include_final:
+        positions.append(list(board.bitboards))
+    return np.array(positions, dtype=np.uint64).reshape(-1, NUM_BITBOARDS)
+
+
+def replay_codes(codes: np.ndarray, include_final: bool = False) -> np.ndarray:
+    """Like `replay` for an array of 16-bit move codes (see `utils.move_codes`), without any string parsing."""
+    board = TrustedBoard()
+    codes = np.asarray(codes, dtype=np.uint16)
+    from_squares, to_squares, promotions = ((codes & 0x3F).tolist(), ((codes >> 6) & 0x3F).tolist(),
+                                            (codes >> 12).tolist())
+    positions = []
+    for from_square, to_square, promotion in zip(from_squares, to_squares, promotions):
+        positions.append(list(board.bitboards))
+        board.push_squares(from_square, to_square, promotion or None)
+    if include_final:
+        positions.append(list(board.bitboards))
+    return np.array(positions, dtype=np.uint64).reshape(-1, NUM_BITBOARDS)
+
+
+def python_chess_replay(moves: str, notation: str = "san", include_final: bool = False) -> np.ndarray:
+    """Reference implementation of `replay` which validates every move with python-chess."""
+    board = chess.Board()
+    push = board.push_san if notation == "san" else board.push_uci
+    positions = []
+    for move in moves.split():
+        positions.append(TrustedBoard.from_board(board).bitboards)
+        push(move)
+    if include_final:
+        positions.append(TrustedBoard.from_board(board).bitboards)
+    return np.array(positions, dtype=np.uint64).reshape(-1, NUM_BITBOARDS)
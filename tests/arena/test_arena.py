@@ -0,0 +1,49 @@
+import numpy as np
+import pytest
+from deep_chess_playground.arena.arena import Arena, play_match_game
+from deep_chess_playground.arena.openings import load_openings
+from deep_chess_playground.arena.statistics import SPRT
+from deep_chess_playground.engine.evaluation import Evaluation
+from deep_chess_playground.engine.search import Search
+from deep_chess_playground.pytorch_modules.cnn.two_d_cnn.backbones import ConvolutionalTower
+from deep_chess_playground.pytorch_modules.policy_value_network import PolicyValueNetwork
+
+
+def uniform_evaluate(boards):
+    evaluations = []
+    for board in boards:
+        moves = list(board.legal_moves)
+        evaluations.append(Evaluation(moves, np.full(len(moves), 1 / max(len(moves), 1)), 0.0))
+    return evaluations
+
+
+@pytest.fixture
+def games_file(write_games):
+    return write_games("0.csv.gz", ["e4 e5 Nf3 Nc6 Bb5 a6", "e4 e5 Nf3 Nc6 Bc4 Bc5", "d4 d5 c4 e6 Nc3 Nf6", "e4",
+                                    "f3 e5 g4 Qh4#"], ECO=["C60", "C50", "D30", "B00", "A00"])
+
+
+def test_load_openings_is_balanced_and_playable(games_file):
+    openings = load_openings([games_file], num_openings=10, opening_plies=4)
+    # "e4" is too short, the fool's mate line ends the game and C50/C60 share the first four plies
+    assert sorted(" ".join(line) for line in openings) == ["d4 d5 c4 e6", "e4 e5 Nf3 Nc6"]
+    assert load_openings([games_file], num_openings=1, opening_plies=4, seed=1)[0] in openings
+
+
+def test_play_match_game_from_opening():
+    result = play_match_game(Search(uniform_evaluate), Search(uniform_evaluate), ["f3", "e5", "g4"],
+                             num_simulations=50, max_plies=6)
+    assert result == "0-1"
+
+
+def test_arena_with_sprt_stops_early(games_file):
+    model = PolicyValueNetwork(ConvolutionalTower(24, 1, 8), 8, value_channels=4)
+    openings = load_openings([games_file], num_openings=2, opening_plies=4)
+    arena = Arena(model, model, openings, num_workers=2, num_simulations=2, leaves_per_batch=2, max_plies=10)
+    result = arena.run(4)
+    assert result.score.games == 4 and result.decision is None and result.llr is None
+    # Identical deterministic players can't beat each other with swapped colors on every opening
+    assert result.score.wins == result.score.losses
+    # Draws only, so the claim of a 10 Elo improvement is rejected long before 100 games
+    result = arena.run(100, SPRT(elo0=10, elo1=20))
+    assert result.decision == "H0" and result.score.games < 100
@@ -0,0 +1,95 @@
+import chess
+import numpy as np
+import pandas as pd
+import pytest
+import torch
+from deep_chess_playground.arena.puzzles import (CACHE_SUFFIX, MISSING_RATING, PuzzleSuite, accuracy_report,
+                                                 evaluate_suite, load_suite)
+from deep_chess_playground.data_encoders.input_encoders.grid_encoding import GridEncoder
+from deep_chess_playground.data_encoders.output_encoders.move_encoding_8_8_73 import POLICY_SIZE, MoveEncoder8x8x73
+
+
+PUZZLES = [
+    ["00008", "r6k/pp2r2p/4Rp1Q/3p4/8/1N1P2R1/PqP2bPP/7K b - - 0 24", "f2g3 e6e7 b2b1 b3c1 b1c1 h6c1", "1913",
+     "crushing hangingPiece long middlegame"],
+    ["mate1", "6k1/p4ppp/8/8/8/8/5PPP/2RR2K1 b - - 0 1", "a7a6 c1c8", "1450", "mate mateIn1 backRankMate"],
+    ["broken", "6k1/p4ppp/8/8/8/8/5PPP/2RR2K1 b - - 0 1", "a7a6 c1c9", "1500", "mate"],
+]
+EPD = """r1bqkb1r/pppp1ppp/2n2n2/4p2Q/2B1P3/8/PPPP1PPP/RNB1K1NR w KQkq - bm Qxf7#; id "mates.001";
+rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - am f3 g4; id "blunders.001";
+"""
+
+
+class ConstantPolicy(torch.nn.Module):
+    """Prefers moves with higher flat indices in every position."""
+
+    def forward(self, x):
+        return torch.arange(POLICY_SIZE, dtype=torch.float32).expand(len(x), -1)
+
+
+@pytest.fixture
+def puzzle_csv(tmp_path):
+    path = tmp_path / "puzzles.csv"
+    pd.DataFrame([[puzzle_id, fen, moves, rating, 80, 90, 1000, themes, "", ""]
+                  for puzzle_id, fen, moves, rating, themes in PUZZLES],
+                 columns=["PuzzleId", "FEN", "Moves", "Rating", "RatingDeviation", "Popularity", "NbPlays", "Themes",
+                          "GameUrl", "OpeningTags"]).to_csv(path, index=False)
+    return str(path)
+
+
+def rows(offsets, values):
+    return [set(values[begin:end].tolist()) for begin, end in zip(offsets[:-1], offsets[1:])]
+
+
+def test_lichess_suite(puzzle_csv):
+    move_encoder = MoveEncoder8x8x73()
+    suite = load_suite(puzzle_csv, cache=False)
+    assert suite.ids.tolist() == ["00008", "mate1"]
+    assert suite.ratings.tolist() == [1913, 1450]
+    board = chess.Board(PUZZLES[1][1])
+    board.push_uci("a7a6")
+    # Both rook moves mate
+    assert rows(suite.accepted_offsets, suite.accepted_indices)[1] == {move_encoder.index("c1c8"),
+                                                                        move_encoder.index("d1d8")}
+    assert rows(suite.legal_offsets, suite.legal_indices)[1] == set(move_encoder.legal_move_indices(board).tolist())
+    assert np.array_equal(suite.planes[1], GridEncoder().encode_board(board).numpy())
+
+    suite = load_suite(puzzle_csv, all_moves=True, cache=False)
+    assert suite.ids.tolist() == ["00008"] * 3 + ["mate1"]
+    assert [rows(suite.accepted_offsets, suite.accepted_indices)[index] for index in range(3)] == \
+        [{move_encoder.index(move)} for move in ["e6e7", "b3c1", "h6c1"]]
+
+
+def test_evaluate_and_report(puzzle_csv):
+    suite = load_suite(puzzle_csv, all_moves=True, cache=False)
+    solved = evaluate_suite(ConstantPolicy(), suite, top_k=(1, 3), batch_size=3)
+    for index, (legal, accepted) in enumerate(zip(rows(suite.legal_offsets, suite.legal_indices),
+                                                  rows(suite.accepted_offsets, suite.accepted_indices))):
+        ranking = sorted(legal, reverse=True)
+        assert solved[index].tolist() == [bool(accepted & set(ranking[:k])) for k in (1, 3)]
+
+    report = accuracy_report(suite, solved, top_k=(1, 3), rating_bucket=500)
+    assert report["total"]["positions"].item() == 4
+    assert report["total"]["top3"].item() == solved[:, 1].mean()
+    assert report["theme"].loc["mate", "positions"] == 1 and report["theme"].loc["long", "positions"] == 3
+    assert report["rating"].index.tolist() == [1000, 1500]
+    assert report["rating"]["top1"].tolist() == [solved[3, 0], solved[:3, 0].mean()]
+
+
+def test_epd_suite_and_cache(tmp_path):
+    path = tmp_path / "suite.epd"
+    path.write_text(EPD)
+    suite = load_suite(str(path))
+    assert suite.themes.tolist() == ["mates", "blunders"]
+    assert suite.ratings.tolist() == [MISSING_RATING] * 2
+    accepted = rows(suite.accepted_offsets, suite.accepted_indices)
+    move_encoder = MoveEncoder8x8x73()
+    assert accepted[0] == {move_encoder.index("h5f7")}
+    assert len(accepted[1]) == 18 and move_encoder.index("f2f3") not in accepted[1]
+
+    cache_path = str(path) + CACHE_SUFFIX
+    cached = load_suite(str(path))
+    for name in ("planes", "legal_indices", "accepted_offsets", "themes"):
+        assert np.array_equal(getattr(cached, name), getattr(suite, name))
+    assert PuzzleSuite.load(cache_path, (0, 0, False, None)) is None
+    assert len(load_suite(str(path), max_puzzles=1)) == 1
@@ -0,0 +1,37 @@
+import math
+import pytest
+from deep_chess_playground.arena.statistics import SPRT, MatchScore, elo_difference, expected_score
+
+
+def test_elo_difference_inverts_expected_score():
+    assert elo_difference(0.5) == 0
+    assert elo_difference(0.75) == pytest.approx(190.85, abs=0.01)
+    assert elo_difference(expected_score(-123.0)) == pytest.approx(-123.0)
+
+
+def test_match_score():
+    score = MatchScore()
+    for game_score in [1, 1, 0.5, 0]:
+        score.add(game_score)
+    assert (score.wins, score.draws, score.losses, score.games) == (2, 1, 1, 4)
+    assert score.score == 0.625
+    assert score.elo == pytest.approx(elo_difference(0.625))
+    assert 0 < score.elo_error < math.inf
+    assert MatchScore(400, 200, 400).elo_error < MatchScore(40, 20, 40).elo_error
+    assert math.isfinite(MatchScore(10, 0, 0).elo)
+    assert MatchScore(10, 0, 10).likelihood_of_superiority == 0.5
+
+
+def test_sprt_decisions():
+    sprt = SPRT(elo0=0, elo1=10)
+    assert sprt.decision(MatchScore(5, 10, 5)) is None
+    assert sprt.decision(MatchScore(600, 300, 400)) == "H1"
+    assert sprt.decision(MatchScore(400, 300, 600)) == "H0"
+    assert sprt.llr(MatchScore()) == 0
+    with pytest.raises(ValueError):
+        SPRT(elo0=5, elo1=0)
+
+
+def test_sprt_rejects_improvement_after_only_draws():
+    assert SPRT(elo0=10, elo1=20).decision(MatchScore(0, 20, 0)) == "H0"
+    assert SPRT(elo0=-20, elo1=-10).decision(MatchScore(0, 20, 0)) == "H1"
@@ -0,0 +1,18 @@
+import pandas as pd
+import pytest
+from deep_chess_playground.utils.headers import HEADERS
+
+
+@pytest.fixture
+def write_games(tmp_path):
+    """`write_games(name, moves, **columns)` saves games as a converted file `tmp_path / name` and returns its
+    path. The games have the given moves and "?" in the other headers, unless their values are given as columns."""
+    def write(name, moves, **columns):
+        games = pd.DataFrame("?", index=range(len(moves)), columns=HEADERS)
+        games["Moves"] = list(moves)
+        for column, values in columns.items():
+            games[column] = values
+        path = tmp_path / name
+        games.to_csv(path, index=False)
+        return str(path)
+    return write
@@ -0,0 +1,58 @@
+import random
+import chess
+import numpy as np
+import torch
+from deep_chess_playground.data_encoders.input_encoders.attack_features import (NUM_FEATURE_PLANES, attack_bitboards,
+                                                                                feature_planes, pinned_bitboards)
+from deep_chess_playground.data_encoders.input_encoders.grid_encoding import MIN_VECTORIZED_BATCH, GridEncoder
+
+
+# White: the knight on d2 is pinned by the bishop on a5, the rook on e4 by the queen on e8 and attacked by the
+# pawn on f5. Black: the bishop on f7 is pinned by the bishop on b3, the queen is attacked by the rook.
+FEN = "4q1k1/5b2/8/b4p2/4R3/1B6/3N4/4K3 w - - 0 1"
+
+
+def random_boards(count, seed=0):
+    rng, boards = random.Random(seed), []
+    for _ in range(count):
+        board = chess.Board()
+        for _ in range(rng.randrange(120)):
+            moves = list(board.legal_moves)
+            if not moves:
+                break
+            board.push(rng.choice(moves))
+        boards.append(board)
+    return boards
+
+
+def test_attacks_and_mobility_match_python_chess():
+    encoder = GridEncoder()
+    boards = random_boards(200) + [chess.Board(FEN), chess.Board("8/8/8/8/8/8/8/8 w - - 0 1")]
+    bitboards = np.array([encoder.board_bitboards(board) for board in boards], dtype=np.uint64)
+    assert np.array_equal(attack_bitboards(bitboards[:, :12]), bitboards[:, 12:])
+    assert attack_bitboards(np.zeros((0, 12), dtype=np.uint64)).shape == (0, 12)
+
+    planes = feature_planes(bitboards[:, :12])
+    assert planes.shape == (len(boards), NUM_FEATURE_PLANES, 8, 8) and planes.dtype == np.uint8
+    for board, board_planes in zip(boards, planes):
+        mobility = np.zeros((2, 8, 8), dtype=np.uint8)
+        pinned = np.zeros((2, 8, 8), dtype=np.uint8)
+        for square, piece in board.piece_map().items():
+            plane, row, col = int(not piece.color), 7 - chess.square_rank(square), chess.square_file(square)
+            mobility[plane, row, col] = len(board.attacks(square) & ~chess.SquareSet(board.occupied_co[piece.color]))
+            pinned[plane, row, col] = piece.piece_type != chess.KING and board.is_pinned(piece.color, square)
+        assert np.array_equal(board_planes[:2], mobility)
+        assert np.array_equal(board_planes[2:4], pinned)
+
+    encoded = encoder.encode_batch(boards[:MIN_VECTORIZED_BATCH + 1])
+    for board, board_planes in zip(boards, encoded):
+        assert torch.equal(torch.from_numpy(board_planes).float(), encoder.encode_board(board))
+
+
+def test_pins_and_threats():
+    pieces = np.array([GridEncoder().piece_bitboards(chess.Board(FEN))], dtype=np.uint64)
+    assert pinned_bitboards(pieces)[0].tolist() == [chess.BB_D2 | chess.BB_E4, chess.BB_F7]
+    planes = feature_planes(pieces)[0]
+    threatened = [{chess.square(col, 7 - row) for row, col in zip(*np.nonzero(plane))} for plane in planes[4:]]
+    # The bishops and the knight are only attacked by pieces of the same value
+    assert threatened == [{chess.E4}, {chess.E8}]
@@ -0,0 +1,97 @@
+import pickle
+import random
+import chess
+import numpy as np
+import pytest
+import torch
+from deep_chess_playground.data_encoders.input_encoders.encoding_cache import (EncodingCache, next_placement_key,
+                                                                               placement_key)
+from deep_chess_playground.data_encoders.input_encoders.grid_encoding import GridEncoder
+from deep_chess_playground.datasets.position_batch_dataset import PositionBatchDataset, batch_loader
+
+
+@pytest.fixture
+def cache():
+    cache = EncodingCache(capacity=1024)
+    yield cache
+    cache.close()
+    cache.unlink()
+
+
+@pytest.mark.parametrize("fen", [chess.STARTING_FEN,
+                                 "r3k2r/pPppqpb1/bn2pnp1/3PN3/Pp2P3/2N2Q1p/1PPBBPPP/R3K2R b KQkq a3 0 1",
+                                 "rnbqkbnr/pp1ppppp/8/8/2pPP3/8/PPP2PPP/RNBQKBNR b KQkq d3 0 3"])
+def test_incremental_key_matches_full_key(fen):
+    rng = random.Random(0)
+    for _ in range(20):
+        board = chess.Board(fen)
+        key = placement_key(board)
+        for _ in range(60):
+            moves = list(board.legal_moves)
+            if not moves:
+                break
+            move = rng.choice(moves)
+            key = next_placement_key(key, board, move)
+            board.push(move)
+            assert key == placement_key(board)
+
+
+def test_key_ignores_side_to_move_and_castling():
+    board = chess.Board()
+    other = chess.Board(chess.STARTING_FEN.replace(" w KQkq", " b -"))
+    assert placement_key(board) == placement_key(other) != chess.polyglot.zobrist_hash(board)
+
+
+def test_clock_eviction():
+    cache = EncodingCache(capacity=2, ways=2, num_bitboards=1)
+    try:
+        out = np.zeros(1, dtype=np.uint64)
+        cache.put(1, [10])
+        cache.put(2, [20])
+        assert cache.get(1, out) and out[0] == 10
+        cache.put(3, [30])
+        # 1 was referenced and got a second chance, 2 was evicted
+        assert cache.get(1, out) and not cache.get(2, out) and cache.get(3, out) and out[0] == 30
+        assert cache.stats() == {"hits": 3, "misses": 1, "hit_rate": 0.75, "insertions": 3, "evictions": 1,
+                                 "entries": 2}
+    finally:
+        cache.close()
+        cache.unlink()
+
+
+def test_attached_copy_shares_entries(cache):
+    attached = pickle.loads(pickle.dumps(cache))
+    attached.set_worker(0)
+    bitboards = np.arange(24, dtype=np.uint64)
+    attached.put(12345, bitboards)
+    out = np.zeros(24, dtype=np.uint64)
+    assert cache.get(12345, out) and np.array_equal(out, bitboards)
+    attached.close()
+
+
+def test_cached_encoder_matches_encoder(cache):
+    board = chess.Board("r3k2r/pPppqpb1/bn2pnp1/3PN3/Pp2P3/2N2Q1p/1PPBBPPP/R3K2R b KQkq a3 0 1")
+    cached_encoder = GridEncoder(cache)
+    assert torch.equal(cached_encoder.encode_board(board), GridEncoder().encode_board(board))
+    assert torch.equal(cached_encoder.encode_board(board), GridEncoder().encode_board(board))
+    assert cache.stats()["hits"] == 1
+
+
+def test_dataset_with_cache(cache, write_games):
+    path = write_games("0.csv.gz", ["e4 e5 Nf3 Nc6 Bb5 a6 O-O", "e4 e5 Nf3 Nc6 Bc4", "e4 c5 Nf3 d6 d4 cxd4",
+                                    "d4 d5 c4"])
+    expected = list(PositionBatchDataset([path], batch_size=4))
+    dataset = PositionBatchDataset([path], batch_size=4, cache=cache)
+    for _ in range(2):
+        batches = list(dataset)
+        assert all(torch.equal(a[0], b[0]) and torch.equal(a[1], b[1]) for a, b in zip(batches, expected))
+    # 13 distinct positions out of 21: the shared openings hit in the first epoch, everything in the second
+    assert cache.stats()["misses"] == 13 and cache.stats()["hits"] == 2 * 21 - 13
+
+    cache.reset_stats()
+    for _ in range(2):
+        batches = list(batch_loader(dataset, num_workers=2))
+        assert torch.equal(torch.cat([planes for planes, _ in batches]).sum(dim=0),
+                           torch.cat([planes for planes, _ in expected]).sum(dim=0))
+    # The workers count in their own rows of the shared counters
+    assert cache.stats()["hits"] == 2 * 21 and cache.counters[0].sum() == 0
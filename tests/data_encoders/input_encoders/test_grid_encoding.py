@@ -1,3 +1,5 @@
+import chess
+import numpy as np
 import pytest
 import torch
 from deep_chess_playground.data_encoders.input_encoders.grid_encoding import GridEncoder
@@ -132,3 +134,12 @@ class TestGridEncoder:
         output = encoder.encode(fen)
         piece_sum = torch.sum(output[:12])  # Sum of first 12 channels (piece placement)
         assert piece_sum == expected_sum, f"Total piece count for FEN {fen} should be {expected_sum}"
+
+    def test_grid_encoder_batch_matches_encode(self, sample_fen):
+        encoder = GridEncoder()
+        boards = [chess.Board(sample_fen), chess.Board(), chess.Board("8/8/8/8/8/8/8/K6k b - - 0 1")]
+        output = np.zeros((3, 24, 8, 8), dtype=np.uint8)
+        assert encoder.encode_batch(boards, out=output) is output
+        assert output.dtype == np.uint8
+        for board, planes in zip(boards, output):
+            assert torch.equal(torch.from_numpy(planes).float(), encoder.encode_board(board))
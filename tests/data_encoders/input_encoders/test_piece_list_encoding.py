@@ -0,0 +1,54 @@
+import chess
+import numpy as np
+import pytest
+import torch
+from deep_chess_playground.data_encoders.input_encoders.piece_list_encoding import PieceListEncoder, \
+    collate_piece_lists
+from deep_chess_playground.utils.trusted_replay import replay
+
+
+class TestPieceListEncoder:
+    @pytest.fixture
+    def sample_fen(self):
+        return "r3k2r/pp1p1pp1/3bq2p/1B6/3n2bP/P3PN2/1PQ1KPP1/R6R w - - 0 1"
+
+    def test_piece_list_encoder_output(self, sample_fen):
+        output = PieceListEncoder().encode(sample_fen)
+        assert output.shape == (2, 32)
+        assert output.dtype == np.int8
+        board = chess.Board(sample_fen)
+        tokens = [(piece, square) for piece, square in output.T if piece >= 0]
+        assert len(tokens) == len(board.piece_map())
+        for piece, square in tokens:
+            assert "PNBRQKpnbrqk"[piece] == board.piece_at(square).symbol()
+        assert (output[:, len(tokens):] == -1).all()
+
+    def test_piece_list_encoder_starting_position_has_no_padding(self):
+        output = PieceListEncoder().encode(chess.STARTING_FEN)
+        assert (output >= 0).all()
+        assert sorted(output[1].tolist()) == list(range(16)) + list(range(48, 64))
+
+    def test_piece_list_encoder_empty_board(self):
+        assert (PieceListEncoder().encode("8/8/8/8/8/8/8/8 w - - 0 1") == -1).all()
+
+    def test_piece_list_encoder_invalid_fen(self):
+        with pytest.raises(ValueError):
+            PieceListEncoder().encode("invalid fen string")
+
+    def test_piece_list_encoder_batch_bitboards_matches_fen(self):
+        encoder = PieceListEncoder()
+        moves = "e4 e5 Nf3 Nc6 Bc4 h6 O-O Nf6 d3 d6 Be3 Be6 Bxe6 fxe6"
+        board, expected = chess.Board(), []
+        for san in moves.split():
+            expected.append(encoder.encode(board.fen()))
+            board.push_san(san)
+        bitboards = replay(moves)
+        np.testing.assert_array_equal(encoder.encode_batch_bitboards(bitboards), np.stack(expected))
+        np.testing.assert_array_equal(encoder.encode_bitboards(bitboards[3]), expected[3])
+
+    def test_collate_piece_lists(self, sample_fen):
+        encoder = PieceListEncoder()
+        piece_lists, targets = collate_piece_lists([(encoder.encode(sample_fen), 1), (encoder.encode(sample_fen), 2)])
+        assert piece_lists.shape == (2, 2, 32)
+        assert piece_lists.dtype == torch.int8
+        assert targets.tolist() == [1, 2]
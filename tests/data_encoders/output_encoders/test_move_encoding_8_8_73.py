@@ -0,0 +1,49 @@
+import chess
+import pytest
+import torch
+from deep_chess_playground.data_encoders.output_encoders.move_encoding_8_8_73 import MoveEncoder8x8x73, POLICY_SIZE
+from deep_chess_playground.utils.move_utilities import ALL_POSSIBLE_MOVES
+
+
+@pytest.fixture(scope="module")
+def encoder():
+    return MoveEncoder8x8x73()
+
+
+def test_move_indices_are_unique(encoder):
+    # Queen promotions share the plane of the corresponding queen-like move
+    indices = {encoder.index(move) for move in ALL_POSSIBLE_MOVES if not move.endswith("q")}
+    assert len(indices) == len(ALL_POSSIBLE_MOVES) - 44
+    assert all(0 <= index < POLICY_SIZE for index in indices)
+
+
+@pytest.mark.parametrize("move", ["e2e4", "g1f3", "a3c2", "e7e8q", "b2a1n", "b2c1r", "b2b1b"])
+def test_encode_matches_index(encoder, move):
+    encoding = encoder.encode(move)
+    assert encoding.shape == (8, 8, 73)
+    assert encoding.sum() == 1
+    assert encoding.flatten().argmax() == encoder.index(move)
+    assert encoder.index(chess.Move.from_uci(move)) == encoder.index(move)
+
+
+@pytest.mark.parametrize("fen", [
+    chess.STARTING_FEN,
+    "r3k2r/pp1p1pp1/3bq2p/1B6/3n2bP/P3PN2/1PQ1KPP1/R6R w kq - 0 1",
+    "8/8/8/8/8/k7/1p6/K7 b - - 0 1",
+])
+def test_legal_move_mask(encoder, fen):
+    board = chess.Board(fen)
+    mask = encoder.legal_move_mask(board)
+    assert mask.shape == (8, 8, 73)
+    assert mask.dtype == torch.bool
+    assert mask.sum() == board.legal_moves.count()
+    for move in board.legal_moves:
+        assert mask.flatten()[encoder.index(move)]
+
+
+def test_batch_legal_move_mask(encoder):
+    fens = [chess.STARTING_FEN, "8/8/8/8/8/k7/1p6/K7 b - - 0 1", "k7/1Q6/1K6/8/8/8/8/8 b - - 0 1"]
+    mask = encoder.batch_legal_move_mask(fens, flat=True)
+    assert mask.shape == (3, POLICY_SIZE)
+    assert mask.sum(dim=1).tolist() == [20, chess.Board(fens[1]).legal_moves.count(), 0]
+    assert torch.equal(encoder.batch_legal_move_mask(fens).flatten(1), mask)
@@ -0,0 +1,111 @@
+import numpy as np
+import pandas as pd
+import pytest
+from deep_chess_playground.datasets.game_sampler import (TIME_CONTROLS, CurriculumSchedule, GameMetadata,
+                                                         GameSampler, SamplingWeights, step_function)
+from deep_chess_playground.datasets.position_batch_dataset import PositionBatchDataset, spread_repeats
+from deep_chess_playground.utils.move_codes import san_to_codes, save_move_codes, sidecar_path
+
+
+GAMES = [
+    # WhiteElo, BlackElo, TimeControl, Moves
+    ("1500", "1520", "60+0", "e4 e5 Nf3"),
+    ("1490", "1510", "60+0", "d4 d5"),
+    ("1505", "1480", "60+0", "c4"),
+    ("2400", "2450", "900+10", "e4 c5 Nf3 d6 d4 cxd4"),
+    ("?", "2000", "180+2", "Nf3 Nf6"),
+]
+
+
+@pytest.fixture
+def games_files(write_games):
+    paths = []
+    for index, games in enumerate([GAMES[:3], GAMES[3:]]):
+        white_elo, black_elo, time_control, moves = zip(*games)
+        paths.append(write_games(f"{index}.csv.gz", moves, WhiteElo=white_elo, BlackElo=black_elo,
+                                 TimeControl=time_control))
+    return paths
+
+
+def test_metadata(games_files, tmp_path):
+    metadata = GameMetadata.build(games_files)
+    assert metadata.num_games == 5 and metadata.file_offsets.tolist() == [0, 3, 5]
+    assert metadata.elo.tolist() == [1500, 1490, 1480, 2400, -1]
+    assert [TIME_CONTROLS[index] for index in metadata.time_control] == ["Bullet"] * 3 + ["Rapid", "Blitz"]
+    metadata.save(tmp_path / "metadata.npz")
+    loaded = GameMetadata.load(tmp_path / "metadata.npz")
+    assert loaded.files == metadata.files and np.array_equal(loaded.elo, metadata.elo)
+
+
+def test_step_function():
+    values = np.array([0, 1799, 1800, 2500])
+    assert step_function({0: 0.1, 1800: 0.5, 2200: 1.0}, values).tolist() == [0.1, 0.1, 0.5, 1.0]
+    assert step_function(None, values).tolist() == [1, 1, 1, 1]
+    with pytest.raises(ValueError):
+        SamplingWeights(time_control={"Hyperbullet": 1})
+
+
+def test_stratified_sampling_balances_strata(games_files):
+    metadata = GameMetadata.build(games_files)
+    weighted = GameSampler(metadata, SamplingWeights())
+    assert np.allclose(weighted.probabilities(), 0.2)
+    # Three bullet games at 1400-1600 form one stratum, the other two games are strata of their own
+    stratified = GameSampler(metadata, SamplingWeights(), stratified=True)
+    assert np.allclose(stratified.probabilities(), [1 / 9] * 3 + [1 / 3] * 2)
+    sampler = GameSampler(metadata, SamplingWeights(elo={0: 0, 2200: 1}), num_games=10)
+    assert sampler.game_counts().tolist() == [0, 0, 0, 10, 0]
+    without_replacement = GameSampler(metadata, SamplingWeights(time_control={"Bullet": 0}), replacement=False)
+    assert without_replacement.game_counts().tolist() == [0, 0, 0, 1, 1]
+
+
+def test_curriculum_schedule(games_files):
+    metadata = GameMetadata.build(games_files)
+    schedule = CurriculumSchedule([(0, SamplingWeights(time_control={"Rapid": 0, "Blitz": 0}, ply={0: 0.5})),
+                                   (4, SamplingWeights(time_control={"Bullet": 0}, ply={0: 1.0}))])
+    sampler = GameSampler(metadata, schedule)
+    assert np.allclose(sampler.probabilities(), [1 / 3] * 3 + [0, 0])
+    sampler.set_epoch(2)
+    assert np.allclose(sampler.probabilities(), [1 / 6] * 3 + [1 / 4] * 2)
+    sampler.set_epoch(10)
+    assert np.allclose(sampler.probabilities(), [0] * 3 + [1 / 2] * 2)
+    assert np.allclose(sampler.ply_keep_probabilities()[:3], 1.0)
+
+
+def test_dataset_reads_only_sampled_games(games_files):
+    metadata = GameMetadata.build(games_files)
+    sampler = GameSampler(metadata, SamplingWeights(elo={0: 0, 2200: 1}), num_games=2)
+    dataset = PositionBatchDataset(games_files, batch_size=100, sampler=sampler)
+    (planes, targets), = list(dataset)
+    assert len(targets) == 12
+    sampler = GameSampler(metadata, SamplingWeights(elo={0: 0, 2200: 1}, ply={0: 0, 4: 1}), num_games=1)
+    (planes, targets), = list(PositionBatchDataset(games_files, batch_size=100, sampler=sampler))
+    assert len(targets) == 2
+    with pytest.raises(ValueError):
+        PositionBatchDataset(games_files[:1], batch_size=4, sampler=sampler)
+
+
+def test_sampling_from_move_codes(games_files):
+    for path, games in zip(games_files, [GAMES[:3], GAMES[3:]]):
+        save_move_codes(sidecar_path(path), [san_to_codes(game[-1]) for game in games])
+        pd.read_csv(path, dtype=str).drop(columns="Moves").to_csv(path, index=False)
+    metadata = GameMetadata.build(games_files)
+    sampler = GameSampler(metadata, SamplingWeights(elo={0: 0, 2200: 1}), num_games=2)
+    (planes, targets), = list(PositionBatchDataset(games_files, batch_size=100, sampler=sampler,
+                                                   moves_format="codes"))
+    assert len(targets) == 12
+
+
+def test_metadata_of_mixed_formats(games_files, monkeypatch):
+    # The first file has several chunks of games without a Moves column (moves_format "codes"), the second one
+    # SAN moves, the metadata doesn't depend on the moves
+    monkeypatch.setattr("deep_chess_playground.datasets.game_sampler.CHUNK_SIZE", 2)
+    pd.read_csv(games_files[0], dtype=str).drop(columns="Moves").to_csv(games_files[0], index=False)
+    metadata = GameMetadata.build(games_files)
+    assert metadata.elo.tolist() == [1500, 1490, 1480, 2400, -1] and metadata.file_offsets.tolist() == [0, 3, 5]
+
+
+def test_spread_repeats():
+    games = list(spread_repeats("abcdef", [3, 1, 1, 2, 1, 1], spacing=2))
+    assert sorted(games) == sorted("aaabcddef")
+    assert games == list("abcadaedf")
+    assert all(first != second for first, second in zip(games, games[1:]))
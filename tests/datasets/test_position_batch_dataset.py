@@ -0,0 +1,132 @@
+import chess
+import numpy as np
+import pytest
+import torch
+from deep_chess_playground.data_encoders.input_encoders.grid_encoding import GridEncoder
+from deep_chess_playground.data_encoders.output_encoders.move_encoding_8_8_73 import MoveEncoder8x8x73
+from deep_chess_playground.datasets.position_batch_dataset import (PositionBatchDataset, batch_loader,
+                                                                   game_partition, to_float_batch)
+from deep_chess_playground.utils.move_codes import san_to_codes, save_move_codes, sidecar_path
+from deep_chess_playground.utils.pgn_annotations import MISSING_EVAL, Annotations, annotations_path, save_annotations
+
+
+GAMES = ["e4 e5 Nf3 Nc6 Bb5", "d4 d5 c4", "f3 e5 g4 Qh4#", "Nf3"]
+
+
+@pytest.fixture
+def games_files(write_games):
+    return [write_games(f"{index}.csv.gz", games) for index, games in enumerate([GAMES[:2], GAMES[2:]])]
+
+
+def expected_samples(games):
+    encoder, move_encoder = GridEncoder(), MoveEncoder8x8x73()
+    samples = []
+    for moves in games:
+        board = chess.Board()
+        for san in moves.split():
+            move = board.parse_san(san)
+            samples.append((encoder.encode_board(board), move_encoder.index(move)))
+            board.push(move)
+    return samples
+
+
+def test_game_partition():
+    assert game_partition(["a", "b", "c"], 1, 2) == (["b"], 1, 0)
+    assert game_partition(["a"], 1, 2) == (["a"], 2, 1)
+
+
+def test_batches_match_per_sample_encoding(games_files):
+    batches = list(PositionBatchDataset(games_files, batch_size=4))
+    assert [len(targets) for _, targets in batches] == [4, 4, 4, 1]
+    planes = torch.cat([planes for planes, _ in batches])
+    targets = torch.cat([targets for _, targets in batches])
+    assert planes.dtype == torch.uint8 and targets.dtype == torch.int64
+    samples = expected_samples(GAMES)
+    assert torch.equal(planes.float(), torch.stack([sample[0] for sample in samples]))
+    assert targets.tolist() == [sample[1] for sample in samples]
+    assert [len(targets) for _, targets in PositionBatchDataset(games_files, 4, drop_last=True)] == [4, 4, 4]
+
+
+def test_loader_with_workers(games_files):
+    loader = batch_loader(PositionBatchDataset(games_files, batch_size=3), num_workers=2)
+    batches = list(loader)
+    assert sum(len(targets) for _, targets in batches) == 13
+    assert all(planes.is_shared() for planes, _ in batches)
+    x, y = to_float_batch(batches[0])
+    assert x.dtype == torch.float32 and x.shape == (3, 24, 8, 8) and y.dtype == torch.int64
+
+
+def test_move_codes_match_san(games_files):
+    for path, games in zip(games_files, [GAMES[:2], GAMES[2:]]):
+        save_move_codes(sidecar_path(path), [san_to_codes(moves) for moves in games])
+    san_batches = list(PositionBatchDataset(games_files, batch_size=4))
+    code_batches = list(PositionBatchDataset(games_files, batch_size=4, moves_format="codes"))
+    assert len(code_batches) == len(san_batches)
+    for (san_planes, san_targets), (code_planes, code_targets) in zip(san_batches, code_batches):
+        assert torch.equal(san_planes, code_planes) and torch.equal(san_targets, code_targets)
+    with pytest.raises(ValueError):
+        PositionBatchDataset(games_files, batch_size=4, moves_format="uci")
+
+
+def test_eval_targets(games_files):
+    for path, games in zip(games_files, [GAMES[:2], GAMES[2:]]):
+        annotations = []
+        for game_index, moves in enumerate(games):
+            num_plies = len(moves.split())
+            # Every other ply has an eval of game_index + ply / 100 pawns
+            eval_cp = np.array([100 * game_index + ply if ply % 2 == 0 else MISSING_EVAL for ply in range(num_plies)],
+                               dtype=np.int16)
+            annotations.append(Annotations(eval_cp, np.zeros(num_plies, dtype=np.int16),
+                                           np.full(num_plies, np.nan, dtype=np.float32)))
+        save_annotations(annotations_path(path), annotations)
+    batches = list(PositionBatchDataset(games_files, batch_size=4, target_type="eval"))
+    planes = torch.cat([planes for planes, _ in batches])
+    targets = torch.cat([targets for _, targets in batches])
+    assert targets.dtype == torch.float32 and targets.shape == (8, 1)
+    encoder, expected_planes, expected_targets = GridEncoder(), [], []
+    for game_index, moves in enumerate(GAMES[:2] + GAMES[2:]):
+        board = chess.Board()
+        for ply, san in enumerate(moves.split()):
+            board.push_san(san)
+            if ply % 2 == 0:
+                expected_planes.append(encoder.encode_board(board))
+                expected_targets.append(game_index % 2 + ply / 100)
+    assert torch.equal(planes.float(), torch.stack(expected_planes))
+    assert torch.allclose(targets.flatten(), torch.tensor(expected_targets))
+    with pytest.raises(ValueError):
+        PositionBatchDataset(games_files, batch_size=4, target_type="wdl")
+
+
+def positions(batches):
+    return [(planes.numpy().tobytes(), target) for planes_batch, targets in batches
+            for planes, target in zip(planes_batch, targets.tolist())]
+
+
+def test_replicas_read_disjoint_games(games_files):
+    everything = sorted(positions(PositionBatchDataset(games_files, batch_size=4)))
+    replicas = [positions(PositionBatchDataset(games_files, batch_size=4, num_replicas=2, rank=rank))
+                for rank in range(2)]
+    # One file each
+    assert [len(replica) for replica in replicas] == [8, 5]
+    assert sorted(replicas[0] + replicas[1]) == everything
+    # More replicas than files: every replica takes every third game
+    replicas = [positions(batch_loader(PositionBatchDataset(games_files, batch_size=4, num_replicas=3, rank=rank),
+                                       num_workers=2 if rank == 0 else 0)) for rank in range(3)]
+    assert sorted(sum(replicas, [])) == everything
+    with pytest.raises(ValueError):
+        PositionBatchDataset(games_files, batch_size=4, num_replicas=2, rank=2)
+
+
+def test_shuffle_buffer(games_files):
+    dataset = PositionBatchDataset(games_files, batch_size=4, shuffle_buffer=6, seed=1)
+    assert dataset.shuffle_buffer == 8
+    epochs = []
+    for epoch in (0, 0, 1):
+        dataset.set_epoch(epoch)
+        batches = list(dataset)
+        assert [len(targets) for _, targets in batches] == [4, 4, 4, 1]
+        epochs.append(positions(batches))
+    assert epochs[0] == epochs[1] and epochs[0] != epochs[2]
+    assert sorted(epochs[0]) == sorted(epochs[2]) == sorted(positions(PositionBatchDataset(games_files, 4)))
+    dataset = PositionBatchDataset(games_files, batch_size=4, drop_last=True, shuffle_buffer=8)
+    assert [len(targets) for _, targets in dataset] == [4, 4, 4]
@@ -0,0 +1,55 @@
+import numpy as np
+import pytest
+import torch
+from deep_chess_playground.datasets.position_batch_dataset import PositionBatchDataset
+from deep_chess_playground.datasets.teacher_cache import TeacherCacheDataset, build_teacher_cache, record_dtype
+from deep_chess_playground.pytorch_modules.cnn.two_d_cnn.backbones import ResidualTower
+from deep_chess_playground.pytorch_modules.policy_value_network import PolicyValueNetwork
+
+
+@pytest.fixture
+def games_file(write_games):
+    return write_games("0.csv.gz", ["e4 e5 Nf3 Nc6 Bb5", "d4 d5 c4", "f3 e5 g4 Qh4#"])
+
+
+def test_cache_round_trip(games_file, tmp_path):
+    torch.manual_seed(0)
+    teacher = PolicyValueNetwork(ResidualTower(24, 1, 8), 8)
+    batches = list(PositionBatchDataset([games_file], batch_size=5))
+    path = str(tmp_path / "teacher.cache")
+    assert build_teacher_cache(teacher, batches, path, top_k=4) == 12
+    assert record_dtype(4).itemsize == 192 + 2 + 4 * 2 + 4 * 2 + 3 * 2
+
+    dataset = TeacherCacheDataset(path, batch_size=5, shuffle=False)
+    assert len(dataset) == 3
+    cached = list(dataset)
+    planes = torch.cat([planes for planes, _ in cached])
+    moves, indices, probabilities, wdl = (torch.cat(parts) for parts in zip(*[targets for _, targets in cached]))
+    assert torch.equal(planes, torch.cat([planes for planes, _ in batches]))
+    assert torch.equal(moves, torch.cat([moves for _, moves in batches]))
+    with torch.no_grad():
+        policy, value = teacher(planes.float())
+    expected_probabilities, expected_indices = torch.softmax(policy, dim=1).topk(4, dim=1)
+    assert torch.equal(indices, expected_indices)
+    assert torch.allclose(probabilities, expected_probabilities, atol=1e-3)
+    assert torch.allclose(wdl, torch.softmax(value, dim=1), atol=1e-3)
+
+
+def test_shuffle_depends_on_epoch(games_file, tmp_path):
+    path = str(tmp_path / "teacher.cache")
+    build_teacher_cache(PolicyValueNetwork(ResidualTower(24, 1, 8), 8),
+                        PositionBatchDataset([games_file], batch_size=5), path, top_k=2)
+    dataset = TeacherCacheDataset(path, batch_size=4, seed=1)
+    first = [targets[0] for _, targets in dataset]
+    assert all(torch.equal(a, b) for a, b in zip(first, [targets[0] for _, targets in dataset]))
+    dataset.set_epoch(1)
+    second = [targets[0] for _, targets in dataset]
+    assert not all(torch.equal(a, b) for a, b in zip(first, second))
+    assert np.array_equal(np.sort(torch.cat(first).numpy()), np.sort(torch.cat(second).numpy()))
+
+
+def test_invalid_file(tmp_path):
+    path = tmp_path / "other.bin"
+    path.write_bytes(b"\0" * 64)
+    with pytest.raises(ValueError):
+        TeacherCacheDataset(str(path), batch_size=4)
@@ -0,0 +1,66 @@
+import pytest
+import torch
+from deep_chess_playground.engine.checkpoint import STATE_DICT_PREFIX
+from deep_chess_playground.engine.model_package import (export_model_package, load_model, load_model_package,
+                                                        save_model_package)
+from deep_chess_playground.pytorch_modules.pytorch_module_factory import PyTorchModuleFactory
+
+
+POLICY_VALUE_CONFIG = {"category": "PolicyValueNetwork", "channels": 8,
+                       "backbone": {"category": "ResidualTower", "input_planes": 24, "num_blocks": 1, "channels": 8}}
+
+
+@pytest.mark.parametrize("config", [
+    POLICY_VALUE_CONFIG,
+    {"category": "SquareTransformer", "input_planes": 24, "num_layers": 1, "channels": 16, "num_heads": 2,
+     "relative_position_bias": True},
+    {"category": "LineConvolutionTower", "input_planes": 24, "num_blocks": 1, "channels": 8},
+])
+def test_package_round_trip(tmp_path, config):
+    torch.manual_seed(0)
+    module = PyTorchModuleFactory.build_module(config).eval()
+    package_path = str(tmp_path / "model.pkg.pt")
+    save_model_package(module, config, package_path)
+    loaded = load_model_package(package_path)
+    x = torch.rand(4, 24, 8, 8)
+    with torch.no_grad():
+        expected = module(x)
+    actual = loaded(x)
+    for expected_output, actual_output in zip(*(out if isinstance(out, tuple) else (out,)
+                                                for out in (expected, actual))):
+        assert torch.equal(expected_output, actual_output)
+    assert not loaded.training
+    assert not any(parameter.requires_grad for parameter in loaded.parameters())
+
+
+def test_export_from_lightning_checkpoint(tmp_path):
+    torch.manual_seed(0)
+    module = PyTorchModuleFactory.build_module(POLICY_VALUE_CONFIG)
+    optimizer = torch.optim.Adam(module.parameters())
+    module(torch.rand(2, 24, 8, 8))[0].sum().backward()
+    optimizer.step()
+    checkpoint_path, package_path = str(tmp_path / "model.ckpt"), str(tmp_path / "model.pkg.pt")
+    torch.save({"state_dict": {STATE_DICT_PREFIX + name: tensor for name, tensor in module.state_dict().items()},
+                "optimizer_states": [optimizer.state_dict()], "epoch": 3}, checkpoint_path)
+    config = {"category": "MultiClassClassifier", "pytorch_module": POLICY_VALUE_CONFIG}
+
+    export_model_package(config, checkpoint_path, package_path)
+    package = torch.load(package_path, weights_only=True)
+    assert set(package) == {"format_version", "config", "state_dict", "buffers"}
+    assert package["config"] == POLICY_VALUE_CONFIG
+    # No configuration file is needed for a package
+    for loaded in (load_model(None, package_path), load_model_package(package_path, mmap=False)):
+        for name, tensor in module.state_dict().items():
+            assert torch.equal(loaded.state_dict()[name], tensor)
+
+
+def test_load_model_needs_config_for_checkpoints(tmp_path):
+    with pytest.raises(ValueError, match="configuration"):
+        load_model(None, str(tmp_path / "model.ckpt"))
+
+
+def test_not_a_package(tmp_path):
+    package_path = str(tmp_path / "model.pkg.pt")
+    torch.save({"state_dict": {}}, package_path)
+    with pytest.raises(ValueError, match="not a model package"):
+        load_model_package(package_path)
@@ -0,0 +1,104 @@
+import chess
+import numpy as np
+import pytest
+import torch
+from deep_chess_playground.engine.batcher import InferenceBatcher
+from deep_chess_playground.data_encoders.input_encoders.grid_encoding import GridEncoder
+from deep_chess_playground.data_encoders.output_encoders.move_encoding_8_8_73 import MoveEncoder8x8x73
+from deep_chess_playground.engine.evaluation import Evaluation, evaluations_from_outputs
+from deep_chess_playground.engine.search import Search, terminal_value
+from deep_chess_playground.pytorch_modules.cnn.two_d_cnn.backbones import ResidualTower
+from deep_chess_playground.pytorch_modules.cnn.two_d_cnn.heads import AlphaZeroMoveClassificationHead, ValueWDLHead
+from deep_chess_playground.pytorch_modules.policy_value_network import PolicyValueNetwork
+
+
+def uniform_evaluate(boards):
+    evaluations = []
+    for board in boards:
+        moves = list(board.legal_moves)
+        evaluations.append(Evaluation(moves, np.full(len(moves), 1 / max(len(moves), 1)), 0.0))
+    return evaluations
+
+
+def test_search_finds_mate_in_one():
+    search = Search(uniform_evaluate)
+    search.set_position(chess.Board("6k1/5ppp/8/8/8/8/8/R6K w - - 0 1"))
+    for _ in range(100):
+        search.run_iteration()
+    assert search.best_move() == chess.Move.from_uci("a1a8")
+    assert search.root_value() > 0.9
+
+
+def test_search_reuses_subtree():
+    search = Search(uniform_evaluate)
+    board = chess.Board()
+    search.set_position(board)
+    for _ in range(20):
+        search.run_iteration()
+    best_move = search.best_move()
+    child = search.root.children[best_move]
+    board.push(best_move)
+    assert search.set_position(board)
+    assert search.root is child
+    assert not search.set_position(chess.Board("6k1/5ppp/8/8/8/8/8/R6K w - - 0 1"))
+
+
+def test_search_virtual_loss_is_reverted():
+    search = Search(uniform_evaluate, leaves_per_batch=8)
+    search.set_position(chess.Board())
+    evaluated = sum(search.run_iteration() for _ in range(10))
+    assert search.root.visit_count == evaluated
+    assert all(child.visit_count >= 0 for child in search.root.children.values())
+
+
+@pytest.mark.parametrize("fen, expected", [
+    ("6k1/5ppp/8/8/8/8/8/R6K w - - 0 1", None),
+    ("R5k1/5ppp/8/8/8/8/8/7K b - - 0 1", -1.0),
+    ("7k/5Q2/6K1/8/8/8/8/8 b - - 0 1", 0.0),
+])
+def test_terminal_value(fen, expected):
+    assert terminal_value(chess.Board(fen)) == expected
+
+
+def test_inference_batcher_evaluates_legal_moves():
+    torch.manual_seed(0)
+    batcher = InferenceBatcher(PolicyValueNetwork(ResidualTower(24, 1, 8), 8), max_batch_size=4)
+    boards = [chess.Board(), chess.Board("6k1/5ppp/8/8/8/8/8/R6K w - - 0 1")] * 3
+    evaluations = batcher.evaluate(boards)
+    batcher.close()
+    assert len(evaluations) == 6
+    for board, evaluation in zip(boards, evaluations):
+        assert set(evaluation.moves) == set(board.legal_moves)
+        assert evaluation.priors.sum() == pytest.approx(1.0)
+        assert -1 <= evaluation.value <= 1
+    assert batcher.positions_evaluated == 6
+    assert batcher.batches_evaluated >= 2
+
+
+class SoftmaxHeadsNetwork(torch.nn.Module):
+    def __init__(self):
+        super().__init__()
+        self.backbone = ResidualTower(24, 1, 8)
+        self.policy_head = AlphaZeroMoveClassificationHead(8)
+        self.value_head = ValueWDLHead(8)
+
+    def forward(self, x):
+        features = self.backbone(x)
+        return self.policy_head(features), self.value_head(features)
+
+
+def test_evaluations_of_probability_heads():
+    torch.manual_seed(0)
+    model = SoftmaxHeadsNetwork().eval()
+    boards = [chess.Board(), chess.Board("6k1/5ppp/8/8/8/8/8/R6K b - - 0 1")]
+    with torch.no_grad():
+        policy, wdl = model(torch.stack([GridEncoder().encode_board(board) for board in boards]))
+    move_encoder = MoveEncoder8x8x73()
+    probabilities = policy.permute(0, 2, 3, 1).flatten(1)
+    for index, (board, evaluation) in enumerate(zip(boards, evaluations_from_outputs((policy, wdl), boards,
+                                                                                      move_encoder))):
+        # The head's probabilities restricted to the legal moves, not a softmax of them
+        expected = probabilities[index, [move_encoder.index(move) for move in evaluation.moves]].numpy()
+        assert evaluation.priors == pytest.approx(expected / expected.sum(), rel=1e-4)
+        white_value = float(wdl[index, 0] - wdl[index, 2])
+        assert evaluation.value == pytest.approx(white_value if board.turn == chess.WHITE else -white_value, abs=1e-6)
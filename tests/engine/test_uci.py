@@ -0,0 +1,128 @@
+import io
+import time
+import chess
+import pytest
+import torch
+from deep_chess_playground.engine.batcher import InferenceBatcher
+from deep_chess_playground.engine.uci import DEFAULT_NODES, UciEngine, SearchLimits, value_to_centipawns
+from deep_chess_playground.pytorch_modules.cnn.two_d_cnn.backbones import ResidualTower
+from deep_chess_playground.pytorch_modules.policy_value_network import PolicyValueNetwork
+
+
+@pytest.fixture
+def batcher():
+    torch.manual_seed(0)
+    batcher = InferenceBatcher(PolicyValueNetwork(ResidualTower(24, 1, 8), 8))
+    yield batcher
+    batcher.close()
+
+
+def lines(output):
+    return output.getvalue().splitlines()
+
+
+def test_uci_handshake(batcher):
+    output = io.StringIO()
+    engine = UciEngine(batcher.evaluate, output)
+    engine.handle("uci")
+    engine.handle("isready")
+    assert lines(output)[-2:] == ["uciok", "readyok"]
+    assert any(line.startswith("option name Ponder") for line in lines(output))
+
+
+def test_go_nodes_reports_info_and_best_move(batcher):
+    output = io.StringIO()
+    engine = UciEngine(batcher.evaluate, output)
+    engine.handle("position startpos moves e2e4 e7e5")
+    engine.handle("go nodes 64")
+    engine.wait()
+    assert any(line.startswith("info string time to first move") for line in lines(output))
+    assert any(" nps " in line and " pv " in line for line in lines(output))
+    best_move = lines(output)[-1].split()[1]
+    board = chess.Board()
+    board.push_uci("e2e4")
+    board.push_uci("e7e5")
+    assert chess.Move.from_uci(best_move) in board.legal_moves
+
+
+def test_stop_and_isready_answer_during_infinite_search(batcher):
+    output = io.StringIO()
+    engine = UciEngine(batcher.evaluate, output)
+    engine.handle("position startpos")
+    engine.handle("go infinite")
+    time.sleep(0.2)
+    start = time.perf_counter()
+    engine.handle("isready")
+    assert time.perf_counter() - start < 0.05
+    assert "readyok" in lines(output)
+    engine.handle("stop")
+    engine.wait()
+    assert lines(output)[-1].startswith("bestmove")
+
+
+def test_ponder_then_ponderhit_reuses_tree(batcher):
+    output = io.StringIO()
+    engine = UciEngine(batcher.evaluate, output)
+    engine.handle("position startpos moves e2e4")
+    engine.handle("go nodes 64")
+    engine.wait()
+    best_move = lines(output)[-1].split()[1]
+    engine.handle(f"position startpos moves e2e4 {best_move}")
+    engine.handle("go ponder movetime 100")
+    time.sleep(0.2)
+    assert not lines(output)[-1].startswith("bestmove")
+    engine.handle("ponderhit")
+    engine.wait()
+    assert any(line.startswith("info string reused") for line in lines(output))
+    assert lines(output)[-1].startswith("bestmove")
+
+
+def test_fen_position_and_quit(batcher):
+    output = io.StringIO()
+    engine = UciEngine(batcher.evaluate, output)
+    engine.handle("position fen 6k1/5ppp/8/8/8/8/8/R6K w - - 0 1")
+    engine.handle("go movetime 100")
+    assert engine.handle("quit") is False
+    assert lines(output)[-1].startswith("bestmove")
+
+
+def test_go_depth_and_mate_end_the_search(batcher):
+    output = io.StringIO()
+    engine = UciEngine(batcher.evaluate, output)
+    engine.handle("position startpos")
+    engine.handle("go depth 2")
+    engine.wait()
+    assert lines(output)[-1].startswith("bestmove")
+    engine.handle("position fen 6k1/5ppp/8/8/8/8/8/R6K w - - 0 1")
+    engine.handle("go mate 1")
+    engine.wait()
+    assert lines(output)[-1].startswith("bestmove")
+
+
+@pytest.mark.parametrize("moves", ["f2f3 e7e5 g2g4 d8h4", "e2e3 a7a5 d1h5 a8a6 h5a5 h7h5 h2h4 a6h6 a5c7 f7f6 c7d7 e8f7 "
+                                   "d7b7 d8d3 b7b8 d3h7 b8c8 f7g6 c8e6"])
+def test_go_in_a_finished_game(batcher, moves):
+    # Checkmate and the shortest known stalemate
+    output = io.StringIO()
+    engine = UciEngine(batcher.evaluate, output)
+    engine.handle(f"position startpos moves {moves}")
+    engine.handle("go nodes 10")
+    engine.wait()
+    assert lines(output) == ["bestmove 0000"]
+
+
+def test_search_limits():
+    limits = SearchLimits.from_tokens("wtime 60000 btime 30000 winc 1000 binc 0".split())
+    assert limits.time_budget(chess.WHITE) == pytest.approx(60000 / 30 / 1000 + 0.75 - 0.05)
+    assert limits.time_budget(chess.BLACK) == pytest.approx(1.0 - 0.05)
+    assert SearchLimits.from_tokens(["infinite"]).time_budget(chess.WHITE) is None
+    assert SearchLimits.from_tokens("movetime 500".split()).time_budget(chess.WHITE) == pytest.approx(0.45)
+    assert SearchLimits.from_tokens("depth 5 mate 2".split()).max_depth() == 3
+    assert SearchLimits.from_tokens([]).node_limit(chess.WHITE) == DEFAULT_NODES
+    assert SearchLimits.from_tokens(["infinite"]).node_limit(chess.WHITE) is None
+
+
+def test_value_to_centipawns():
+    assert value_to_centipawns(0.0) == 0
+    assert value_to_centipawns(0.5) > 100
+    assert value_to_centipawns(-0.5) == -value_to_centipawns(0.5)
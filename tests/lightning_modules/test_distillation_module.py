@@ -0,0 +1,52 @@
+import pytorch_lightning as pl
+import torch
+from deep_chess_playground.lightning_modules.distillation_module import (DistillationLoss, DistillationModule,
+                                                                         distillation_report)
+from deep_chess_playground.pytorch_modules.cnn.two_d_cnn.backbones import ResidualTower
+from deep_chess_playground.pytorch_modules.policy_value_network import PolicyValueNetwork
+
+
+def teacher_targets(teacher, planes, moves, top_k=8):
+    teacher.eval()
+    with torch.no_grad():
+        policy, value = teacher(planes.float())
+    probabilities, indices = torch.softmax(policy, dim=1).topk(top_k, dim=1)
+    return moves, indices, probabilities, torch.softmax(value, dim=1)
+
+
+def test_loss_is_minimal_for_the_teacher():
+    torch.manual_seed(0)
+    teacher = PolicyValueNetwork(ResidualTower(24, 1, 8), 8)
+    planes = torch.randint(0, 2, (16, 24, 8, 8), dtype=torch.uint8)
+    targets = teacher_targets(teacher, planes, torch.randint(0, 4672, (16,)), top_k=4672)
+    loss_fn = DistillationLoss()
+    with torch.no_grad():
+        outputs = teacher(planes.float())
+        teacher_loss = loss_fn(outputs, targets)
+        other_loss = loss_fn((outputs[0].roll(1, dims=1), outputs[1].roll(1, dims=1)), targets)
+    assert teacher_loss < other_loss
+    hard = DistillationLoss(hard_label_weight=1.0)(outputs, targets)
+    assert hard > teacher_loss
+
+
+def test_student_learns_teacher_policy():
+    torch.manual_seed(0)
+    teacher = PolicyValueNetwork(ResidualTower(24, 2, 16), 16)
+    student = PolicyValueNetwork(ResidualTower(24, 1, 8), 8)
+    planes = torch.randint(0, 2, (32, 24, 8, 8), dtype=torch.uint8)
+    targets = teacher_targets(teacher, planes, torch.randint(0, 4672, (32,)))
+    batches = [(planes, targets)] * 20
+    metrics = {}
+    module = DistillationModule(student, torch.optim.Adam(student.parameters(), lr=1e-2), metrics=metrics)
+    assert metrics == {}
+    loss_before = module.loss_fn(student(planes.float()), targets).item()
+    trainer = pl.Trainer(max_epochs=1, logger=False, enable_checkpointing=False, enable_progress_bar=False,
+                         enable_model_summary=False)
+    trainer.fit(module, torch.utils.data.DataLoader(batches, batch_size=None))
+    student.eval()
+    assert module.loss_fn(student(planes.float()), targets).item() < loss_before
+
+    report = distillation_report(teacher, student, [(planes, targets[1][:, 0])], timing_repeats=2)
+    assert report["teacher_accuracy"] == 1.0
+    assert report["accuracy_retention"] == report["student_accuracy"] == report["teacher_agreement"]
+    assert report["speedup"] > 0
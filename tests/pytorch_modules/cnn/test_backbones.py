@@ -0,0 +1,59 @@
+import pytest
+import torch
+from deep_chess_playground.pytorch_modules.cnn.efficient_blocks import SqueezeExcitation, \
+    DepthwiseSeparableConvolution
+from deep_chess_playground.pytorch_modules.cnn.one_d_cnn.backbones import LineConvolutionTower, get_board_lines
+from deep_chess_playground.pytorch_modules.cnn.three_d_cnn.backbones import HistoryConvolutionTower
+from deep_chess_playground.pytorch_modules.cnn.two_d_cnn.backbones import ConvolutionalTower, ResidualTower
+
+
+def count_parameters(module):
+    return sum(parameter.numel() for parameter in module.parameters())
+
+
+@pytest.mark.parametrize("tower_class", [ConvolutionalTower, ResidualTower, LineConvolutionTower])
+@pytest.mark.parametrize("squeeze_excitation_ratio, depthwise_separable", [
+    (None, False),
+    (4, False),
+    (None, True),
+    (4, True),
+])
+def test_tower_output_shape(tower_class, squeeze_excitation_ratio, depthwise_separable):
+    tower = tower_class(24, 3, 32, squeeze_excitation_ratio=squeeze_excitation_ratio,
+                        depthwise_separable=depthwise_separable)
+    assert tower(torch.randn(2, 24, 8, 8)).shape == (2, 32, 8, 8)
+
+
+def test_depthwise_separable_tower_has_fewer_parameters():
+    assert count_parameters(ResidualTower(24, 4, 64, depthwise_separable=True)) < \
+        count_parameters(ResidualTower(24, 4, 64)) / 2
+
+
+@pytest.mark.parametrize("input_shape", [(2, 4 * 24, 8, 8), (2, 24, 4, 8, 8)])
+def test_history_convolution_tower_output_shape(input_shape):
+    tower = HistoryConvolutionTower(input_planes=24, history_length=4, num_blocks=2, channels=16,
+                                    squeeze_excitation_ratio=4, depthwise_separable=True)
+    assert tower(torch.randn(*input_shape)).shape == (2, 16, 8, 8)
+
+
+def test_board_lines_cover_every_square_four_times():
+    lines = get_board_lines()
+    assert lines.shape == (46, 8)
+    assert (torch.bincount(lines.flatten(), minlength=65)[:64] == 4).all()
+
+
+def test_line_convolution_connects_distant_squares_on_a_line():
+    tower = LineConvolutionTower(1, 1, 4, kernel_size=3).eval()
+    x = torch.zeros(1, 1, 8, 8)
+    baseline = tower(x)
+    x[0, 0, 0, 0] = 1  # a8
+    difference = (tower(x) - baseline).abs().sum(dim=1)[0]
+    assert difference[0, 1] > 0  # b8 shares the rank with a8
+    assert difference[1, 1] > 0  # b7 shares the diagonal with a8
+    assert difference[1, 2] == 0  # c7 shares no line with a8
+
+
+def test_squeeze_excitation_and_depthwise_separable_convolution_shapes():
+    assert SqueezeExcitation(8)(torch.randn(2, 8, 5)).shape == (2, 8, 5)
+    assert SqueezeExcitation(8)(torch.randn(2, 8, 3, 8, 8)).shape == (2, 8, 3, 8, 8)
+    assert DepthwiseSeparableConvolution(2, 8, 16)(torch.randn(2, 8, 8, 8)).shape == (2, 16, 8, 8)
@@ -0,0 +1,67 @@
+import pytest
+import torch
+from deep_chess_playground.pytorch_modules.cnn.channel_pruning import (batch_norm_l1_penalty, count_channels,
+                                                                       pareto_table, prunable_groups,
+                                                                       prune_channels)
+from deep_chess_playground.pytorch_modules.cnn.two_d_cnn.backbones import ConvolutionalTower, ResidualTower
+from deep_chess_playground.pytorch_modules.policy_value_network import PolicyValueNetwork
+
+
+def silence_channels(model, fraction):
+    """Zeroes the BatchNorm weight and bias of a fraction of every group, so removing them changes nothing."""
+    for group in prunable_groups(model):
+        channels = group.batch_norm.num_features
+        silenced = torch.randperm(channels)[:int(fraction * channels)]
+        with torch.no_grad():
+            group.batch_norm.weight[silenced] = 0
+            group.batch_norm.bias[silenced] = 0
+
+
+@pytest.mark.parametrize("tower_class", [ConvolutionalTower, ResidualTower])
+@pytest.mark.parametrize("squeeze_excitation_ratio, depthwise_separable", [
+    (None, False),
+    (4, False),
+    (None, True),
+])
+def test_pruning_silent_channels_keeps_outputs(tower_class, squeeze_excitation_ratio, depthwise_separable):
+    torch.manual_seed(0)
+    model = PolicyValueNetwork(tower_class(24, 3, 16, squeeze_excitation_ratio=squeeze_excitation_ratio,
+                                           depthwise_separable=depthwise_separable), 16)
+    silence_channels(model, 0.5)
+    model.eval()
+    pruned = prune_channels(model, 0.5).eval()
+    assert count_channels(pruned) == count_channels(model) // 2
+    assert sum(p.numel() for p in pruned.parameters()) < sum(p.numel() for p in model.parameters())
+    x = torch.randn(4, 24, 8, 8)
+    with torch.no_grad():
+        for expected, actual in zip(model(x), pruned(x)):
+            assert torch.allclose(expected, actual, atol=1e-5)
+
+
+def test_min_channels_and_errors():
+    tower = ResidualTower(24, 2, 8)
+    with torch.no_grad():
+        tower.blocks[0].conv1[1].weight.zero_()
+    pruned = prune_channels(tower, 0.5, min_channels=2)
+    assert [group.batch_norm.num_features for group in prunable_groups(pruned)] == [2, 8]
+    assert pruned(torch.randn(1, 24, 8, 8)).shape == (1, 8, 8, 8)
+    with pytest.raises(ValueError):
+        prune_channels(tower, 1.0)
+    with pytest.raises(ValueError):
+        prune_channels(torch.nn.Linear(2, 2), 0.5)
+    assert batch_norm_l1_penalty(tower).item() == pytest.approx(8.0)
+
+
+def test_pareto_table():
+    torch.manual_seed(0)
+    model = ResidualTower(24, 2, 16)
+    for group in prunable_groups(model):
+        torch.nn.init.uniform_(group.batch_norm.weight)
+    fine_tuned = []
+    table = pareto_table(model, [0.0, 0.25, 0.5], evaluate=lambda pruned: float(count_channels(pruned)),
+                         example_input=torch.randn(8, 24, 8, 8), fine_tune=fine_tuned.append, rounds=2, repeats=2)
+    assert table["channels"].tolist() == [32, 24, 16]
+    assert len(fine_tuned) == 4
+    assert table["flops"].is_monotonic_decreasing
+    assert table.loc[0, "pareto"]
+    assert model.training
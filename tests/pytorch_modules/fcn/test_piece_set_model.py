@@ -0,0 +1,19 @@
+import chess
+import torch
+from deep_chess_playground.data_encoders.input_encoders.piece_list_encoding import PieceListEncoder
+from deep_chess_playground.pytorch_modules.fcn.piece_centric.piece_set_model import PieceSetModel
+
+
+def test_piece_set_model_output_shape():
+    model = PieceSetModel(hidden_sizes=[64, 32], output_size=3)
+    x = torch.from_numpy(PieceListEncoder().encode(chess.STARTING_FEN)).unsqueeze(0).repeat(5, 1, 1)
+    assert model(x).shape == (5, 3)
+
+
+def test_piece_set_model_ignores_padding_and_token_order():
+    model = PieceSetModel(hidden_sizes=[16], output_size=4)
+    x = torch.from_numpy(PieceListEncoder().encode("4k3/8/8/8/8/8/8/4K3 w - - 0 1")).unsqueeze(0)
+    shuffled = x.clone()
+    shuffled[:, :, [0, 1]] = x[:, :, [1, 0]]
+    assert torch.allclose(model(x), model(shuffled))
+    assert torch.allclose(model(x), model(x[:, :, :2]))
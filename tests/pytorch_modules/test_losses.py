@@ -0,0 +1,39 @@
+import chess
+import torch
+from deep_chess_playground.data_encoders.output_encoders.move_encoding_8_8_73 import MoveEncoder8x8x73
+from deep_chess_playground.pytorch_modules.cnn.two_d_cnn.heads import AlphaZeroMoveClassificationHead
+from deep_chess_playground.pytorch_modules.losses import masked_log_softmax, MaskedPolicyCrossEntropyLoss
+
+
+def test_masked_log_softmax_puts_all_probability_on_legal_moves():
+    logits = torch.randn(2, 4672)
+    mask = MoveEncoder8x8x73().batch_legal_move_mask([chess.STARTING_FEN, chess.STARTING_FEN], flat=True)
+    probabilities = masked_log_softmax(logits, mask).exp()
+    assert torch.allclose(probabilities[mask].view(2, -1).sum(dim=1), torch.ones(2))
+    assert probabilities[~mask].max() == 0
+
+
+def test_masked_log_softmax_without_legal_moves_is_finite():
+    assert torch.isfinite(masked_log_softmax(torch.randn(1, 4672), torch.zeros(1, 4672, dtype=torch.bool))).all()
+
+
+def test_masked_policy_loss_accepts_one_hot_targets():
+    encoder = MoveEncoder8x8x73()
+    logits = torch.randn(1, 8, 8, 73, requires_grad=True)
+    mask = encoder.batch_legal_move_mask([chess.STARTING_FEN])
+    loss_fn = MaskedPolicyCrossEntropyLoss()
+    one_hot_loss = loss_fn(logits, encoder.encode("e2e4").unsqueeze(0), mask)
+    index_loss = loss_fn(logits, torch.tensor([encoder.index("e2e4")]), mask)
+    assert torch.allclose(one_hot_loss, index_loss)
+    assert index_loss < loss_fn(logits, torch.tensor([encoder.index("e2e4")]))
+    index_loss.backward()
+    assert logits.grad[~mask].abs().max() == 0
+
+
+def test_policy_head_with_legal_mask():
+    head = AlphaZeroMoveClassificationHead(input_planes=16)
+    mask = MoveEncoder8x8x73().batch_legal_move_mask([chess.STARTING_FEN] * 4)
+    log_probabilities = head(torch.randn(4, 16, 8, 8), mask)
+    assert log_probabilities.shape == (4, 4672)
+    assert torch.allclose(log_probabilities.exp().sum(dim=1), torch.ones(4))
+    assert head(torch.randn(4, 16, 8, 8)).shape == (4, 73, 8, 8)
@@ -0,0 +1,31 @@
+import pytest
+import torch
+from deep_chess_playground.pytorch_modules.pytorch_module_factory import PyTorchModuleFactory
+
+
+@pytest.mark.parametrize("config", [
+    {"category": "ConvolutionalTower", "input_planes": 24, "num_blocks": 2, "channels": 16},
+    {"category": "ResidualTower", "input_planes": 24, "num_blocks": 2, "channels": 16, "squeeze_excitation_ratio": 4},
+    {"category": "LineConvolutionTower", "input_planes": 24, "num_blocks": 2, "channels": 16,
+     "depthwise_separable": True},
+    {"category": "HistoryConvolutionTower", "input_planes": 12, "history_length": 2, "num_blocks": 2, "channels": 16},
+    {"category": "SquareTransformer", "input_planes": 24, "num_layers": 1, "channels": 16, "num_heads": 2},
+])
+def test_build_backbone(config):
+    module = PyTorchModuleFactory.build_module(config)
+    assert module(torch.randn(2, 24, 8, 8)).shape == (2, 16, 8, 8)
+
+
+def test_build_sequential_does_not_modify_config():
+    config = {"category": "Sequential", "modules": [
+        {"category": "ResidualTower", "input_planes": 24, "num_blocks": 1, "channels": 16},
+        {"category": "ValueWDLHead", "input_planes": 16},
+    ]}
+    module = PyTorchModuleFactory.build_module(config)
+    assert module(torch.randn(2, 24, 8, 8)).shape == (2, 3)
+    assert config["modules"][0]["category"] == "ResidualTower"
+
+
+def test_build_invalid_category():
+    with pytest.raises(ValueError):
+        PyTorchModuleFactory.build_module({"category": "Unknown"})
@@ -0,0 +1,42 @@
+import pytest
+import torch
+from deep_chess_playground.pytorch_modules.cnn.two_d_cnn.heads import AlphaZeroMoveClassificationHead, ValueWDLHead
+from deep_chess_playground.pytorch_modules.transformer.square_transformer import SquareTransformer, \
+    RelativePositionBias
+
+
+@pytest.mark.parametrize("learned_square_embedding, relative_position_bias", [
+    (True, False),
+    (False, True),
+    (True, True),
+])
+def test_square_transformer_output_shape(learned_square_embedding, relative_position_bias):
+    transformer = SquareTransformer(input_planes=24, num_layers=2, channels=32, num_heads=4,
+                                    learned_square_embedding=learned_square_embedding,
+                                    relative_position_bias=relative_position_bias)
+    output = transformer(torch.randn(3, 24, 8, 8))
+    assert output.shape == (3, 32, 8, 8)
+    assert AlphaZeroMoveClassificationHead(32)(output).shape == (3, 73, 8, 8)
+    assert ValueWDLHead(32)(output).shape == (3, 3)
+
+
+def test_square_transformer_gradients_reach_all_parameters():
+    transformer = SquareTransformer(input_planes=24, num_layers=1, channels=16, num_heads=2,
+                                    relative_position_bias=True)
+    transformer(torch.randn(2, 24, 8, 8)).sum().backward()
+    assert all(parameter.grad is not None for parameter in transformer.parameters())
+
+
+def test_square_transformer_invalid_number_of_heads():
+    with pytest.raises(ValueError):
+        SquareTransformer(input_planes=24, num_layers=1, channels=30, num_heads=4)
+
+
+def test_relative_position_bias_depends_only_on_offset():
+    position_bias = RelativePositionBias(num_heads=2)
+    torch.nn.init.normal_(position_bias.bias)
+    bias = position_bias()
+    assert bias.shape == (2, 64, 64)
+    # a8 -> b7 and c6 -> d5 have the same (row, column) offset
+    assert torch.equal(bias[:, 0, 9], bias[:, 18, 27])
+    assert not torch.equal(bias[:, 0, 9], bias[:, 0, 1])
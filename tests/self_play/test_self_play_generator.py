@@ -0,0 +1,81 @@
+import chess
+import numpy as np
+import pandas as pd
+import pytest
+from deep_chess_playground.data_encoders.output_encoders.move_encoding_8_8_73 import MoveEncoder8x8x73
+from deep_chess_playground.engine.evaluation import Evaluation
+from deep_chess_playground.engine.search import Search
+from deep_chess_playground.pytorch_modules.cnn.two_d_cnn.backbones import ConvolutionalTower
+from deep_chess_playground.pytorch_modules.policy_value_network import PolicyValueNetwork
+from deep_chess_playground.self_play.ring_buffer import InferenceRingBuffer
+from deep_chess_playground.self_play.self_play_generator import SelfPlayGenerator, play_game
+from deep_chess_playground.utils.headers import HEADERS
+
+
+def uniform_evaluate(boards):
+    evaluations = []
+    for board in boards:
+        moves = list(board.legal_moves)
+        evaluations.append(Evaluation(moves, np.full(len(moves), 1 / max(len(moves), 1)), 0.0))
+    return evaluations
+
+
+def test_ring_buffer_round_trip():
+    ring = InferenceRingBuffer(4)
+    consumer = InferenceRingBuffer(4, name=ring.name)
+    try:
+        for round_index in range(3):
+            planes = np.full((3, 24, 8, 8), round_index, dtype=np.uint8)
+            start = ring.put_requests(planes)
+            pending_start, count = consumer.pending_requests()
+            assert (pending_start, count) == (start, 3)
+            assert (consumer.planes[consumer.slots(start, count)] == round_index).all()
+            assert not ring.responses_ready(start, count)
+            consumer.put_responses(start, np.full((3, 4672), round_index, np.float32), np.arange(3, dtype=np.float32))
+            assert ring.responses_ready(start, count)
+            policy, value = ring.get_responses(start, count)
+            assert (policy == round_index).all() and value.tolist() == [0, 1, 2]
+        with pytest.raises(RuntimeError):
+            ring.put_requests(np.zeros((5, 24, 8, 8), dtype=np.uint8))
+    finally:
+        consumer.close()
+        ring.close()
+        ring.unlink()
+
+
+def test_play_game_records_visit_distributions():
+    game = play_game(Search(uniform_evaluate, leaves_per_batch=4), MoveEncoder8x8x73(), np.random.default_rng(0),
+                     num_simulations=8, max_plies=10)
+    assert len(game.board.move_stack) == 10
+    assert game.result == "1/2-1/2" and game.termination == "Adjudication"
+    assert len(game.policy_indices) == len(game.policy_probabilities) == 10
+    assert all(abs(float(probabilities.sum()) - 1) < 1e-2 for probabilities in game.policy_probabilities)
+    assert game.values().tolist() == [0] * 10
+    row = dict(zip(HEADERS, game.row()))
+    assert len(row["Moves"].split()) == 10
+    board = chess.Board()
+    for san in row["Moves"].split():
+        board.push_san(san)
+    assert board.move_stack == game.board.move_stack
+
+
+@pytest.mark.parametrize("output_format", ["csv", "shards"])
+def test_generate_with_worker_processes(tmp_path, output_format):
+    model = PolicyValueNetwork(ConvolutionalTower(24, 1, 8), 8, value_channels=4)
+    generator = SelfPlayGenerator(model, str(tmp_path), num_workers=2, output_format=output_format,
+                                  games_per_file=2, num_simulations=4, leaves_per_batch=2, max_plies=6)
+    stats = generator.generate(3)
+    assert stats["games"] == 3 and stats["positions"] == 18 and stats["batches"] > 0
+    if output_format == "csv":
+        df = pd.concat([pd.read_csv(tmp_path / "0.csv.gz"), pd.read_csv(tmp_path / "1.csv.gz")])
+        assert list(df.columns) == HEADERS and len(df) == 3
+    else:
+        shards = [np.load(tmp_path / "0.npz"), np.load(tmp_path / "1.npz")]
+        assert sum(len(shard["planes"]) for shard in shards) == 18
+        assert all(len(shard["policy_offsets"]) == len(shard["values"]) + 1 for shard in shards)
+        assert shards[0]["planes"].dtype == np.uint8
+
+
+def test_missing_destination_dir(tmp_path):
+    with pytest.raises(FileNotFoundError):
+        SelfPlayGenerator(None, str(tmp_path / "missing"))
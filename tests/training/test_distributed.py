@@ -0,0 +1,79 @@
+import socket
+import pytest
+import torch
+import torch.distributed as dist
+import torch.multiprocessing as mp
+from torch.nn.parallel import DistributedDataParallel
+from deep_chess_playground.lightning_modules.basic_module import BasicModule
+from deep_chess_playground.training.distributed import (EvenBatches, HierarchicalAllReduceState, communication_hook,
+                                                        fit, hierarchical_allreduce_hook, training_settings)
+
+
+GAMES = ["e4 e5 Nf3 Nc6 Bb5 a6", "d4 d5 c4 e6 Nc3", "f3 e5 g4 Qh4#", "Nf3 d5 g3", "c4 e5 Nc3 Nf6 g3"]
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+class ListDataset:
+    def __init__(self):
+        self.epoch = None
+
+    def set_epoch(self, epoch):
+        self.epoch = epoch
+
+
+def run_collectives(rank, world_size, port):
+    dist.init_process_group("gloo", init_method=f"tcp://127.0.0.1:{port}", rank=rank, world_size=world_size)
+    # Every rank has a different number of batches, all stop after the smallest number
+    batches = EvenBatches(list(range(rank + 2)), ListDataset())
+    assert list(batches) == [0, 1]
+
+    for dtype in (None, torch.float16):
+        torch.manual_seed(0)
+        flat, hierarchical = torch.nn.Linear(16, 8), torch.nn.Linear(16, 8)
+        hierarchical.load_state_dict(flat.state_dict())
+        flat, hierarchical = DistributedDataParallel(flat), DistributedDataParallel(hierarchical)
+        hierarchical.register_comm_hook(HierarchicalAllReduceState(2, dtype), hierarchical_allreduce_hook)
+        x = torch.rand(4, 16) * (rank + 1)
+        flat(x).square().sum().backward()
+        hierarchical(x).square().sum().backward()
+        for expected, actual in zip(flat.parameters(), hierarchical.parameters()):
+            torch.testing.assert_close(actual.grad, expected.grad, rtol=1e-3 if dtype else 1e-6, atol=1e-3)
+    dist.destroy_process_group()
+
+
+def test_even_batches_and_hierarchical_allreduce():
+    mp.spawn(run_collectives, args=(4, free_port()), nprocs=4)
+
+
+def test_communication_hook():
+    settings = training_settings({"train_files": ["0.csv.gz"], "processes": 4})
+    assert communication_hook(settings) == (None, None)
+    state, hook = communication_hook({**settings, "allreduce": "hierarchical", "gradient_compression": "bf16"})
+    assert (state.group_size, state.dtype, hook) == (4, torch.bfloat16, hierarchical_allreduce_hook)
+    with pytest.raises(ValueError, match="PowerSGD"):
+        training_settings({"train_files": ["0.csv.gz"], "allreduce": "hierarchical",
+                           "gradient_compression": "powersgd"})
+    with pytest.raises(ValueError, match="Unknown"):
+        training_settings({"train_files": ["0.csv.gz"], "proceses": 4})
+
+
+def test_fit_two_processes(tmp_path, write_games):
+    for index in range(3):
+        write_games(f"{index}.csv.gz", GAMES[index:] + GAMES[:index])
+    torch.manual_seed(0)
+    network = torch.nn.Sequential(torch.nn.Flatten(), torch.nn.Linear(24 * 64, 4672))
+    initial = [parameter.detach().clone() for parameter in network.parameters()]
+    module = BasicModule(network, torch.optim.SGD(network.parameters(), lr=0.1), torch.nn.CrossEntropyLoss())
+    settings = {"train_files": str(tmp_path / "*.csv.gz"), "batch_size": 4, "epochs": 2, "shuffle_buffer": 8,
+                "processes": 2, "threads": 1, "gradient_compression": "powersgd", "powersgd_start_step": 2,
+                "default_root_dir": str(tmp_path)}
+
+    trainer = fit(module, settings, start_method="spawn", logger=False, enable_checkpointing=False,
+                  enable_progress_bar=False, enable_model_summary=False)
+    assert trainer.callback_metrics["positions_per_second"] > 0
+    assert not all(torch.equal(before, after) for before, after in zip(initial, network.parameters()))
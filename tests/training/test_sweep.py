@@ -0,0 +1,66 @@
+import json
+import os
+import pandas as pd
+import pytest
+import torch
+from deep_chess_playground.lightning_modules.basic_module import BasicModule
+from deep_chess_playground.training.sweep import expand_search_space, keeps_going, rung_epochs, run_sweep, set_path
+
+
+GAMES = ["e4 e5 Nf3 Nc6 Bb5 a6", "d4 d5 c4 e6 Nc3", "f3 e5 g4 Qh4#", "Nf3 d5 g3", "c4 e5 Nc3 Nf6 g3"]
+
+
+def build_module(config):
+    torch.manual_seed(0)
+    network = torch.nn.Sequential(torch.nn.Flatten(), torch.nn.Linear(24 * 64, 4672))
+    return BasicModule(network, torch.optim.SGD(network.parameters(), lr=config["optimizer"]["lr"]),
+                       torch.nn.CrossEntropyLoss())
+
+
+def test_search_space():
+    config = {"optimizer": {"lr": 0.1}, "layers": [{"channels": 8}]}
+    set_path(config, "layers.0.channels", 16)
+    set_path(config, "optimizer.momentum", 0.9)
+    assert config == {"optimizer": {"lr": 0.1, "momentum": 0.9}, "layers": [{"channels": 16}]}
+    with pytest.raises(KeyError):
+        set_path(config, "scheduler.gamma", 0.5)
+
+    space = {"layers.0.channels": [8, 16], "optimizer.lr": {"loguniform": [1e-4, 1e-2]},
+             "batch_size": {"choice": [256, 512]}, "blocks": {"randint": [2, 4]}}
+    trials = expand_search_space(space, num_samples=3, seed=1)
+    assert len(trials) == 6 and [trial["layers.0.channels"] for trial in trials] == [8] * 3 + [16] * 3
+    assert all(1e-4 <= trial["optimizer.lr"] <= 1e-2 and trial["batch_size"] in (256, 512) and
+               trial["blocks"] in (2, 3, 4) for trial in trials)
+    assert trials == expand_search_space(space, num_samples=3, seed=1)
+    with pytest.raises(ValueError, match="Invalid"):
+        expand_search_space({"optimizer.lr": {"normal": [0, 1]}})
+
+
+def test_successive_halving_rules():
+    assert rung_epochs(1, 27, 3) == [1, 3, 9]
+    assert rung_epochs(2, 8, 2) == [2, 4]
+    assert keeps_going([], 5.0, 3)
+    assert keeps_going([1.0, 2.0, 3.0, 4.0, 5.0, 6.0], 2.0, 3)
+    assert not keeps_going([1.0, 2.0, 3.0, 4.0, 5.0, 6.0], 3.0, 3)
+
+
+def test_run_sweep(tmp_path, monkeypatch, write_games):
+    base = {"optimizer": {"lr": 0.1},
+            "training": {"train_files": [write_games("train.csv.gz", GAMES)],
+                         "val_files": [write_games("val.csv.gz", GAMES)], "batch_size": 8}}
+    sweep = {"base": base, "search_space": {"optimizer.lr": [0.0, 0.01, 0.1, 1.0]}, "max_epochs": 3,
+             "reduction_factor": 3, "processes": 2, "threads_per_trial": 1, "output_dir": str(tmp_path / "sweep")}
+
+    monkeypatch.setenv("OMP_NUM_THREADS", "3")
+    results = run_sweep(sweep, build_module)
+    assert os.environ["OMP_NUM_THREADS"] == "3"
+    assert sorted(results["optimizer.lr"]) == [0.0, 0.01, 0.1, 1.0]
+    assert set(results["epochs"]) <= {1, 3}
+    # The trial with the best loss at the rung always goes on
+    assert results.loc[results["losses"].map(lambda losses: losses[0]).idxmin(), "epochs"] == 3
+    assert len(pd.read_csv(tmp_path / "sweep" / "results.csv")) == 4
+    with open(tmp_path / "sweep" / "trial_3" / "config.json") as f:
+        assert json.load(f)["optimizer"]["lr"] == 1.0
+
+    with pytest.raises(ValueError, match="val_files"):
+        run_sweep({**sweep, "base": {"training": {"train_files": ["train.csv.gz"]}}}, build_module)
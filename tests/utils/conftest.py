@@ -0,0 +1,39 @@
+import http.server
+import re
+import threading
+import pytest
+
+
+class RangeRequestHandler(http.server.BaseHTTPRequestHandler):
+    """Serves `server.data`, honouring `Range: bytes={start}-` unless `server.ranges` is False. The body of the
+    n-th response is cut off after `server.drops[n]` bytes, like a dropped connection."""
+
+    def do_GET(self):
+        match = re.match(r"bytes=(\d+)-", self.headers.get("Range", ""))
+        start = int(match.group(1)) if match and self.server.ranges else 0
+        body = self.server.data[start:]
+        self.server.requests.append(start)
+        if match and self.server.ranges:
+            self.send_response(206)
+            self.send_header("Content-Range", f"bytes {start}-{len(self.server.data) - 1}/{len(self.server.data)}")
+        else:
+            self.send_response(200)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        limit = self.server.drops.pop(0) if self.server.drops else None
+        self.wfile.write(body[:limit])
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def http_server():
+    server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), RangeRequestHandler)
+    server.data, server.drops, server.ranges, server.requests = b"", [], True, []
+    server.url = f"http://127.0.0.1:{server.server_port}/games.pgn.zst"
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
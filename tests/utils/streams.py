@@ -0,0 +1,14 @@
+import io
+
+
+class UnseekableStream(io.RawIOBase):
+    """A readable stream without seek(), like stdin or a socket."""
+
+    def __init__(self, data: bytes):
+        self._data = io.BytesIO(data)
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        return self._data.readinto(buffer)
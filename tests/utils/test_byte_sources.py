@@ -0,0 +1,54 @@
+import os
+import pytest
+from deep_chess_playground.utils.byte_sources import HttpRangeReader, open_source
+from tests.utils.streams import UnseekableStream
+
+
+def test_open_source_file(tmp_path):
+    path = tmp_path / "data.bin"
+    path.write_bytes(bytes(range(256)))
+    stream, size = open_source(str(path), 100)
+    with stream:
+        assert size == 256
+        assert stream.read() == bytes(range(100, 256))
+
+
+def test_open_source_unseekable_stream():
+    data = os.urandom(5000)
+    stream, size = open_source(UnseekableStream(data), 1234)
+    assert size is None
+    assert stream.read() == data[1234:]
+    with pytest.raises(ValueError):
+        open_source(UnseekableStream(data), 6000)
+
+
+def test_http_range_reader_reconnects(http_server):
+    http_server.data = os.urandom(100000)
+    http_server.drops = [30000, 1000]
+    with HttpRangeReader(http_server.url, retry_delay=0) as reader:
+        assert reader.size == 100000
+        assert reader.read() == http_server.data
+        assert reader.reconnections == 2
+    assert http_server.requests == [0, 30000, 31000]
+
+
+def test_http_range_reader_offset(http_server):
+    http_server.data = os.urandom(10000)
+    stream, size = open_source(http_server.url, 2500)
+    with stream:
+        assert size == 10000
+        assert stream.read() == http_server.data[2500:]
+    # A server ignoring ranges sends everything, the bytes before the offset are skipped
+    http_server.ranges = False
+    with HttpRangeReader(http_server.url, 2500) as reader:
+        assert reader.read() == http_server.data[2500:]
+
+
+def test_http_range_reader_gives_up(http_server):
+    http_server.data = os.urandom(10000)
+    # The retries only count reconnections without progress
+    http_server.drops = [100, 100] + [0] * 10
+    with HttpRangeReader(http_server.url, retries=2, retry_delay=0) as reader:
+        with pytest.raises(OSError, match="failed at byte 200"):
+            reader.read()
+    assert http_server.requests == [0, 100, 200, 200]
@@ -0,0 +1,55 @@
+import json
+import math
+from queue import Queue
+from deep_chess_playground.utils.conversion_telemetry import (ConversionStats, JsonLinesExporter, MetricsReporter,
+                                                              PrometheusExporter)
+
+
+def test_snapshot_progress_and_eta():
+    queue = Queue(maxsize=4)
+    queue.put(b"chunk")
+    stats = ConversionStats(1000, {"chunks": queue})
+    assert math.isnan(stats.snapshot()["eta_seconds"])
+    stats.compressed_bytes_read = 250
+    stats.games_parsed = 10
+    snapshot = stats.snapshot()
+    assert snapshot["progress"] == 0.25
+    assert math.isclose(snapshot["eta_seconds"], 3 * snapshot["elapsed_seconds"], rel_tol=1e-3)
+    assert snapshot["chunks_queue_size"] == 1 and snapshot["chunks_queue_occupancy"] == 0.25
+
+
+def test_snapshot_of_resumed_conversion():
+    stats = ConversionStats(1000)
+    stats.start_offset = stats.compressed_bytes_read = 500
+    assert math.isnan(stats.snapshot()["eta_seconds"])
+    stats.compressed_bytes_read = 600
+    snapshot = stats.snapshot()
+    # 100 bytes read in this run, 400 to go
+    assert snapshot["progress"] == 0.6
+    assert math.isclose(snapshot["eta_seconds"], 4 * snapshot["elapsed_seconds"], rel_tol=1e-3)
+
+
+def test_reporter_reports_on_stop():
+    snapshots = []
+    reporter = MetricsReporter(ConversionStats(100), [snapshots.append], interval=60)
+    reporter.start()
+    reporter.stop()
+    assert len(snapshots) == 1
+
+
+def test_exporters(tmp_path):
+    stats = ConversionStats(100)
+    stats.games_written = 7
+    jsonl = JsonLinesExporter(str(tmp_path / "metrics.jsonl"))
+    jsonl(stats.snapshot())
+    jsonl(stats.snapshot())
+    lines = (tmp_path / "metrics.jsonl").read_text().splitlines()
+    assert len(lines) == 2
+    record = json.loads(lines[0])
+    assert record["games_written"] == 7 and record["eta_seconds"] is None
+
+    PrometheusExporter(str(tmp_path / "metrics.prom"), labels={"file": "january"})(stats.snapshot())
+    text = (tmp_path / "metrics.prom").read_text()
+    assert "# TYPE pgn_conversion_games_written_total counter" in text
+    assert 'pgn_conversion_games_written_total{file="january"} 7' in text
+    assert "# TYPE pgn_conversion_progress gauge" in text
@@ -0,0 +1,75 @@
+import numpy as np
+import pandas as pd
+import pytest
+from deep_chess_playground.utils.games_index import GamesIndex, opening_family, time_control_bucket
+from deep_chess_playground.utils.headers import HEADERS
+
+
+GAMES = [
+    # Date, White, Black, WhiteElo, BlackElo, ECO, Opening, TimeControl
+    ("2023.01.05", "alice", "bob", "2250", "2300", "B90", "Sicilian Defense: Najdorf Variation", "180+2"),
+    ("2023.02.11", "carol", "alice", "1800", "2240", "B20", "Sicilian Defense", "60+0"),
+    ("2022.12.31", "bob", "dave", "2400", "2350", "B90", "Sicilian Defense: Najdorf Variation", "600+0"),
+    ("2023.03.01", "dave", "carol", "2210", "2205", "C50", "Italian Game", "300+3"),
+    ("2023.04.01", "alice", "dave", "2310", "?", "B33", "Sicilian Defense: Sveshnikov Variation", "-"),
+]
+
+
+def write_games(path, games):
+    rows = []
+    for date, white, black, white_elo, black_elo, eco, opening, time_control in games:
+        row = dict.fromkeys(HEADERS, "?")
+        row.update(Date=date, White=white, Black=black, WhiteElo=white_elo, BlackElo=black_elo, ECO=eco,
+                   Opening=opening, TimeControl=time_control, Moves="e4 c5")
+        rows.append(row)
+    pd.DataFrame(rows, columns=HEADERS).to_csv(path, index=False)
+
+
+@pytest.fixture
+def index(tmp_path):
+    write_games(tmp_path / "0.csv.gz", GAMES[:3])
+    write_games(tmp_path / "1.csv.gz", GAMES[3:])
+    return GamesIndex.build([str(tmp_path / "0.csv.gz"), str(tmp_path / "1.csv.gz")])
+
+
+def test_buckets():
+    assert time_control_bucket("180+2") == "Blitz"
+    assert time_control_bucket("60+0") == "Bullet"
+    assert time_control_bucket("15+0") == "UltraBullet"
+    assert time_control_bucket("600+0") == "Rapid"
+    assert time_control_bucket("1800+20") == "Classical"
+    assert time_control_bucket("-") == "Correspondence"
+    assert opening_family("Sicilian Defense: Najdorf Variation") == "Sicilian Defense"
+
+
+def test_posting_lists_are_sorted_global_ids(index):
+    assert index.num_games == 5
+    assert index.posting_list("Player", "alice").tolist() == [0, 1, 4]
+    assert index.posting_list("Player", ["bob", "carol"]).tolist() == [0, 1, 2, 3]
+    assert index.posting_list("ECO", "B90").tolist() == [0, 2]
+    assert index.posting_list("Elo", "2200").tolist() == [0, 3]
+    assert index.posting_list("Year", "2023").tolist() == [0, 1, 3, 4]
+    assert all(np.all(np.diff(ids) > 0) for ids in index.postings.values())
+    assert index.locations(np.array([2, 3])) == [(index.files[0], 2), (index.files[1], 0)]
+
+
+def test_query_intersects_and_reads_only_matching_rows(index):
+    assert index.search(opening_family="Sicilian Defense", year="2023").tolist() == [0, 1, 4]
+    df = index.query(opening_family="Sicilian Defense", year="2023", min_elo=2200)
+    assert df["White"].tolist() == ["alice"]
+    assert df["Row"].tolist() == [0] and df["File"].tolist() == [index.files[0]]
+    assert list(df.columns) == HEADERS + ["File", "Row"]
+    df = index.query(columns=["ECO"], player="dave", time_control=["Rapid", "Blitz"])
+    assert df["ECO"].tolist() == ["B90", "C50"]
+    assert index.query(player="nobody").empty
+    assert len(index.search()) == 5
+
+
+def test_save_and_load(index, tmp_path):
+    index.save(tmp_path / "index.npz")
+    loaded = GamesIndex.load(tmp_path / "index.npz")
+    assert loaded.files == index.files and loaded.num_games == index.num_games
+    assert loaded.postings.keys() == index.postings.keys()
+    assert all(np.array_equal(loaded.postings[key], index.postings[key]) for key in index.postings)
+    assert loaded.search(eco="B90", max_elo=2300).tolist() == [0, 2]
+    assert loaded.query(eco="B90", max_elo=2300)["White"].tolist() == ["alice"]
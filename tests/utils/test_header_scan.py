@@ -0,0 +1,103 @@
+import io
+import os
+import pandas as pd
+import pytest
+import zstandard as zstd
+from pypaya_pgn_parser.pgn_parser import PGNParser
+from deep_chess_playground.utils.games_index import time_control_bucket
+from deep_chess_playground.utils.header_scan import HeaderHistograms, scan_headers
+from deep_chess_playground.utils.headers import HEADERS
+from deep_chess_playground.utils.pgn_zst_to_csv_gz_converter import PgnZstToCsvGzConverter
+
+
+EXAMPLE_PGN_PATH = os.path.join(os.path.dirname(__file__), '..', 'data', 'example.pgn')
+
+MISSING_TAGS_PGN = b"""[Event "No tags"]
+[Result "1-0"]
+
+1. e4 e5 2. Qh5 Nc6 3. Bc4 Nf6 4. Qxf7# 1-0
+
+[Event "Old game"]
+[Date "1858.??.??"]
+[WhiteElo "?"]
+[BlackElo "5000"]
+[TimeControl "-"]
+[Termination "Mate"]
+[Result "1/2-1/2"]
+
+1. d4 1/2-1/2
+"""
+
+
+@pytest.fixture(scope="module")
+def example_headers():
+    with open(EXAMPLE_PGN_PATH) as f:
+        stream = io.StringIO(f.read())
+    parser, rows = PGNParser(), []
+    while result := parser.parse(stream):
+        rows.append(result[0])
+    return pd.DataFrame(rows, columns=HEADERS[:-1])
+
+
+def scan(data: bytes, chunk_size: int) -> HeaderHistograms:
+    histograms = HeaderHistograms()
+    rest = b"\n"
+    for start in range(0, len(data), chunk_size):
+        rest = histograms.scan(rest + data[start:start + chunk_size])
+    histograms.scan(rest, final=True)
+    return histograms
+
+
+def test_histograms_match_parsed_headers(example_headers):
+    with open(EXAMPLE_PGN_PATH, "rb") as f:
+        summary = scan(f.read(), 1 << 20).summary()
+    assert summary["games"] == {"total": len(example_headers)}
+    months = example_headers["Date"].str[:7].str.replace(".", "-")
+    assert summary["months"] == months.value_counts().to_dict()
+    elo = pd.concat([example_headers["WhiteElo"], example_headers["BlackElo"]]).astype(int) // 100 * 100
+    assert summary["elo"] == elo.astype(str).value_counts().to_dict()
+    assert summary["time_controls"] == example_headers["TimeControl"].map(time_control_bucket).value_counts().to_dict()
+    assert summary["terminations"] == example_headers["Termination"].value_counts().to_dict()
+    assert summary["results"] == example_headers["Result"].value_counts().to_dict()
+
+
+@pytest.mark.parametrize("chunk_size", [7, 1000, 1 << 20])
+def test_chunk_boundaries(chunk_size):
+    with open(EXAMPLE_PGN_PATH, "rb") as f:
+        data = f.read() * 3
+    expected = scan(data, 1 << 24).summary()
+    assert scan(data, chunk_size).summary() == expected
+
+
+def test_missing_and_unexpected_values():
+    summary = scan(MISSING_TAGS_PGN, 16).summary()
+    assert summary["games"] == {"total": 2}
+    assert summary["months"] == {"?": 2}
+    assert summary["elo"] == {"?": 4}
+    assert summary["time_controls"] == {"Correspondence": 1, "?": 1}
+    assert summary["terminations"] == {"?": 2}
+    assert summary["results"] == {"1-0": 1, "1/2-1/2": 1}
+    assert scan(MISSING_TAGS_PGN, 16).to_frame("results").values.tolist() == [["1-0", 1], ["1/2-1/2", 1]]
+
+
+def test_converter_scan_with_crlf_line_endings(tmp_path):
+    with open(EXAMPLE_PGN_PATH, "rb") as f:
+        data = f.read().replace(b"\n", b"\r\n")
+    pgn_zst_path = tmp_path / "example.pgn.zst"
+    pgn_zst_path.write_bytes(zstd.compress(data))
+    snapshots = []
+    converter = PgnZstToCsvGzConverter(str(pgn_zst_path), str(tmp_path), 10, chunk_size=5000,
+                                       metrics_callbacks=[snapshots.append])
+    histograms = converter.scan_headers()
+    assert histograms.num_games == 54
+    assert histograms.summary() == scan_headers(str(pgn_zst_path)).summary()
+    assert snapshots[-1]["games_parsed"] == 54 and snapshots[-1]["progress"] == 1.0
+    assert snapshots[-1]["decompressed_bytes"] == len(data)
+    assert os.listdir(tmp_path) == ["example.pgn.zst"]
+
+
+def test_scan_multiple_frames_from_stream():
+    with open(EXAMPLE_PGN_PATH, "rb") as f:
+        data = f.read()
+    frames = b"".join(zstd.compress(data[start:start + 5000]) for start in range(0, len(data), 5000))
+    assert scan_headers(io.BytesIO(frames)).summary() == scan(data, 1 << 20).summary()
@@ -0,0 +1,76 @@
+import io
+import os
+import chess
+import numpy as np
+import pytest
+from pypaya_pgn_parser.pgn_parser import PGNParser
+from deep_chess_playground.data_encoders.output_encoders.move_encoding_8_8_73 import MoveEncoder8x8x73
+from deep_chess_playground.utils.move_codes import (decode_move, decode_move_codes, encode_move, load_move_codes,
+                                                    san_to_codes, save_move_codes, sidecar_path)
+from deep_chess_playground.utils.trusted_replay import replay, replay_codes
+
+
+@pytest.fixture(scope="module")
+def example_games():
+    example_pgn_path = os.path.join(os.path.dirname(__file__), '..', 'data', 'example.pgn')
+    with open(example_pgn_path) as f:
+        stream = io.StringIO(f.read())
+    parser = PGNParser()
+    games = []
+    while result := parser.parse(stream):
+        _, moves = result
+        if moves:
+            games.append(moves)
+    return games
+
+
+@pytest.mark.parametrize("uci", ["e2e4", "e7e8q", "a2a1n", "e1g1", "h7g8r"])
+def test_encode_decode_round_trip(uci):
+    move = chess.Move.from_uci(uci)
+    assert 0 <= encode_move(move) < 1 << 16
+    assert decode_move(encode_move(move)) == move
+
+
+def test_san_to_codes_matches_python_chess(example_games):
+    for moves in example_games[:10]:
+        board = chess.Board()
+        expected = [encode_move(board.push_san(san)) for san in moves.split()]
+        codes = san_to_codes(moves)
+        assert codes.dtype == np.uint16
+        assert codes.tolist() == expected
+    assert san_to_codes("").shape == (0,)
+    with pytest.raises(ValueError):
+        san_to_codes("e4 Ke3")
+
+
+def test_decode_move_codes():
+    codes = san_to_codes("e4 e5 Nf3 Nc6 Bc4 Nf6 O-O")
+    from_squares, to_squares, promotions = decode_move_codes(codes)
+    assert [chess.Move(f, t, p or None).uci() for f, t, p in zip(from_squares, to_squares, promotions)] == \
+        ["e2e4", "e7e5", "g1f3", "b8c6", "f1c4", "g8f6", "e1g1"]
+
+
+def test_replay_codes_matches_replay(example_games):
+    for moves in example_games:
+        np.testing.assert_array_equal(replay_codes(san_to_codes(moves), include_final=True),
+                                      replay(moves, include_final=True))
+
+
+def test_indices_from_codes_match_index(example_games):
+    move_encoder = MoveEncoder8x8x73()
+    for moves in example_games[:10]:
+        board = chess.Board()
+        expected = [move_encoder.index(board.push_san(san)) for san in moves.split()]
+        assert move_encoder.indices_from_codes(san_to_codes(moves)).tolist() == expected
+    assert move_encoder.indices_from_codes(np.array([encode_move(chess.Move(52, 60, chess.KING))]))[0] == -1
+
+
+def test_save_load_round_trip(tmp_path):
+    games = [san_to_codes("e4 e5 Nf3"), san_to_codes(""), san_to_codes("d4")]
+    path = sidecar_path(str(tmp_path / "0.csv.gz"))
+    assert path == str(tmp_path / "0.moves.npz")
+    save_move_codes(path, games)
+    codes, offsets = load_move_codes(path)
+    assert offsets.tolist() == [0, 3, 3, 4]
+    assert [codes[start:end].tolist() for start, end in zip(offsets[:-1], offsets[1:])] == \
+        [game.tolist() for game in games]
@@ -8,6 +8,7 @@ from deep_chess_playground.utils.square_utilities import Square
     "expected_direction,expected_square_distance,expected_knight_move", [
         ("e2e4", Square("e2"), Square("e4"), None, 0, 2, False),
         ("b1c3", Square("b1"), Square("c3"), None, 1, 2, True),
+        ("a3c2", Square("a3"), Square("c2"), None, 3, 2, True),
         ("h7h8q", Square("h7"), Square("h8"), "q", 0, 1, False),
         ("a7a8r", Square("a7"), Square("a8"), "r", 0, 1, False)
     ])
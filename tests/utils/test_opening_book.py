@@ -0,0 +1,80 @@
+import io
+import os
+from collections import Counter
+import chess
+import chess.polyglot
+import pandas as pd
+import pytest
+from pypaya_pgn_parser.pgn_parser import PGNParser
+from deep_chess_playground.utils import PROJECT_ROOT, opening_book
+from deep_chess_playground.utils.headers import HEADERS
+from deep_chess_playground.utils.opening_book import OpeningBook, OpeningBookBuilder, decode_move, encode_move
+
+
+@pytest.fixture
+def games_file(tmp_path):
+    with open(os.path.join(PROJECT_ROOT, "tests", "data", "example.pgn")) as f:
+        stream = io.StringIO(f.read())
+    parser, rows = PGNParser(), []
+    while result := parser.parse(stream):
+        rows.append(result[0] + [result[1]])
+    path = tmp_path / "0.csv.gz"
+    pd.DataFrame(rows, columns=HEADERS).to_csv(path, index=False)
+    return str(path)
+
+
+def test_move_codes():
+    for uci in ["e2e4", "a7a8q", "h2h1n", "e1g1"]:
+        assert decode_move(encode_move(chess.Move.from_uci(uci))) == chess.Move.from_uci(uci)
+
+
+def test_book_counts_match_games(games_file, tmp_path, monkeypatch):
+    # Tiny runs and merge blocks exercise the external sort
+    monkeypatch.setattr(opening_book, "MERGE_BLOCK_SIZE", 7)
+    book_path = str(tmp_path / "book.bin")
+    num_records = OpeningBookBuilder(max_ply=6, run_size=50).build([games_file], book_path)
+    df = pd.read_csv(games_file)
+    first_moves = Counter(moves.split()[0] for moves, result in zip(df["Moves"], df["Result"])
+                          if result in ("1-0", "0-1", "1/2-1/2"))
+    book = OpeningBook(book_path)
+    assert len(book) == num_records and book.max_ply == 6
+    entries = book.find_all(chess.Board())
+    board = chess.Board()
+    assert {board.san(entry.move): entry.count for entry in entries} == dict(first_moves)
+    assert [entry.count for entry in entries] == sorted((entry.count for entry in entries), reverse=True)
+    white_wins = sum(result == "1-0" for result in df["Result"])
+    assert sum(entry.wins for entry in entries) == white_wins
+    assert book.find_all(chess.Board("8/8/8/8/8/8/8/K6k w - - 0 1")) == []
+    assert book.weighted_choice(chess.Board()) in [entry.move for entry in entries]
+    book.close()
+
+    in_memory = OpeningBookBuilder(max_ply=6).build([games_file], str(tmp_path / "book2.bin"))
+    assert in_memory == num_records
+    with open(book_path, "rb") as f, open(tmp_path / "book2.bin", "rb") as g:
+        assert f.read() == g.read()
+
+
+def test_min_count_and_polyglot_export(games_file, tmp_path):
+    book_path, polyglot_path = str(tmp_path / "book.bin"), str(tmp_path / "book.bin.polyglot")
+    OpeningBookBuilder(max_ply=12, min_count=2).build([games_file], book_path)
+    book = OpeningBook(book_path)
+    book.export_polyglot(polyglot_path)
+    with chess.polyglot.open_reader(polyglot_path) as reader:
+        board = chess.Board()
+        assert {entry.move for entry in reader.find_all(board)} == {entry.move for entry in book.find_all(board)}
+        assert all(entry.count >= 2 for entry in book.find_all(board))
+        # Every book move is legal in its position, including castling read back from the Polyglot encoding
+        for moves in pd.read_csv(games_file)["Moves"]:
+            board = chess.Board()
+            for san in moves.split()[:12]:
+                for entry in reader.find_all(board):
+                    assert board.is_legal(entry.move)
+                board.push_san(san)
+    book.close()
+
+
+def test_invalid_file(tmp_path):
+    path = tmp_path / "book.bin"
+    path.write_bytes(b"\0" * 64)
+    with pytest.raises(ValueError):
+        OpeningBook(str(path))
@@ -0,0 +1,67 @@
+import io
+import numpy as np
+import pytest
+from deep_chess_playground.utils.pgn_annotations import (MATE_EVAL, MISSING_EVAL, Annotations, AnnotatedPGNParser,
+                                                         annotations_path, eval_targets, load_annotations,
+                                                         parse_comment, save_annotations)
+
+
+PGN = """[Event "Annotated"]
+[Result "0-1"]
+
+1. e4 { [%eval 0.2] [%clk 0:05:00] } 1... e5 { [%eval -1.5] [%clk 0:04:58.5] } 2. Qh5?! { [%clk 0:04:50] }
+2... Nc6 { [%eval #-3] [%clk 1:00:01] } 3. Bc4 4. Qxf7# 0-1
+
+[Event "Plain"]
+[Result "*"]
+
+1. d4 d5 *
+"""
+
+
+@pytest.mark.parametrize("comment, expected", [
+    ("[%eval 0.2] [%clk 0:05:00]", (20, 0, 300.0)),
+    ("[%clk 0:00:07.5] [%eval -12.34]", (-1234, 0, 7.5)),
+    ("[%eval #4]", (MISSING_EVAL, 4, np.nan)),
+    ("[%eval #-1] [%clk 1:02:03]", (MISSING_EVAL, -1, 3723.0)),
+    ("?!", (MISSING_EVAL, 0, np.nan)),
+])
+def test_parse_comment(comment, expected):
+    eval_cp, eval_mate, clock = parse_comment(comment)
+    assert (eval_cp, eval_mate) == expected[:2]
+    assert clock == expected[2] or (np.isnan(clock) and np.isnan(expected[2]))
+
+
+def test_parser_aligns_annotations_with_plies():
+    parser = AnnotatedPGNParser()
+    stream = io.StringIO(PGN)
+    _, moves = parser.parse(stream)
+    assert moves.split() == ["e4", "e5", "Qh5", "Nc6", "Bc4", "Qxf7#"]
+    annotations = parser.annotations
+    assert annotations.eval_cp.tolist() == [20, -150, MISSING_EVAL, MISSING_EVAL, MISSING_EVAL, MISSING_EVAL]
+    assert annotations.eval_mate.tolist() == [0, 0, 0, -3, 0, 0]
+    np.testing.assert_array_equal(annotations.clock, [300, 298.5, 290, 3601, np.nan, np.nan])
+    _, moves = parser.parse(stream)
+    assert moves == "d4 d5"
+    assert parser.annotations.eval_cp.tolist() == [MISSING_EVAL] * 2
+
+
+def test_eval_targets():
+    targets = eval_targets(np.array([20, -150, MISSING_EVAL, 5000, MISSING_EVAL]), np.array([0, 0, 0, 0, -3]))
+    np.testing.assert_allclose(targets, [0.2, -1.5, np.nan, MATE_EVAL, -MATE_EVAL])
+    assert targets.dtype == np.float32
+
+
+def test_save_load_round_trip(tmp_path):
+    games = [Annotations(np.array([20, -150], dtype=np.int16), np.zeros(2, dtype=np.int16),
+                         np.array([300, 298.5], dtype=np.float32)),
+             Annotations(np.array([MISSING_EVAL], dtype=np.int16), np.array([2], dtype=np.int16),
+                         np.array([np.nan], dtype=np.float32))]
+    path = annotations_path(str(tmp_path / "3.csv.gz"))
+    assert path == str(tmp_path / "3.annotations.npz")
+    save_annotations(path, games)
+    annotations, offsets = load_annotations(path)
+    assert offsets.tolist() == [0, 2, 3]
+    assert annotations.eval_cp.dtype == np.int16 and annotations.clock.dtype == np.float32
+    assert annotations.eval_cp.tolist() == [20, -150, MISSING_EVAL]
+    assert annotations.eval_mate.tolist() == [0, 0, 2]
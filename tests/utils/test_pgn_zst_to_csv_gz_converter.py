@@ -1,9 +1,15 @@
+import io
+import json
 import os
 import pytest
 import tempfile
+import numpy as np
 import pandas as pd
 import zstandard as zstd
+from deep_chess_playground.utils.move_codes import load_move_codes, san_to_codes, sidecar_path
+from deep_chess_playground.utils.pgn_annotations import MISSING_EVAL, annotations_path, load_annotations
 from deep_chess_playground.utils.pgn_zst_to_csv_gz_converter import PgnZstToCsvGzConverter
+from tests.utils.streams import UnseekableStream
 
 
 @pytest.fixture
@@ -173,3 +179,172 @@ def test_example_pgn_conversion(example_pgn_zst_file, output_dir):
 
     # Check that all games have a valid result
     assert combined_df['Result'].isin(['1-0', '0-1', '1/2-1/2', '*']).all()
+
+
+def test_metrics_callbacks(example_pgn_zst_file, output_dir):
+    snapshots = []
+    converter = PgnZstToCsvGzConverter(
+        pgn_zst_path=example_pgn_zst_file,
+        destination_dir=output_dir,
+        num_games_per_file=20,
+        metrics_callbacks=[snapshots.append]
+    )
+    converter.convert()
+
+    final = snapshots[-1]
+    assert final['compressed_bytes_read'] == final['compressed_bytes_total'] == os.path.getsize(example_pgn_zst_file)
+    assert final['progress'] == 1.0 and final['eta_seconds'] == 0.0
+    assert final['games_parsed'] == final['games_written'] == 54
+    assert final['files_written'] == 3
+    assert final['decompressed_bytes'] > final['compressed_bytes_read']
+    assert 0 <= final['chunks_queue_occupancy'] <= 1 and 'games_queue_size' in final
+
+
+@pytest.mark.parametrize("moves_format", ["codes", "both"])
+def test_move_codes_sidecars(example_pgn_zst_file, output_dir, moves_format):
+    PgnZstToCsvGzConverter(
+        pgn_zst_path=example_pgn_zst_file,
+        destination_dir=output_dir,
+        num_games_per_file=20,
+        moves_format=moves_format
+    ).convert()
+
+    csv_files = sorted(file for file in os.listdir(output_dir) if file.endswith('.csv.gz'))
+    assert len(csv_files) == 3
+    for file in csv_files:
+        df = pd.read_csv(os.path.join(output_dir, file), compression='gzip')
+        codes, offsets = load_move_codes(sidecar_path(os.path.join(output_dir, file)))
+        assert len(offsets) == len(df) + 1 and offsets[-1] == len(codes)
+        assert ('Moves' in df.columns) == (moves_format == "both")
+        if moves_format == "both":
+            for moves, start, end in zip(df['Moves'], offsets[:-1], offsets[1:]):
+                assert codes[start:end].tolist() == san_to_codes(moves).tolist()
+
+
+def test_invalid_moves_format(sample_pgn_zst_file, output_dir):
+    with pytest.raises(ValueError):
+        PgnZstToCsvGzConverter(sample_pgn_zst_file, output_dir, 1, moves_format="uci")
+
+
+def test_annotations_sidecars(example_pgn_zst_file, output_dir):
+    PgnZstToCsvGzConverter(
+        pgn_zst_path=example_pgn_zst_file,
+        destination_dir=output_dir,
+        num_games_per_file=20,
+        annotations=True
+    ).convert()
+
+    csv_files = sorted(file for file in os.listdir(output_dir) if file.endswith('.csv.gz'))
+    assert len(csv_files) == 3
+    evals = 0
+    for file in csv_files:
+        df = pd.read_csv(os.path.join(output_dir, file), compression='gzip')
+        annotations, offsets = load_annotations(annotations_path(os.path.join(output_dir, file)))
+        assert np.diff(offsets).tolist() == df['Moves'].str.split().str.len().tolist()
+        evals += int((annotations.eval_cp != MISSING_EVAL).sum() + (annotations.eval_mate != 0).sum())
+        assert (annotations.clock >= 0).all()
+    assert evals > 0
+    first = pd.read_csv(os.path.join(output_dir, csv_files[0]), compression='gzip')
+    annotations, offsets = load_annotations(annotations_path(os.path.join(output_dir, csv_files[0])))
+    assert first.loc[0, 'Moves'].startswith('e4 e5 Nf3')
+    assert annotations.eval_cp[:3].tolist() == [20, 17, 29]
+    assert annotations.clock[:3].tolist() == [300, 300, 302]
+
+
+def read_output(output_dir):
+    files = sorted((file for file in os.listdir(output_dir) if file.endswith('.csv.gz')),
+                   key=lambda file: int(file.split('.')[0]))
+    return pd.concat([pd.read_csv(os.path.join(output_dir, file)) for file in files], ignore_index=True)
+
+
+def example_pgn_frames(frame_size):
+    """The example games compressed as independent zstd frames of `frame_size` bytes of PGN each."""
+    with open(os.path.join(os.path.dirname(__file__), '..', 'data', 'example.pgn'), 'rb') as f:
+        content = f.read()
+    return b"".join(zstd.compress(content[start:start + frame_size])
+                    for start in range(0, len(content), frame_size))
+
+
+class InterruptedStream(UnseekableStream):
+    """Fails after `limit` bytes, like a dropped download."""
+
+    def __init__(self, data: bytes, limit: int):
+        super().__init__(data[:limit])
+
+    def readinto(self, buffer):
+        size = super().readinto(buffer)
+        if not size:
+            raise OSError("Connection lost")
+        return size
+
+
+@pytest.mark.parametrize("chunk_size", [50, 333, 20000])
+def test_small_chunks(example_pgn_zst_file, output_dir, chunk_size):
+    PgnZstToCsvGzConverter(example_pgn_zst_file, output_dir, 20).convert()
+    expected = read_output(output_dir)
+    with tempfile.TemporaryDirectory() as chunked_dir:
+        PgnZstToCsvGzConverter(example_pgn_zst_file, chunked_dir, 20, chunk_size=chunk_size).convert()
+        # The games cut by the end of a chunk are neither lost nor duplicated
+        pd.testing.assert_frame_equal(read_output(chunked_dir), expected)
+
+
+def test_stream_input(example_pgn_zst_file, output_dir):
+    snapshots = []
+    with open(example_pgn_zst_file, 'rb') as f:
+        stream = UnseekableStream(f.read())
+    PgnZstToCsvGzConverter(stream, output_dir, 20, metrics_callbacks=[snapshots.append]).convert()
+    assert len(read_output(output_dir)) == 54
+    assert snapshots[-1]['compressed_bytes_total'] == 0
+    assert snapshots[-1]['compressed_bytes_read'] == os.path.getsize(example_pgn_zst_file)
+
+
+def test_http_input(http_server, output_dir):
+    http_server.data = example_pgn_frames(5000)
+    http_server.drops = [len(http_server.data) // 2]
+    PgnZstToCsvGzConverter(http_server.url, output_dir, 20).convert()
+    games = read_output(output_dir)
+    assert len(games) == 54 and not games.duplicated().any()
+    assert http_server.requests == [0, len(http_server.data) // 2]
+
+
+@pytest.mark.parametrize("frame_size, num_games_per_file, chunk_size", [
+    (3000, 7, 500), (3000, 3, 1024 * 1024), (777, 5, 20000), (40000, 4, 1000)])
+def test_resume(output_dir, frame_size, num_games_per_file, chunk_size):
+    data = example_pgn_frames(frame_size)
+    checkpoint_path = os.path.join(output_dir, 'checkpoint.json')
+    with tempfile.TemporaryDirectory() as expected_dir:
+        PgnZstToCsvGzConverter(io.BytesIO(data), expected_dir, num_games_per_file, chunk_size=chunk_size).convert()
+        expected = read_output(expected_dir)
+
+    with pytest.raises(RuntimeError, match="Connection lost"):
+        PgnZstToCsvGzConverter(InterruptedStream(data, len(data) * 2 // 3), output_dir, num_games_per_file,
+                               chunk_size=chunk_size, checkpoint_path=checkpoint_path).convert()
+    with open(checkpoint_path) as f:
+        checkpoint = json.load(f)
+    assert 0 < checkpoint['files_written'] < len(expected) // num_games_per_file and not checkpoint['complete']
+    # Resumed from a later frame, or from the start skipping the written games with large frames
+    assert (checkpoint['frame_offset'] > 0) == (frame_size < 40000)
+    PgnZstToCsvGzConverter(io.BytesIO(data), output_dir, num_games_per_file, chunk_size=chunk_size,
+                           checkpoint_path=checkpoint_path).convert()
+    pd.testing.assert_frame_equal(read_output(output_dir), expected)
+    with open(checkpoint_path) as f:
+        assert json.load(f)['complete']
+
+    # Nothing is left to convert
+    converter = PgnZstToCsvGzConverter(io.BytesIO(data), output_dir, num_games_per_file,
+                                       checkpoint_path=checkpoint_path)
+    converter.convert()
+    assert converter.stats.games_parsed == 0
+    with pytest.raises(ValueError, match="moves_format"):
+        PgnZstToCsvGzConverter(io.BytesIO(data), output_dir, num_games_per_file, moves_format="codes",
+                               checkpoint_path=checkpoint_path).convert()
+    with pytest.raises(ValueError, match="num_games_per_file"):
+        PgnZstToCsvGzConverter(io.BytesIO(data), output_dir, num_games_per_file + 1,
+                               checkpoint_path=checkpoint_path).convert()
+
+
+def test_resume_with_another_input(sample_pgn_zst_file, example_pgn_zst_file, output_dir):
+    checkpoint_path = os.path.join(output_dir, 'checkpoint.json')
+    PgnZstToCsvGzConverter(sample_pgn_zst_file, output_dir, 10, checkpoint_path=checkpoint_path).convert()
+    with pytest.raises(ValueError, match="source"):
+        PgnZstToCsvGzConverter(example_pgn_zst_file, output_dir, 10, checkpoint_path=checkpoint_path).convert()
@@ -0,0 +1,80 @@
+import io
+import os
+import chess
+import numpy as np
+import pytest
+from pypaya_pgn_parser.pgn_parser import PGNParser
+from deep_chess_playground.data_encoders.input_encoders.grid_encoding import GridEncoder
+from deep_chess_playground.utils.trusted_replay import TrustedBoard, replay, python_chess_replay
+
+
+@pytest.fixture(scope="module")
+def example_games():
+    example_pgn_path = os.path.join(os.path.dirname(__file__), '..', 'data', 'example.pgn')
+    with open(example_pgn_path) as f:
+        stream = io.StringIO(f.read())
+    parser = PGNParser()
+    games = []
+    while result := parser.parse(stream):
+        _, moves = result
+        if moves:
+            games.append(moves)
+    return games
+
+
+def test_replay_matches_python_chess(example_games):
+    assert len(example_games) > 50
+    for moves in example_games:
+        np.testing.assert_array_equal(replay(moves, include_final=True),
+                                      python_chess_replay(moves, include_final=True))
+
+
+def test_replay_uci_matches_python_chess(example_games):
+    for moves in example_games[:10]:
+        board = chess.Board()
+        uci_moves = " ".join(board.push_san(san).uci() for san in moves.split())
+        np.testing.assert_array_equal(replay(uci_moves, notation="uci"), python_chess_replay(moves))
+
+
+def test_replay_shape():
+    positions = replay("e4 e5 Nf3")
+    assert positions.shape == (3, 12)
+    assert positions.dtype == np.uint64
+    assert replay("e4 e5 Nf3", include_final=True).shape == (4, 12)
+    assert replay("").shape == (0, 12)
+
+
+@pytest.mark.parametrize("fen, san, expected_uci", [
+    # Knight on e2 is pinned, so "Nc3" refers to the b1 knight
+    ("4k3/4r3/8/8/8/8/4N3/1N2K3 w - - 0 1", "Nc3", "b1c3"),
+    # En passant capture
+    ("4k3/8/8/3pP3/8/8/8/4K3 w - d6 0 1", "exd6", "e5d6"),
+    # Promotion with capture
+    ("3r3k/4P3/8/8/8/8/8/4K3 w - - 0 1", "exd8=N+", "e7d8n"),
+    # File and rank disambiguation
+    ("k7/8/8/8/8/R7/7R/R3K3 w - - 0 1", "R1a2", "a1a2"),
+    ("k7/8/8/8/8/R7/7R/R3K3 w - - 0 1", "Rha2", "h2a2"),
+    ("r3k2r/8/8/8/8/8/8/R3K2R b KQkq - 0 1", "O-O-O", "e8c8"),
+])
+def test_push_san_matches_python_chess(fen, san, expected_uci):
+    board = chess.Board(fen)
+    trusted_board = TrustedBoard.from_board(board)
+    trusted_board.push_san(san)
+    board.push_uci(expected_uci)
+    assert trusted_board.bitboards == TrustedBoard.from_board(board).bitboards
+    assert trusted_board.turn == board.turn
+
+
+def test_to_board_round_trip():
+    board = chess.Board("r3k2r/pp1p1pp1/3bq2p/1B6/3n2bP/P3PN2/1PQ1KPP1/R6R w kq - 0 1")
+    assert TrustedBoard.from_board(board).to_board().board_fen() == board.board_fen()
+
+
+def test_grid_encoder_encode_bitboards_matches_fen(example_games):
+    encoder = GridEncoder()
+    board = chess.Board()
+    moves = example_games[0].split()[:20]
+    for san in moves:
+        board.push_san(san)
+    bitboards = replay(" ".join(moves), include_final=True)[-1]
+    assert (encoder.encode_bitboards(bitboards) == encoder.encode(board.fen())).all()